@@ -4,18 +4,61 @@ Description:
     Video streaming process — WebRTC + TURN server.
     Captures from webcam or Picamera2, streams via WebRTC peer.
     No local display. No annotation. Pure streaming only.
+
+    Capture runs on its own thread into a preallocated frame ring
+    (SharedFrameBuffer), paced by what the viewers' encoders pull and, with
+    no viewer, by the capture governor. The event loop does networking
+    only. Snapshots, event clips and flock activity peek at the ring
+    without counting as viewers. Capture, viewer, latency and link stats
+    are logged every 60 seconds.
+
+    Each feature's rationale lives in its lib/services module; its
+    settings are in the README environment table.
 """
 
 import cv2
 import time
 import asyncio
+import queue
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+from firebase_admin import db
 
 from lib.services.hardware import camera_controller as camera
 from lib.services.hardware.camera_controller import CameraError
-from lib.services.webrtc_peer import run_webrtc_peer, WebRTCStartError, WebRTCStopError
+from lib.services import capture_governor
+from lib.services.capture_governor import CaptureGovernor, CaptureGovernorError
+from lib.services.webrtc_peer import (
+    run_webrtc_peer, DEFAULT_ICE_MODE, DEFAULT_ICE_PROBE_INTERVAL, DEFAULT_MAX_VIEWERS,
+    DEFAULT_RECONNECT_GRACE, DEFAULT_SIGNALING,
+    WebRTCStartError, WebRTCStopError
+)
 from lib.services import firebase_rtdb
 from lib.services.firebase_rtdb import FirebaseInitError
+from lib.services.loop_lag import LoopLagMonitor
+from lib.services.stream_telemetry import StreamTelemetry, StreamTelemetryError
+from lib.services import stream_report
+from lib.services import live_control
+from lib.services.live_control import LiveControlError
+from lib.services import abr_controller
+from lib.services import codec_bench
+from lib.services.codec_bench import CodecBenchError
+from lib.services import frame_latency
+from lib.services.frame_latency import FrameTracer
+from lib.services import snapshot_publisher
+from lib.services.snapshot_publisher import SnapshotError, SnapshotPublisher
+from lib.services import clip_recorder
+from lib.services.clip_recorder import ClipEncoderError, ClipRecorder, ClipRecorderError
+from lib.services import activity_monitor
+from lib.services.activity_monitor import (
+    ActivityError, ActivityMonitor, ActivityWriteError, ActivityZoneError
+)
+from lib.services.rtdb_stream import RTDBStream, RTDBStreamError
+from lib.services.abr_controller import ABRLadderError
 from lib.services.logger import get_logger
 
 log = get_logger("process_a.py")
@@ -23,26 +66,155 @@ log = get_logger("process_a.py")
 
 # ─────────────────────────── SHARED FRAME BUFFER ─────────────────────────────
 
+FRAME_RING_SLOTS     = 4     # Readers must finish with a view before 3 more frames land
+CAPTURE_JOIN_TIMEOUT = 2.0   # Seconds to wait for the capture thread on shutdown
+CONSUME_TIMEOUT      = 1.0   # Longest wait for the encoder to pull a captured frame
+MAX_CAPTURE_FAILURES = 10    # Consecutive empty frames / CameraErrors before capture stops
+CAPTURE_RETRY_WAIT   = 0.1   # Seconds before retrying a failed camera read
+DEFAULT_CAMERA_FPS   = 20
+
+
 class SharedFrameBuffer:
-    """Thread-safe buffer to share frames between camera capture and WebRTC."""
+    """
+    Ring of preallocated frames shared between camera capture and WebRTC.
 
-    def __init__(self):
-        self._frame     = None
+    The old buffer copied on update() and again on every get(), and
+    cv2.resize allocated a fresh array per frame. Now the only full-frame
+    copies are the write into a slot and the encoder's copy into its
+    AVFrame (compare with test/bench_frame_buffer.py).
+
+    The producer writes straight into the next slot and publishes it; readers
+    get a read-only view of the latest published slot — no copies either way.
+
+    Example:
+        slot = frame_buffer.next_slot()
+        cv2.resize(raw_frame, (width, height), dst=slot)
+        frame_buffer.publish()
+
+        frame = frame_buffer.get()   # read-only view, valid for the next
+                                     # FRAME_RING_SLOTS - 1 published frames
+
+    Single producer. A view stays intact until the producer wraps around to
+    its slot again, so consumers must copy or encode it straight away (recv()
+    does — from_ndarray() copies into the AVFrame).
+
+    Each slot also carries its capture and publish time (publish(captured=),
+    get_stamped()) for lib/services/frame_latency.
+    """
+
+    def __init__(
+        self,
+        shape        : tuple,
+        slots        : int = FRAME_RING_SLOTS,
+        dtype        = np.uint8,
+        pixel_format : str = "bgr",
+    ):
+        self.pixel_format = pixel_format   # camera_controller.PIXEL_FORMATS
+        self._slots     = [np.empty(shape, dtype=dtype) for _ in range(slots)]
+        self._stamps    = [(None, None)] * slots   # (captured, published) time.time()
+        self._views     = [self._read_only(slot) for slot in self._slots]
+        self._latest    = -1          # Index of the newest published slot
+        self._write     = 0           # Index the producer writes into next
+        self._seq       = 0           # Published frame count
         self._lock      = threading.Lock()
         self._new_frame = threading.Event()
+        self._consumed  = threading.Event()
 
-    def update(self, frame) -> None:
+        self.allocations   = slots    # Slot arrays — fixed, the ring never reallocates
+        self.bytes_written = 0        # Bytes published into the ring
+        self.delivered     = 0        # Published frames handed to a consumer
+        self.repeated      = 0        # get() calls that returned an already-seen frame
+        self._delivered_seq = 0
+
+    @staticmethod
+    def _read_only(slot: np.ndarray) -> np.ndarray:
+        view = slot.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def shape(self) -> tuple:
+        return self._slots[0].shape
+
+    @property
+    def seq(self) -> int:
+        """Number of frames published so far (0 = none yet)."""
+        return self._seq
+
+    @property
+    def dropped(self) -> int:
+        """Published frames overwritten before any consumer saw them."""
+        pending = 1 if self._seq != self._delivered_seq else 0
+        return self._seq - self.delivered - pending
+
+    # ── Producer ──────────────────────────────────────────────────────────
+
+    def next_slot(self) -> np.ndarray:
+        """Writable array for the next frame. Call publish() once it is filled."""
+        return self._slots[self._write]
+
+    def publish(self, captured: Optional[float] = None) -> int:
+        """
+        Make the slot returned by next_slot() the latest frame. Returns its seq.
+        captured is when the camera returned the frame (default: now).
+        """
+        published = time.time()
         with self._lock:
-            self._frame = frame.copy() if frame is not None else None
+            self._stamps[self._write] = (captured or published, published)
+            self._latest = self._write
+            self._write  = (self._write + 1) % len(self._slots)
+            self._seq   += 1
+            self.bytes_written += self._slots[self._latest].nbytes
+            self._consumed.clear()
             self._new_frame.set()
+            return self._seq
+
+    def update(self, frame) -> None:
+        """Copy a frame into the ring (for producers that cannot write in place)."""
+        if frame is None:
+            return
+        _write_frame(frame, self.next_slot(), self.pixel_format)
+        self.publish()
+
+    # ── Consumers ─────────────────────────────────────────────────────────
 
     def get(self):
+        """
+        Read-only view of the latest frame, or None before the first publish.
+        Counts as delivery — this is the encoder's pull.
+        """
+        return self.get_stamped()[0]
+
+    def get_stamped(self) -> tuple:
+        """get() plus the frame's (captured, published) times, from the same slot."""
+        with self._lock:
+            if self._latest < 0:
+                return None, None, None
+            if self._seq != self._delivered_seq:
+                self.delivered      += 1
+                self._delivered_seq  = self._seq
+                self._consumed.set()
+            else:
+                self.repeated += 1
+            return (self._views[self._latest], *self._stamps[self._latest])
+
+    def peek(self) -> tuple:
+        """
+        Like get_stamped(), but not a delivery: side readers (snapshots)
+        must not pace capture or skew the delivered / dropped counts.
+        """
         with self._lock:
-            return self._frame.copy() if self._frame is not None else None
+            if self._latest < 0:
+                return None, None, None
+            return (self._views[self._latest], *self._stamps[self._latest])
 
     def wait_for_frame(self, timeout: float = 1.0) -> bool:
         return self._new_frame.wait(timeout)
 
+    def wait_consumed(self, timeout: float = CONSUME_TIMEOUT) -> bool:
+        """Block until the latest published frame has been pulled by get()."""
+        return self._consumed.wait(timeout)
+
     def clear_event(self) -> None:
         self._new_frame.clear()
 
@@ -64,6 +236,48 @@ def process_A(**kwargs) -> None:
         TURN_SERVER_URL : str
         TURN_USERNAME   : str
         TURN_PASSWORD   : str
+        CAMERA_PIXEL_FORMAT : str    "yuv420" | "bgr"               (optional)
+        CAMERA_IDLE_MODE    : str    "off" | "keepalive" | "stop"   (optional)
+        CAMERA_IDLE_AFTER_S : float  no-viewer seconds before idling (optional)
+        CAMERA_KEEPALIVE_S  : float  keep-alive frame interval       (optional)
+        CAMERA_CAPTURE_THREAD : bool capture on a dedicated thread   (optional)
+        CAMERA_FPS          : int    encoder / capture ceiling        (optional)
+        CAMERA_BACKEND      : str    "hardware" | "synthetic" | "file" (optional)
+        CAMERA_SOURCE       : str    video file for the file backend   (optional)
+        CAMERA_FAULTS       : str    simulated stall / fail / error spec (optional)
+        WEBRTC_ABR          : bool   adaptive bitrate / resolution    (optional)
+        WEBRTC_LADDER       : str    ABR ladder spec, "" = default    (optional)
+        WEBRTC_MAX_VIEWERS  : int    concurrent viewer limit          (optional)
+        WEBRTC_SIGNALING    : str    "listen" | "poll"                (optional)
+        WEBRTC_ICE_MODE     : str    "trickle" | "full"               (optional)
+        WEBRTC_RECONNECT_GRACE_S : float  warm-reconnect window        (optional)
+        WEBRTC_ICE_PROBE_S  : float  ICE server probe interval, 0 = off (optional)
+        WEBRTC_STATS_PATH   : str    link metrics JSON-lines file    (optional)
+        WEBRTC_STATS_RTDB_S : float  RTDB stats summary interval, 0 = off (optional)
+        LIVE_CONTROL_HZ     : float  max level messages per second    (optional)
+        WEBRTC_CODEC        : str    "auto" | "vp8" | "h264" | "off"  (optional)
+        WEBRTC_CODEC_CACHE  : str    codec benchmark cache file       (optional)
+        WEBRTC_LATENCY_OVERLAY : bool  burn capture time into frames  (optional)
+        SNAPSHOT_ENABLED    : bool   publish JPEG previews            (optional)
+        SNAPSHOT_INTERVAL_S : float  scheduled snapshot interval, 0 = on request only (optional)
+        SNAPSHOT_PATH       : str    local JPEG file, "" = none       (optional)
+        SNAPSHOT_WIDTH      : int    JPEG width in pixels             (optional)
+        CLIP_ENABLED        : bool   pre/post-roll event clips         (optional)
+        CLIP_PRE_S          : float  seconds kept before an event      (optional)
+        CLIP_POST_S         : float  seconds recorded after an event   (optional)
+        CLIP_RING_MB        : float  encoded ring memory cap           (optional)
+        CLIP_FPS            : int    clip frame rate                   (optional)
+        CLIP_WIDTH          : int    clip width in pixels              (optional)
+        CLIP_DIR            : str    clip directory                    (optional)
+        ACTIVITY_ENABLED    : bool   flock activity analysis           (optional)
+        ACTIVITY_FPS        : float  analysis samples per second       (optional)
+        ACTIVITY_ZONES      : str    "name:x0,y0,x1,y1;...", "" = whole frame (optional)
+        ACTIVITY_CPU_PCT    : float  CPU budget, % of one core         (optional)
+        ACTIVITY_PATH       : str    per-minute JSON-lines file, "" = none (optional)
+        ACTIVITY_CLIP_THRESHOLD : float  zone motion share that starts a clip, 0 = off (optional)
+        sensor_rings        : dict   {name: SensorRing} from process_c (optional)
+        control_commands    : multiprocessing.Queue  commands → process_b (optional)
+        control_events      : multiprocessing.Queue  acks / state ← process_b (optional)
     """
     args            = kwargs["process_A_args"]
     TASK_NAME       = args["TASK_NAME"]
@@ -76,6 +290,48 @@ def process_A(**kwargs) -> None:
     TURN_SERVER_URL = args["TURN_SERVER_URL"]
     TURN_USERNAME   = args["TURN_USERNAME"]
     TURN_PASSWORD   = args["TURN_PASSWORD"]
+    PIXEL_FORMAT    = args.get("CAMERA_PIXEL_FORMAT", camera.DEFAULT_PIXEL_FORMAT)
+    IDLE_MODE       = args.get("CAMERA_IDLE_MODE",    capture_governor.DEFAULT_IDLE_MODE)
+    IDLE_AFTER_S    = args.get("CAMERA_IDLE_AFTER_S", capture_governor.DEFAULT_IDLE_AFTER)
+    KEEPALIVE_S     = args.get("CAMERA_KEEPALIVE_S",  capture_governor.DEFAULT_KEEPALIVE)
+    CAPTURE_THREAD  = args.get("CAMERA_CAPTURE_THREAD", True)
+    CAMERA_FPS      = args.get("CAMERA_FPS", DEFAULT_CAMERA_FPS)
+    CAMERA_BACKEND  = args.get("CAMERA_BACKEND", camera.DEFAULT_BACKEND)
+    CAMERA_SOURCE   = args.get("CAMERA_SOURCE", "")
+    CAMERA_FAULTS   = args.get("CAMERA_FAULTS", "")
+    WEBRTC_ABR      = args.get("WEBRTC_ABR", True)
+    WEBRTC_LADDER   = args.get("WEBRTC_LADDER", "")
+    MAX_VIEWERS     = args.get("WEBRTC_MAX_VIEWERS", DEFAULT_MAX_VIEWERS)
+    SIGNALING       = args.get("WEBRTC_SIGNALING", DEFAULT_SIGNALING)
+    ICE_MODE        = args.get("WEBRTC_ICE_MODE", DEFAULT_ICE_MODE)
+    RECONNECT_GRACE = args.get("WEBRTC_RECONNECT_GRACE_S", DEFAULT_RECONNECT_GRACE)
+    ICE_PROBE_S     = args.get("WEBRTC_ICE_PROBE_S", DEFAULT_ICE_PROBE_INTERVAL)
+    STATS_PATH      = args.get("WEBRTC_STATS_PATH")
+    STATS_RTDB_S    = args.get("WEBRTC_STATS_RTDB_S", 0.0)
+    CONTROL_HZ      = args.get("LIVE_CONTROL_HZ", live_control.DEFAULT_RATE_HZ)
+    CODEC_MODE      = args.get("WEBRTC_CODEC", codec_bench.DEFAULT_CODEC_MODE)
+    CODEC_CACHE     = args.get("WEBRTC_CODEC_CACHE", codec_bench.DEFAULT_CACHE_PATH)
+    LATENCY_OVERLAY = args.get("WEBRTC_LATENCY_OVERLAY", False)
+    SNAPSHOT_ENABLED    = args.get("SNAPSHOT_ENABLED", True)
+    SNAPSHOT_INTERVAL_S = args.get("SNAPSHOT_INTERVAL_S", snapshot_publisher.DEFAULT_INTERVAL)
+    SNAPSHOT_PATH       = args.get("SNAPSHOT_PATH", "")
+    SNAPSHOT_WIDTH      = args.get("SNAPSHOT_WIDTH", snapshot_publisher.DEFAULT_WIDTH)
+    CLIP_ENABLED    = args.get("CLIP_ENABLED", False)
+    CLIP_PRE_S      = args.get("CLIP_PRE_S", clip_recorder.DEFAULT_PRE_ROLL)
+    CLIP_POST_S     = args.get("CLIP_POST_S", clip_recorder.DEFAULT_POST_ROLL)
+    CLIP_RING_MB    = args.get("CLIP_RING_MB", clip_recorder.DEFAULT_RING_MB)
+    CLIP_FPS        = args.get("CLIP_FPS", clip_recorder.DEFAULT_FPS)
+    CLIP_WIDTH      = args.get("CLIP_WIDTH", clip_recorder.DEFAULT_WIDTH)
+    CLIP_DIR        = args.get("CLIP_DIR", clip_recorder.DEFAULT_DIR)
+    ACTIVITY_ENABLED   = args.get("ACTIVITY_ENABLED", False)
+    ACTIVITY_FPS       = args.get("ACTIVITY_FPS", activity_monitor.DEFAULT_FPS)
+    ACTIVITY_ZONES     = args.get("ACTIVITY_ZONES", "")
+    ACTIVITY_CPU_PCT   = args.get("ACTIVITY_CPU_PCT", activity_monitor.DEFAULT_CPU_PERCENT)
+    ACTIVITY_PATH      = args.get("ACTIVITY_PATH", "")
+    ACTIVITY_CLIP_THRESHOLD = args.get("ACTIVITY_CLIP_THRESHOLD", 0.0)
+    sensor_rings     = args.get("sensor_rings", {})
+    control_commands = args.get("control_commands")
+    control_events   = args.get("control_events")
 
     log(details=f"{TASK_NAME} - Running", log_type="info")
 
@@ -84,13 +340,29 @@ def process_A(**kwargs) -> None:
         capture = camera.config_camera(
             IS_WEB_CAM      = IS_WEB_CAM,
             CAMERA_INDEX    = CAMERA_INDEX,
-            FRAME_DIMENSION = FRAME_DIMENSION
+            FRAME_DIMENSION = FRAME_DIMENSION,
+            PIXEL_FORMAT    = PIXEL_FORMAT,
+            FPS             = CAMERA_FPS,
+            BACKEND         = CAMERA_BACKEND,
+            SOURCE          = CAMERA_SOURCE,
+            FAULTS          = CAMERA_FAULTS
         )
     except CameraError as e:
         log(details=f"{TASK_NAME} - Camera init failed: {e}", log_type="error")
         status_checker.clear()
         return
 
+    if CAMERA_BACKEND != "hardware":
+        log(details=f"{TASK_NAME} - Simulated camera: {capture!r} faults={CAMERA_FAULTS or 'none'}", log_type="warning")
+
+    if capture.pixel_format != PIXEL_FORMAT:
+        log(
+            details=f"{TASK_NAME} - Camera cannot deliver {PIXEL_FORMAT} at "
+                    f"{FRAME_DIMENSION['width']}x{FRAME_DIMENSION['height']} — "
+                    f"using {capture.pixel_format}",
+            log_type="warning",
+        )
+
     # ── Init Firebase ─────────────────────────────────────────────────────
     try:
         firebase_rtdb.initialize_firebase()
@@ -104,77 +376,317 @@ def process_A(**kwargs) -> None:
     device_uid = USER_CREDENTIAL["deviceUid"]
 
     # ── Shared frame buffer ───────────────────────────────────────────────
-    frame_buffer = SharedFrameBuffer()
+    frame_buffer = SharedFrameBuffer(
+        shape        = camera.frame_shape(FRAME_DIMENSION, capture.pixel_format),
+        pixel_format = capture.pixel_format,
+    )
+
+    # ── Capture governor ──────────────────────────────────────────────────
+    activity_fps        = ACTIVITY_FPS if ACTIVITY_ENABLED else 0
+    background_interval = _background_interval(CLIP_FPS if CLIP_ENABLED else 0, activity_fps)
+    try:
+        governor = CaptureGovernor(
+            mode                = IDLE_MODE,
+            idle_after          = IDLE_AFTER_S,
+            keepalive_interval  = KEEPALIVE_S,
+            background_interval = background_interval,
+        )
+    except CaptureGovernorError as e:
+        log(details=f"{TASK_NAME} - {e} — falling back to defaults", log_type="warning")
+        governor = CaptureGovernor(background_interval=background_interval)
 
     # ── Async event loop ──────────────────────────────────────────────────
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
 
-    webrtc_peer_instance = None
+    # threading.Event — set from the event loop, waited on by the capture thread
+    wake_event   = threading.Event()
+    stop_capture = threading.Event()
+    lag_monitor  = LoopLagMonitor()
 
-    # ── Connection state callback ─────────────────────────────────────────
-    def on_connection_state_change(state: str) -> None:
-        if state == "connected":
-            live_status.set()
-        elif state in ["disconnected", "failed", "closed"]:
-            log(details=f"{TASK_NAME} - WebRTC state: {state}", log_type="warning")
-            live_status.clear()
+    def on_offer() -> None:
+        governor.demand()
+        wake_event.set()
 
-    # ── Init WebRTC peer ──────────────────────────────────────────────────
-    try:
-        webrtc_peer_instance = loop.run_until_complete(
-            run_webrtc_peer(
-                user_uid                   = user_uid,
-                device_uid                 = device_uid,
-                capture                    = capture,
-                frame_dimension            = FRAME_DIMENSION,
-                on_connection_state_change = on_connection_state_change,
-                frame_buffer               = frame_buffer,
-                turn_server_url            = TURN_SERVER_URL,
-                turn_username              = TURN_USERNAME,
-                turn_password              = TURN_PASSWORD
-            )
+    # ── Adaptive bitrate ladder ───────────────────────────────────────────
+    abr_ladder = None
+    if WEBRTC_ABR:
+        width, height = FRAME_DIMENSION["width"], FRAME_DIMENSION["height"]
+        try:
+            abr_ladder = abr_controller.parse_ladder(WEBRTC_LADDER, width, height, CAMERA_FPS)
+        except ABRLadderError as e:
+            log(details=f"{TASK_NAME} - {e} — using the default ladder", log_type="warning")
+            abr_ladder = abr_controller.default_ladder(width, height, CAMERA_FPS)
+        log(
+            details=f"{TASK_NAME} - ABR ladder: {', '.join(str(rung) for rung in abr_ladder)}",
+            log_type="info",
         )
-    except WebRTCStartError as e:
-        log(details=f"{TASK_NAME} - WebRTC peer init failed: {e}", log_type="error")
-        status_checker.clear()
-        _safe_cleanup(capture, IS_WEB_CAM, TASK_NAME)
-        return
 
-    # ── Main streaming loop ───────────────────────────────────────────────
-    async def _streaming_loop():
-        frame_count  = 0
-        start_time   = time.time()
-        last_fps_log = start_time
+    def on_abr_change(viewer_id: str, rung, reason: str, sample) -> None:
+        rtt  = f"{sample.rtt_ms:.0f}ms" if sample.rtt_ms is not None else "n/a"
+        loss = f"{sample.loss:.1%}"     if sample.loss   is not None else "n/a"
+        log(
+            details=f"{TASK_NAME} - ABR [{viewer_id}] → {rung} ({reason}) | rtt {rtt}, loss {loss}, "
+                    f"sent {sample.send_kbps:.0f} kbps",
+            log_type="info",
+        )
 
-        while status_checker.is_set():
-            raw_frame = capture.capture_array()
+    def on_ice_probe(results, working) -> None:
+        alive = [result for result in results if result.ok]
+        log(
+            details=f"{TASK_NAME} - ICE servers: {len(alive)}/{len(results)} reachable | "
+                    + ", ".join(str(result) for result in alive)
+                    + f" | Using: {', '.join(url for server in working for url in server.urls)}",
+            log_type="info",
+        )
+        dead = [result for result in results if not result.ok]
+        if dead:
+            log(
+                details=f"{TASK_NAME} - ICE servers dropped: " + ", ".join(str(result) for result in dead),
+                log_type="warning",
+            )
 
-            if raw_frame is None:
-                log(details=f"{TASK_NAME} - Camera returned empty frame", log_type="warning")
-                status_checker.clear()
-                break
+    # ── Live control data channel ─────────────────────────────────────────
+    ack_times = deque(maxlen=200)    # Command received → ack sent (ms)
 
-            raw_frame = cv2.resize(
-                raw_frame,
-                (FRAME_DIMENSION["width"], FRAME_DIMENSION["height"])
+    def on_data_message(viewer_id: str, text: str) -> None:
+        try:
+            command = live_control.parse_message(text)
+        except LiveControlError as e:
+            webrtc_peer_instance.send_data(
+                live_control.ack_message(None, None, ok=False, reason="invalid"), viewer_id
+            )
+            log(details=f"{TASK_NAME} - Bad data channel message from {viewer_id}: {e}", log_type="warning")
+            return
+        if command["type"] == "latency":
+            tracer.record("glass", command["ms"] / 1000)
+            return
+
+        reason = None
+        if control_commands is None:
+            reason = "unavailable"
+        else:
+            try:
+                control_commands.put_nowait({**command, "viewer": viewer_id, "received": time.time()})
+            except queue.Full:
+                reason = "busy"
+        if reason:
+            webrtc_peer_instance.send_data(
+                live_control.ack_message(command["id"], command["action"], ok=False, reason=reason),
+                viewer_id,
             )
 
-            frame_buffer.update(raw_frame)
-            frame_count += 1
+    # ── Link telemetry ────────────────────────────────────────────────────
+    try:
+        telemetry = StreamTelemetry(STATS_PATH)
+        if STATS_PATH:
+            log(details=f"{TASK_NAME} - Writing link metrics to {STATS_PATH}", log_type="info")
+    except StreamTelemetryError as e:
+        log(details=f"{TASK_NAME} - Link metrics file disabled: {e}", log_type="warning")
+        telemetry = StreamTelemetry()
+
+    # ── Frame latency ─────────────────────────────────────────────────────
+    tracer = FrameTracer()
+
+    # ── Snapshots ─────────────────────────────────────────────────────────
+    publisher = SnapshotPublisher(
+        path        = SNAPSHOT_PATH or None,
+        ref         = db.reference(f"snapshots/{user_uid}/{device_uid}"),
+        width       = SNAPSHOT_WIDTH,
+        ignore_rows = frame_latency.overlay_height(FRAME_DIMENSION["width"]) if LATENCY_OVERLAY else 0,
+    )
+    snapshots = _Snapshots(
+        task_name    = TASK_NAME,
+        publisher    = publisher,
+        frame_buffer = frame_buffer,
+        governor     = governor,
+        wake_event   = wake_event,
+        interval     = SNAPSHOT_INTERVAL_S,
+    )
+
+    # ── Event clips ───────────────────────────────────────────────────────
+    def on_clip(result) -> None:
+        if result.error is not None:
+            log(details=f"{TASK_NAME} - Event clip ({result.reason}) failed: {result.error}", log_type="warning")
+            return
+        log(
+            details=f"{TASK_NAME} - Event clip ({result.reason}) written: {result.path} | "
+                    f"{result.seconds:.1f}s, {result.frames} frames, {result.bytes / 1e6:.1f} MB, "
+                    f"muxed in {result.write_ms:.0f}ms",
+            log_type="info",
+        )
+
+    recorder = ClipRecorder(
+        directory = CLIP_DIR,
+        width     = CLIP_WIDTH,
+        fps       = CLIP_FPS,
+        pre_roll  = CLIP_PRE_S,
+        post_roll = CLIP_POST_S,
+        ring_mb   = CLIP_RING_MB,
+        on_clip   = on_clip,
+    ) if CLIP_ENABLED else None
+
+    # ── Flock activity ────────────────────────────────────────────────────
+    activity = None
+    if ACTIVITY_ENABLED:
+        try:
+            zones = activity_monitor.parse_zones(ACTIVITY_ZONES)
+        except ActivityZoneError as e:
+            log(details=f"{TASK_NAME} - {e} — using the whole frame", log_type="warning")
+            zones = activity_monitor.parse_zones("")
+        activity = ActivityMonitor(
+            zones       = zones,
+            fps         = ACTIVITY_FPS,
+            cpu_percent = ACTIVITY_CPU_PCT,
+            ignore_rows = frame_latency.overlay_height(FRAME_DIMENSION["width"]) if LATENCY_OVERLAY else 0,
+            path        = ACTIVITY_PATH or None,
+            ref         = db.reference(f"activity/{user_uid}/{device_uid}"),
+        )
+
+    webrtc_peer_instance = None
+
+    # ── Connection state callback ─────────────────────────────────────────
+    def on_connection_state_change(state: str) -> None:
+        if state == "connected":
+            live_status.set()
+        elif state in ["disconnected", "failed", "closed"]:
+            log(details=f"{TASK_NAME} - WebRTC state: {state}", log_type="warning")
+            live_status.clear()
 
-            # FPS log every 60 seconds
-            now = time.time()
-            if now - last_fps_log >= 60.0:
-                fps = frame_count / (now - start_time)
-                log(details=f"{TASK_NAME} - FPS: {fps:.1f} | Frames: {frame_count}", log_type="info")
-                last_fps_log = now
+    # ── Capture and side-reader threads ───────────────────────────────────
+    capture_loop = _CaptureLoop(
+        task_name      = TASK_NAME,
+        capture        = capture,
+        is_web_cam     = IS_WEB_CAM,
+        camera_index   = CAMERA_INDEX,
+        frame_buffer   = frame_buffer,
+        governor       = governor,
+        tracer         = tracer,
+        live_status    = live_status,
+        status_checker = status_checker,
+        wake_event     = wake_event,
+        stop_event     = stop_capture,
+        fps            = CAMERA_FPS,
+        overlay        = LATENCY_OVERLAY,
+    )
+    capture_thread = threading.Thread(target=capture_loop.run, name="capture", daemon=True)
+    clip_thread    = threading.Thread(
+        target = _clip_worker,
+        name   = "clip",
+        daemon = True,
+        kwargs = {
+            "task_name"         : TASK_NAME,
+            "recorder"          : recorder,
+            "frame_buffer"      : frame_buffer,
+            "frame_dimension"   : FRAME_DIMENSION,
+            "governor"          : governor,
+            "fallback_interval" : _background_interval(activity_fps),
+            "running"           : capture_loop.running,
+            "stop_event"        : stop_capture,
+        },
+    )
+    activity_thread = threading.Thread(
+        target = _activity_worker,
+        name   = "activity",
+        daemon = True,
+        kwargs = {
+            "task_name"      : TASK_NAME,
+            "activity"       : activity,
+            "frame_buffer"   : frame_buffer,
+            "recorder"       : recorder,
+            "clip_threshold" : ACTIVITY_CLIP_THRESHOLD,
+            "running"        : capture_loop.running,
+            "stop_event"     : stop_capture,
+        },
+    )
 
-            await asyncio.sleep(0.01)
+    async def _streaming_loop() -> None:
+        peer, is_running = webrtc_peer_instance, status_checker.is_set
+        monitors = [
+            asyncio.ensure_future(lag_monitor.run(is_running)),
+            asyncio.ensure_future(_stats_reporter(
+                task_name      = TASK_NAME,
+                peer           = peer,
+                lag_monitor    = lag_monitor,
+                telemetry      = telemetry,
+                snapshots      = publisher,
+                recorder       = recorder,
+                activity       = activity,
+                tracer         = tracer,
+                ack_times      = ack_times,
+                capture_thread = CAPTURE_THREAD,
+                is_running     = is_running,
+            )),
+            asyncio.ensure_future(_level_streamer(peer, sensor_rings, CONTROL_HZ, is_running)),
+            asyncio.ensure_future(_select_codec(
+                task_name       = TASK_NAME,
+                peer            = peer,
+                mode            = CODEC_MODE,
+                cache_path      = CODEC_CACHE,
+                abr_ladder      = abr_ladder,
+                frame_dimension = FRAME_DIMENSION,
+                fps             = CAMERA_FPS,
+            )),
+        ]
+        if SNAPSHOT_ENABLED:
+            monitors.append(asyncio.ensure_future(snapshots.run(is_running)))
+            monitors.append(asyncio.ensure_future(snapshots.watch_requests()))
+        if control_events is not None:
+            monitors.append(asyncio.ensure_future(
+                _event_relay(TASK_NAME, control_events, peer, recorder, activity, ack_times, is_running)
+            ))
+        if recorder is not None:
+            clip_thread.start()
+        if activity is not None:
+            activity_thread.start()
+        try:
+            if CAPTURE_THREAD:
+                capture_thread.start()
+                while status_checker.is_set() and capture_thread.is_alive():
+                    await asyncio.sleep(0.5)
+            else:
+                await capture_loop.run_inline()
+        finally:
+            for task in monitors:
+                task.cancel()
 
     # ── Run ───────────────────────────────────────────────────────────────
+    # The peer starts inside the try so a failed start still reaches the
+    # cleanup below (snapshot executor, clip muxer, camera, event loop)
     try:
-        loop.run_until_complete(_streaming_loop())
+        try:
+            webrtc_peer_instance = loop.run_until_complete(
+                run_webrtc_peer(
+                    user_uid                   = user_uid,
+                    device_uid                 = device_uid,
+                    capture                    = capture,
+                    frame_dimension            = FRAME_DIMENSION,
+                    on_connection_state_change = on_connection_state_change,
+                    frame_buffer               = frame_buffer,
+                    turn_server_url            = TURN_SERVER_URL,
+                    turn_username              = TURN_USERNAME,
+                    turn_password              = TURN_PASSWORD,
+                    on_offer                   = on_offer,
+                    fps                        = CAMERA_FPS,
+                    abr_ladder                 = abr_ladder,
+                    on_abr_change              = on_abr_change,
+                    max_viewers                = MAX_VIEWERS,
+                    signaling                  = SIGNALING,
+                    ice_mode                   = ICE_MODE,
+                    reconnect_grace            = RECONNECT_GRACE,
+                    ice_probe_interval         = ICE_PROBE_S,
+                    on_ice_probe               = on_ice_probe,
+                    telemetry                  = telemetry,
+                    stats_rtdb_interval        = STATS_RTDB_S,
+                    on_data_message            = on_data_message,
+                    tracer                     = tracer
+                )
+            )
+        except WebRTCStartError as e:
+            log(details=f"{TASK_NAME} - WebRTC peer init failed: {e}", log_type="error")
+            status_checker.clear()
+        else:
+            loop.run_until_complete(_streaming_loop())
     except KeyboardInterrupt:
         log(details=f"{TASK_NAME} - KeyboardInterrupt received", log_type="warning")
         status_checker.clear()
@@ -182,12 +694,24 @@ def process_A(**kwargs) -> None:
         log(details=f"{TASK_NAME} - Unexpected error in streaming loop: {e}", log_type="error")
         status_checker.clear()
     finally:
+        stop_capture.set()
+        wake_event.set()
+        if capture_thread.is_alive():
+            capture_thread.join(timeout=CAPTURE_JOIN_TIMEOUT)
+        for thread in (clip_thread, activity_thread):
+            if thread.is_alive():
+                thread.join(timeout=CAPTURE_JOIN_TIMEOUT)
+        if recorder is not None:
+            recorder.close()     # Writes a clip still recording
+
         if webrtc_peer_instance:
             try:
                 loop.run_until_complete(webrtc_peer_instance.stop())
             except WebRTCStopError as e:
                 log(details=f"{TASK_NAME} - WebRTC stop error: {e}", log_type="warning")
 
+        snapshots.close()
+        _close_telemetry(telemetry, TASK_NAME)
         _safe_cleanup(capture, IS_WEB_CAM, TASK_NAME)
 
         try:
@@ -198,11 +722,577 @@ def process_A(**kwargs) -> None:
         log(details=f"{TASK_NAME} - Process stopped", log_type="info")
 
 
+# ─────────────────────────── CAPTURE LOOP ────────────────────────────────────
+
+class _CaptureLoop:
+    """
+    Camera → ring, one frame per step(): on the capture thread (run()) or
+    inline on the event loop (run_inline(), CAMERA_CAPTURE_THREAD=false,
+    for comparison). Clears status_checker when capture must stop.
+
+    An empty frame or a CameraError from the read is retried after
+    CAPTURE_RETRY_WAIT; only MAX_CAPTURE_FAILURES of them in a row stop
+    capture, so a USB hiccup or a dropped frame does not end the process.
+    """
+
+    def __init__(
+        self,
+        task_name      : str,
+        capture,
+        is_web_cam     : bool,
+        camera_index   : int,
+        frame_buffer   : SharedFrameBuffer,
+        governor       : CaptureGovernor,
+        tracer         : FrameTracer,
+        live_status,
+        status_checker,
+        wake_event     : threading.Event,
+        stop_event     : threading.Event,
+        fps            : int,
+        overlay        : bool = False,
+    ):
+        self.task_name      = task_name
+        self.capture        = capture
+        self.is_web_cam     = is_web_cam
+        self.camera_index   = camera_index
+        self.frame_buffer   = frame_buffer
+        self.governor       = governor
+        self.tracer         = tracer
+        self.live_status    = live_status
+        self.status_checker = status_checker
+        self.wake_event     = wake_event
+        self.stop_event     = stop_event
+        self.fps            = fps
+        self.frame_interval = 1.0 / fps
+        self.overlay        = overlay
+        self.camera_paused  = False
+        self.failures       = 0         # Failed reads since start
+        self.failed_in_row  = 0
+        self.rates          = stream_report.CaptureRates(frame_buffer, governor)
+
+    def running(self) -> bool:
+        return self.status_checker.is_set() and not self.stop_event.is_set()
+
+    def step(self) -> Optional[float]:
+        """
+        One capture iteration.
+
+        Returns:
+            Seconds to wait before the next call (a wake-up cuts it short),
+            or None if capture must stop.
+        """
+        governor = self.governor
+
+        # ── Viewer-aware idle / wake ──────────────────────────────────────
+        if governor.update(viewer_connected=self.live_status.is_set()):
+            log(
+                details=f"{self.task_name} - Capture {governor.state} (idle mode: {governor.mode})",
+                log_type="info",
+            )
+
+        # FPS + copy + CPU stats every 60 seconds (idle or not)
+        if self.rates.due():
+            log(details=f"{self.task_name} - {self.rates.report(self.fps)}", log_type="info")
+
+        if governor.camera_should_run == self.camera_paused:
+            try:
+                if self.camera_paused:
+                    camera.resume_camera(self.capture, self.is_web_cam, self.camera_index)
+                else:
+                    camera.pause_camera(self.capture, self.is_web_cam)
+                self.camera_paused = not self.camera_paused
+            except CameraError as e:
+                log(details=f"{self.task_name} - Camera pause/resume failed: {e}", log_type="error")
+                return None
+
+        if not governor.should_capture():
+            return governor.idle_wait()
+
+        started = time.time()
+        try:
+            raw_frame = self.capture.capture_array()
+            error     = "empty frame" if raw_frame is None else None
+        except CameraError as e:
+            raw_frame, error = None, e
+        captured = time.time()
+
+        if raw_frame is None:
+            self.failures      += 1
+            self.failed_in_row += 1
+            if self.failed_in_row >= MAX_CAPTURE_FAILURES:
+                log(
+                    details=f"{self.task_name} - Camera read failed {self.failed_in_row} times in a row "
+                            f"({error}) — stopping capture",
+                    log_type="error",
+                )
+                return None
+            log(
+                details=f"{self.task_name} - Camera read failed ({error}) — retry "
+                        f"{self.failed_in_row}/{MAX_CAPTURE_FAILURES - 1}",
+                log_type="warning",
+            )
+            return CAPTURE_RETRY_WAIT
+        self.failed_in_row = 0
+
+        # Write straight into the next ring slot — no per-frame allocation
+        buffer = self.frame_buffer
+        slot   = buffer.next_slot()
+        _write_frame(raw_frame, slot, buffer.pixel_format)
+        if self.overlay:
+            frame_latency.draw_overlay(slot, buffer.pixel_format, captured)
+        buffer.publish(captured=captured)
+        self.tracer.record("capture", captured - started)
+        self.tracer.record("write", time.time() - captured)
+        self.rates.frames += 1
+
+        ttff = governor.frame_captured()
+        if ttff is not None:
+            log(
+                details=f"{self.task_name} - Capture woke for viewer | time-to-first-frame: "
+                        f"{ttff * 1000:.0f}ms (idle mode: {governor.mode})",
+                log_type="info",
+            )
+        return 0.0
+
+    def run(self) -> None:
+        """Capture thread body — blocking camera I/O stays off the event loop."""
+        try:
+            while self.running():
+                started = time.monotonic()
+                wait    = self.step()
+                if wait is None:
+                    self.status_checker.clear()
+                    break
+                if wait > 0:
+                    self.wake_event.wait(wait)
+                    self.wake_event.clear()
+                    continue
+
+                # Demand-driven pacing: capture the next frame only once the
+                # encoder has pulled this one, and never above CAMERA_FPS.
+                # Without a consumer this falls back to one frame per
+                # CONSUME_TIMEOUT, so a joining viewer still gets a fresh one —
+                # or per background_interval, so side readers (clips,
+                # activity) keep their rate; they never count as consumers.
+                background = self.governor.background_interval or CONSUME_TIMEOUT
+                self.frame_buffer.wait_consumed(min(CONSUME_TIMEOUT, background))
+                remaining = started + self.frame_interval - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+        except Exception as e:
+            log(details=f"{self.task_name} - Unexpected error in capture thread: {e}", log_type="error")
+            self.status_checker.clear()
+
+    async def run_inline(self) -> None:
+        """Capture on the event loop itself (CAMERA_CAPTURE_THREAD=false)."""
+        while self.running():
+            wait = self.step()
+            if wait is None:
+                self.status_checker.clear()
+                break
+            await asyncio.sleep(max(wait, self.frame_interval))
+
+
+# ─────────────────────────── SIDE READERS ────────────────────────────────────
+# Snapshots, event clips and flock activity read the ring with peek(): they
+# must not pace capture or count as a delivery. Without a viewer, the
+# governor's background_interval keeps frames coming for the ones that
+# never sleep.
+
+def _background_interval(*fps: float) -> float:
+    """
+    Idle capture floor for the side readers that never sleep — event clips
+    need a pre-roll, activity needs its samples (0 = none).
+    """
+    rates = [rate for rate in fps if rate]
+    return 1.0 / max(rates) if rates else 0.0
+
+
+def _trigger_clip(task_name: str, recorder: Optional[ClipRecorder], reason: str) -> None:
+    """Start (or extend) an event clip — safe from any thread."""
+    if recorder is None or recorder.encoder_name is None:
+        return
+    if recorder.trigger(reason):
+        log(
+            details=f"{task_name} - Event clip started: {reason} "
+                    f"(pre-roll {recorder.ring.seconds:.1f}s buffered)",
+            log_type="info",
+        )
+
+
+def _clip_worker(
+    task_name         : str,
+    recorder          : ClipRecorder,
+    frame_buffer      : SharedFrameBuffer,
+    frame_dimension   : dict,
+    governor          : CaptureGovernor,
+    fallback_interval : float,
+    running           : Callable[[], bool],
+    stop_event        : threading.Event,
+) -> None:
+    """
+    Clip thread body — encodes ring frames into the pre-roll ring. Drops
+    the governor's background rate to fallback_interval if the encoder fails.
+    """
+    try:
+        encoder = recorder.open(frame_dimension["width"], frame_dimension["height"])
+    except ClipEncoderError as e:
+        log(details=f"{task_name} - Event clips disabled: {e}", log_type="error")
+        governor.background_interval = fallback_interval
+        return
+    log(
+        details=f"{task_name} - Event clips: {encoder} {recorder.width}px @ {recorder.fps} fps, "
+                f"pre-roll {recorder.pre_roll:.0f}s, post-roll {recorder.post_roll:.0f}s, "
+                f"ring cap {recorder.ring.max_bytes / 1e6:.0f} MB → {recorder.directory}",
+        log_type="info",
+    )
+
+    clip_interval, last_seq, last_captured = 1.0 / recorder.fps, 0, None
+    try:
+        while running():
+            started = time.monotonic()
+            seq = frame_buffer.seq
+            if seq != last_seq:
+                last_seq = seq
+                frame, captured, _ = frame_buffer.peek()
+                # A publish can land between the two reads — the last
+                # peek may already have returned this frame
+                if frame is not None and captured != last_captured:
+                    last_captured = captured
+                    try:
+                        recorder.encode(frame, frame_buffer.pixel_format, captured)
+                    except ClipEncoderError as e:
+                        log(details=f"{task_name} - Event clips disabled: {e}", log_type="error")
+                        governor.background_interval = fallback_interval
+                        return
+                    except ClipRecorderError as e:
+                        log(details=f"{task_name} - {e}", log_type="warning")
+            recorder.finish_due()
+            remaining = started + clip_interval - time.monotonic()
+            if remaining > 0:
+                stop_event.wait(remaining)
+    except Exception as e:
+        log(details=f"{task_name} - Unexpected error in clip thread: {e}", log_type="error")
+
+
+def _activity_worker(
+    task_name      : str,
+    activity       : ActivityMonitor,
+    frame_buffer   : SharedFrameBuffer,
+    recorder       : Optional[ClipRecorder],
+    clip_threshold : float,
+    running        : Callable[[], bool],
+    stop_event     : threading.Event,
+) -> None:
+    """
+    Activity thread body — per-zone motion / occupancy from the ring.
+    Zone motion at or above clip_threshold (0 = off) starts an event clip.
+    """
+    last_captured, last_motion_clip = None, 0.0
+    try:
+        while running():
+            started = time.monotonic()
+            summary = activity.take_summary()
+            if summary is not None:
+                try:
+                    activity.publish(summary)
+                except ActivityWriteError as e:
+                    log(details=f"{task_name} - {e}", log_type="warning")
+
+            frame, captured, _ = frame_buffer.peek()
+            if frame is not None and captured != last_captured:
+                last_captured = captured
+                try:
+                    sample = activity.analyze(frame, frame_buffer.pixel_format, captured)
+                except ActivityError as e:
+                    log(details=f"{task_name} - {e}", log_type="warning")
+                    sample = None
+                if (
+                    sample is not None and clip_threshold > 0 and
+                    max(sample.activity.values()) >= clip_threshold and
+                    time.monotonic() - last_motion_clip >= activity_monitor.MOTION_COOLDOWN
+                ):
+                    last_motion_clip = time.monotonic()
+                    _trigger_clip(task_name, recorder, "motion")
+            stop_event.wait(max(0.0, started + activity.interval - time.monotonic()))
+    except Exception as e:
+        log(details=f"{task_name} - Unexpected error in activity thread: {e}", log_type="error")
+
+
+class _Snapshots:
+    """
+    Scheduled and on-request JPEG previews. Encoding runs on a one-thread
+    executor so a slow publish never blocks the event loop; close() it
+    when the process stops.
+    """
+
+    def __init__(
+        self,
+        task_name    : str,
+        publisher    : SnapshotPublisher,
+        frame_buffer : SharedFrameBuffer,
+        governor     : CaptureGovernor,
+        wake_event   : threading.Event,
+        interval     : float,
+    ):
+        self.task_name    = task_name
+        self.publisher    = publisher
+        self.frame_buffer = frame_buffer
+        self.governor     = governor
+        self.wake_event   = wake_event
+        self.interval     = interval
+        self.requested    = asyncio.Event()
+        self._executor    = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+
+    async def run(self, is_running: Callable[[], bool]) -> None:
+        """Publish a snapshot every `interval` seconds (0 = never) and on request."""
+        loop, last_request = asyncio.get_running_loop(), 0.0
+        while is_running():
+            try:
+                await asyncio.wait_for(self.requested.wait(), self.interval if self.interval > 0 else None)
+            except asyncio.TimeoutError:
+                pass
+            if self.requested.is_set():
+                self.requested.clear()
+                gap = last_request + snapshot_publisher.MIN_REQUEST_GAP - time.monotonic()
+                if gap > 0:
+                    await asyncio.sleep(gap)
+                last_request = time.monotonic()
+
+            frame, captured = await self._fresh_frame()
+            if frame is None:
+                log(details=f"{self.task_name} - Snapshot skipped: no frame captured yet", log_type="warning")
+                continue
+            try:
+                await loop.run_in_executor(
+                    self._executor, self.publisher.publish, frame, self.frame_buffer.pixel_format, captured
+                )
+            except SnapshotError as e:
+                log(details=f"{self.task_name} - {e}", log_type="warning")
+
+    async def watch_requests(self) -> None:
+        """Watch snapshots/.../request — any new value asks for a snapshot now."""
+        try:
+            stream = await RTDBStream(self.publisher.ref.child("request")).open()
+        except RTDBStreamError as e:
+            log(details=f"{self.task_name} - On-demand snapshots disabled: {e}", log_type="warning")
+            return
+        try:
+            initial = True
+            async for _, _, _, value in stream:
+                if not initial and value is not None:
+                    self.requested.set()
+                initial = False     # The first event is the value already there
+        finally:
+            stream.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    async def _fresh_frame(self) -> tuple:
+        """Private copy of a recent ring frame — asks the governor for one if it is stale."""
+        buffer = self.frame_buffer
+        frame, captured, _ = buffer.peek()
+        if frame is None or time.time() - captured > snapshot_publisher.MAX_FRAME_AGE:
+            seq = buffer.seq
+            self.governor.request_frame()
+            self.wake_event.set()
+            deadline = time.monotonic() + snapshot_publisher.FRAME_TIMEOUT
+            while buffer.seq == seq and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            frame, captured, _ = buffer.peek()
+        if frame is None:
+            return None, None
+        return frame.copy(), captured
+
+
+# ─────────────────────────── EVENT LOOP TASKS ────────────────────────────────
+
+def _next_event(control_events) -> Optional[dict]:
+    try:
+        return control_events.get(timeout=0.5)
+    except queue.Empty:
+        return None
+
+
+async def _event_relay(
+    task_name      : str,
+    control_events,
+    peer,
+    recorder       : Optional[ClipRecorder],
+    activity       : Optional[ActivityMonitor],
+    ack_times      : deque,
+    is_running     : Callable[[], bool],
+) -> None:
+    """Relay process_b's acks / state changes to the data channels; motor starts trigger clips."""
+    loop   = asyncio.get_running_loop()
+    motors = {"dispensing": False, "refilling": False}
+    while is_running():
+        event = await loop.run_in_executor(None, _next_event, control_events)
+        if event is None:
+            continue
+        motor_state = live_control.parse_state(event["text"])
+        if motor_state is not None:
+            for key, reason in (("dispensing", "feed"), ("refilling", "water")):
+                if motor_state[key] and not motors[key]:
+                    _trigger_clip(task_name, recorder, reason)
+                    if activity is not None:
+                        activity.mark(reason)
+            motors = motor_state
+        peer.send_data(event["text"], event.get("viewer"))
+        if event.get("received"):
+            ack_times.append((time.time() - event["received"]) * 1000)
+
+
+async def _level_streamer(peer, sensor_rings: dict, rate_hz: float, is_running: Callable[[], bool]) -> None:
+    """Send sensor levels to open data channels whenever they change."""
+    last, last_sent = None, 0.0
+    while is_running():
+        await asyncio.sleep(1.0 / rate_hz)
+        if not peer.data_channels():
+            last = None
+            continue
+        current = live_control.read_levels(sensor_rings)
+        now     = time.monotonic()
+        if current != last or now - last_sent >= live_control.KEEPALIVE_SECONDS:
+            peer.send_data(live_control.levels_message(*current))
+            last, last_sent = current, now
+
+
+async def _select_codec(
+    task_name       : str,
+    peer,
+    mode            : str,
+    cache_path      : str,
+    abr_ladder      : Optional[list],
+    frame_dimension : dict,
+    fps             : int,
+) -> None:
+    """Benchmark (or load cached results) and set the peer's codec order."""
+    if mode == "off":
+        return
+    if mode in codec_bench.MIME_TYPES:
+        peer.codec_preferences = [codec_bench.MIME_TYPES[mode]]
+        log(details=f"{task_name} - Codec: {mode} preferred (WEBRTC_CODEC)", log_type="info")
+        return
+    if mode != "auto":
+        log(details=f"{task_name} - Unknown WEBRTC_CODEC '{mode}' — using the phone's order", log_type="warning")
+        return
+
+    width, height = frame_dimension["width"], frame_dimension["height"]
+    sizes = {}
+    for rung in abr_ladder or []:
+        sizes[(rung.width, rung.height)] = max(rung.kbps, sizes.get((rung.width, rung.height), 0))
+    sizes = [(w, h, kbps) for (w, h), kbps in sizes.items()] or [(width, height, 1500)]
+    fps   = abr_ladder[0].fps if abr_ladder else fps
+
+    key    = codec_bench.fingerprint(sizes, fps)
+    cached = codec_bench.load_cache(cache_path, key)
+    source = "cached"
+    if cached is not None:
+        results, ranking = cached
+    else:
+        started = time.monotonic()
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, codec_bench.run_benchmark, sizes)
+        except CodecBenchError as e:
+            log(details=f"{task_name} - Codec benchmark failed: {e} — using the phone's order", log_type="warning")
+            return
+        ranking = codec_bench.rank_codecs(results, sizes[0][0], sizes[0][1], fps)
+        source  = f"benchmarked in {time.monotonic() - started:.1f}s"
+        try:
+            codec_bench.save_cache(cache_path, key, results, ranking)
+        except CodecBenchError as e:
+            log(details=f"{task_name} - {e}", log_type="warning")
+
+    peer.codec_preferences = ranking
+    log(
+        details=f"{task_name} - Codec: {ranking[0].split('/')[-1]} preferred ({source}, "
+                f"budget {abr_controller.ENCODE_BUDGET * 1000 / fps:.0f}ms/frame) | "
+                + ", ".join(str(result) for result in results),
+        log_type="info",
+    )
+
+
+async def _stats_reporter(
+    task_name      : str,
+    peer,
+    lag_monitor    : LoopLagMonitor,
+    telemetry      : StreamTelemetry,
+    snapshots      : SnapshotPublisher,
+    recorder       : Optional[ClipRecorder],
+    activity       : Optional[ActivityMonitor],
+    tracer         : FrameTracer,
+    ack_times      : deque,
+    capture_thread : bool,
+    is_running     : Callable[[], bool],
+) -> None:
+    """Event loop lag, viewers, links and side readers every REPORT_INTERVAL seconds."""
+    last_report, last_cpu, last_activity = time.monotonic(), time.process_time(), None
+    while is_running():
+        await asyncio.sleep(1.0)
+        if time.monotonic() - last_report < stream_report.REPORT_INTERVAL:
+            continue
+
+        # CPU per viewer: the marginal cost of fan-out (one encoder each)
+        cpu    = (time.process_time() - last_cpu) / (time.monotonic() - last_report) * 100
+        minute = activity.last_summary if activity is not None else None
+        lines  = (
+            stream_report.loop_lag_line(lag_monitor.snapshot(), capture_thread),
+            stream_report.viewers_line(peer.viewer_summary(), peer.max_viewers, cpu, peer.rejected_viewers),
+            stream_report.links_line(telemetry.summary(seconds=stream_report.REPORT_INTERVAL)),
+            stream_report.snapshots_line(snapshots),
+            stream_report.clips_line(recorder),
+            stream_report.activity_line(minute) if minute is not last_activity else None,
+            stream_report.latency_line(tracer.snapshot()),
+            stream_report.control_line(ack_times, peer.data_channels()),
+            stream_report.signaling_line(peer.signaling_summary()),
+            stream_report.first_frame_line(peer.first_frame_summary(), peer.ice_mode),
+            stream_report.reconnects_line(peer.reconnect_summary()),
+        )
+        for line in filter(None, lines):
+            log(details=f"{task_name} - {line}", log_type="info")
+
+        tracer.reset()
+        ack_times.clear()
+        last_activity = minute
+        last_report   = time.monotonic()
+        last_cpu      = time.process_time()
+
+
 # ─────────────────────────── HELPERS ─────────────────────────────────────────
 
+def _write_frame(frame: np.ndarray, slot: np.ndarray, pixel_format: str) -> None:
+    """
+    Copy/resize a captured frame into a ring slot of the same pixel format.
+
+    Same shape → one copy. BGR of another size → cv2.resize into the slot.
+    I420 of another size (camera ignored the requested size) → slow path
+    through BGR; not expected in normal operation.
+    """
+    if frame.shape == slot.shape:
+        np.copyto(slot, frame)
+    elif pixel_format == "yuv420":
+        height, width = slot.shape[0] * 2 // 3, slot.shape[1]
+        bgr = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+        bgr = cv2.resize(bgr, (width, height))
+        cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420, dst=slot)
+    else:
+        cv2.resize(frame, (slot.shape[1], slot.shape[0]), dst=slot)
+
+
 def _safe_cleanup(capture, IS_WEB_CAM: bool, task_name: str) -> None:
     """Attempt camera cleanup and log on failure."""
     try:
         camera.clean_up_camera(capture, IS_WEB_CAM)
     except Exception as e:
-        log(details=f"{task_name} - Camera cleanup failed: {e}", log_type="warning")
\ No newline at end of file
+        log(details=f"{task_name} - Camera cleanup failed: {e}", log_type="warning")
+
+
+def _close_telemetry(telemetry: StreamTelemetry, task_name: str) -> None:
+    """Flush and close the link metrics file, logging on failure."""
+    try:
+        telemetry.close()
+    except StreamTelemetryError as e:
+        log(details=f"{task_name} - Link metrics close failed: {e}", log_type="warning")
+
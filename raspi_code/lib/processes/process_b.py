@@ -5,22 +5,25 @@ Description:
     Reads Firebase RTDB state and physical keypad, drives feed/water motors,
     updates LCD, and logs analytics back to Firebase.
 
-    Sensor reads (v3 — offloaded to process_c):
+    Sensor reads (v4 — shared-memory rings from process_c):
         Feed and water level percentages are no longer read directly in this
         process. process_c runs the HC-SR04 ultrasonic sensors in a dedicated
-        loop with the median filter enabled and writes the latest values into
-        two shared multiprocessing.Value floats:
+        streaming-filter loop and appends every sample to one SensorRing per
+        registered sensor (dict sensor_rings, keyed by registry name):
 
-            shared_feed_level  : multiprocessing.Value('d')
-            shared_water_level : multiprocessing.Value('d')
+            sensor_rings["feed"]  : lib.services.sensor_ring.SensorRing
+            sensor_rings["water"] : lib.services.sensor_ring.SensorRing
 
-        This process reads those values on every tick via:
-            current_feed_level  = shared_feed_level.value
-            current_water_level = shared_water_level.value
+        This process reads the newest record on every tick via
+        _read_sensor_ring(). Reads are lock-free (seqlock) and never block
+        the tick loop. Levels of any extra registered sensors (additional
+        hoppers / troughs) are pushed to Firebase under sensors/.../levels/.
 
-        No locks are acquired on the read side — reading a double is atomic
-        on all supported platforms and the occasional torn read of a float
-        (one stale byte) is harmless compared to blocking the tick loop.
+        Staleness: if the newest record is older than SENSOR_STALE_SECONDS
+        (process_c died or hung) or the filter has not accepted a sample
+        recently (quality == 0, sensor dead / disconnected), the level is
+        flagged stale — the last good level is kept, a warning is logged
+        once per transition, and the LCD shows a sensor error.
 
     Water refill behaviour (v2):
         Refill is now fully manual and toggle-based.
@@ -47,6 +50,15 @@ Description:
         Hardware (GPIO, motors, LCD) is NOT re-initialized on a settings restart —
         only settings and per-loop state are refreshed.
 
+    Live-view commands (lib/services/live_control):
+        While a viewer is connected with the "control" data channel, feed /
+        water commands arrive from process_a on control_commands instead of
+        through buttons/... timestamps. The tick sleep waits on that queue,
+        so a command wakes the loop at once; that tick skips the RTDB read
+        and acts on the command like an app button press. Every command is
+        acknowledged — and every motor start / stop announced — on
+        control_events for process_a to relay to the app.
+
     Analytics (v3):
         Feed analytics now logs kgPerDispense per completed dispense cycle
         instead of a sensor-derived percentage delta.
@@ -55,6 +67,8 @@ Description:
         - Water analytics logs durationSeconds (start→stop span) unchanged.
 """
 
+import math
+import queue
 import time
 from datetime import datetime
 
@@ -69,6 +83,8 @@ from lib.services.hardware import (
 )
 from lib.services.hardware.keypad_controller import Keypad4x4, KeypadError
 from lib.services.hardware.motor_controller  import MotorError, MotorSetupError
+from lib.services.sensor_ring import SensorRingError
+from lib.services import live_control
 from lib.services.logger import get_logger
 
 log = get_logger("process_b.py")
@@ -209,8 +225,8 @@ def _read_pins_data(keypad_instance: Keypad4x4) -> dict:
     """
     Read keypad state only.
 
-    Sensor levels are NO LONGER read here — they come from shared memory
-    (shared_feed_level, shared_water_level) written by process_c.
+    Sensor levels are NO LONGER read here — they come from the shared
+    memory rings (sensor_rings) written by process_c.
 
     Uses scan_key() (no debounce) — debouncing for the toggle logic is
     handled upstream via the physical button cooldown timer, not here.
@@ -244,6 +260,67 @@ def _current_millis() -> int:
     return int(time.monotonic() * 1000)
 
 
+SENSOR_STALE_SECONDS = 5.0
+
+
+def _read_sensor_ring(ring, last_level: float) -> tuple:
+    """
+    Read the newest level from a process_c SensorRing.
+
+    Returns:
+        tuple: (level_percent, is_stale). On stale/missing data — no record,
+               older than SENSOR_STALE_SECONDS, or quality <= 0 — last_level
+               (the last good level) is returned unchanged, so warnings and
+               Firebase writes never act on a dead sensor's value and the
+               LCD does not flip to 0%.
+    """
+    try:
+        record = ring.latest()
+    except SensorRingError:
+        return last_level, True
+
+    if record is None or math.isnan(record.percent):
+        return last_level, True
+
+    if (
+        time.time() - record.timestamp > SENSOR_STALE_SECONDS or
+        record.quality <= 0.0
+    ):
+        return last_level, True
+    return record.percent, False
+
+
+# ─────────────────────────── LIVE CONTROL HELPERS ────────────────────────────
+
+def _wait_for_command(command_queue, timeout: float):
+    """
+    Sleep one tick, returning early with a live-view command if one arrives.
+
+    Returns:
+        The command dict from process_a, or None after a plain tick.
+    """
+    if command_queue is None:
+        time.sleep(timeout)
+        return None
+    try:
+        return command_queue.get(timeout=timeout)
+    except queue.Empty:
+        return None
+    except (OSError, EOFError, ValueError):
+        time.sleep(timeout)     # Queue torn down — behave like a plain tick
+        return None
+
+
+def _send_event(event_queue, text: str, viewer=None, received=None) -> None:
+    """Queue an ack / state message for process_a. Dropped if nobody drains it."""
+    if event_queue is None:
+        return
+    try:
+        event_queue.put_nowait({"text": text, "viewer": viewer, "received": received})
+    except (queue.Full, OSError, ValueError):
+        pass
+
+
 # ─────────────────────────── FIREBASE HELPERS ────────────────────────────────
 
 def _update_button_timestamp(database_ref: dict, button_type: str) -> None:
@@ -334,17 +411,21 @@ def _update_lcd_display(
     water_warning       : bool,
     dispense_active     : bool,
     refill_active       : bool,
+    feed_stale          : bool = False,
+    water_stale         : bool = False,
 ) -> None:
     if lcd_obj is None:
         return
     try:
         line1 = (
             "DISPENSING..."                    if dispense_active else
+            "FEED SENSOR ERR"                  if feed_stale      else
             f"FEED LOW {current_feed_level}%"  if feed_warning    else
             f"Feed: {current_feed_level}%"
         )
         line2 = (
             "REFILLING..."                      if refill_active  else
+            "WATER SENSOR ERR"                  if water_stale    else
             f"WATER LOW {current_water_level}%" if water_warning  else
             f"Water: {current_water_level}%"
         )
@@ -364,8 +445,15 @@ def process_B(**kwargs) -> None:
     USER_CREDENTIAL    = args["USER_CREDENTIAL"]
     LCD_I2C_ADDR       = args.get("LCD_I2C_ADDR", 0x27)
     # ── Shared memory from process_c ──────────────────────────────────────
-    shared_feed_level  = args["shared_feed_level"]   # multiprocessing.Value('d')
-    shared_water_level = args["shared_water_level"]  # multiprocessing.Value('d')
+    sensor_rings       = args["sensor_rings"]        # {name: SensorRing}
+    feed_ring          = sensor_rings["feed"]
+    water_ring         = sensor_rings["water"]
+    extra_rings        = {
+        name: ring for name, ring in sensor_rings.items() if name not in ("feed", "water")
+    }
+    # ── Live-view data channel commands via process_a ─────────────────────
+    control_commands   = args.get("control_commands")
+    control_events     = args.get("control_events")
 
     log(details=f"{TASK_NAME} - Running", log_type="info")
 
@@ -440,6 +528,9 @@ def process_B(**kwargs) -> None:
         # ── Per-restart state ─────────────────────────────────────────────
         current_feed_level  = 0.0
         current_water_level = 0.0
+        feed_stale          = False
+        water_stale         = False
+        extra_levels        = {name: 0.0 for name in extra_rings}
         current_feed_physical_button_state  = False
         current_water_physical_button_state = False
 
@@ -498,7 +589,9 @@ def process_B(**kwargs) -> None:
                     break
 
                 current_time = time.time()
-                time.sleep(0.1)
+                live_command = _wait_for_command(control_commands, 0.1)
+                live_feed    = live_command is not None and live_command["action"] == "feed"
+                live_water   = live_command is not None and live_command["action"] == "water"
 
                 # ── Read keypad ───────────────────────────────────────────
                 # Sensor levels come from shared memory (process_c), not here.
@@ -513,8 +606,21 @@ def process_B(**kwargs) -> None:
                     break
 
                 # ── Read sensor levels from shared memory (process_c) ─────
-                current_feed_level  = shared_feed_level.value
-                current_water_level = shared_water_level.value
+                current_feed_level,  new_feed_stale  = _read_sensor_ring(feed_ring,  current_feed_level)
+                current_water_level, new_water_stale = _read_sensor_ring(water_ring, current_water_level)
+
+                if boot_ticks_elapsed >= BOOT_STABILIZATION_TICKS:
+                    if new_feed_stale != feed_stale:
+                        log(
+                            details=f"{TASK_NAME} - Feed sensor {'STALE' if new_feed_stale else 'recovered'}",
+                            log_type="warning" if new_feed_stale else "info",
+                        )
+                    if new_water_stale != water_stale:
+                        log(
+                            details=f"{TASK_NAME} - Water sensor {'STALE' if new_water_stale else 'recovered'}",
+                            log_type="warning" if new_water_stale else "info",
+                        )
+                    feed_stale, water_stale = new_feed_stale, new_water_stale
 
                 # ── D-key hold → logout request ───────────────────────────
                 if raw_key == "D":
@@ -535,69 +641,73 @@ def process_B(**kwargs) -> None:
                     d_key_hold_start = 0.0
 
                 # ── Read Firebase ─────────────────────────────────────────
-                try:
-                    database_data = firebase_rtdb.read_RTDB(database_ref=database_ref)
-                    current_feed_app_button_state  = database_data["current_feed_app_button_state"]
-                    current_water_app_button_state = database_data["current_water_app_button_state"]
-                    raw_feed_timestamp             = database_data["raw_feed_timestamp"]
-                    raw_water_timestamp            = database_data["raw_water_timestamp"]
-                    current_feed_schedule_state    = database_data["current_feed_schedule_state"]
-                    current_live_button_state      = database_data["current_live_button_state"]
-
-                    user_settings                   = database_data["current_user_settings"]
-                    current_feed_threshold_warning  = user_settings["feed_threshold_warning"]
-                    current_water_threshold_warning = user_settings["water_threshold_warning"]
-
-                    # ── Live-reload dispenseCountdownMs ───────────────────
-                    new_countdown = user_settings.get("dispense_countdown_ms")
-                    if isinstance(new_countdown, int) and new_countdown > 0 and new_countdown != DISPENSE_COUNTDOWN_TIME:
-                        log(
-                            details=f"{TASK_NAME} - dispenseCountdownMs updated: "
-                                    f"{DISPENSE_COUNTDOWN_TIME}ms → {new_countdown}ms",
-                            log_type="info",
-                        )
-                        DISPENSE_COUNTDOWN_TIME = new_countdown
-                        _save_cached_countdown(new_countdown)
-
-                    # ── Live-reload kgPerDispense ─────────────────────────
-                    new_kg = user_settings.get("kg_per_dispense")
-                    if isinstance(new_kg, (int, float)) and new_kg > 0 and new_kg != KG_PER_DISPENSE:
-                        log(
-                            details=f"{TASK_NAME} - kgPerDispense updated: "
-                                    f"{KG_PER_DISPENSE}kg → {new_kg}kg",
-                            log_type="info",
-                        )
-                        KG_PER_DISPENSE = float(new_kg)
-                        _save_cached_kg_per_dispense(KG_PER_DISPENSE)
-
-                    # ── Detect settings change → graceful restart ─────────
-                    _current_updated_at = user_settings.get("updated_at", 0)
-                    if (
-                        not _settings_change_pending
-                        and _current_updated_at
-                        and _current_updated_at != _settings_updated_at_at_start
-                    ):
-                        log(
-                            details=f"{TASK_NAME} - Settings change detected "
-                                    f"(updatedAt {_settings_updated_at_at_start} → {_current_updated_at}). "
-                                    f"Waiting for motors to idle before restarting.",
-                            log_type="info",
-                        )
-                        _settings_change_pending = True
-                        if lcd_obj:
-                            try:
-                                lcd_obj.show(["Settings updated", "Finishing cycle..."])
-                            except Exception:
-                                pass
-
-                except FirebaseReadError as e:
-                    if current_time - last_db_error_log >= DB_ERROR_LOG_INTERVAL:
-                        log(details=f"{TASK_NAME} - RTDB read failed: {e}", log_type="warning")
-                        last_db_error_log = current_time
-                except Exception as e:
-                    if current_time - last_db_error_log >= DB_ERROR_LOG_INTERVAL:
-                        log(details=f"{TASK_NAME} - Unexpected RTDB error: {e}", log_type="warning")
-                        last_db_error_log = current_time
+                # Skipped on a tick woken by a live-view command: the
+                # previous tick's values still hold, and the command is
+                # acted on without waiting for an RTDB round trip.
+                if live_command is None:
+                    try:
+                        database_data = firebase_rtdb.read_RTDB(database_ref=database_ref)
+                        current_feed_app_button_state  = database_data["current_feed_app_button_state"]
+                        current_water_app_button_state = database_data["current_water_app_button_state"]
+                        raw_feed_timestamp             = database_data["raw_feed_timestamp"]
+                        raw_water_timestamp            = database_data["raw_water_timestamp"]
+                        current_feed_schedule_state    = database_data["current_feed_schedule_state"]
+                        current_live_button_state      = database_data["current_live_button_state"]
+
+                        user_settings                   = database_data["current_user_settings"]
+                        current_feed_threshold_warning  = user_settings["feed_threshold_warning"]
+                        current_water_threshold_warning = user_settings["water_threshold_warning"]
+
+                        # ── Live-reload dispenseCountdownMs ───────────────────
+                        new_countdown = user_settings.get("dispense_countdown_ms")
+                        if isinstance(new_countdown, int) and new_countdown > 0 and new_countdown != DISPENSE_COUNTDOWN_TIME:
+                            log(
+                                details=f"{TASK_NAME} - dispenseCountdownMs updated: "
+                                        f"{DISPENSE_COUNTDOWN_TIME}ms → {new_countdown}ms",
+                                log_type="info",
+                            )
+                            DISPENSE_COUNTDOWN_TIME = new_countdown
+                            _save_cached_countdown(new_countdown)
+
+                        # ── Live-reload kgPerDispense ─────────────────────────
+                        new_kg = user_settings.get("kg_per_dispense")
+                        if isinstance(new_kg, (int, float)) and new_kg > 0 and new_kg != KG_PER_DISPENSE:
+                            log(
+                                details=f"{TASK_NAME} - kgPerDispense updated: "
+                                        f"{KG_PER_DISPENSE}kg → {new_kg}kg",
+                                log_type="info",
+                            )
+                            KG_PER_DISPENSE = float(new_kg)
+                            _save_cached_kg_per_dispense(KG_PER_DISPENSE)
+
+                        # ── Detect settings change → graceful restart ─────────
+                        _current_updated_at = user_settings.get("updated_at", 0)
+                        if (
+                            not _settings_change_pending
+                            and _current_updated_at
+                            and _current_updated_at != _settings_updated_at_at_start
+                        ):
+                            log(
+                                details=f"{TASK_NAME} - Settings change detected "
+                                        f"(updatedAt {_settings_updated_at_at_start} → {_current_updated_at}). "
+                                        f"Waiting for motors to idle before restarting.",
+                                log_type="info",
+                            )
+                            _settings_change_pending = True
+                            if lcd_obj:
+                                try:
+                                    lcd_obj.show(["Settings updated", "Finishing cycle..."])
+                                except Exception:
+                                    pass
+
+                    except FirebaseReadError as e:
+                        if current_time - last_db_error_log >= DB_ERROR_LOG_INTERVAL:
+                            log(details=f"{TASK_NAME} - RTDB read failed: {e}", log_type="warning")
+                            last_db_error_log = current_time
+                    except Exception as e:
+                        if current_time - last_db_error_log >= DB_ERROR_LOG_INTERVAL:
+                            log(details=f"{TASK_NAME} - Unexpected RTDB error: {e}", log_type="warning")
+                            last_db_error_log = current_time
 
                 # ── Sync live stream status ───────────────────────────────
                 if current_live_button_state:
@@ -666,14 +776,18 @@ def process_B(**kwargs) -> None:
                     (
                         physical_feed_new_press    or
                         feed_app_new_press         or
+                        live_feed                  or
                         feed_schedule_new_trigger
                     ) and not dispense_active
                 )
 
                 # Determine analytics source for this dispense trigger
-                if feed_schedule_new_trigger and not physical_feed_new_press and not feed_app_new_press:
+                if (
+                    feed_schedule_new_trigger and not physical_feed_new_press and
+                    not feed_app_new_press and not live_feed
+                ):
                     pending_feed_source = "schedule"
-                elif feed_app_new_press:
+                elif feed_app_new_press or live_feed:
                     pending_feed_source = "app"
                 else:
                     pending_feed_source = "keypad"
@@ -689,6 +803,14 @@ def process_B(**kwargs) -> None:
                 # ── Boot stabilization ────────────────────────────────────
                 if boot_ticks_elapsed < BOOT_STABILIZATION_TICKS:
                     boot_ticks_elapsed += 1
+                    if live_command is not None:
+                        _send_event(
+                            control_events,
+                            live_control.ack_message(
+                                live_command["id"], live_command["action"], ok=False, reason="booting"
+                            ),
+                            live_command["viewer"], live_command["received"],
+                        )
                     continue
 
                 # ── Graceful settings restart — wait for motors to go idle ─
@@ -703,6 +825,14 @@ def process_B(**kwargs) -> None:
                             time.sleep(1)
                         except Exception:
                             pass
+                    if live_command is not None:
+                        _send_event(
+                            control_events,
+                            live_control.ack_message(
+                                live_command["id"], live_command["action"], ok=False, reason="settings"
+                            ),
+                            live_command["viewer"], live_command["received"],
+                        )
                     settings_restart = True
                     break
 
@@ -739,6 +869,12 @@ def process_B(**kwargs) -> None:
                         log_type="info"
                     )
 
+                live_water_accepted = (
+                    live_water and
+                    not _settings_change_pending and
+                    (current_time - last_physical_water_press) >= APP_AFTER_PHYSICAL_BLACKOUT
+                )
+
                 if not _settings_change_pending:
 
                     if water_app_new_press:
@@ -758,6 +894,30 @@ def process_B(**kwargs) -> None:
                             refill_active      = refill_active,
                         )
 
+                    if live_water_accepted:
+                        if not refill_active:
+                            refill_start_monotonic = time.monotonic()
+                        refill_active = _refill_it(
+                            water_button_state = True,
+                            refill_active      = refill_active,
+                        )
+
+                # ── Acknowledge live-view command ─────────────────────────
+                if live_command is not None:
+                    accepted = (live_feed and feed_button_pressed) or live_water_accepted
+                    _send_event(
+                        control_events,
+                        live_control.ack_message(
+                            live_command["id"],
+                            live_command["action"],
+                            ok         = accepted,
+                            reason     = None if accepted else ("settings" if _settings_change_pending else "busy"),
+                            dispensing = dispense_active,
+                            refilling  = refill_active,
+                        ),
+                        live_command["viewer"], live_command["received"],
+                    )
+
                 # ── Analytics on action completion ────────────────────────
                 if prev_dispense_active and not dispense_active:
                     try:
@@ -785,6 +945,9 @@ def process_B(**kwargs) -> None:
                         log(details=f"{TASK_NAME} - Analytics write failed: {e}", log_type="warning")
                     refill_start_monotonic = 0.0
 
+                if (dispense_active, refill_active) != (prev_dispense_active, prev_refill_active):
+                    _send_event(control_events, live_control.state_message(dispense_active, refill_active))
+
                 prev_dispense_active = dispense_active
                 prev_refill_active   = refill_active
 
@@ -798,16 +961,22 @@ def process_B(**kwargs) -> None:
                         water_warning       = water_warning,
                         dispense_active     = dispense_active,
                         refill_active       = refill_active,
+                        feed_stale          = feed_stale,
+                        water_stale         = water_stale,
                     )
                     last_lcd_update = current_time
 
                 # ── Push sensor data to Firebase ──────────────────────────
+                sensor_update = {
+                    "feedLevel" : current_feed_level,
+                    "waterLevel": current_water_level,
+                    "updatedAt" : datetime.now().strftime("%m/%d/%Y %H:%M:%S"),
+                }
+                for name, ring in extra_rings.items():
+                    extra_levels[name], _ = _read_sensor_ring(ring, extra_levels[name])
+                    sensor_update[f"levels/{name}"] = extra_levels[name]
                 try:
-                    database_ref["sensors_ref"].update({
-                        "feedLevel" : current_feed_level,
-                        "waterLevel": current_water_level,
-                        "updatedAt" : datetime.now().strftime("%m/%d/%Y %H:%M:%S"),
-                    })
+                    database_ref["sensors_ref"].update(sensor_update)
                 except Exception as e:
                     if current_time - last_db_error_log >= DB_ERROR_LOG_INTERVAL:
                         log(details=f"{TASK_NAME} - Sensor DB update failed: {e}", log_type="warning")
@@ -1,9 +1,9 @@
 """
 Path: lib/processes/process_c.py
 Description:
-    Ultrasonic sensor process — reads feed (left) and water (right) HC-SR04
-    sensors in a tight dedicated loop and writes results into two shared
-    multiprocessing.Value floats that process_b reads every tick.
+    Ultrasonic sensor process — reads every registered HC-SR04 sensor (feed
+    and water by default) in a tight dedicated loop and appends every sample
+    to a shared-memory SensorRing per sensor that process_b reads every tick.
 
     Why a separate process?
         process_b runs a 100ms tick loop that also handles keypad scanning,
@@ -19,22 +19,45 @@ Description:
         fidelity, and lets process_b simply read the latest value from shared
         memory on every tick without blocking.
 
-    IPC — multiprocessing.Value (shared memory):
-        Two c_double Values are created in main.py and passed to both
-        process_b and process_c:
+    IPC — SensorRing (multiprocessing.shared_memory + seqlock):
+        One ring per registered sensor is created in main.py and passed to
+        both process_b and process_c as a dict:
 
-            shared_feed_level  : c_double — latest feed level  (%)
-            shared_water_level : c_double — latest water level (%)
+            sensor_rings : {name: SensorRing} — e.g. "feed", "water", ...
 
-        process_c writes; process_b reads. Value uses a Lock internally so
-        reads and writes are atomic — no additional synchronisation needed
-        for two simple float updates.
+        process_c appends one (timestamp, raw cm, percent, quality) record
+        per raw sample — including rejected ones, so a dead sensor shows up
+        as raw 0.0 with quality falling to 0 instead of a frozen level.
+        percent is the latest filtered level (NaN before the first accept).
+        process_b reads lock-free; see lib/services/sensor_ring.
 
-    Sensor loop:
-        Each iteration reads left sensor → right sensor using the median
-        filter (5 samples). Total cycle time ≈ 300–400ms. The loop runs
-        continuously; there is no artificial sleep between cycles so the
-        shared values are always as fresh as the hardware allows.
+    Sensor loop (streaming, N sensors):
+        Sensors come from the ULTRASONIC_SENSORS registry (default: feed on
+        TRIG 25 / ECHO 22 and water on TRIG 7 / ECHO 8, one shared zone).
+        lib/services/sensor_scheduler plans time slots so that sensors in
+        the same acoustic zone never fire together, while sensors in
+        different zones fire in the same slot and are timed concurrently.
+        Each slot yields ONE raw reading per sensor in it.
+
+        Every raw sample is pushed through that sensor's FilterChain
+        (lib/services/sensor_filter) and the result is published
+        immediately. Rejected samples keep the previous level.
+
+        The chain is selected with SENSOR_FILTER_CHAIN (default "median:5",
+        equivalent smoothing to the old 5-sample burst).
+
+    Raw trace recording:
+        If SENSOR_TRACE_PATH is set, every raw sample (before filtering) is
+        appended to that file via lib/services/sensor_trace.TraceRecorder.
+        Evaluate filters offline with test/eval_sensor_filters.py.
+
+    Measurement backend:
+        ULTRASONIC_BACKEND selects how echo pulses are timed (see
+        ultrasonic_controller). With "rpigpio" or "gpiod" the process sleeps
+        on edge events instead of spinning on GPIO.input(), so it no longer
+        holds a CPU core at 100%. The default is "rpigpio"; if its edge
+        detection cannot be set up the process falls back to "poll"
+        (logged). Compare backends with test/test_sensor_backends.py.
 
     Shutdown:
         process_c checks status_checker on every iteration. When any other
@@ -46,9 +69,17 @@ Description:
         ultrasonic_controller raises exceptions only — no internal logging.
 """
 
+import time
+
 import RPi.GPIO as GPIO
 
 from lib.services.hardware import ultrasonic_controller as distance
+from lib.services.hardware.ultrasonic_controller import UltrasonicSetupError
+from lib.services import sensor_filter
+from lib.services.sensor_filter import SensorFilterConfigError
+from lib.services import sensor_trace
+from lib.services.sensor_trace import SensorTraceError
+from lib.services import sensor_scheduler
 from lib.services.logger import get_logger
 
 log = get_logger("process_c.py")
@@ -58,23 +89,91 @@ def process_C(**kwargs) -> None:
     args               = kwargs["process_C_args"]
     TASK_NAME          = args["TASK_NAME"]
     status_checker     = args["status_checker"]
-    shared_feed_level  = args["shared_feed_level"]   # multiprocessing.Value('d')
-    shared_water_level = args["shared_water_level"]  # multiprocessing.Value('d')
+    sensor_rings       = args["sensor_rings"]        # {name: SensorRing}
+    SENSORS            = args.get("SENSORS") or sensor_scheduler.parse_sensor_registry()
+    ULTRASONIC_BACKEND = args.get("ULTRASONIC_BACKEND", distance.DEFAULT_BACKEND)
+    SLOT_SECONDS       = args.get("ULTRASONIC_SLOT_MS", distance.ECHO_TIMEOUT * 1000) / 1000
+    FILTER_CHAIN_SPEC  = args.get("SENSOR_FILTER_CHAIN", sensor_filter.DEFAULT_CHAIN_SPEC)
+    TRACE_PATH         = args.get("SENSOR_TRACE_PATH")
 
     log(details=f"{TASK_NAME} - Running", log_type="info")
 
+    # ── Per-sensor streaming filter chains ────────────────────────────────
+    try:
+        sensor_filter.build_filter_chain(FILTER_CHAIN_SPEC)
+    except SensorFilterConfigError as e:
+        log(
+            details=f"{TASK_NAME} - Bad SENSOR_FILTER_CHAIN '{FILTER_CHAIN_SPEC}': {e} — "
+                    f"falling back to '{sensor_filter.DEFAULT_CHAIN_SPEC}'",
+            log_type="warning",
+        )
+        FILTER_CHAIN_SPEC = sensor_filter.DEFAULT_CHAIN_SPEC
+
+    # Per-sensor state. Trace ids follow registry order (feed=0, water=1
+    # with the default registry — same ids as before).
+    states = {
+        sensor.name: {
+            "sensor"   : sensor,
+            "trace_id" : index,
+            "chain"    : sensor_filter.build_filter_chain(FILTER_CHAIN_SPEC),
+            "ring"     : sensor_rings[sensor.name],
+            "percent"  : float("nan"),
+        }
+        for index, sensor in enumerate(SENSORS)
+    }
+
+    # ── Optional raw trace recorder ───────────────────────────────────────
+    recorder = None
+    if TRACE_PATH:
+        try:
+            recorder = sensor_trace.TraceRecorder(TRACE_PATH)
+            log(details=f"{TASK_NAME} - Recording raw sensor trace to {TRACE_PATH}", log_type="info")
+        except SensorTraceError as e:
+            log(details=f"{TASK_NAME} - Trace recorder disabled: {e}", log_type="warning")
+
     GPIO.setmode(GPIO.BCM)
     GPIO.setwarnings(False)
 
+    pins = [(sensor.trig, sensor.echo) for sensor in SENSORS]
     try:
-        distance.setup_ultrasonics()
+        try:
+            distance.setup_ultrasonics(backend=ULTRASONIC_BACKEND, pins=pins)
+        except UltrasonicSetupError as e:
+            if ULTRASONIC_BACKEND == "poll":
+                raise
+            log(
+                details=f"{TASK_NAME} - Ultrasonic backend '{ULTRASONIC_BACKEND}' unavailable: {e} — "
+                        f"falling back to poll",
+                log_type="warning",
+            )
+            distance.setup_ultrasonics(backend="poll", pins=pins)
     except Exception as e:
         log(details=f"{TASK_NAME} - Ultrasonic setup failed: {e}", log_type="error")
         status_checker.clear()
         GPIO.cleanup()
         return
 
-    log(details=f"{TASK_NAME} - Ultrasonic sensors initialized", log_type="info")
+    scheduler = sensor_scheduler.SensorScheduler(
+        sensors      = SENSORS,
+        concurrent   = distance.supports_concurrent(),
+        slot_seconds = SLOT_SECONDS,
+    )
+
+    log(
+        details=f"{TASK_NAME} - Ultrasonic sensors initialized "
+                f"(backend={distance.get_backend()}, filter={FILTER_CHAIN_SPEC}) | "
+                f"{scheduler.describe()}",
+        log_type="info",
+    )
+    if not distance.supports_concurrent() and len({s.zone for s in SENSORS}) > 1:
+        log(
+            details=f"{TASK_NAME} - Backend 'poll' cannot fire zones concurrently — "
+                    f"use ULTRASONIC_BACKEND=rpigpio or gpiod for interleaved slots",
+            log_type="warning",
+        )
+
+    last_stats_log = time.monotonic()
+    samples_taken  = 0
 
     try:
         while True:
@@ -85,29 +184,54 @@ def process_C(**kwargs) -> None:
                 )
                 break
 
-            # ── Read feed sensor (left) ───────────────────────────────────
+            # ── Fire this slot's sensors (sleeps until the slot opens) ────
+            slot = scheduler.next_slot()
             try:
-                feed_cm = distance.read_left_distance()
-                feed_pct = _to_percent(feed_cm)
-                with shared_feed_level.get_lock():
-                    shared_feed_level.value = feed_pct
+                stamp_ns = time.monotonic_ns()
+                raws     = distance.measure_concurrent([(s.trig, s.echo) for s in slot])
             except Exception as e:
                 log(
-                    details=f"{TASK_NAME} - Feed sensor read failed: {e}",
+                    details=f"{TASK_NAME} - Sensor read failed "
+                            f"({', '.join(s.name for s in slot)}): {e}",
                     log_type="warning",
                 )
+                continue
 
-            # ── Read water sensor (right) ─────────────────────────────────
-            try:
-                water_cm = distance.read_right_distance()
-                water_pct = _to_percent(water_cm)
-                with shared_water_level.get_lock():
-                    shared_water_level.value = water_pct
-            except Exception as e:
+            # ── Filter + publish each reading ─────────────────────────────
+            for sensor, raw in zip(slot, raws):
+                state = states[sensor.name]
+                try:
+                    if recorder:
+                        recorder.append(state["trace_id"], stamp_ns, raw)
+                    value_cm = state["chain"].update(raw)
+                    if value_cm is not None:
+                        state["percent"] = _to_percent(value_cm, sensor.full_cm, sensor.empty_cm)
+                    state["ring"].write(
+                        raw_cm  = raw,
+                        percent = state["percent"],
+                        quality = state["chain"].quality,
+                    )
+                except Exception as e:
+                    log(
+                        details=f"{TASK_NAME} - {sensor.name} sensor publish failed: {e}",
+                        log_type="warning",
+                    )
+            samples_taken += len(slot)
+
+            # ── Scheduler + filter stats every 60 seconds ─────────────────
+            now = time.monotonic()
+            if now - last_stats_log >= 60.0:
+                per_sensor = " | ".join(
+                    f"{name} accepted={st['chain'].accepted} rejected={st['chain'].rejected}"
+                    for name, st in states.items()
+                )
                 log(
-                    details=f"{TASK_NAME} - Water sensor read failed: {e}",
-                    log_type="warning",
+                    details=f"{TASK_NAME} - {samples_taken / (now - last_stats_log):.1f} samples/s "
+                            f"(overruns={scheduler.overruns}, guarded={scheduler.guarded}) | {per_sensor}",
+                    log_type="info",
                 )
+                samples_taken  = 0
+                last_stats_log = now
 
     except KeyboardInterrupt:
         log(details=f"{TASK_NAME} - KeyboardInterrupt received", log_type="warning")
@@ -119,7 +243,15 @@ def process_C(**kwargs) -> None:
         raise
 
     finally:
+        if recorder:
+            try:
+                recorder.close()
+            except SensorTraceError as e:
+                log(details=f"{TASK_NAME} - Trace close failed: {e}", log_type="warning")
+        distance.cleanup_ultrasonics()
         GPIO.cleanup()
+        for ring in sensor_rings.values():
+            ring.close()
         log(details=f"{TASK_NAME} - Process stopped", log_type="info")
 
 
@@ -131,6 +263,7 @@ def _to_percent(distance_cm: float, min_dist: int = 10, max_dist: int = 300) ->
 
     Mirrors the conversion in process_b so both processes use identical
     scaling. Kept here to avoid process_c importing from process_b.
+    Per-sensor min/max distances come from the ULTRASONIC_SENSORS registry.
     """
     if distance_cm <= min_dist:
         return 100.0
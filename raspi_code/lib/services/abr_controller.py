@@ -0,0 +1,225 @@
+"""
+ABR Controller Module
+Path: lib/services/abr_controller.py
+
+Adaptive bitrate / resolution / frame-rate controller for the WebRTC stream.
+
+Why:
+    A fixed b=AS:1500 at full resolution stalls viewers on weak mobile links
+    through the TURN relay, while LAN viewers would happily take more. The
+    controller walks a quality ladder from link measurements instead.
+
+Ladder:
+    Ordered best → worst. Each rung is WIDTHxHEIGHT@FPS:KBPS, comma
+    separated, e.g. (WEBRTC_LADDER in credentials/.env)
+        1280x720@20:1500,960x540@20:900,640x360@15:500,426x240@10:250
+    Empty spec = default_ladder() derived from FRAME_DIMENSION / CAMERA_FPS.
+
+Inputs (LinkSample, one every few seconds from RTCPeerConnection.getStats()):
+    rtt_ms      — round trip time from remote-inbound-rtp
+    loss        — fraction of packets lost since the last sample (0–1)
+    send_kbps   — bitrate actually sent since the last sample
+    encode_ms   — mean encoder time per frame
+
+Decision (with hysteresis):
+    congested  = loss > LOSS_DOWN or rtt_ms > RTT_DOWN_MS
+    overloaded = encode_ms > ENCODE_BUDGET × frame interval of the rung
+    healthy    = loss < LOSS_UP and rtt_ms < RTT_UP_MS and encode has headroom
+
+    step down after DOWN_AFTER consecutive congested/overloaded samples,
+    step up after UP_AFTER consecutive healthy samples, and never change
+    twice within HOLD_SECONDS. Down reacts fast; up is slow and cautious.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import time
+from typing import List, NamedTuple, Optional
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class ABRError(Exception):
+    """Base exception for ABR controller errors."""
+    pass
+
+class ABRLadderError(ABRError):
+    """Raised when a ladder spec cannot be parsed."""
+    pass
+
+
+# ─────────────────────────── TUNING ──────────────────────────────────────────
+
+LOSS_DOWN     = 0.08     # Step down above 8% loss
+LOSS_UP       = 0.02     # Step up only below 2% loss
+RTT_DOWN_MS   = 400.0
+RTT_UP_MS     = 250.0
+ENCODE_BUDGET = 0.8      # Encode may use 80% of the frame interval
+ENCODE_UP     = 0.5      # Step up only below 50% (the next rung costs more)
+
+DOWN_AFTER    = 2        # Consecutive bad samples before stepping down
+UP_AFTER      = 5        # Consecutive good samples before stepping up
+HOLD_SECONDS  = 10.0     # Minimum time between two changes
+
+
+class Rung(NamedTuple):
+    width  : int
+    height : int
+    fps    : int
+    kbps   : int
+
+    def __str__(self) -> str:
+        return f"{self.width}x{self.height}@{self.fps}:{self.kbps}"
+
+
+class LinkSample(NamedTuple):
+    rtt_ms    : Optional[float]
+    loss      : Optional[float]
+    send_kbps : float
+    encode_ms : Optional[float]
+
+
+# ─────────────────────────── LADDER ──────────────────────────────────────────
+
+def default_ladder(width: int, height: int, fps: int, max_kbps: int = 1500) -> List[Rung]:
+    """Four rungs from the capture size down to one third of it."""
+    steps = ((1.0, 1.0, 1.0), (0.75, 1.0, 0.6), (0.5, 0.75, 1 / 3), (1 / 3, 0.5, 1 / 6))
+    ladder = []
+    for scale, fps_scale, kbps_scale in steps:
+        rung = Rung(
+            width  = max(int(width  * scale) // 2 * 2, 16),    # I420 needs even sizes
+            height = max(int(height * scale) // 2 * 2, 16),
+            fps    = max(int(round(fps * fps_scale)), 1),
+            kbps   = max(int(round(max_kbps * kbps_scale)), 100),
+        )
+        if rung not in ladder:
+            ladder.append(rung)
+    return ladder
+
+
+def parse_ladder(spec: str, width: int, height: int, fps: int) -> List[Rung]:
+    """
+    Parse a WEBRTC_LADDER spec, best rung first. Rungs larger than the
+    capture size or faster than the capture rate are clamped to it.
+
+    Raises:
+        ABRLadderError: Malformed rung.
+    """
+    if not (spec or "").strip():
+        return default_ladder(width, height, fps)
+
+    ladder = []
+    for token in spec.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        try:
+            size, rest     = token.lower().split("@")
+            rung_w, rung_h = (int(v) for v in size.split("x"))
+            rung_fps, kbps = (int(v) for v in rest.split(":"))
+        except ValueError as e:
+            raise ABRLadderError(
+                f"Bad ladder rung '{token}' — expected WxH@FPS:KBPS. Source: {__name__}"
+            ) from e
+        if min(rung_w, rung_h, rung_fps, kbps) <= 0 or rung_w % 2 or rung_h % 2:
+            raise ABRLadderError(
+                f"Ladder rung '{token}' needs positive values and even dimensions. "
+                f"Source: {__name__}"
+            )
+        ladder.append(Rung(min(rung_w, width), min(rung_h, height), min(rung_fps, fps), kbps))
+
+    if not ladder:
+        raise ABRLadderError(f"Empty ladder spec '{spec}'. Source: {__name__}")
+    ladder.sort(key=lambda r: (r.width * r.height * r.fps, r.kbps), reverse=True)
+    return ladder
+
+
+# ─────────────────────────── CONTROLLER ──────────────────────────────────────
+
+class ABRController:
+    """
+    Example:
+        abr  = ABRController(parse_ladder(spec, 1280, 720, 20))
+        rung = abr.rung                          # apply initial settings
+        ...
+        new  = abr.update(LinkSample(rtt_ms=80, loss=0.0, send_kbps=1400, encode_ms=12))
+        if new is not None:
+            apply(new)
+    """
+
+    def __init__(self, ladder: List[Rung], start_index: int = 0):
+        if not ladder:
+            raise ABRLadderError(f"ABR ladder is empty. Source: {__name__}")
+        self.ladder       = list(ladder)
+        self.index        = min(max(start_index, 0), len(self.ladder) - 1)
+        self.last_reason  = "start"
+        self.changes      = 0
+        self._bad         = 0
+        self._good        = 0
+        self._changed_at  = 0.0
+
+    @property
+    def rung(self) -> Rung:
+        return self.ladder[self.index]
+
+    def _judge(self, sample: LinkSample) -> tuple:
+        """Returns (bad_reason or None, healthy)."""
+        budget_ms = 1000.0 / self.rung.fps
+        loss      = sample.loss   or 0.0
+        rtt       = sample.rtt_ms or 0.0
+        encode    = sample.encode_ms
+
+        if loss > LOSS_DOWN:
+            return f"loss {loss:.0%}", False
+        if rtt > RTT_DOWN_MS:
+            return f"rtt {rtt:.0f}ms", False
+        if encode is not None and encode > ENCODE_BUDGET * budget_ms:
+            return f"encode {encode:.0f}ms", False
+
+        healthy = (
+            loss < LOSS_UP and
+            rtt  < RTT_UP_MS and
+            (encode is None or encode < ENCODE_UP * budget_ms)
+        )
+        return None, healthy
+
+    def update(self, sample: LinkSample, now: Optional[float] = None) -> Optional[Rung]:
+        """
+        Feed one link sample.
+
+        Returns:
+            The new Rung if the controller stepped, otherwise None.
+        """
+        now = time.monotonic() if now is None else now
+        reason, healthy = self._judge(sample)
+
+        if reason:
+            self._bad  += 1
+            self._good  = 0
+        elif healthy:
+            self._good += 1
+            self._bad   = 0
+        else:
+            self._bad = self._good = 0
+
+        if now - self._changed_at < HOLD_SECONDS:
+            return None
+
+        if self._bad >= DOWN_AFTER and self.index < len(self.ladder) - 1:
+            return self._step(+1, f"down: {reason}", now)
+        if self._good >= UP_AFTER and self.index > 0:
+            return self._step(-1, "up: link healthy", now)
+        return None
+
+    def _step(self, delta: int, reason: str, now: float) -> Rung:
+        self.index       += delta
+        self.last_reason  = reason
+        self.changes     += 1
+        self._bad = self._good = 0
+        self._changed_at  = now
+        return self.rung
+
+    def __repr__(self) -> str:
+        return f"ABRController(rung={self.rung}, {self.index + 1}/{len(self.ladder)})"
@@ -0,0 +1,357 @@
+"""
+Activity Monitor Module
+Path: lib/services/activity_monitor.py
+
+Flock activity and occupancy per zone of the picture, from a tiny
+downscaled copy of the camera frame, summarised per minute.
+
+Why:
+    Questions like "do the birds crowd the feeder after a dispense?" need a
+    number over time, not someone watching the stream. Real CV (detectors,
+    optical flow) does not fit on the Pi next to capture and encoding; a
+    160-pixel luma thumbnail once a second, compared with a few NumPy
+    array operations, does — about a millisecond of CPU per sample.
+
+Per sample (analyze(), ACTIVITY_FPS, 1–2 fps is plenty):
+    1. The luma plane (I420 Y, or BGR → gray) minus ignore_rows (latency
+       overlay) is downscaled to width with INTER_AREA — the only read of
+       the ring view — and its mean is subtracted, so an auto-exposure
+       step does not count as movement.
+    2. motion     = |frame − previous frame|      > DIFF_THRESHOLD
+       foreground = |frame − running background|  > DIFF_THRESHOLD
+       The background is an exponential average (BACKGROUND_ALPHA per
+       sample, ~1 minute at 1 fps), so occupancy means "differs from the
+       scene of the last minute or so" — birds standing still for longer
+       fade into it.
+    3. Zones (ACTIVITY_ZONES, "name:x0,y0,x1,y1;..." as fractions of the
+       frame, may overlap) are a (zones × pixels) weight matrix; one matrix
+       product gives every zone's motion and foreground share at once.
+
+Activity = mean motion share over the minute, peak = highest single
+sample, occupancy = mean foreground share; each 0–1.
+
+CPU budget (ACTIVITY_CPU_PCT, % of one core):
+    analyze() measures its own thread CPU time, and interval — the time the
+    caller should wait before the next sample — becomes
+    max(1 / fps, cpu time / budget). An expensive sample stretches the gap
+    after it, so the average can never exceed the budget; such samples
+    are counted as throttled.
+
+Minute summaries (take_summary() → publish()):
+    {"timestamp": <period start, Unix ms>, "seconds": 60, "samples": n,
+     "zones": {"feeder": {"activity": .., "peak": .., "occupancy": ..}},
+     "events": ["feed"], "cpuMs": <mean per sample>, "throttled": n}
+    events lists what mark() reported during the minute (process_a marks
+    dispenses and refills), so activity can be lined up with feeding.
+    Appended to a JSON-lines file (the local time series, rotated to
+    <path>.1 at max_bytes) and pushed to activity/{userUid}/{deviceUid}.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import json
+import os
+import re
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class ActivityError(Exception):
+    """Raised when a frame cannot be analysed."""
+    pass
+
+class ActivityZoneError(ActivityError):
+    """Raised for a malformed ACTIVITY_ZONES spec."""
+    pass
+
+class ActivityWriteError(ActivityError):
+    """Raised when a summary cannot be written to the file or RTDB."""
+    pass
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+DEFAULT_FPS         = 1.0
+DEFAULT_WIDTH       = 160       # Analysis width in pixels
+DEFAULT_ZONES       = "all:0,0,1,1"
+DEFAULT_CPU_PERCENT = 2.0       # Of one core
+DEFAULT_MAX_BYTES   = 5 * 1024 * 1024
+DIFF_THRESHOLD      = 16.0      # Luma levels a pixel must change to count
+BACKGROUND_ALPHA    = 0.02      # Background update weight per sample
+PERIOD_SECONDS      = 60
+MOTION_COOLDOWN     = 300.0     # Seconds between motion-triggered clips
+_ZONE_NAME          = re.compile(r"^[A-Za-z0-9_-]+$")   # Usable as an RTDB key
+
+
+class Zone(NamedTuple):
+    name : str
+    x0   : float
+    y0   : float
+    x1   : float
+    y1   : float
+
+
+class ActivitySample(NamedTuple):
+    time      : float
+    activity  : Dict[str, float]
+    occupancy : Dict[str, float]
+    cpu_ms    : float
+
+
+def parse_zones(spec: str) -> List[Zone]:
+    """
+    Parse an ACTIVITY_ZONES spec ("feeder:0,0.5,0.4,1;water:0.6,0.5,1,1").
+    Empty = the whole frame.
+
+    Raises:
+        ActivityZoneError: Malformed zone, bad coordinates or duplicate name.
+    """
+    if not (spec or "").strip():
+        spec = DEFAULT_ZONES
+
+    zones = []
+    for token in spec.split(";"):
+        token = token.strip()
+        if not token:
+            continue
+        try:
+            name, box      = token.split(":")
+            x0, y0, x1, y1 = (float(v) for v in box.split(","))
+        except ValueError as e:
+            raise ActivityZoneError(
+                f"Bad activity zone '{token}' — expected name:x0,y0,x1,y1. Source: {__name__}"
+            ) from e
+        name = name.strip()
+        if not _ZONE_NAME.match(name) or not (0.0 <= x0 < x1 <= 1.0 and 0.0 <= y0 < y1 <= 1.0):
+            raise ActivityZoneError(
+                f"Activity zone '{token}' needs a name of letters, digits, _ or - and "
+                f"0 <= x0 < x1 <= 1, 0 <= y0 < y1 <= 1. "
+                f"Source: {__name__}"
+            )
+        if any(zone.name == name for zone in zones):
+            raise ActivityZoneError(f"Duplicate activity zone '{name}'. Source: {__name__}")
+        zones.append(Zone(name, x0, y0, x1, y1))
+
+    if not zones:
+        raise ActivityZoneError(f"Empty activity zone spec '{spec}'. Source: {__name__}")
+    return zones
+
+
+def zone_weights(zones: List[Zone], width: int, height: int) -> np.ndarray:
+    """(zones × pixels) float32 matrix; each row sums to 1 over its zone."""
+    weights = np.zeros((len(zones), height, width), dtype=np.float32)
+    for index, zone in enumerate(zones):
+        x0, x1 = int(zone.x0 * width),  max(int(zone.x0 * width) + 1,  round(zone.x1 * width))
+        y0, y1 = int(zone.y0 * height), max(int(zone.y0 * height) + 1, round(zone.y1 * height))
+        weights[index, y0:y1, x0:x1] = 1.0 / ((y1 - y0) * (x1 - x0))
+    return weights.reshape(len(zones), -1)
+
+
+# ─────────────────────────── MONITOR ─────────────────────────────────────────
+
+class ActivityMonitor:
+    """
+    Example:
+        monitor = ActivityMonitor(parse_zones("feeder:0,0.5,0.4,1"), path="logs/activity.jsonl",
+                                  ref=db.reference("activity/uid/dev"))
+        frame, captured, _ = frame_buffer.peek()
+        sample  = monitor.analyze(frame, "yuv420", captured)   # None for the first frame
+        summary = monitor.take_summary()                       # once per minute
+        if summary:
+            monitor.publish(summary)
+        sleep(monitor.interval)
+
+    analyze(), take_summary() and publish() belong to one thread; mark()
+    may be called from any thread.
+    """
+
+    def __init__(
+        self,
+        zones       : Optional[List[Zone]] = None,
+        fps         : float = DEFAULT_FPS,
+        width       : int = DEFAULT_WIDTH,
+        cpu_percent : float = DEFAULT_CPU_PERCENT,
+        ignore_rows : int = 0,
+        path        : Optional[str] = None,
+        ref         = None,
+        max_bytes   : int = DEFAULT_MAX_BYTES
+    ):
+        self.zones       = zones or parse_zones(DEFAULT_ZONES)
+        self.fps         = fps
+        self.width       = width
+        self.cpu_budget  = cpu_percent / 100.0
+        self.ignore_rows = ignore_rows
+        self.path        = path
+        self.ref         = ref
+        self.max_bytes   = max_bytes
+
+        self.interval    : float = 1.0 / fps
+        self.samples     : int = 0
+        self.throttled   : int = 0
+        self.published   : int = 0
+        self.last_summary: Optional[dict] = None
+        self.cpu_ms      : deque = deque(maxlen=120)
+
+        self._weights    : Optional[np.ndarray] = None
+        self._previous   : Optional[np.ndarray] = None
+        self._background : Optional[np.ndarray] = None
+        self._events     : list = []
+        self._reset_period(None)
+
+    # ── Analysis ──────────────────────────────────────────────────────────
+
+    def _thumbnail(self, frame: np.ndarray, pixel_format: str) -> np.ndarray:
+        if pixel_format == "yuv420":
+            luma = frame[self.ignore_rows:frame.shape[0] * 2 // 3]
+        elif pixel_format == "bgr":
+            luma = frame[self.ignore_rows:]
+        else:
+            raise ActivityError(f"Unsupported pixel format '{pixel_format}'. Source: {__name__}")
+        width  = min(self.width, luma.shape[1])
+        height = max(1, round(luma.shape[0] * width / luma.shape[1]))
+        small  = cv2.resize(luma, (width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = small.astype(np.float32)
+        small -= small.mean()
+        return small
+
+    def analyze(self, frame: np.ndarray, pixel_format: str, captured: float) -> Optional[ActivitySample]:
+        """
+        One sample from a ring frame (read once, by the downscale).
+        Returns None for the first frame (nothing to compare with) or after
+        a frame size change.
+
+        Raises:
+            ActivityError: Unsupported pixel format or analysis failure.
+        """
+        started = time.thread_time()
+        try:
+            current = self._thumbnail(frame, pixel_format)
+        except cv2.error as e:
+            raise ActivityError(f"Activity downscale failed: {e}. Source: {__name__}") from e
+
+        if self._previous is None or self._previous.shape != current.shape:
+            self._previous   = current
+            self._background = current.copy()
+            self._weights    = zone_weights(self.zones, current.shape[1], current.shape[0])
+            return None
+
+        changed = np.stack((
+            np.abs(current - self._previous)   > DIFF_THRESHOLD,
+            np.abs(current - self._background) > DIFF_THRESHOLD,
+        )).reshape(2, -1).astype(np.float32)
+        shares  = self._weights @ changed.T                 # (zones, [motion, foreground])
+        self._background += BACKGROUND_ALPHA * (current - self._background)
+        self._previous    = current
+
+        cpu = time.thread_time() - started
+        self._budget(cpu)
+        self._accumulate(captured, shares)
+        return ActivitySample(
+            time      = captured,
+            activity  = {zone.name: float(shares[i, 0]) for i, zone in enumerate(self.zones)},
+            occupancy = {zone.name: float(shares[i, 1]) for i, zone in enumerate(self.zones)},
+            cpu_ms    = cpu * 1000,
+        )
+
+    def _budget(self, cpu: float) -> None:
+        """Stretch the next gap so CPU per second of wall time stays within budget."""
+        self.cpu_ms.append(cpu * 1000)
+        self.interval = 1.0 / self.fps
+        if self.cpu_budget > 0 and cpu / self.cpu_budget > self.interval:
+            self.interval   = cpu / self.cpu_budget
+            self.throttled += 1
+            self._period_throttled += 1
+
+    # ── Minute summaries ──────────────────────────────────────────────────
+
+    def _reset_period(self, start: Optional[float]) -> None:
+        zones = len(self.zones)
+        self._period_start     = start
+        self._period_samples   = 0
+        self._period_sums      = np.zeros((zones, 2), dtype=np.float64)
+        self._period_peaks     = np.zeros(zones, dtype=np.float64)
+        self._period_cpu       = 0.0
+        self._period_throttled = 0
+
+    def _accumulate(self, captured: float, shares: np.ndarray) -> None:
+        if self._period_start is None:
+            self._period_start = captured - captured % PERIOD_SECONDS
+        self._period_samples += 1
+        self._period_sums    += shares
+        np.maximum(self._period_peaks, shares[:, 0], out=self._period_peaks)
+        self._period_cpu     += self.cpu_ms[-1]
+        self.samples         += 1
+
+    def mark(self, event: str) -> None:
+        """Note an event (e.g. "feed") in the current minute's summary."""
+        self._events.append(event)
+
+    def take_summary(self, now: Optional[float] = None) -> Optional[dict]:
+        """The finished minute's summary, once its minute is over (else None)."""
+        now = time.time() if now is None else now
+        if self._period_start is None or now < self._period_start + PERIOD_SECONDS:
+            return None
+        samples = self._period_samples
+        events, self._events = self._events, []
+        summary = {
+            "timestamp" : int(self._period_start * 1000),
+            "seconds"   : PERIOD_SECONDS,
+            "samples"   : samples,
+            "zones"     : {
+                zone.name: {
+                    "activity"  : round(float(self._period_sums[i, 0]) / samples, 4),
+                    "peak"      : round(float(self._period_peaks[i]), 4),
+                    "occupancy" : round(float(self._period_sums[i, 1]) / samples, 4),
+                }
+                for i, zone in enumerate(self.zones)
+            } if samples else {},
+            "events"    : sorted(set(events)),
+            "cpuMs"     : round(self._period_cpu / samples, 2) if samples else 0.0,
+            "throttled" : self._period_throttled,
+        }
+        self._reset_period(None)
+        self.last_summary = summary
+        return summary
+
+    def publish(self, summary: dict) -> None:
+        """
+        Append the summary to the file and push it to RTDB. Blocking.
+
+        Raises:
+            ActivityWriteError: The file and / or RTDB write failed (the
+                other target is still written).
+        """
+        errors = []
+        if self.path:
+            try:
+                self._append(summary)
+            except OSError as e:
+                errors.append(f"file {self.path}: {e}")
+        if self.ref is not None:
+            try:
+                self.ref.push(summary)
+            except Exception as e:
+                errors.append(f"RTDB: {e}")
+        if errors:
+            raise ActivityWriteError(f"Activity summary write failed: {'; '.join(errors)}. Source: {__name__}")
+        self.published += 1
+
+    def _append(self, summary: dict) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary, separators=(",", ":")) + "\n")
+
+    def __repr__(self) -> str:
+        return f"ActivityMonitor(zones={[zone.name for zone in self.zones]}, samples={self.samples})"
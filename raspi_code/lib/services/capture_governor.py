@@ -0,0 +1,232 @@
+"""
+Capture Governor Module
+Path: lib/services/capture_governor.py
+
+Viewer-aware capture policy for process_a.
+
+Why:
+    Without a viewer the capture loop still grabbed, resized and buffered
+    frames at up to ~100 Hz all day. Nobody watches most of the time, so
+    almost all of that CPU (and camera/ISP power) was wasted.
+
+States:
+    active — a viewer is connected or was asked for recently; capture at
+             full rate.
+    idle   — no viewer for idle_after seconds. What happens depends on mode:
+
+Modes (CAMERA_IDLE_MODE):
+    off        — never idle (old behaviour).
+    keepalive  — keep the camera running but grab only one frame every
+                 keepalive_interval seconds, so a viewer that connects
+                 still gets a recent picture immediately.
+    stop       — stop the camera entirely (camera_controller.pause_camera).
+                 Lowest draw, but the sensor must restart on wake.
+
+Waking:
+    demand() is called as soon as an offer arrives — before ICE and the
+    answer — so the camera warms up while the connection is negotiated.
+    The time from demand() to the first captured frame is recorded as
+    time-to-first-frame (TTFF).
+
+    request_frame() asks for ONE frame without waking (snapshots): the next
+    should_capture() is True even while idle — in "stop" mode the camera
+    runs just for that frame — and the state, wake-ups and TTFF are left
+    alone.
+
+Background capture:
+    background_interval > 0 keeps a floor under the idle capture rate for
+    consumers that never sleep (the clip recorder's pre-roll ring): while
+    idle a frame is due every background_interval seconds (or keep-alive,
+    if that is shorter), and "stop" mode keeps the camera running. The
+    state still goes idle, so viewer wake-ups and TTFF are unchanged.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class CaptureGovernorError(Exception):
+    """Raised when the governor is configured with invalid values."""
+    pass
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+IDLE_MODES          = ("off", "keepalive", "stop")
+DEFAULT_IDLE_MODE   = "keepalive"
+DEFAULT_IDLE_AFTER  = 30.0    # Seconds without a viewer before going idle
+DEFAULT_KEEPALIVE   = 5.0     # Seconds between keep-alive frames
+IDLE_POLL_SECONDS   = 1.0     # Longest idle sleep between state checks
+
+ACTIVE = "active"
+IDLE   = "idle"
+
+
+# ─────────────────────────── GOVERNOR ────────────────────────────────────────
+
+class CaptureGovernor:
+    """
+    Decides when process_a should capture.
+
+    Example:
+        governor = CaptureGovernor(mode="stop")
+        while running:
+            governor.update(viewer_connected=live_status.is_set())
+            if not governor.should_capture():
+                sleep(governor.idle_wait())
+                continue
+            frame = capture.capture_array()
+            ttff  = governor.frame_captured()   # float once per wake-up
+    """
+
+    def __init__(
+        self,
+        mode                : str   = DEFAULT_IDLE_MODE,
+        idle_after          : float = DEFAULT_IDLE_AFTER,
+        keepalive_interval  : float = DEFAULT_KEEPALIVE,
+        background_interval : float = 0.0,
+    ):
+        if mode not in IDLE_MODES:
+            raise CaptureGovernorError(
+                f"Unknown idle mode '{mode}'. Valid: {', '.join(IDLE_MODES)}. Source: {__name__}"
+            )
+        if idle_after <= 0 or keepalive_interval <= 0:
+            raise CaptureGovernorError(
+                f"idle_after and keepalive_interval must be > 0. Source: {__name__}"
+            )
+        if background_interval < 0:
+            raise CaptureGovernorError(f"background_interval must be >= 0. Source: {__name__}")
+
+        now                      = time.monotonic()
+        self.mode                = mode
+        self.idle_after          = idle_after
+        self.keepalive_interval  = keepalive_interval
+        self.background_interval = background_interval
+        self.state               = ACTIVE
+
+        self._last_demand  = now
+        self._last_capture = 0.0
+        self._idle_since   : Optional[float] = None
+        self._wake_at      : Optional[float] = None
+        self._frame_wanted : bool = False
+
+        self.wakeups      = 0
+        self.last_ttff    : Optional[float] = None
+        self._idle_total  = 0.0
+
+        # demand() runs on the event loop, everything else on the capture thread
+        self._lock = threading.RLock()
+
+    # ── Inputs ────────────────────────────────────────────────────────────
+
+    def demand(self, now: Optional[float] = None) -> None:
+        """A viewer wants video (offer received). Wakes the governor if idle."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_demand = now
+            if self.state == IDLE:
+                self.state        = ACTIVE
+                self.wakeups     += 1
+                self._idle_total += now - self._idle_since
+                self._idle_since  = None
+                self._wake_at     = now
+
+    def request_frame(self) -> None:
+        """One frame is wanted (snapshot) — captured even while idle."""
+        with self._lock:
+            self._frame_wanted = True
+
+    def update(self, viewer_connected: bool, now: Optional[float] = None) -> bool:
+        """
+        Refresh the state from the viewer flag.
+
+        Returns:
+            True if the state changed on this call.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if viewer_connected:
+                was_idle = self.state == IDLE
+                self.demand(now)
+                return was_idle
+
+            if (
+                self.mode != "off" and
+                self.state == ACTIVE and
+                now - self._last_demand >= self.idle_after
+            ):
+                self.state       = IDLE
+                self._idle_since = now
+                self._wake_at    = None
+                return True
+            return False
+
+    def frame_captured(self, now: Optional[float] = None) -> Optional[float]:
+        """
+        Record a captured frame.
+
+        Returns:
+            Time-to-first-frame in seconds if this is the first frame after a
+            wake-up, otherwise None.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_capture = now
+            self._frame_wanted = False
+            if self._wake_at is None or self.state != ACTIVE:
+                return None
+            self.last_ttff = now - self._wake_at
+            self._wake_at  = None
+            return self.last_ttff
+
+    # ── Decisions ─────────────────────────────────────────────────────────
+
+    @property
+    def camera_should_run(self) -> bool:
+        """False only while idle in "stop" mode with no frame requested or background capture."""
+        return not (
+            self.state == IDLE and self.mode == "stop" and
+            not self._frame_wanted and not self.background_interval
+        )
+
+    def _idle_interval(self) -> Optional[float]:
+        """Seconds between idle frames (keep-alive / background), None = no idle frames."""
+        intervals = [self.background_interval] if self.background_interval > 0 else []
+        if self.mode == "keepalive":
+            intervals.append(self.keepalive_interval)
+        return min(intervals) if intervals else None
+
+    def should_capture(self, now: Optional[float] = None) -> bool:
+        if self.state == ACTIVE or self._frame_wanted:
+            return True
+        interval = self._idle_interval()
+        if interval is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self._last_capture >= interval
+
+    def idle_wait(self, now: Optional[float] = None) -> float:
+        """Seconds the caller may sleep before checking again (cut short by demand)."""
+        interval = self._idle_interval()
+        if interval is None:
+            return IDLE_POLL_SECONDS
+        now = time.monotonic() if now is None else now
+        due = self._last_capture + interval - now
+        return min(max(due, 0.0), IDLE_POLL_SECONDS)
+
+    def idle_seconds(self, now: Optional[float] = None) -> float:
+        """Total time spent idle so far, including the current idle period."""
+        now = time.monotonic() if now is None else now
+        if self._idle_since is None:
+            return self._idle_total
+        return self._idle_total + (now - self._idle_since)
+
+    def __repr__(self) -> str:
+        return f"CaptureGovernor(mode={self.mode}, state={self.state})"
@@ -0,0 +1,479 @@
+"""
+Clip Recorder Module
+Path: lib/services/clip_recorder.py
+
+Event clips: the seconds before and after a feed dispense, a water refill
+or motion, written to disk as MP4 without re-encoding.
+
+Why:
+    process_a only kept the latest few frames in the SharedFrameBuffer, so
+    when something happened in the coop — a dispense that jammed, a refill
+    nobody saw — there was nothing to look back at. Recording everything
+    would fill the SD card; recording only after the event misses the
+    lead-up.
+
+Pipeline:
+    1. encode() — called by process_a's "clip" thread at CLIP_FPS with a
+       ring frame: downscaled to width (swscale) and encoded with a
+       dedicated H.264 encoder (ENCODERS, first that opens — the Pi's
+       hardware encoder, else libx264 ultrafast / zerolatency) at kbps,
+       a keyframe every KEYFRAME_SECONDS. The WebRTC encoders cannot be
+       reused: there is one per viewer, none without a viewer, and their
+       output is already RTP-packetized.
+    2. PacketRing — encoded packets grouped by GOP (keyframe onwards),
+       bounded by max_bytes (CLIP_RING_MB) and by age: the oldest GOP goes
+       once the next one still covers pre_roll. A clip can therefore start
+       up to one GOP before the requested pre-roll. Memory ≈ kbps / 8 ×
+       (pre_roll + KEYFRAME_SECONDS) — ~1 MB at the defaults; the cap only
+       bites on scenes busy enough to overshoot the bitrate a lot.
+    3. trigger(reason) — takes the ring from the last keyframe at or before
+       now − pre_roll, then keeps appending new packets until now +
+       post_roll. A trigger while a clip is open extends it (capped at
+       MAX_CLIP_SECONDS) instead of starting an overlapping one.
+    4. Muxer thread — the finished packet list is stream-copied into an
+       MP4 (SPS / PPS are in-band, the muxer builds avcC from them),
+       written as .part and renamed, so a half-written clip never looks
+       complete. Only the newest `keep` clips are kept. Each result —
+       success or ClipWriteError — is passed to on_clip.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process (on_clip results
+    included; the callback runs on the muxer thread).
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from fractions import Fraction
+from typing import Callable, List, NamedTuple, Optional
+
+import av
+import numpy as np
+from av import VideoFrame
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class ClipRecorderError(Exception):
+    """Raised when a frame cannot be converted or encoded."""
+    pass
+
+class ClipEncoderError(ClipRecorderError):
+    """Raised when no H.264 encoder can be opened."""
+    pass
+
+class ClipWriteError(ClipRecorderError):
+    """Raised (and reported through on_clip) when a clip cannot be written."""
+    pass
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+ENCODERS          = ("h264_v4l2m2m", "libx264")   # Tried in order
+ENCODER_OPTIONS   = {"libx264": {"preset": "ultrafast", "tune": "zerolatency"}}
+DEFAULT_DIR       = "clips"
+DEFAULT_PRE_ROLL  = 10.0      # Seconds kept before a trigger
+DEFAULT_POST_ROLL = 20.0      # Seconds recorded after the (last) trigger
+DEFAULT_RING_MB   = 8.0       # Encoded ring memory cap
+DEFAULT_FPS       = 10
+DEFAULT_WIDTH     = 640
+DEFAULT_KBPS      = 600
+DEFAULT_KEEP      = 50        # Newest clips kept on disk
+KEYFRAME_SECONDS  = 2.0       # GOP length — pre-roll granularity
+MAX_CLIP_SECONDS  = 120.0     # Longest clip, however often it is extended
+MUX_QUEUE_SIZE    = 4         # Finished clips waiting for the muxer
+MUX_JOIN_TIMEOUT  = 5.0
+
+TIME_BASE      = Fraction(1, 1000)    # Packet pts / dts in ms
+NAL_SPS        = 7
+NAL_PPS        = 8
+_REASON_CHARS  = re.compile(r"[^a-z0-9_-]+")
+
+
+class EncodedPacket(NamedTuple):
+    data     : bytes
+    pts      : int        # ms, TIME_BASE
+    dts      : int
+    keyframe : bool
+    wall     : float      # Capture time (time.time()) of the frame
+
+
+class ClipResult(NamedTuple):
+    path    : Optional[str]
+    reason  : str
+    seconds : float
+    bytes   : int
+    frames  : int
+    write_ms: float
+    error   : Optional[ClipWriteError]
+
+
+# ─────────────────────────── H.264 HELPERS ───────────────────────────────────
+
+def _nal_units(data: bytes) -> List[bytes]:
+    """Annex B NAL units (start codes stripped)."""
+    units = []
+    for chunk in re.split(b"\x00\x00\x01", data):
+        chunk = chunk.rstrip(b"\x00")
+        if chunk:
+            units.append(chunk)
+    return units
+
+
+def parameter_sets(data: bytes) -> bytes:
+    """SPS + PPS of an Annex B access unit, start codes included (b"" if none)."""
+    return b"".join(
+        b"\x00\x00\x00\x01" + unit for unit in _nal_units(data)
+        if unit[0] & 0x1F in (NAL_SPS, NAL_PPS)
+    )
+
+
+def _safe_reason(reason: str) -> str:
+    return _REASON_CHARS.sub("-", reason.lower()).strip("-") or "event"
+
+
+# ─────────────────────────── PACKET RING ─────────────────────────────────────
+
+class PacketRing:
+    """
+    Encoded packets grouped by GOP, oldest GOP dropped first.
+
+    Example:
+        ring = PacketRing(max_bytes=8_000_000, max_age=10.0)
+        ring.append(packet)                  # starts a GOP on a keyframe
+        packets = ring.since(time.time() - 10.0)
+
+    Not thread-safe — ClipRecorder serialises access.
+    """
+
+    def __init__(self, max_bytes: int, max_age: float):
+        self.max_bytes = max_bytes
+        self.max_age   = max_age
+        self.bytes     = 0
+        self.trimmed   = 0          # GOPs dropped for memory, not age
+        self._gops     : deque = deque()
+
+    def append(self, packet: EncodedPacket) -> None:
+        if packet.keyframe or not self._gops:
+            if not packet.keyframe:
+                return              # Never start the ring mid-GOP
+            self._gops.append([])
+        self._gops[-1].append(packet)
+        self.bytes += len(packet.data)
+        self._trim(packet.wall)
+
+    def _trim(self, now: float) -> None:
+        while len(self._gops) > 1:
+            if self.bytes > self.max_bytes:
+                self.trimmed += 1
+            elif self._gops[1][0].wall > now - self.max_age:
+                return              # The next GOP alone would not cover max_age
+            self.bytes -= sum(len(packet.data) for packet in self._gops.popleft())
+
+    def since(self, wall: float) -> List[EncodedPacket]:
+        """Packets from the last keyframe at or before wall (or the oldest one)."""
+        start = 0
+        for index, gop in enumerate(self._gops):
+            if gop[0].wall <= wall:
+                start = index
+        return [packet for gop in list(self._gops)[start:] for packet in gop]
+
+    @property
+    def seconds(self) -> float:
+        if not self._gops:
+            return 0.0
+        return self._gops[-1][-1].wall - self._gops[0][0].wall
+
+    def clear(self) -> None:
+        self._gops.clear()
+        self.bytes = 0
+
+
+# ─────────────────────────── RECORDER ────────────────────────────────────────
+
+class _Clip:
+    def __init__(self, reason: str, started: float, ends: float, packets: List[EncodedPacket]):
+        self.reasons = [reason]
+        self.started = started
+        self.ends    = ends
+        self.packets = packets
+
+
+class ClipRecorder:
+    """
+    Example:
+        recorder = ClipRecorder("clips", on_clip=report)
+        recorder.open(1280, 720)                       # ClipEncoderError if no H.264
+        recorder.encode(frame, "yuv420", captured)     # clip thread, CLIP_FPS
+        recorder.finish_due()                          # same thread, every tick
+        recorder.trigger("feed")                       # any thread
+        recorder.close()
+
+    encode() / finish_due() belong to one thread; trigger() may be called
+    from any thread.
+    """
+
+    def __init__(
+        self,
+        directory : str = DEFAULT_DIR,
+        width     : int = DEFAULT_WIDTH,
+        fps       : int = DEFAULT_FPS,
+        kbps      : int = DEFAULT_KBPS,
+        pre_roll  : float = DEFAULT_PRE_ROLL,
+        post_roll : float = DEFAULT_POST_ROLL,
+        ring_mb   : float = DEFAULT_RING_MB,
+        keep      : int = DEFAULT_KEEP,
+        on_clip   : Optional[Callable[[ClipResult], None]] = None
+    ):
+        self.directory = directory
+        self.width     = width - width % 2
+        self.fps       = fps
+        self.kbps      = kbps
+        self.pre_roll  = pre_roll
+        self.post_roll = post_roll
+        self.keep      = keep
+        self.on_clip   = on_clip
+        self.ring      = PacketRing(int(ring_mb * 1e6), pre_roll)
+
+        self.encoder_name : Optional[str] = None
+        self.written      : int = 0
+        self.failed       : int = 0
+        self.last_path    : Optional[str] = None
+        self.encode_ms    : deque = deque(maxlen=600)
+
+        self._context     = None
+        self._size        : Optional[tuple] = None   # Source (width, height) the encoder was opened for
+        self._headers     = b""                      # Latest SPS + PPS
+        self._last_pts    = -1
+        self._clip        : Optional[_Clip] = None
+        self._lock        = threading.Lock()
+        self._mux_queue   : queue.Queue = queue.Queue(maxsize=MUX_QUEUE_SIZE)
+        self._muxer       = threading.Thread(target=self._mux_loop, name="clip-muxer", daemon=True)
+        self._muxer.start()
+
+    # ── Encoder ───────────────────────────────────────────────────────────
+
+    def open(self, source_width: int, source_height: int) -> str:
+        """
+        Open the first working encoder from ENCODERS for frames of the
+        source size (downscaled to width). encode() reopens it if the ring
+        frame size changes or an encode failed.
+
+        Raises:
+            ClipEncoderError: None of ENCODERS can be opened.
+        """
+        width  = min(self.width, source_width - source_width % 2)
+        height = max(2, round(source_height * width / source_width) // 2 * 2)
+
+        errors = []
+        for name in ENCODERS:
+            try:
+                context             = av.CodecContext.create(name, "w")
+                context.width       = width
+                context.height      = height
+                context.pix_fmt     = "yuv420p"
+                context.time_base   = TIME_BASE
+                context.framerate   = Fraction(self.fps, 1)
+                context.bit_rate    = self.kbps * 1000
+                context.gop_size    = max(1, round(self.fps * KEYFRAME_SECONDS))
+                context.max_b_frames = 0
+                context.options     = ENCODER_OPTIONS.get(name, {})
+                context.open()
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                continue
+            self._context, self.encoder_name = context, name
+            self._size = (source_width, source_height)
+            return name
+        self._context, self.encoder_name = None, None
+        raise ClipEncoderError(f"No H.264 encoder for clips ({'; '.join(errors)}). Source: {__name__}")
+
+    def encode(self, frame: np.ndarray, pixel_format: str, captured: float) -> None:
+        """
+        Encode one ring frame into the packet ring (and the open clip).
+        The frame is copied into an AVFrame straight away.
+
+        Raises:
+            ClipEncoderError: No encoder could be opened.
+            ClipRecorderError: Conversion or encoding failed (the encoder is
+                reopened on the next frame).
+        """
+        if pixel_format == "yuv420":
+            size, format = (frame.shape[1], frame.shape[0] * 2 // 3), "yuv420p"
+        elif pixel_format == "bgr":
+            size, format = (frame.shape[1], frame.shape[0]), "bgr24"
+        else:
+            raise ClipRecorderError(f"Unsupported pixel format '{pixel_format}'. Source: {__name__}")
+        if self._context is None or self._size != size:
+            self.open(*size)
+
+        started = time.perf_counter()
+        try:
+            video = VideoFrame.from_ndarray(frame, format=format)
+            if (video.width, video.height) != (self._context.width, self._context.height) or format != "yuv420p":
+                video = video.reformat(self._context.width, self._context.height, format="yuv420p")
+            # Capture time as pts — the frame rate is whatever the ring delivered
+            self._last_pts  = max(self._last_pts + 1, int(captured * 1000))
+            video.pts       = self._last_pts
+            video.time_base = TIME_BASE
+            encoded = self._context.encode(video)
+        except Exception as e:
+            self._context = None
+            raise ClipRecorderError(f"Clip encode failed: {e}. Source: {__name__}") from e
+        self.encode_ms.append((time.perf_counter() - started) * 1000)
+
+        with self._lock:
+            for packet in encoded:
+                data = bytes(packet)
+                if packet.is_keyframe:
+                    self._headers = parameter_sets(data) or self._headers
+                pts  = packet.pts if packet.pts is not None else video.pts
+                dts  = packet.dts if packet.dts is not None else pts
+                item = EncodedPacket(data, pts, dts, packet.is_keyframe, captured)
+                self.ring.append(item)
+                if self._clip is not None:
+                    self._clip.packets.append(item)
+
+    # ── Clips ─────────────────────────────────────────────────────────────
+
+    def trigger(self, reason: str, now: Optional[float] = None) -> bool:
+        """
+        Start a clip (pre-roll from the ring) or extend the open one.
+
+        Returns:
+            True if a new clip was started, False if the open one was extended.
+        """
+        now    = time.time() if now is None else now
+        reason = _safe_reason(reason)
+        with self._lock:
+            if self._clip is not None:
+                self._clip.ends = min(now + self.post_roll, self._clip.started + MAX_CLIP_SECONDS)
+                if reason not in self._clip.reasons:
+                    self._clip.reasons.append(reason)
+                return False
+            packets    = self.ring.since(now - self.pre_roll)
+            self._clip = _Clip(reason, packets[0].wall if packets else now, now + self.post_roll, packets)
+            return True
+
+    @property
+    def recording(self) -> bool:
+        return self._clip is not None
+
+    def finish_due(self, now: Optional[float] = None, force: bool = False) -> bool:
+        """
+        Hand the open clip to the muxer once its post-roll is over (or now,
+        if force). Returns True if a clip was handed over.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            clip = self._clip
+            if clip is None or (now < clip.ends and not force):
+                return False
+            self._clip = None
+            headers    = self._headers
+        size = (self._context.width, self._context.height) if self._context is not None else None
+        try:
+            self._mux_queue.put_nowait((clip, headers, size))
+        except queue.Full:
+            self._report(ClipResult(
+                None, "+".join(clip.reasons), 0.0, 0, len(clip.packets), 0.0,
+                ClipWriteError(f"Clip dropped: {MUX_QUEUE_SIZE} clips already waiting. Source: {__name__}"),
+            ))
+        return True
+
+    def close(self, timeout: float = MUX_JOIN_TIMEOUT) -> None:
+        """Write the open clip (as far as it got) and stop the muxer."""
+        self.finish_due(force=True)
+        try:
+            self._mux_queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._muxer.join(timeout)
+
+    # ── Muxer thread ──────────────────────────────────────────────────────
+
+    def _mux_loop(self) -> None:
+        while True:
+            item = self._mux_queue.get()
+            if item is None:
+                return
+            clip, headers, size = item
+            reason  = "+".join(clip.reasons)
+            started = time.perf_counter()
+            try:
+                path, nbytes = self._write(clip, reason, headers, size)
+            except ClipWriteError as e:
+                self.failed += 1
+                self._report(ClipResult(None, reason, 0.0, 0, len(clip.packets), 0.0, e))
+                continue
+            self.written  += 1
+            self.last_path = path
+            seconds = (clip.packets[-1].pts - clip.packets[0].pts) / 1000 if clip.packets else 0.0
+            self._prune()
+            self._report(ClipResult(
+                path, reason, seconds, nbytes, len(clip.packets),
+                (time.perf_counter() - started) * 1000, None,
+            ))
+
+    def _write(self, clip: _Clip, reason: str, headers: bytes, size: Optional[tuple]) -> tuple:
+        """
+        Raises:
+            ClipWriteError: Nothing to write, or the MP4 could not be written.
+        """
+        packets = clip.packets
+        if not packets or size is None:
+            raise ClipWriteError(f"Clip '{reason}' has no frames. Source: {__name__}")
+
+        name = time.strftime("%Y%m%d-%H%M%S", time.localtime(clip.started)) + f"_{reason}.mp4"
+        path = os.path.join(self.directory, name)
+        tmp  = path + ".part"
+        first = packets[0]
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with av.open(tmp, "w", format="mp4", options={"movflags": "+faststart"}) as output:
+                stream           = output.add_stream("h264", rate=self.fps)
+                stream.width, stream.height = size
+                stream.pix_fmt   = "yuv420p"
+                stream.time_base = TIME_BASE
+                for index, item in enumerate(packets):
+                    data = item.data
+                    if index == 0 and not parameter_sets(data):
+                        data = headers + data   # Encoders that send SPS / PPS only once
+                    packet           = av.Packet(data)
+                    packet.pts       = item.pts - first.pts
+                    packet.dts       = item.dts - first.dts
+                    packet.time_base = TIME_BASE
+                    packet.stream    = stream
+                    packet.is_keyframe = item.keyframe
+                    output.mux(packet)
+            os.replace(tmp, path)
+            return path, os.path.getsize(path)
+        except Exception as e:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise ClipWriteError(f"Could not write clip {path}: {e}. Source: {__name__}") from e
+
+    def _prune(self) -> None:
+        """Delete all but the newest `keep` clips. Best effort — retried after the next clip."""
+        if self.keep <= 0:
+            return
+        try:
+            clips = sorted(name for name in os.listdir(self.directory) if name.endswith(".mp4"))
+            for name in clips[:-self.keep]:
+                os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _report(self, result: ClipResult) -> None:
+        if self.on_clip is not None:
+            self.on_clip(result)
+
+    def __repr__(self) -> str:
+        return (f"ClipRecorder(encoder={self.encoder_name}, ring={self.ring.seconds:.1f}s/"
+                f"{self.ring.bytes / 1e6:.1f}MB, written={self.written})")
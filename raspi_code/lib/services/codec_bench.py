@@ -0,0 +1,254 @@
+"""
+Codec Bench Module
+Path: lib/services/codec_bench.py
+
+On-device encode benchmark that decides which video codec the WebRTC
+answer should prefer.
+
+Why:
+    aiortc answers with the codecs in the order the phone offered them, so
+    the Pi encodes with whatever the phone lists first — usually VP8, on
+    some phones H.264. Both are software encoders here (libvpx / libx264)
+    and which one is cheaper depends on the board and the frame size. Every
+    viewer has its own encoder, so the cheaper one is also what decides how
+    many viewers fit.
+
+Method:
+    run_benchmark() encodes FRAMES synthetic frames (moving noise, so the
+    encoder cannot coast on a static image) with every aiortc video codec
+    at every size given — normally each ABR rung — after WARMUP_FRAMES
+    discarded frames, and reports mean / p95 encode time per frame.
+    rank_codecs() orders the codecs: the ones whose mean encode time at the
+    top rung fits the frame budget (ENCODE_BUDGET × 1000 / fps ms, the same
+    budget ABRController uses) first, then the rest. Within each group the
+    cheapest first, by encode time summed over all sizes — ABR spends much
+    of a session on the lower rungs, where the ranking can differ from
+    the top one.
+
+Cache:
+    Results are stored as JSON (WEBRTC_CODEC_CACHE) under a fingerprint of
+    the board (CPU model, machine), the av / aiortc versions and the
+    benchmarked sizes and fps. A matching entry skips the benchmark on the
+    next boot; any change re-runs it.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import hashlib
+import json
+import os
+import platform
+import time
+from fractions import Fraction
+from typing import List, NamedTuple, Optional, Tuple
+
+import av
+import aiortc
+import numpy as np
+from av import VideoFrame
+from aiortc import RTCRtpSender
+from aiortc.codecs import CODECS, get_encoder
+
+from lib.services.abr_controller import ENCODE_BUDGET
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class CodecBenchError(Exception):
+    """Base exception for codec benchmark errors."""
+    pass
+
+class CodecBenchCacheError(CodecBenchError):
+    """Raised when the benchmark cache cannot be written."""
+    pass
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+CODEC_MODES        = ("auto", "vp8", "h264", "off")
+DEFAULT_CODEC_MODE = "auto"
+MIME_TYPES         = {"vp8": "video/VP8", "h264": "video/H264"}
+DEFAULT_CACHE_PATH = "logs/codec_bench.json"
+
+FRAMES        = 30     # Measured frames per codec and size
+WARMUP_FRAMES = 5      # Discarded — the first frames include encoder setup
+CACHE_VERSION = 1
+
+
+class BenchResult(NamedTuple):
+    mime    : str
+    width   : int
+    height  : int
+    mean_ms : float
+    p95_ms  : float
+
+    def __str__(self) -> str:
+        return f"{self.mime.split('/')[-1]} {self.width}x{self.height} {self.mean_ms:.1f}ms"
+
+
+# ─────────────────────────── BENCHMARK ───────────────────────────────────────
+
+def available_codecs() -> List[str]:
+    """aiortc's video codecs (mime types), RTX excluded."""
+    mimes = []
+    for codec in CODECS["video"]:
+        if codec.mimeType.lower() != "video/rtx" and codec.mimeType not in mimes:
+            mimes.append(codec.mimeType)
+    return mimes
+
+
+def synthetic_frames(width: int, height: int, count: int) -> List[VideoFrame]:
+    """I420 frames of random texture panning across the image."""
+    rng   = np.random.default_rng(0)
+    plane = rng.integers(0, 256, (height * 3 // 2, width), dtype=np.uint8)
+    frames = []
+    for index in range(count):
+        frame           = VideoFrame.from_ndarray(np.roll(plane, index * 4, axis=1), format="yuv420p")
+        frame.pts       = index * 3000
+        frame.time_base = Fraction(1, 90000)
+        frames.append(frame)
+    return frames
+
+
+def benchmark_codec(mime: str, width: int, height: int, kbps: int, frames: int = FRAMES) -> BenchResult:
+    """
+    Encode synthetic frames with one codec at one size.
+
+    Raises:
+        CodecBenchError: The encoder could not be created or failed.
+    """
+    params = next((codec for codec in CODECS["video"] if codec.mimeType == mime), None)
+    if params is None:
+        raise CodecBenchError(f"aiortc has no {mime} encoder. Source: {__name__}")
+    try:
+        encoder = get_encoder(params)
+        encoder.target_bitrate = kbps * 1000
+        timings = []
+        for index, frame in enumerate(synthetic_frames(width, height, WARMUP_FRAMES + frames)):
+            started = time.perf_counter()
+            encoder.encode(frame)
+            if index >= WARMUP_FRAMES:
+                timings.append(time.perf_counter() - started)
+    except Exception as e:
+        raise CodecBenchError(
+            f"{mime} encode at {width}x{height} failed: {e}. Source: {__name__}"
+        ) from e
+
+    timings.sort()
+    return BenchResult(
+        mime    = mime,
+        width   = width,
+        height  = height,
+        mean_ms = sum(timings) / len(timings) * 1000,
+        p95_ms  = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+    )
+
+
+def run_benchmark(sizes: List[Tuple[int, int, int]], frames: int = FRAMES) -> List[BenchResult]:
+    """
+    Benchmark every available codec at every (width, height, kbps) size.
+    Blocking and CPU heavy — run it in an executor.
+
+    Raises:
+        CodecBenchError: No codec could encode at all.
+    """
+    results, errors = [], []
+    for mime in available_codecs():
+        for width, height, kbps in sizes:
+            try:
+                results.append(benchmark_codec(mime, width, height, kbps, frames))
+            except CodecBenchError as e:
+                errors.append(str(e))
+                break       # Broken encoder — skip its other sizes
+    if not results:
+        raise CodecBenchError(f"No codec could be benchmarked: {'; '.join(errors)}. Source: {__name__}")
+    return results
+
+
+def rank_codecs(results: List[BenchResult], width: int, height: int, fps: int) -> List[str]:
+    """
+    Codec mime types, preferred first: those that encode a width × height
+    frame within the frame budget, then the rest; cheapest (summed over
+    all sizes) first within each.
+    """
+    budget_ms = ENCODE_BUDGET * 1000.0 / max(fps, 1)
+    total, fits = {}, {}
+    for r in results:
+        total[r.mime] = total.get(r.mime, 0.0) + r.mean_ms
+        if (r.width, r.height) == (width, height):
+            fits[r.mime] = r.mean_ms <= budget_ms
+    return sorted(total, key=lambda mime: (not fits.get(mime, False), total[mime]))
+
+
+def codec_preferences(ranking: List[str]) -> list:
+    """
+    RTCRtpCodecCapability list for RTCRtpTransceiver.setCodecPreferences():
+    every capability aiortc has (aiortc drops codecs missing from the list),
+    ordered by ranking; RTX entries are kept so retransmission stays on.
+    """
+    order = {mime.lower(): index for index, mime in enumerate(ranking)}
+    capabilities = RTCRtpSender.getCapabilities("video").codecs
+    return sorted(capabilities, key=lambda codec: order.get(codec.mimeType.lower(), len(order)))
+
+
+# ─────────────────────────── CACHE ───────────────────────────────────────────
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key.strip() in ("Model", "model name", "Hardware"):
+                    return value.strip()
+    except OSError:
+        pass
+    return platform.processor() or "unknown"
+
+
+def fingerprint(sizes: List[Tuple[int, int, int]], fps: int) -> str:
+    """Cache key — changes with the board, the encoder libraries or the sizes."""
+    identity = json.dumps({
+        "version" : CACHE_VERSION,
+        "cpu"     : _cpu_model(),
+        "machine" : platform.machine(),
+        "av"      : av.__version__,
+        "aiortc"  : aiortc.__version__,
+        "sizes"   : [list(size) for size in sizes],
+        "fps"     : fps,
+    }, sort_keys=True)
+    return hashlib.sha1(identity.encode()).hexdigest()[:16]
+
+
+def load_cache(path: str, key: str) -> Optional[Tuple[List[BenchResult], List[str]]]:
+    """(results, ranking) stored under key, or None if missing / stale / unreadable."""
+    try:
+        with open(path, "r") as f:
+            cached = json.load(f)
+        if cached.get("key") != key:
+            return None
+        results = [BenchResult(*result) for result in cached["results"]]
+        return results, list(cached["ranking"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_cache(path: str, key: str, results: List[BenchResult], ranking: List[str]) -> None:
+    """
+    Raises:
+        CodecBenchCacheError: If the file cannot be written.
+    """
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                "key"     : key,
+                "created" : int(time.time()),
+                "results" : [list(result) for result in results],
+                "ranking" : ranking,
+            }, f, indent=2)
+    except OSError as e:
+        raise CodecBenchCacheError(
+            f"Could not write codec benchmark cache {path}: {e}. Source: {__name__}"
+        ) from e
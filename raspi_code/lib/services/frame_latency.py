@@ -0,0 +1,229 @@
+"""
+Frame Latency Module
+Path: lib/services/frame_latency.py
+
+Per-stage timing of every video frame from the camera to the encoder
+output, and an optional timestamp overlay for glass-to-glass measurement.
+
+Why:
+    Nothing said how old a frame is when it leaves the Pi. Capture, the
+    SharedFrameBuffer handoff, recv() pacing, downscale / conversion and
+    encode each add latency, and a viewer only sees the sum.
+
+Stages (seconds, one sample per frame — per frame and viewer from queue on):
+    capture — capture_array() call (process_a capture thread)
+    write   — resize / copy into the ring slot, overlay included
+    ring    — published → pulled by CameraVideoTrack.recv() (includes the
+              recv() pacing wait for a frame that was already there)
+    convert — recv(): downscale + VideoFrame.from_ndarray()
+    queue   — recv() returned → encoder started (MediaRelay + sender task)
+    encode  — encoder.encode() (aiortc runs it in an executor)
+    total   — capture_array() returned → encoded, i.e. the frame's age when
+              its RTP packets go out
+    glass   — end to end, reported by the app (see below)
+
+    The track stamps each frame by pts (stamp()); the encoder wrapper in
+    webrtc_peer looks the pts up again (encoded()). FrameTracer keeps the
+    last `capacity` samples per stage; snapshot() gives p50 / p95 / p99 /
+    max in milliseconds.
+
+Overlay (draw_overlay / read_overlay):
+    A 2 × 24 block code in the top-left corner of the frame, luma only:
+    40 bits of the capture time in Unix ms (mod 2^40) followed by an 8-bit
+    checksum (XOR of the five timestamp bytes), MSB first, row by row,
+    white = 1. Blocks are width / 80 pixels (at least 4), large enough to
+    survive the lower ABR rungs and the encoder. The local capture time is
+    printed as text beside it for filming both screens. The app decodes
+    the code of the displayed frame, subtracts it from its own clock
+    (both NTP-synced), and sends the result back on the live-view data
+    channel as {"type": "latency", "ms": ...} (lib/services/live_control).
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class FrameLatencyError(Exception):
+    """Raised for an unknown stage or pixel format."""
+    pass
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+STAGES           = ("capture", "write", "ring", "convert", "queue", "encode", "total", "glass")
+DEFAULT_CAPACITY = 1200    # Samples per stage (one minute of 20 fps)
+MAX_PENDING      = 64      # Frames stamped but not yet seen by an encoder
+
+OVERLAY_COLUMNS  = 24
+OVERLAY_ROWS     = 2
+OVERLAY_BITS     = OVERLAY_COLUMNS * OVERLAY_ROWS    # 40 timestamp + 8 checksum
+TIMESTAMP_BITS   = 40
+
+
+# ─────────────────────────── TRACER ──────────────────────────────────────────
+
+class FrameTracer:
+    """
+    Thread-safe enough for its writers: the capture thread (capture,
+    write), the event loop (stamp) and the encoder executor (encoded) —
+    every write is a single deque append or dict assignment.
+
+    Example:
+        tracer = FrameTracer()
+        tracer.record("capture", 0.012)
+        tracer.stamp(pts, captured, published, pulled, converted)   # recv()
+        tracer.encoded(pts, started, finished)                     # encoder
+        tracer.snapshot()["total"]   # {"p50": .., "p95": .., "p99": .., "max": .., "count": ..}
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.samples  : Dict[str, deque] = {stage: deque(maxlen=capacity) for stage in STAGES}
+        self._pending : Dict[int, tuple] = {}   # pts → (captured, converted)
+
+    def record(self, stage: str, seconds: float) -> None:
+        """
+        Raises:
+            FrameLatencyError: Unknown stage.
+        """
+        try:
+            self.samples[stage].append(seconds)
+        except KeyError:
+            raise FrameLatencyError(f"Unknown latency stage '{stage}'. Source: {__name__}") from None
+
+    def stamp(
+        self,
+        pts       : int,
+        captured  : Optional[float],
+        published : Optional[float],
+        pulled    : float,
+        converted : float
+    ) -> None:
+        """Record ring / convert for a frame leaving recv() and remember it by pts."""
+        if published is not None:
+            self.samples["ring"].append(max(0.0, pulled - published))
+        self.samples["convert"].append(converted - pulled)
+        self._pending[pts] = (captured, converted)
+        while len(self._pending) > MAX_PENDING:
+            del self._pending[next(iter(self._pending))]
+
+    def encoded(self, pts: int, started: float, finished: float) -> None:
+        """Record queue / encode / total for one viewer's encode of a stamped frame."""
+        stamped = self._pending.get(pts)
+        if stamped is None:
+            return
+        captured, converted = stamped
+        self.samples["queue"].append(max(0.0, started - converted))
+        self.samples["encode"].append(finished - started)
+        if captured is not None:
+            self.samples["total"].append(finished - captured)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Percentiles in ms per stage that has samples."""
+        summary = {}
+        for stage, samples in self.samples.items():
+            values = sorted(samples)
+            if not values:
+                continue
+            last = len(values) - 1
+            summary[stage] = {
+                "p50"   : round(values[int(last * 0.50)] * 1000, 1),
+                "p95"   : round(values[int(last * 0.95)] * 1000, 1),
+                "p99"   : round(values[int(last * 0.99)] * 1000, 1),
+                "max"   : round(values[last] * 1000, 1),
+                "count" : len(values),
+            }
+        return summary
+
+    def reset(self) -> None:
+        for samples in self.samples.values():
+            samples.clear()
+
+    def __repr__(self) -> str:
+        return f"FrameTracer(total={len(self.samples['total'])} samples)"
+
+
+# ─────────────────────────── OVERLAY ─────────────────────────────────────────
+
+def _luma(frame: np.ndarray, pixel_format: str) -> np.ndarray:
+    """Writable (if frame is) luma view: the Y plane of I420, or the BGR image."""
+    if pixel_format == "yuv420":
+        return frame[:frame.shape[0] * 2 // 3]
+    if pixel_format == "bgr":
+        return frame
+    raise FrameLatencyError(f"Unsupported pixel format '{pixel_format}'. Source: {__name__}")
+
+
+def _block_size(width: int) -> float:
+    """Fractional, so a downscaled frame keeps the same block grid."""
+    return max(4.0, width / 80.0)
+
+
+def overlay_height(width: int) -> int:
+    """Rows the overlay covers at the top of a frame this wide."""
+    return int(OVERLAY_ROWS * _block_size(width)) + 1
+
+
+def _checksum(value: int) -> int:
+    checksum = 0
+    for shift in range(0, TIMESTAMP_BITS, 8):
+        checksum ^= (value >> shift) & 0xFF
+    return checksum
+
+
+def draw_overlay(frame: np.ndarray, pixel_format: str, timestamp: Optional[float] = None) -> None:
+    """
+    Burn the capture time (Unix seconds, default now) into a ring slot.
+
+    Raises:
+        FrameLatencyError: Unsupported pixel format.
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    luma      = _luma(frame, pixel_format)
+    block     = _block_size(luma.shape[1])
+    value     = int(timestamp * 1000) % (1 << TIMESTAMP_BITS)
+    code      = (value << 8) | _checksum(value)
+
+    for bit in range(OVERLAY_BITS):
+        row, column = divmod(bit, OVERLAY_COLUMNS)
+        on = (code >> (OVERLAY_BITS - 1 - bit)) & 1
+        luma[round(row * block):round((row + 1) * block),
+             round(column * block):round((column + 1) * block)] = 235 if on else 16
+
+    text = time.strftime("%H:%M:%S", time.localtime(timestamp)) + f".{int(timestamp * 1000) % 1000:03d}"
+    cv2.putText(
+        luma, text,
+        (round((OVERLAY_COLUMNS + 1) * block), round((OVERLAY_ROWS - 0.25) * block)),
+        cv2.FONT_HERSHEY_SIMPLEX, block / 16, (235, 235, 235), max(1, round(block / 8)), cv2.LINE_AA,
+    )
+
+
+def read_overlay(frame: np.ndarray, pixel_format: str) -> Optional[int]:
+    """
+    Capture time in Unix ms (mod 2^40) from a frame's overlay, or None if
+    there is none / the checksum fails. Reference decoder for the app.
+    """
+    luma  = _luma(frame, pixel_format)
+    block = _block_size(luma.shape[1])
+    if luma.shape[0] < OVERLAY_ROWS * block or luma.shape[1] < OVERLAY_COLUMNS * block:
+        return None
+
+    code = 0
+    for bit in range(OVERLAY_BITS):
+        row, column = divmod(bit, OVERLAY_COLUMNS)
+        y, x  = int((row + 0.5) * block), int((column + 0.5) * block)
+        level = luma[y, x] if luma.ndim == 2 else luma[y, x].mean()
+        code  = (code << 1) | (1 if level >= 128 else 0)
+
+    value = code >> 8
+    return value if (code & 0xFF) == _checksum(value) else None
@@ -5,13 +5,56 @@ Loc: lib/services/hardware/camera_controller.py
 Supports:
 - Webcam mode  (cv2.VideoCapture via CAMERA_INDEX)
 - Raspberry Pi native mode (Picamera2)
+- Simulated mode (CAMERA_BACKEND=synthetic | file) — no hardware needed
+
+Simulated cameras (SimulatedCamera):
+    "synthetic" — a textured pattern panning across the frame with a
+                  bright square moving over it, so encoders and motion
+                  checks have real work. Built once as a double-width
+                  strip; each frame is one copy out of it plus the square.
+    "file"      — replays a video file (CAMERA_SOURCE) in a loop, resized
+                  to the frame size. Frames are decoded and converted once
+                  at start-up (up to PRELOAD_MB; a longer file replays its
+                  first part) so replay costs the same as synthetic — a
+                  benchmark measures the pipeline, not the decoder.
+
+    capture_array() blocks until the next frame is due at FPS, like a real
+    sensor, and skips ahead (drops) rather than bursting when the caller
+    falls behind. The object also answers the Picamera2 / VideoCapture
+    lifecycle calls (start / stop / close, isOpened / release), so
+    pause_camera / resume_camera / clean_up_camera work unchanged.
+
+Fault injection (CAMERA_FAULTS, simulated cameras only):
+    Comma-separated, each drawn per frame from a seeded RNG (reproducible):
+        stall:P:S — with probability P the frame arrives S seconds late
+        fail:P    — capture_array() returns None (empty frame)
+        error:P   — capture_array() raises CameraError
+    e.g. "stall:0.01:1.5,fail:0.001". Counters: frames, stalls, failures,
+    errors. Neither fail nor error is fatal on its own: process_a retries
+    the read and stops only after a run of consecutive failures
+    (MAX_CAPTURE_FAILURES), so "fail:1" or "error:1" exercises that stop.
+
+Pixel formats (capture.pixel_format after config_camera):
+- "bgr"    — (H, W, 3) BGR, the classic OpenCV layout.
+- "yuv420" — (H * 3/2, W) planar I420 at the target size, exactly what
+             av's yuv420p VideoFrame and the VP8/H.264 encoders consume,
+             so no colour conversion or resize is needed before encoding.
+             Picamera2 delivers it natively; V4L2 webcams only if they
+             offer YU12 at that size. Otherwise the camera silently falls
+             back to "bgr" — check capture.pixel_format.
+             Keep FRAME_WIDTH a multiple of 64 so Picamera2 adds no
+             row padding.
 
 This module raises exceptions only — no logging, no dict returns.
 All logging is handled by the calling process.
 """
 
+import random
+import time
+
 import cv2
-from typing import Any
+import numpy as np
+from typing import Any, Optional, Tuple
 
 # Optional import — prevents crash on dev environments without Picamera2
 try:
@@ -40,35 +83,336 @@ class CameraNotAvailableError(CameraError):
     pass
 
 
+# ─────────────────────────── PIXEL FORMATS ───────────────────────────────────
+
+PIXEL_FORMATS        = ("bgr", "yuv420")
+DEFAULT_PIXEL_FORMAT = "yuv420"
+
+# av / aiortc VideoFrame format names
+AV_FORMATS = {"bgr": "bgr24", "yuv420": "yuv420p"}
+
+BACKENDS            = ("hardware", "synthetic", "file")
+DEFAULT_BACKEND     = "hardware"
+SIMULATED_FPS       = 30       # When config_camera() gets no FPS
+PRELOAD_MB          = 256      # Decoded frames kept for file replay
+FAULT_SEED          = 0
+
+
+def frame_shape(FRAME_DIMENSION: dict, pixel_format: str) -> Tuple[int, ...]:
+    """numpy shape of one frame in the given pixel format."""
+    width, height = FRAME_DIMENSION["width"], FRAME_DIMENSION["height"]
+    if pixel_format == "yuv420":
+        return (height * 3 // 2, width)
+    return (height, width, 3)
+
+
+def _set_webcam_format(capture: Any, pixel_format: str, size: Tuple[int, int]) -> bool:
+    """
+    Ask a V4L2 webcam for raw I420 at `size`. Returns True if the camera
+    actually delivers it; otherwise restores normal BGR conversion.
+    """
+    if pixel_format != "yuv420":
+        return False
+
+    width, height = size
+    capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"YU12"))
+    capture.set(cv2.CAP_PROP_FRAME_WIDTH,  width)
+    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    capture.set(cv2.CAP_PROP_CONVERT_RGB,  0)
+
+    ret, probe = capture.read()
+    if ret and probe is not None and probe.size == width * height * 3 // 2:
+        return True
+
+    capture.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+    return False
+
+
+# ─────────────────────────── SIMULATED CAMERA ────────────────────────────────
+
+def parse_faults(spec: str) -> dict:
+    """
+    Parse a CAMERA_FAULTS spec ("stall:0.01:1.5,fail:0.001,error:0").
+
+    Returns:
+        {"stall": (probability, seconds), "fail": probability, "error": probability}
+
+    Raises:
+        CameraConfigError: Malformed entry or probability outside 0–1.
+    """
+    faults = {"stall": (0.0, 0.0), "fail": 0.0, "error": 0.0}
+    for token in (spec or "").split(","):
+        token = token.strip()
+        if not token:
+            continue
+        kind, *values = token.lower().split(":")
+        try:
+            numbers = [float(value) for value in values]
+        except ValueError as e:
+            raise CameraConfigError(f"Bad camera fault '{token}'. Source: {__name__}") from e
+        if kind == "stall" and len(numbers) == 2 and numbers[1] >= 0:
+            faults["stall"] = (numbers[0], numbers[1])
+        elif kind in ("fail", "error") and len(numbers) == 1:
+            faults[kind] = numbers[0]
+        else:
+            raise CameraConfigError(
+                f"Bad camera fault '{token}' — expected stall:P:S, fail:P or error:P. Source: {__name__}"
+            )
+        if not 0.0 <= numbers[0] <= 1.0:
+            raise CameraConfigError(f"Fault probability out of range in '{token}'. Source: {__name__}")
+    return faults
+
+
+def _synthetic_strip(size: Tuple[int, int], pixel_format: str) -> tuple:
+    """Double-width textured strip (luma, chroma planes or BGR) to pan across."""
+    width, height = size
+    rng     = np.random.default_rng(FAULT_SEED)
+    noise   = rng.integers(0, 256, (height // 8 + 1, width // 4 + 1), dtype=np.uint8)
+    texture = cv2.resize(noise, (width * 2, height), interpolation=cv2.INTER_LINEAR)
+    ramp    = np.linspace(40, 200, width * 2, dtype=np.float32)
+    luma    = np.clip(texture * 0.4 + ramp * 0.6, 16, 235).astype(np.uint8)
+    if pixel_format == "bgr":
+        bgr = np.empty((height, width * 2, 3), dtype=np.uint8)
+        bgr[..., 0] = luma
+        bgr[..., 1] = np.roll(luma, width // 3, axis=1)
+        bgr[..., 2] = np.roll(luma, 2 * width // 3, axis=1)
+        return (bgr,)
+    chroma_u = cv2.resize(np.roll(luma, width // 3, axis=1), (width, height // 2))
+    chroma_v = cv2.resize(np.roll(luma, 2 * width // 3, axis=1), (width, height // 2))
+    return luma, chroma_u, chroma_v
+
+
+def _load_file_frames(path: str, size: Tuple[int, int], pixel_format: str) -> list:
+    """
+    Decode a video file into frames of the target size / format, up to PRELOAD_MB.
+
+    Raises:
+        CameraConfigError: The file cannot be opened or has no frames.
+    """
+    source = cv2.VideoCapture(path)
+    if not source.isOpened():
+        raise CameraConfigError(f"Could not open camera source file '{path}'. Source: {__name__}")
+    frames, total = [], 0
+    try:
+        while total < PRELOAD_MB * 1024 * 1024:
+            ret, bgr = source.read()
+            if not ret:
+                break
+            if (bgr.shape[1], bgr.shape[0]) != size:
+                bgr = cv2.resize(bgr, size, interpolation=cv2.INTER_AREA)
+            frame = cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420) if pixel_format == "yuv420" else bgr
+            frames.append(frame)
+            total += frame.nbytes
+    finally:
+        source.release()
+    if not frames:
+        raise CameraConfigError(f"Camera source file '{path}' has no readable frames. Source: {__name__}")
+    return frames
+
+
+class SimulatedCamera:
+    """
+    Hardware-free capture object with the same capture_array() shim.
+
+    Example:
+        capture = config_camera(False, 0, {"width": 1280, "height": 720}, "yuv420",
+                                FPS=20, BACKEND="synthetic", FAULTS="stall:0.01:1.5")
+        frame = capture.capture_array()     # blocks until due at 20 fps
+        capture.stalls, capture.failures
+    """
+
+    def __init__(
+        self,
+        backend      : str,
+        size         : Tuple[int, int],
+        pixel_format : str,
+        fps          : int,
+        frames       : Optional[list] = None,
+        faults       : Optional[dict] = None
+    ):
+        self.backend      = backend
+        self.frame_size   = size
+        self.pixel_format = pixel_format
+        self.fps          = fps
+        self.faults       = faults or parse_faults("")
+
+        self.frames   = 0
+        self.stalls   = 0
+        self.failures = 0
+        self.errors   = 0
+
+        self._replay  = frames
+        self._strip   = _synthetic_strip(size, pixel_format) if frames is None else None
+        self._shape   = frame_shape({"width": size[0], "height": size[1]}, pixel_format)
+        self._rng     = random.Random(FAULT_SEED)
+        self._running = False
+        self._due     = 0.0
+        self.start()
+
+    # ── Picamera2 / VideoCapture lifecycle ───────────────────────────────
+
+    def start(self) -> None:
+        self._running = True
+        self._due     = time.monotonic()
+
+    def stop(self) -> None:
+        self._running = False
+
+    def close(self) -> None:
+        self._running = False
+
+    def isOpened(self) -> bool:
+        return self._running
+
+    def release(self) -> None:
+        self._running = False
+
+    # ── Frames ────────────────────────────────────────────────────────────
+
+    def _wait_due(self) -> None:
+        """Sleep until the next frame time; drop missed frames instead of bursting."""
+        interval = 1.0 / self.fps
+        now      = time.monotonic()
+        if self._due > now:
+            time.sleep(self._due - now)
+        elif now - self._due > interval:
+            self._due = now
+        self._due += interval
+
+    def _render(self, index: int) -> np.ndarray:
+        if self._replay is not None:
+            return self._replay[index % len(self._replay)].copy()
+
+        width, height = self.frame_size
+        offset = (index * 4) % width
+        frame  = np.empty(self._shape, dtype=np.uint8)
+        if self.pixel_format == "yuv420":
+            luma, chroma_u, chroma_v = self._strip
+            half = offset // 2 * 2
+            frame[:height] = luma[:, half:half + width]
+            quarter = height // 4
+            frame[height:height + quarter].reshape(height // 2, width // 2)[:] = \
+                chroma_u[:, half // 2:half // 2 + width // 2]
+            frame[height + quarter:].reshape(height // 2, width // 2)[:] = \
+                chroma_v[:, half // 2:half // 2 + width // 2]
+            target = frame[:height]
+        else:
+            frame[:] = self._strip[0][:, offset:offset + width]
+            target = frame
+
+        # Bright square on a Lissajous path — local motion over the pan
+        side = max(8, height // 8)
+        x    = int((np.sin(index / 23.0) * 0.5 + 0.5) * (width - side))
+        y    = int((np.sin(index / 17.0) * 0.5 + 0.5) * (height - side))
+        target[y:y + side, x:x + side] = 235
+        return frame
+
+    def capture_array(self) -> Optional[np.ndarray]:
+        """
+        Next frame in pixel_format, paced at fps.
+
+        Raises:
+            CameraError: The camera is stopped, or an injected error fault fired.
+        """
+        if not self._running:
+            raise CameraError(f"Simulated camera is stopped. Source: {__name__}")
+        self._wait_due()
+
+        stall_p, stall_s = self.faults["stall"]
+        if stall_p and self._rng.random() < stall_p:
+            self.stalls += 1
+            time.sleep(stall_s)
+            self._due = time.monotonic() + 1.0 / self.fps
+        if self.faults["fail"] and self._rng.random() < self.faults["fail"]:
+            self.failures += 1
+            return None
+        if self.faults["error"] and self._rng.random() < self.faults["error"]:
+            self.errors += 1
+            raise CameraError(f"Injected camera error (CAMERA_FAULTS). Source: {__name__}")
+
+        frame = self._render(self.frames)
+        self.frames += 1
+        return frame
+
+    def __repr__(self) -> str:
+        width, height = self.frame_size
+        return (f"SimulatedCamera({self.backend} {width}x{height} {self.pixel_format} @ {self.fps} fps, "
+                f"frames={self.frames}, stalls={self.stalls}, failures={self.failures})")
+
+
 # ─────────────────────────── CONFIG ──────────────────────────────────────────
 
 def config_camera(
     IS_WEB_CAM      : bool,
     CAMERA_INDEX    : int,
-    FRAME_DIMENSION : dict
+    FRAME_DIMENSION : dict,
+    PIXEL_FORMAT    : str = "bgr",
+    FPS             : Optional[int] = None,
+    BACKEND         : str = DEFAULT_BACKEND,
+    SOURCE          : str = "",
+    FAULTS          : str = ""
 ) -> Any:
     """
     Configure and return the appropriate camera capture object.
 
-    Two supported modes:
-        IS_WEB_CAM=True  → cv2.VideoCapture(CAMERA_INDEX)
-        IS_WEB_CAM=False → Picamera2 (Raspberry Pi native)
+    Supported modes:
+        BACKEND="hardware", IS_WEB_CAM=True  → cv2.VideoCapture(CAMERA_INDEX)
+        BACKEND="hardware", IS_WEB_CAM=False → Picamera2 (Raspberry Pi native)
+        BACKEND="synthetic" / "file"         → SimulatedCamera
 
     The returned capture object always exposes a capture_array() method
-    so the calling process can use a unified API regardless of camera type.
+    so the calling process can use a unified API regardless of camera type,
+    and a pixel_format attribute with the format it actually delivers
+    ("yuv420" may fall back to "bgr").
 
     Args:
         IS_WEB_CAM:      True = USB/webcam, False = Picamera2
         CAMERA_INDEX:    Camera index (used only when IS_WEB_CAM=True)
         FRAME_DIMENSION: {"width": int, "height": int}
+        PIXEL_FORMAT:    "bgr" or "yuv420" (requested, see pixel_format)
+        FPS:             Sensor frame rate; None = driver default. Lower
+                         rates are skipped in the camera, not in Python.
+        BACKEND:         "hardware" | "synthetic" | "file"
+        SOURCE:          Video file replayed by the "file" backend
+        FAULTS:          Fault spec for simulated cameras (see module docstring)
 
     Returns:
-        capture object (cv2.VideoCapture or Picamera2)
+        capture object (cv2.VideoCapture, Picamera2 or SimulatedCamera)
 
     Raises:
         CameraConfigError:        Camera failed to open or configure.
         CameraNotAvailableError:  Picamera2 not installed / not on Pi.
     """
+    if PIXEL_FORMAT not in PIXEL_FORMATS:
+        raise CameraConfigError(
+            f"Unknown pixel format '{PIXEL_FORMAT}'. Valid: {', '.join(PIXEL_FORMATS)}. "
+            f"Source: {__name__}"
+        )
+    if BACKEND not in BACKENDS:
+        raise CameraConfigError(
+            f"Unknown camera backend '{BACKEND}'. Valid: {', '.join(BACKENDS)}. Source: {__name__}"
+        )
+    size = (FRAME_DIMENSION["width"], FRAME_DIMENSION["height"])
+
+    # ── SIMULATED MODE ────────────────────────────────────────────────────
+    if BACKEND != "hardware":
+        if PIXEL_FORMAT == "yuv420" and (size[0] % 2 or size[1] % 4):
+            raise CameraConfigError(
+                f"yuv420 needs an even width and a height divisible by 4, got {size}. Source: {__name__}"
+            )
+        frames = None
+        if BACKEND == "file":
+            if not SOURCE:
+                raise CameraConfigError(f"The file camera backend needs CAMERA_SOURCE. Source: {__name__}")
+            frames = _load_file_frames(SOURCE, size, PIXEL_FORMAT)
+        return SimulatedCamera(
+            backend      = BACKEND,
+            size         = size,
+            pixel_format = PIXEL_FORMAT,
+            fps          = FPS or SIMULATED_FPS,
+            frames       = frames,
+            faults       = parse_faults(FAULTS),
+        )
 
     # ── WEBCAM MODE ───────────────────────────────────────────────────────
     if IS_WEB_CAM:
@@ -78,11 +422,21 @@ def config_camera(
                 f"Could not open webcam at index {CAMERA_INDEX}. Source: {__name__}"
             )
 
+        if FPS:
+            capture.set(cv2.CAP_PROP_FPS, FPS)
+            capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)   # Don't queue stale frames
+
+        capture.frame_size   = size
+        capture.pixel_format = "yuv420" if _set_webcam_format(capture, PIXEL_FORMAT, size) else "bgr"
+        yuv_shape            = frame_shape(FRAME_DIMENSION, "yuv420")
+
         # Shim: expose capture_array() to match Picamera2 API
         def _capture_array_shim():
             ret, frame = capture.read()
             if not ret:
                 return None
+            if capture.pixel_format == "yuv420":
+                return frame.reshape(yuv_shape)   # Raw I420 arrives flat
             return frame
 
         capture.capture_array = _capture_array_shim
@@ -96,15 +450,30 @@ def config_camera(
         )
 
     try:
-        picam2 = Picamera2()
-        config = picam2.create_video_configuration(
-            main={
-                "size"  : (FRAME_DIMENSION["width"], FRAME_DIMENSION["height"]),
-                "format": "BGR888"
-            }
+        picam2   = Picamera2()
+        controls = {"FrameRate": FPS} if FPS else {}
+
+        if PIXEL_FORMAT == "yuv420":
+            picam2.configure(
+                picam2.create_video_configuration(
+                    main={"size": size, "format": "YUV420"}, controls=controls
+                )
+            )
+            picam2.start()
+            probe = picam2.capture_array()
+            if probe is not None and probe.shape == frame_shape(FRAME_DIMENSION, "yuv420"):
+                picam2.pixel_format = "yuv420"
+                return picam2
+            # Padded rows (width not a multiple of 64) — fall back to BGR
+            picam2.stop()
+
+        picam2.configure(
+            picam2.create_video_configuration(
+                main={"size": size, "format": "BGR888"}, controls=controls
+            )
         )
-        picam2.configure(config)
         picam2.start()
+        picam2.pixel_format = "bgr"
         return picam2
 
     except Exception as e:
@@ -120,7 +489,7 @@ def clean_up_camera(capture: Any, IS_WEB_CAM: bool) -> None:
     Properly release or stop the camera depending on mode.
 
     Args:
-        capture:    cv2.VideoCapture or Picamera2 instance
+        capture:    cv2.VideoCapture, Picamera2 or SimulatedCamera instance
         IS_WEB_CAM: True = cv2.VideoCapture, False = Picamera2
 
     Raises:
@@ -130,7 +499,9 @@ def clean_up_camera(capture: Any, IS_WEB_CAM: bool) -> None:
         cv2.destroyAllWindows() is always called even on error.
     """
     try:
-        if IS_WEB_CAM:
+        if isinstance(capture, SimulatedCamera):
+            capture.close()
+        elif IS_WEB_CAM:
             if capture and capture.isOpened():
                 capture.release()
         else:
@@ -142,4 +513,65 @@ def clean_up_camera(capture: Any, IS_WEB_CAM: bool) -> None:
             f"Error cleaning up camera: {e}. Source: {__name__}"
         ) from e
     finally:
-        cv2.destroyAllWindows()
\ No newline at end of file
+        try:
+            cv2.destroyAllWindows()
+        except cv2.error:
+            pass        # Headless OpenCV build (servers) — no windows to close
+
+
+# ─────────────────────────── PAUSE / RESUME ──────────────────────────────────
+
+def pause_camera(capture: Any, IS_WEB_CAM: bool) -> None:
+    """
+    Stop the camera streaming without discarding the capture object.
+
+    Used by process_a's idle mode — a paused camera draws no ISP/USB
+    bandwidth and wakes with resume_camera().
+
+    Raises:
+        CameraError: If the camera could not be stopped.
+    """
+    try:
+        if isinstance(capture, SimulatedCamera):
+            capture.stop()
+        elif IS_WEB_CAM:
+            if capture.isOpened():
+                capture.release()
+        else:
+            capture.stop()
+    except Exception as e:
+        raise CameraError(f"Failed to pause camera: {e}. Source: {__name__}") from e
+
+
+def resume_camera(capture: Any, IS_WEB_CAM: bool, CAMERA_INDEX: int) -> None:
+    """
+    Restart a camera stopped with pause_camera().
+
+    The webcam is reopened on the same cv2.VideoCapture object, so the
+    capture_array() shim installed by config_camera() keeps working; the
+    raw I420 request is re-applied because V4L2 forgets it on release.
+
+    Raises:
+        CameraConfigError: If the camera could not be restarted.
+    """
+    try:
+        if isinstance(capture, SimulatedCamera):
+            capture.start()
+        elif IS_WEB_CAM:
+            if not capture.isOpened():
+                if not capture.open(CAMERA_INDEX):
+                    raise CameraConfigError(
+                        f"Could not reopen webcam at index {CAMERA_INDEX}. Source: {__name__}"
+                    )
+                if capture.pixel_format == "yuv420" and not _set_webcam_format(
+                    capture, "yuv420", capture.frame_size
+                ):
+                    raise CameraConfigError(
+                        f"Webcam stopped delivering I420 after reopen. Source: {__name__}"
+                    )
+        else:
+            capture.start()
+    except CameraConfigError:
+        raise
+    except Exception as e:
+        raise CameraConfigError(f"Failed to resume camera: {e}. Source: {__name__}") from e
@@ -3,6 +3,8 @@ Ultrasonic Controller
 Path: lib/services/hardware/ultrasonic_controller.py
 
 HC-SR04 ultrasonic distance sensors for feed (left) and water (right) level.
+Any number of additional sensors can be set up by passing their (trig, echo)
+pins to setup_ultrasonics() — see lib/services/sensor_scheduler.
 
 Noise reduction:
     Raw HC-SR04 readings spike to 0 or max-range on electrical noise,
@@ -16,9 +18,26 @@ Noise reduction:
     100ms tick loop in process_b (5 samples × 30ms = ~150ms per sensor,
     ~300ms total — longer than the entire tick budget).
 
-    Now that sensor reads run in their own dedicated process (process_c),
-    the median filter is safe to re-enable. process_c has no tick budget
-    constraint and can spend as long as the hardware requires.
+    process_c now streams single raw readings (read_*_raw) through
+    lib/services/sensor_filter instead. The burst median and
+    read_left_distance() / read_right_distance() are kept as legacy
+    helpers for the test/ scripts and the offline filter comparison.
+
+Measurement backends:
+    "poll"   — legacy busy-wait. Spins on GPIO.input(echo) and calls
+               time.time() every iteration. Pins a CPU core and adds
+               Python-level jitter to the echo width.
+    "rpigpio"— RPi.GPIO edge callbacks (add_event_detect BOTH). The callback
+               thread stamps each edge with time.monotonic_ns(); the caller
+               sleeps on a threading.Event until the falling edge arrives.
+    "gpiod"  — libgpiod v2 line events. Edge timestamps come from the kernel
+               (CLOCK_MONOTONIC at IRQ time), so Python scheduling jitter no
+               longer affects the measured pulse width. Requires the
+               python3-libgpiod / gpiod>=2 bindings.
+
+    The backend is chosen once in setup_ultrasonics(). "rpigpio" is the
+    default — RPi.GPIO is already required — and process_c falls back to
+    "poll" if edge detection cannot be set up.
 
 Logging contract:
     This is a service module — no logging. Returns 0.0 on read failure.
@@ -26,8 +45,31 @@ Logging contract:
 """
 
 import time
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+
 import RPi.GPIO as GPIO
 
+# Optional import — libgpiod v2 bindings are not present on every image
+try:
+    import gpiod
+    from gpiod.line import Direction, Edge
+    HAS_GPIOD = True
+except (ImportError, RuntimeError):
+    HAS_GPIOD = False
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class UltrasonicError(Exception):
+    """Base exception for ultrasonic controller errors."""
+    pass
+
+class UltrasonicSetupError(UltrasonicError):
+    """Raised when sensor GPIO or the measurement backend fails to set up."""
+    pass
+
 # ─────────────────────────── PIN DEFINITIONS ─────────────────────────────────
 
 LEFT_TRIG  = 25   # Feed sensor — trigger
@@ -43,41 +85,231 @@ ECHO_TIMEOUT     = 0.04     # 40ms per echo wait — covers ~6.8m max range
 VALID_MIN_CM     = 2.0      # Below this = sensor fault / object too close
 VALID_MAX_CM     = 400.0    # Above this = no echo / out of range
 
+SPEED_OF_SOUND_CM_S = 33112    # Used for the round-trip → distance conversion
+
+# ─────────────────────────── BACKEND CONFIG ──────────────────────────────────
+
+BACKENDS        = ("poll", "rpigpio", "gpiod")
+DEFAULT_BACKEND = "rpigpio"
+GPIOD_CHIP      = "/dev/gpiochip0"   # Pi 5 on older kernels: /dev/gpiochip4
+
+DEFAULT_PINS    = ((LEFT_TRIG, LEFT_ECHO), (RIGHT_TRIG, RIGHT_ECHO))
+
+_backend     : str = DEFAULT_BACKEND
+_echo_timers : Dict[int, "_EdgeTimer"] = {}
+
 
 # ─────────────────────────── SETUP ───────────────────────────────────────────
 
-def setup_ultrasonics() -> None:
+def setup_ultrasonics(
+    backend : str = DEFAULT_BACKEND,
+    pins    : Sequence[Tuple[int, int]] = DEFAULT_PINS,
+) -> None:
     """
-    Initialize GPIO pins for both ultrasonic sensors.
+    Initialize GPIO pins for the ultrasonic sensors.
     Leaves TRIG pins LOW for 500ms to let sensors settle.
+
+    Args:
+        backend: Echo measurement backend — one of BACKENDS.
+        pins:    (trig, echo) BCM pin pairs. Defaults to feed + water.
+
+    Raises:
+        UltrasonicSetupError: Unknown backend, gpiod not installed, or the
+                              echo lines could not be requested.
     """
+    global _backend
+
+    if backend not in BACKENDS:
+        raise UltrasonicSetupError(
+            f"Unknown ultrasonic backend '{backend}'. "
+            f"Valid: {', '.join(BACKENDS)}. Source: {__name__}"
+        )
+    if backend == "gpiod" and not HAS_GPIOD:
+        raise UltrasonicSetupError(
+            f"gpiod backend requested but libgpiod v2 bindings are not installed. "
+            f"Source: {__name__}"
+        )
+
     GPIO.setmode(GPIO.BCM)
     GPIO.setwarnings(False)
 
-    GPIO.setup(LEFT_TRIG,  GPIO.OUT)
-    GPIO.setup(LEFT_ECHO,  GPIO.IN)
-    GPIO.setup(RIGHT_TRIG, GPIO.OUT)
-    GPIO.setup(RIGHT_ECHO, GPIO.IN)
-
-    GPIO.output(LEFT_TRIG,  False)
-    GPIO.output(RIGHT_TRIG, False)
+    for trig, _ in pins:
+        GPIO.setup(trig, GPIO.OUT)
+        GPIO.output(trig, False)
+
+    cleanup_ultrasonics()
+
+    try:
+        for _, echo in pins:
+            if backend == "gpiod":
+                _echo_timers[echo] = _GpiodEdgeTimer(echo)
+            else:
+                GPIO.setup(echo, GPIO.IN)
+                if backend == "rpigpio":
+                    _echo_timers[echo] = _RPiGPIOEdgeTimer(echo)
+    except Exception as e:
+        cleanup_ultrasonics()
+        raise UltrasonicSetupError(
+            f"Failed to set up '{backend}' echo backend: {e}. Source: {__name__}"
+        ) from e
+
+    _backend = backend
     time.sleep(0.5)
 
 
-# ─────────────────────────── RAW MEASUREMENT ─────────────────────────────────
+def cleanup_ultrasonics() -> None:
+    """
+    Release edge-detection resources held by the active backend.
+    Safe to call repeatedly. GPIO.cleanup() is still the caller's job.
+    """
+    for timer in list(_echo_timers.values()):
+        try:
+            timer.close()
+        except Exception:
+            pass
+    _echo_timers.clear()
 
-def _measure_once(trig: int, echo: int) -> float:
+
+def get_backend() -> str:
+    """Return the name of the active measurement backend."""
+    return _backend
+
+
+# ─────────────────────────── EDGE TIMERS ─────────────────────────────────────
+
+class _EdgeTimer(ABC):
     """
-    Fire one ultrasonic pulse and return the raw distance in cm.
+    Captures one rising + falling edge pair on an echo pin.
 
-    Returns:
-        float: Distance in cm, or 0.0 on timeout / no echo.
+    Usage per measurement:
+        timer.arm()            — forget previous edges
+        (fire trigger pulse)
+        timer.wait(timeout)    — block (no spinning) until both edges seen
+                                 → (rise_ns, fall_ns) or None on timeout
+    """
+
+    @abstractmethod
+    def arm(self) -> None:
+        ...
+
+    @abstractmethod
+    def wait(self, timeout: float) -> Optional[tuple]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class _RPiGPIOEdgeTimer(_EdgeTimer):
+    """
+    RPi.GPIO add_event_detect(BOTH) backend.
+
+    The callback runs on RPi.GPIO's event thread. The first edge after arm()
+    is the rising edge, the second is the falling edge — reading the pin
+    level inside the callback would race with short (< 150 µs) echoes.
+    """
+
+    def __init__(self, echo: int):
+        self.echo  = echo
+        self._rise : Optional[int] = None
+        self._fall : Optional[int] = None
+        self._done = threading.Event()
+        GPIO.add_event_detect(echo, GPIO.BOTH, callback=self._on_edge)
+
+    def _on_edge(self, channel: int) -> None:
+        ts = time.monotonic_ns()
+        if self._done.is_set():
+            return
+        if self._rise is None:
+            self._rise = ts
+        else:
+            self._fall = ts
+            self._done.set()
+
+    def arm(self) -> None:
+        self._done.clear()
+        self._rise = None
+        self._fall = None
+
+    def wait(self, timeout: float) -> Optional[tuple]:
+        if not self._done.wait(timeout):
+            return None
+        return self._rise, self._fall
+
+    def close(self) -> None:
+        try:
+            GPIO.remove_event_detect(self.echo)
+        except Exception:
+            pass
+
+
+class _GpiodEdgeTimer(_EdgeTimer):
+    """
+    libgpiod v2 line-event backend with kernel edge timestamps.
+
+    wait_edge_events() blocks in poll() — the process sleeps until the
+    kernel queues an edge. Only the edge type and timestamp_ns of each
+    event are used, so userspace latency has no effect on the result.
     """
-    # 10µs trigger pulse
+
+    def __init__(self, echo: int):
+        self.echo     = echo
+        self._request = gpiod.request_lines(
+            GPIOD_CHIP,
+            consumer = f"chick-up-echo-{echo}",
+            config   = {
+                echo: gpiod.LineSettings(
+                    direction      = Direction.INPUT,
+                    edge_detection = Edge.BOTH,
+                )
+            },
+        )
+
+    def arm(self) -> None:
+        # Drain stale edges left over from a previous timed-out measurement
+        while self._request.wait_edge_events(0):
+            self._request.read_edge_events()
+
+    def wait(self, timeout: float) -> Optional[tuple]:
+        rise     = None
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = max(deadline - time.monotonic(), 0.0)
+            if not self._request.wait_edge_events(remaining):
+                return None
+            for event in self._request.read_edge_events():
+                if event.event_type == event.Type.RISING_EDGE:
+                    rise = event.timestamp_ns
+                elif rise is not None:
+                    return rise, event.timestamp_ns
+
+    def close(self) -> None:
+        self._request.release()
+
+
+# ─────────────────────────── RAW MEASUREMENT ─────────────────────────────────
+
+def _echo_to_cm(elapsed_s: float) -> float:
+    """Convert a round-trip echo width in seconds to a distance in cm."""
+    return round((elapsed_s * SPEED_OF_SOUND_CM_S) / 2, 2)
+
+
+def _fire_trigger(trig: int) -> None:
+    """Send the 10µs trigger pulse."""
     GPIO.output(trig, True)
     time.sleep(0.00001)
     GPIO.output(trig, False)
 
+
+def _measure_once_poll(trig: int, echo: int) -> float:
+    """
+    Legacy busy-wait measurement. Kept as the fallback backend.
+
+    Returns:
+        float: Distance in cm, or 0.0 on timeout / no echo.
+    """
+    _fire_trigger(trig)
+
     start = None
     stop = None
 
@@ -97,17 +329,90 @@ def _measure_once(trig: int, echo: int) -> float:
     if stop is None:  # Echo never went LOW
         return 0.0
 
-    # Calculate distance
-    elapsed = stop - start
-    distance = (elapsed * 33112) / 2  # speed of sound in cm/s
-    return round(distance, 2)
+    return _echo_to_cm(stop - start)
+
+
+def _measure_once_edges(trig: int, echo: int) -> float:
+    """
+    Edge-timestamped measurement — sleeps until the echo pulse completes.
+
+    Returns:
+        float: Distance in cm, or 0.0 on timeout / no echo.
+    """
+    timer = _echo_timers.get(echo)
+    if timer is None:
+        return 0.0
+
+    timer.arm()
+    _fire_trigger(trig)
+
+    # Rising edge + full echo width must both fit in the window
+    edges = timer.wait(ECHO_TIMEOUT * 2)
+    if edges is None:
+        return 0.0
+
+    rise_ns, fall_ns = edges
+    if fall_ns <= rise_ns:
+        return 0.0
+    return _echo_to_cm((fall_ns - rise_ns) / 1e9)
+
+
+def _measure_once(trig: int, echo: int) -> float:
+    """
+    Fire one ultrasonic pulse and return the raw distance in cm,
+    using the backend selected in setup_ultrasonics().
+
+    Returns:
+        float: Distance in cm, or 0.0 on timeout / no echo.
+    """
+    if _backend == "poll":
+        return _measure_once_poll(trig, echo)
+    return _measure_once_edges(trig, echo)
 
 
-# ─────────────────────────── MEDIAN FILTER ───────────────────────────────────
+def supports_concurrent() -> bool:
+    """True if the active backend can time several echoes at once."""
+    return _backend != "poll"
+
+
+def measure_concurrent(pins: Sequence[Tuple[int, int]]) -> List[float]:
+    """
+    Fire several sensors back to back and time all their echoes together.
+
+    Only valid for sensors that cannot hear each other — the caller
+    (sensor_scheduler) guarantees that. With the poll backend the sensors
+    are measured one after another instead.
+
+    Returns:
+        list[float]: Distance in cm per (trig, echo) pair, 0.0 on timeout.
+    """
+    if not supports_concurrent():
+        return [_measure_once_poll(trig, echo) for trig, echo in pins]
+
+    timers = [_echo_timers.get(echo) for _, echo in pins]
+    for timer in timers:
+        if timer is not None:
+            timer.arm()
+    for trig, _ in pins:
+        _fire_trigger(trig)
+
+    deadline = time.monotonic() + ECHO_TIMEOUT * 2
+    results  = []
+    for timer in timers:
+        edges = timer.wait(max(deadline - time.monotonic(), 0.0)) if timer else None
+        if edges is None or edges[1] <= edges[0]:
+            results.append(0.0)
+        else:
+            results.append(_echo_to_cm((edges[1] - edges[0]) / 1e9))
+    return results
+
+
+# ─────────────────────────── MEDIAN FILTER (LEGACY) ──────────────────────────
 
 def _median_distance(trig: int, echo: int) -> float:
     """
     Take SAMPLE_COUNT readings, discard out-of-range values, return median.
+    Legacy burst filter — used by the test/ scripts, not by process_c.
 
     Why median and not average:
         Ultrasonic spikes (0 cm or 400+ cm) are isolated outliers caused by
@@ -139,8 +444,8 @@ def read_left_distance() -> float:
     """
     Read feed level sensor (left — GPIO TRIG 25, ECHO 24).
 
-    Uses the median filter — safe to call now that sensor reads run in their
-    own dedicated process (process_c) with no tick budget constraint.
+    Legacy: burst median of SAMPLE_COUNT readings (~150ms). process_c uses
+    read_left_raw() with a streaming filter chain instead.
 
     Returns:
         float: Median distance in cm. 0.0 = sensor fault / no valid reading.
@@ -152,10 +457,30 @@ def read_right_distance() -> float:
     """
     Read water level sensor (right — GPIO TRIG 7, ECHO 8).
 
-    Uses the median filter — safe to call now that sensor reads run in their
-    own dedicated process (process_c) with no tick budget constraint.
+    Legacy: burst median of SAMPLE_COUNT readings (~150ms). process_c uses
+    read_right_raw() with a streaming filter chain instead.
 
     Returns:
         float: Median distance in cm. 0.0 = sensor fault / no valid reading.
     """
-    return _median_distance(RIGHT_TRIG, RIGHT_ECHO)
\ No newline at end of file
+    return _median_distance(RIGHT_TRIG, RIGHT_ECHO)
+
+
+def read_left_raw() -> float:
+    """
+    Single unfiltered feed sensor reading for streaming filter chains.
+
+    Returns:
+        float: Raw distance in cm. 0.0 = timeout / no echo.
+    """
+    return _measure_once(LEFT_TRIG, LEFT_ECHO)
+
+
+def read_right_raw() -> float:
+    """
+    Single unfiltered water sensor reading for streaming filter chains.
+
+    Returns:
+        float: Raw distance in cm. 0.0 = timeout / no echo.
+    """
+    return _measure_once(RIGHT_TRIG, RIGHT_ECHO)
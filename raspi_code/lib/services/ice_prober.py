@@ -0,0 +1,306 @@
+"""
+ICE Prober Module
+Path: lib/services/ice_prober.py
+
+Measures which STUN / TURN servers are reachable, and how fast, before a
+viewer needs them.
+
+Why:
+    aiortc hands aioice only the FIRST stun: and the FIRST turn: URL of the
+    configured list, and gathers against them inside every offer. A dead
+    STUN server or a firewalled TURN transport (UDP blocked, TCP open)
+    therefore costs each viewer aioice's full 5-second gather timeout — and
+    the TCP TURN URL in the list is never even tried.
+
+Method:
+    probe() checks every configured URL concurrently:
+        stun:  one Binding request (retransmitted on loss), RTT to response
+        turn:  a full TURN Allocate over the URL's transport (401 challenge
+               + authenticated allocate), closed right away
+    working_servers() then returns the servers ordered for aiortc: fastest
+    working STUN first, then the fastest working TURN transport (UDP
+    preferred when both work), dead URLs dropped, host names replaced by
+    the resolved address so the gather skips DNS. Until the first probe
+    completes — or if nothing answers — the configured list is returned
+    unchanged.
+
+    run() probes at start-up and every `interval` seconds afterwards.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import asyncio
+import socket
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+from aioice import stun
+from aioice.turn import create_turn_endpoint
+from aiortc import RTCIceServer
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class IceProbeError(Exception):
+    """Raised when a single STUN / TURN probe fails."""
+
+    def __init__(self, message: str, reason: str = ""):
+        super().__init__(message)
+        self.reason = reason or message
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+DEFAULT_INTERVAL = 300.0            # Seconds between probe rounds
+DEFAULT_TIMEOUT  = 3.0              # Seconds per probe
+STUN_RETRANSMITS = (0.0, 0.5, 1.5)  # Send times within the timeout
+
+
+class ProbeResult(NamedTuple):
+    url     : str
+    kind    : str              # "stun" | "turn"
+    ok      : bool
+    rtt_ms  : Optional[float]  # STUN round trip / TURN allocate time
+    address : Optional[str]    # Resolved server IP
+    error   : Optional[str]
+
+    def __str__(self) -> str:
+        if self.ok:
+            return f"{self.url} {self.rtt_ms:.0f}ms"
+        return f"{self.url} DEAD ({self.error})"
+
+
+# ─────────────────────────── PROBES ──────────────────────────────────────────
+
+def parse_url(url: str) -> tuple:
+    """Split a STUN / TURN URL: "turn:host:3478?transport=tcp" → ("turn", "host", 3478, "tcp")."""
+    scheme, _, rest = url.partition(":")
+    rest, _, query  = rest.partition("?")
+    host, _, port   = rest.rpartition(":")
+    if not host:
+        host, port = rest, ("5349" if scheme == "turns" else "3478")
+    transport = query.partition("transport=")[2] or ("udp" if scheme == "turn" else None)
+    return scheme, host, int(port), transport
+
+
+async def _resolve(host: str) -> str:
+    loop  = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, None, family=socket.AF_INET)
+    return infos[0][4][0]
+
+
+async def _resolve_or_raise(host: str, timeout: float) -> str:
+    try:
+        return await asyncio.wait_for(_resolve(host), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        raise IceProbeError(
+            f"Cannot resolve {host}: {e or 'timeout'}. Source: {__name__}", "dns"
+        ) from e
+
+
+class _StunProbeProtocol(asyncio.DatagramProtocol):
+    def __init__(self, transaction_id: bytes):
+        self.transaction_id = transaction_id
+        self.response       = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        try:
+            message = stun.parse_message(data)
+        except ValueError:
+            return
+        if message.transaction_id == self.transaction_id and not self.response.done():
+            self.response.set_result(message)
+
+    def error_received(self, exc: Exception) -> None:
+        if not self.response.done():
+            self.response.set_exception(exc)
+
+
+async def probe_stun(host: str, port: int, timeout: float = DEFAULT_TIMEOUT) -> tuple:
+    """
+    Send a STUN Binding request.
+
+    Returns:
+        (rtt_ms, resolved address)
+
+    Raises:
+        IceProbeError: No response within timeout, or resolution failed.
+    """
+    loop    = asyncio.get_running_loop()
+    address = await _resolve_or_raise(host, timeout)
+
+    request = stun.Message(message_method=stun.Method.BINDING, message_class=stun.Class.REQUEST)
+    try:
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: _StunProbeProtocol(request.transaction_id), remote_addr=(address, port)
+        )
+    except OSError as e:
+        raise IceProbeError(f"STUN {host}:{port} failed: {e}. Source: {__name__}", str(e)) from e
+    started  = time.monotonic()
+    deadline = started + timeout
+    sends    = list(STUN_RETRANSMITS)
+    try:
+        while not protocol.response.done():
+            now = time.monotonic()
+            if now >= deadline:
+                raise IceProbeError(f"STUN {host}:{port} timed out. Source: {__name__}", "timeout")
+            if sends and now >= started + sends[0]:
+                transport.sendto(bytes(request))
+                sends.pop(0)
+            wake = min(started + sends[0], deadline) if sends else deadline
+            await asyncio.wait({protocol.response}, timeout=max(wake - now, 0.0))
+        protocol.response.result()     # Raises a socket error seen meanwhile
+        return (time.monotonic() - started) * 1000, address
+    except OSError as e:
+        raise IceProbeError(f"STUN {host}:{port} failed: {e}. Source: {__name__}", str(e)) from e
+    finally:
+        transport.close()
+
+
+async def probe_turn(
+    host      : str,
+    port      : int,
+    username  : str,
+    password  : str,
+    transport : str = "udp",
+    timeout   : float = DEFAULT_TIMEOUT
+) -> tuple:
+    """
+    Allocate (and immediately release) a TURN relay.
+
+    Returns:
+        (allocate_ms, resolved address)
+
+    Raises:
+        IceProbeError: Allocation failed or timed out.
+    """
+    address = await _resolve_or_raise(host, timeout)
+    started = time.monotonic()
+    try:
+        relay, _ = await asyncio.wait_for(
+            create_turn_endpoint(
+                asyncio.DatagramProtocol,
+                server_addr = (address, port),
+                username    = username,
+                password    = password,
+                transport   = transport,
+            ),
+            timeout,
+        )
+    except Exception as e:
+        reason = "timeout" if isinstance(e, asyncio.TimeoutError) else (str(e) or type(e).__name__)
+        raise IceProbeError(
+            f"TURN {host}:{port}/{transport} failed: {reason}. Source: {__name__}", reason
+        ) from e
+    allocate_ms = (time.monotonic() - started) * 1000
+    relay.close()
+    return allocate_ms, address
+
+
+# ─────────────────────────── PROBER ──────────────────────────────────────────
+
+class IceProber:
+    """
+    Example:
+        prober = IceProber(ice_servers)
+        asyncio.ensure_future(prober.run(lambda: running, on_probe=report))
+        ...
+        pc = RTCPeerConnection(RTCConfiguration(iceServers=prober.working_servers()))
+    """
+
+    def __init__(
+        self,
+        ice_servers : List[RTCIceServer],
+        interval    : float = DEFAULT_INTERVAL,
+        timeout     : float = DEFAULT_TIMEOUT
+    ):
+        self.ice_servers = list(ice_servers)
+        self.interval    = interval
+        self.timeout     = timeout
+        self.results     : List[ProbeResult] = []
+        self.probed_at   : Optional[float] = None
+        self.rounds      : int = 0
+        self._working    : Optional[List[RTCIceServer]] = None
+
+    async def _probe_url(self, server: RTCIceServer, url: str) -> ProbeResult:
+        scheme, host, port, transport = parse_url(url)
+        kind = "stun" if scheme == "stun" else "turn"
+        try:
+            if kind == "stun":
+                rtt_ms, address = await probe_stun(host, port, self.timeout)
+            else:
+                rtt_ms, address = await probe_turn(
+                    host, port, server.username, server.credential, transport, self.timeout
+                )
+            return ProbeResult(url, kind, True, rtt_ms, address, None)
+        except IceProbeError as e:
+            return ProbeResult(url, kind, False, None, None, e.reason)
+
+    async def probe(self) -> List[ProbeResult]:
+        """Probe every configured URL concurrently and rebuild the working set."""
+        jobs = [
+            self._probe_url(server, url)
+            for server in self.ice_servers
+            for url in (server.urls if isinstance(server.urls, list) else [server.urls])
+        ]
+        self.results   = list(await asyncio.gather(*jobs))
+        self.probed_at = time.time()
+        self.rounds   += 1
+        self._working  = self._build_working()
+        return self.results
+
+    def _build_working(self) -> Optional[List[RTCIceServer]]:
+        alive = [result for result in self.results if result.ok]
+        if not alive:
+            return None     # Offline or all dead — keep the configured list
+
+        credentials = {}
+        for server in self.ice_servers:
+            for url in (server.urls if isinstance(server.urls, list) else [server.urls]):
+                credentials[url] = (server.username, server.credential)
+
+        def _with_address(result: ProbeResult) -> str:
+            scheme, _, port, transport = parse_url(result.url)
+            url = f"{scheme}:{result.address}:{port}"
+            return f"{url}?transport={transport}" if scheme != "stun" else url
+
+        stun_alive = sorted((r for r in alive if r.kind == "stun"), key=lambda r: r.rtt_ms)
+        turn_alive = sorted(
+            (r for r in alive if r.kind == "turn"),
+            key=lambda r: (parse_url(r.url)[3] != "udp", r.rtt_ms),
+        )
+
+        working = []
+        if stun_alive:
+            working.append(RTCIceServer(urls=[_with_address(r) for r in stun_alive]))
+        for result in turn_alive:
+            username, credential = credentials[result.url]
+            working.append(RTCIceServer(
+                urls=[_with_address(result)], username=username, credential=credential
+            ))
+        return working
+
+    def working_servers(self) -> List[RTCIceServer]:
+        """Servers ordered for aiortc; the configured list until a probe succeeds."""
+        return list(self._working) if self._working else list(self.ice_servers)
+
+    @property
+    def dead(self) -> List[ProbeResult]:
+        return [result for result in self.results if not result.ok]
+
+    async def run(self, is_running: Callable[[], bool], on_probe: Optional[Callable] = None) -> None:
+        """Probe now and every `interval` seconds until is_running() is False."""
+        while is_running():
+            await self.probe()
+            if on_probe:
+                on_probe(self.results)
+            slept = 0.0
+            while slept < self.interval and is_running():
+                await asyncio.sleep(1.0)
+                slept += 1.0
+
+    def __repr__(self) -> str:
+        alive = sum(result.ok for result in self.results)
+        return f"IceProber({alive}/{len(self.results)} alive, rounds={self.rounds})"
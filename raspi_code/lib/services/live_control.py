@@ -0,0 +1,193 @@
+"""
+Live Control Module
+Path: lib/services/live_control.py
+
+Message format and helpers for the live-view data channel: level updates
+out to the app, feed / water commands in, acknowledgements back.
+
+Why:
+    Without it a viewer learns feed / water levels only from the sensors/
+    node process_b writes every tick, and presses feed / water by writing a
+    buttons/... timestamp that process_b reads on its next RTDB poll — a
+    few hundred milliseconds each way through Firebase. While a viewer is
+    connected there is already a direct peer connection; an RTCDataChannel
+    on it carries both directions in tens of milliseconds.
+
+Path of a command:
+    app ──datachannel──▶ process_a ──commands Queue──▶ process_b (motors)
+    app ◀─datachannel─── process_a ◀──events Queue──── process_b (ack / state)
+
+    Levels do not go through process_b: process_a reads process_c's
+    SensorRings directly (lock-free) and sends a "levels" message whenever
+    a level changes, at most rate_hz times a second.
+
+Data channel:
+    The app creates it before its offer — aiortc answers, and an answer
+    cannot add a data channel — with label CHANNEL_LABEL ("control").
+    Messages are JSON text.
+
+Messages (app → Pi):
+    {"type": "command", "id": "<any>", "action": "feed" | "water"}
+        feed  — start one dispense cycle (same as the app feed button)
+        water — toggle the water pump (same as the app water button)
+    {"type": "latency", "ms": 184.0}
+        glass-to-glass latency the app measured from the timestamp
+        overlay (lib/services/frame_latency) of a displayed frame
+
+Messages (Pi → app):
+    {"type": "levels", "levels": {"feed": 61.2, "water": 40.0, ...},
+     "stale": ["water"], "timestamp": <ms>}
+    {"type": "ack", "id": "<id>", "action": "feed", "ok": true,
+     "reason": null, "dispensing": true, "refilling": false,
+     "timestamp": <ms>}
+        ok=false reasons: "busy" (dispense already running / queue full),
+        "settings" (restart pending), "booting", "invalid", "unavailable"
+    {"type": "state", "dispensing": false, "refilling": false, "timestamp": <ms>}
+        sent when a motor starts or stops for any reason (keypad, schedule,
+        countdown end)
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import json
+import math
+import time
+from typing import Dict, Optional
+
+from lib.services.sensor_ring import SensorRingError
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class LiveControlError(Exception):
+    """Raised when a data channel message cannot be parsed."""
+    pass
+
+
+# ─────────────────────────── PROTOCOL ────────────────────────────────────────
+
+CHANNEL_LABEL        = "control"
+ACTIONS              = ("feed", "water")
+DEFAULT_RATE_HZ      = 10.0     # Max level messages per second
+KEEPALIVE_SECONDS    = 2.0      # Resend unchanged levels this often
+LEVEL_STALE_SECONDS  = 5.0      # Same rule as process_b's SENSOR_STALE_SECONDS
+COMMAND_QUEUE_SIZE   = 16
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def parse_message(text: str) -> dict:
+    """
+    Parse an app → Pi message.
+
+    Returns:
+        {"type": "command", "id": ..., "action": "feed" | "water"} or
+        {"type": "latency", "ms": float}
+
+    Raises:
+        LiveControlError: Not JSON, unknown type, unknown action or bad
+            latency value.
+    """
+    try:
+        message = json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise LiveControlError(f"Data channel message is not JSON: {e}. Source: {__name__}") from e
+    kind = message.get("type") if isinstance(message, dict) else None
+
+    if kind == "latency":
+        ms = message.get("ms")
+        if isinstance(ms, bool) or not isinstance(ms, (int, float)) or not 0 <= ms < 60000:
+            raise LiveControlError(f"Bad latency report '{ms}'. Source: {__name__}")
+        return {"type": "latency", "ms": float(ms)}
+    if kind != "command":
+        raise LiveControlError(f"Unsupported data channel message. Source: {__name__}")
+    action = message.get("action")
+    if action not in ACTIONS:
+        raise LiveControlError(f"Unknown command action '{action}'. Source: {__name__}")
+    return {"type": "command", "id": message.get("id"), "action": action}
+
+
+def levels_message(levels: Dict[str, float], stale: list) -> str:
+    return json.dumps({
+        "type"      : "levels",
+        "levels"    : levels,
+        "stale"     : stale,
+        "timestamp" : _now_ms(),
+    })
+
+
+def ack_message(
+    command_id,
+    action     : Optional[str],
+    ok         : bool,
+    reason     : Optional[str] = None,
+    dispensing : Optional[bool] = None,
+    refilling  : Optional[bool] = None
+) -> str:
+    return json.dumps({
+        "type"       : "ack",
+        "id"         : command_id,
+        "action"     : action,
+        "ok"         : ok,
+        "reason"     : reason,
+        "dispensing" : dispensing,
+        "refilling"  : refilling,
+        "timestamp"  : _now_ms(),
+    })
+
+
+def state_message(dispensing: bool, refilling: bool) -> str:
+    return json.dumps({
+        "type"       : "state",
+        "dispensing" : dispensing,
+        "refilling"  : refilling,
+        "timestamp"  : _now_ms(),
+    })
+
+
+def parse_state(text: str) -> Optional[dict]:
+    """
+    Motor state of a Pi → app "state" message (process_a triggers event
+    clips on it), or None for any other / unreadable message.
+
+    Returns:
+        {"dispensing": bool, "refilling": bool} or None
+    """
+    try:
+        message = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(message, dict) or message.get("type") != "state":
+        return None
+    return {"dispensing": bool(message.get("dispensing")), "refilling": bool(message.get("refilling"))}
+
+
+# ─────────────────────────── LEVELS──────────────────────────────────────────
+
+def read_levels(sensor_rings: dict, now: Optional[float] = None) -> tuple:
+    """
+    Newest level of every ring.
+
+    Returns:
+        ({name: percent}, [stale names]). Rings without data yet are left
+        out of the levels and listed as stale.
+    """
+    now    = time.time() if now is None else now
+    levels = {}
+    stale  = []
+    for name, ring in sensor_rings.items():
+        try:
+            record = ring.latest()
+        except SensorRingError:
+            record = None
+        if record is None or math.isnan(record.percent):
+            stale.append(name)
+            continue
+        levels[name] = round(record.percent, 1)
+        if now - record.timestamp > LEVEL_STALE_SECONDS or record.quality <= 0.0:
+            stale.append(name)
+    return levels, stale
@@ -0,0 +1,80 @@
+"""
+Loop Lag Module
+Path: lib/services/loop_lag.py
+
+Measures asyncio event-loop lag — how late the loop wakes a coroutine that
+asked to sleep for a fixed interval.
+
+Why:
+    process_a's event loop runs Firebase signaling, ICE and every
+    CameraVideoTrack.recv(). Anything blocking on it (a camera read, a
+    resize, a synchronous Firebase call) delays all of them. Lag is the
+    direct measure of that: 0 ms on an idle loop, roughly the length of the
+    longest blocking call otherwise.
+
+Method:
+    A probe coroutine sleeps `interval` seconds in a loop and records
+    (actual wake time − requested wake time) for every iteration into a
+    bounded deque. snapshot() summarises the window (mean / p99 / max).
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import asyncio
+from collections import deque
+from typing import Callable, NamedTuple
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+DEFAULT_INTERVAL = 0.05    # Probe period in seconds (20 Hz)
+DEFAULT_WINDOW   = 1200    # Samples kept (~60 s at the default interval)
+
+
+class LagStats(NamedTuple):
+    samples : int
+    mean_ms : float
+    p99_ms  : float
+    max_ms  : float
+
+
+# ─────────────────────────── MONITOR ─────────────────────────────────────────
+
+class LoopLagMonitor:
+    """
+    Example:
+        monitor = LoopLagMonitor()
+        asyncio.ensure_future(monitor.run(status_checker.is_set))
+        ...
+        stats = monitor.snapshot()      # LagStats for the last window
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, window: int = DEFAULT_WINDOW):
+        self.interval = interval
+        self._samples = deque(maxlen=window)
+
+    async def run(self, is_running: Callable[[], bool]) -> None:
+        """Probe until is_running() returns False."""
+        loop = asyncio.get_running_loop()
+        while is_running():
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._samples.append(max(loop.time() - expected, 0.0))
+
+    def snapshot(self, reset: bool = True) -> LagStats:
+        """Summarise the collected samples, optionally starting a new window."""
+        samples = sorted(self._samples)
+        if reset:
+            self._samples.clear()
+        if not samples:
+            return LagStats(0, 0.0, 0.0, 0.0)
+
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        return LagStats(
+            samples = len(samples),
+            mean_ms = sum(samples) / len(samples) * 1000,
+            p99_ms  = p99 * 1000,
+            max_ms  = samples[-1] * 1000,
+        )
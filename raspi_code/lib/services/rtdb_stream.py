@@ -0,0 +1,174 @@
+"""
+RTDB Stream Module
+Path: lib/services/rtdb_stream.py
+
+Bridges a Firebase RTDB listen() stream into an asyncio event loop.
+
+Why:
+    WebRTC signaling used to poll — offer_ref.get() every 500 ms and the
+    whole iceCandidates/mobile node every 200 ms — which is constant RTDB
+    traffic even with nobody watching, and adds up to one poll period of
+    latency to every offer and candidate. listen() keeps one server-sent
+    events connection open instead: nothing is transferred while the node
+    is unchanged, and changes arrive as soon as they are written.
+
+Threading:
+    firebase_admin delivers listen() events on its own background thread.
+    Each event is handed to the loop with call_soon_threadsafe(), applied
+    to a local mirror of the node (snapshot) and queued. Opening the stream
+    is a blocking HTTP request, so open() runs it in the default executor.
+    Every queued event carries the snapshot as it was right after that
+    event — snapshots are copied on write, never mutated — so events that
+    land together are not collapsed into the latest state.
+
+Event model (firebase_admin.db.Event):
+    put   — data replaces the value at path ("/" = the whole node). The
+            first event after opening is always a put of the current value.
+    patch — data's keys are merged into the value at path.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import asyncio
+from typing import Any, Optional, Tuple
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class RTDBStreamError(Exception):
+    """Raised when a listen() stream cannot be opened."""
+    pass
+
+
+# ─────────────────────────── SNAPSHOT ────────────────────────────────────────
+
+def _put(snapshot: Any, parts: list, data: Any) -> Any:
+    """Return snapshot with data stored (None = deleted) at the path parts."""
+    if not parts:
+        return data
+    node = dict(snapshot) if isinstance(snapshot, dict) else {}
+    child = _put(node.get(parts[0]), parts[1:], data)
+    if child is None:
+        node.pop(parts[0], None)
+    else:
+        node[parts[0]] = child
+    return node or None
+
+
+def apply_event(snapshot: Any, event_type: str, path: str, data: Any) -> Any:
+    """Apply one put / patch event to a local mirror of the node."""
+    parts = [part for part in (path or "/").split("/") if part]
+    if event_type == "patch" and isinstance(data, dict):
+        for key, value in data.items():
+            snapshot = _put(snapshot, parts + [p for p in key.split("/") if p], value)
+        return snapshot
+    return _put(snapshot, parts, data)
+
+
+# ─────────────────────────── STREAM ──────────────────────────────────────────
+
+class RTDBStream:
+    """
+    Example:
+        stream = RTDBStream(db.reference("liveStream/uid/device/offer"))
+        await stream.open()                 # raises RTDBStreamError
+        async for event_type, path, data, snapshot in stream:
+            handle(snapshot)                # whole node after this event
+        ...
+        stream.close()                      # ends the async for
+    """
+
+    _CLOSED = object()
+
+    def __init__(self, ref):
+        self.ref      = ref
+        self.snapshot : Any = None
+        self.events   : int = 0
+        self.closed   : bool = False
+
+        self._loop         : Optional[asyncio.AbstractEventLoop] = None
+        self._queue        : Optional[asyncio.Queue] = None
+        self._registration = None
+
+    async def open(self) -> "RTDBStream":
+        """
+        Start listening.
+
+        Raises:
+            RTDBStreamError: If the stream could not be opened.
+        """
+        self._loop  = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        try:
+            self._registration = await self._loop.run_in_executor(
+                None, self.ref.listen, self._on_event
+            )
+        except Exception as e:
+            self.closed = True
+            raise RTDBStreamError(
+                f"Failed to listen on {getattr(self.ref, 'path', self.ref)}: {e}. "
+                f"Source: {__name__}"
+            ) from e
+        if self.closed:
+            # close() was called while the stream was opening
+            self._close_registration()
+        return self
+
+    def _on_event(self, event) -> None:
+        """Runs on the firebase_admin listener thread."""
+        if self.closed:
+            return
+        try:
+            self._loop.call_soon_threadsafe(
+                self._deliver, event.event_type, event.path, event.data
+            )
+        except RuntimeError:
+            pass    # Event loop already closed
+
+    def _deliver(self, event_type: str, path: str, data: Any) -> None:
+        if self.closed:
+            return
+        self.snapshot  = apply_event(self.snapshot, event_type, path, data)
+        self.events   += 1
+        self._queue.put_nowait((event_type, path, data, self.snapshot))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Tuple[str, str, Any, Any]:
+        if self._queue is None:
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is self._CLOSED:
+            raise StopAsyncIteration
+        return item
+
+    def close(self) -> None:
+        """Stop listening. Safe to call more than once."""
+        if self.closed and self._registration is None:
+            return
+        self.closed = True
+        self._close_registration()
+        if self._queue is not None:
+            self._queue.put_nowait(self._CLOSED)
+
+    def _close_registration(self) -> None:
+        registration, self._registration = self._registration, None
+        if registration is None:
+            return
+
+        def _close():
+            try:
+                registration.close()    # Joins the listener thread
+            except Exception:
+                pass
+
+        if self._loop is not None and self._loop.is_running():
+            self._loop.run_in_executor(None, _close)
+        else:
+            _close()
+
+    def __repr__(self) -> str:
+        return f"RTDBStream({getattr(self.ref, 'path', self.ref)}, events={self.events})"
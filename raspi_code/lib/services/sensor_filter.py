@@ -0,0 +1,309 @@
+"""
+Sensor Filter Module
+Path: lib/services/sensor_filter.py
+
+Streaming filter pipeline for HC-SR04 level sensors.
+
+Why streaming:
+    ultrasonic_controller._median_distance() fires SAMPLE_COUNT readings with
+    30ms sleeps and returns one median — every published value is ~150ms old
+    and the sensor is idle between bursts. A streaming chain takes ONE raw
+    sample at a time and emits a fresh filtered value after every sample,
+    so the output rate equals the raw sample rate and lag is bounded by the
+    filter window, not by the burst.
+
+Pipeline:
+    raw cm → range gate → stage 1 → stage 2 → ... → filtered cm
+
+    Each stage keeps its own ring buffer (collections.deque with maxlen) and
+    returns either a value for the next stage or None to reject the sample.
+    A rejected sample publishes nothing; the previous value stays current.
+
+Stages (selected by name in the chain spec):
+    median[:N]     — sliding median over the last N accepted samples (N=5)
+    iqr[:N[:K]]    — rejects samples outside [Q1 - K·IQR, Q3 + K·IQR] of the
+                     last N samples (N=25, K=1.5). Needs 4 samples to engage.
+    ewma[:ALPHA]   — exponential moving average, y += ALPHA·(x − y) (0.3)
+    kalman[:Q[:R]] — 1-D constant-level Kalman filter with process noise Q
+                     and measurement noise R in cm² (Q=0.05, R=4.0)
+
+Chain spec:
+    Comma separated, applied left to right, e.g. "iqr:25,median:5,ewma:0.3".
+    Set via SENSOR_FILTER_CHAIN in credentials/.env.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import List, Optional
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class SensorFilterError(Exception):
+    """Base exception for sensor filter errors."""
+    pass
+
+class SensorFilterConfigError(SensorFilterError):
+    """Raised when a filter chain spec cannot be parsed."""
+    pass
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+DEFAULT_CHAIN_SPEC = "median:5"   # Same smoothing as the old 5-sample burst
+
+VALID_MIN_CM = 2.0
+VALID_MAX_CM = 400.0
+
+QUALITY_WINDOW = 20   # Raw samples considered by FilterChain.quality
+
+
+# ─────────────────────────── STAGES ──────────────────────────────────────────
+
+class FilterStage(ABC):
+    """A single streaming stage. update() returns the output or None (reject)."""
+
+    name = "stage"
+
+    @abstractmethod
+    def update(self, value: float) -> Optional[float]:
+        ...
+
+    def reset(self) -> None:
+        pass
+
+
+class SlidingMedian(FilterStage):
+    """Median of the last `window` accepted samples."""
+
+    name = "median"
+
+    def __init__(self, window: int = 5):
+        if window < 1:
+            raise SensorFilterConfigError(f"median window must be >= 1, got {window}")
+        self._ring = deque(maxlen=window)
+
+    def update(self, value: float) -> Optional[float]:
+        self._ring.append(value)
+        ordered = sorted(self._ring)
+        n       = len(ordered)
+        mid     = n // 2
+        if n % 2:
+            return ordered[mid]
+        return (ordered[mid - 1] + ordered[mid]) / 2
+
+    def reset(self) -> None:
+        self._ring.clear()
+
+
+class IQRReject(FilterStage):
+    """
+    Interquartile-range outlier gate — the streaming form of the 50-sample
+    prototype in test/test_sensor_iqr.py.
+
+    The sample is judged against the window BEFORE it is added, then always
+    appended so a genuine step change is accepted once it fills the window.
+    """
+
+    name = "iqr"
+
+    def __init__(self, window: int = 25, k: float = 1.5):
+        if window < 4:
+            raise SensorFilterConfigError(f"iqr window must be >= 4, got {window}")
+        if not 0 <= k < math.inf:
+            raise SensorFilterConfigError(f"iqr k must be a finite number >= 0, got {k}")
+        self._ring = deque(maxlen=window)
+        self._k    = k
+
+    def update(self, value: float) -> Optional[float]:
+        accept = True
+        if len(self._ring) >= 4:
+            ordered = sorted(self._ring)
+            n       = len(ordered)
+            q1      = ordered[n // 4]
+            q3      = ordered[(3 * n) // 4]
+            iqr     = q3 - q1
+            accept  = (q1 - self._k * iqr) <= value <= (q3 + self._k * iqr)
+
+        self._ring.append(value)
+        return value if accept else None
+
+    def reset(self) -> None:
+        self._ring.clear()
+
+
+class EWMA(FilterStage):
+    """Exponentially weighted moving average."""
+
+    name = "ewma"
+
+    def __init__(self, alpha: float = 0.3):
+        if not 0.0 < alpha <= 1.0:
+            raise SensorFilterConfigError(f"ewma alpha must be in (0, 1], got {alpha}")
+        self._alpha = alpha
+        self._value : Optional[float] = None
+
+    def update(self, value: float) -> Optional[float]:
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self._alpha * (value - self._value)
+        return self._value
+
+    def reset(self) -> None:
+        self._value = None
+
+
+class Kalman1D(FilterStage):
+    """
+    Scalar Kalman filter for a slowly changing level.
+
+    State model: level(t) = level(t-1) + w,  w ~ N(0, Q)
+    Measurement: z(t)     = level(t)   + v,  v ~ N(0, R)
+    """
+
+    name = "kalman"
+
+    def __init__(self, q: float = 0.05, r: float = 4.0):
+        if not (0 < q < math.inf and 0 < r < math.inf):
+            raise SensorFilterConfigError(f"kalman q and r must be finite and > 0, got q={q} r={r}")
+        self._q = q
+        self._r = r
+        self._x : Optional[float] = None
+        self._p = 0.0
+
+    def update(self, value: float) -> Optional[float]:
+        if self._x is None:
+            self._x = value
+            self._p = self._r
+            return self._x
+
+        self._p += self._q
+        gain     = self._p / (self._p + self._r)
+        self._x += gain * (value - self._x)
+        self._p *= (1 - gain)
+        return self._x
+
+    def reset(self) -> None:
+        self._x = None
+        self._p = 0.0
+
+
+STAGES = {
+    SlidingMedian.name : SlidingMedian,
+    IQRReject.name     : IQRReject,
+    EWMA.name          : EWMA,
+    Kalman1D.name      : Kalman1D,
+}
+
+
+# ─────────────────────────── CHAIN ───────────────────────────────────────────
+
+class FilterChain:
+    """
+    Ordered list of stages with a range gate in front.
+
+    Example:
+        chain = build_filter_chain("iqr:25,median:5,ewma:0.3")
+        for raw in samples:
+            value = chain.update(raw)
+            if value is not None:
+                publish(value)
+    """
+
+    def __init__(self, stages: List[FilterStage], spec: str = ""):
+        self.stages   = stages
+        self.spec     = spec
+        self.accepted = 0
+        self.rejected = 0
+        self.last     : Optional[float] = None
+        self._recent  = deque(maxlen=QUALITY_WINDOW)
+
+    @property
+    def quality(self) -> float:
+        """Share of the last QUALITY_WINDOW raw samples that were accepted."""
+        if not self._recent:
+            return 0.0
+        return sum(self._recent) / len(self._recent)
+
+    def update(self, raw_cm: float) -> Optional[float]:
+        """
+        Feed one raw sample through the chain.
+
+        Returns:
+            Filtered distance in cm, or None if the sample was rejected
+            (out of range, or dropped by a stage).
+        """
+        if not VALID_MIN_CM <= raw_cm <= VALID_MAX_CM:
+            self.rejected += 1
+            self._recent.append(False)
+            return None
+
+        value = raw_cm
+        for stage in self.stages:
+            value = stage.update(value)
+            if value is None:
+                self.rejected += 1
+                self._recent.append(False)
+                return None
+
+        self.accepted += 1
+        self._recent.append(True)
+        self.last      = round(value, 2)
+        return self.last
+
+    def reset(self) -> None:
+        for stage in self.stages:
+            stage.reset()
+        self.accepted = 0
+        self.rejected = 0
+        self.last     = None
+        self._recent.clear()
+
+    def __repr__(self) -> str:
+        return f"FilterChain({self.spec or 'passthrough'})"
+
+
+def build_filter_chain(spec: str = DEFAULT_CHAIN_SPEC) -> FilterChain:
+    """
+    Build a FilterChain from a comma separated spec string.
+
+    Args:
+        spec: e.g. "iqr:25:1.5,median:5,kalman:0.05:4". Empty = passthrough.
+
+    Raises:
+        SensorFilterConfigError: Unknown stage name or bad parameter
+                                 (including a non-integer window size).
+    """
+    stages = []
+    for token in (spec or "").split(","):
+        token = token.strip().lower()
+        if not token:
+            continue
+
+        name, *params = token.split(":")
+        cls = STAGES.get(name)
+        if cls is None:
+            raise SensorFilterConfigError(
+                f"Unknown filter stage '{name}'. Valid: {', '.join(STAGES)}. "
+                f"Source: {__name__}"
+            )
+
+        try:
+            values = [float(p) for p in params]
+            if cls in (SlidingMedian, IQRReject) and values:
+                if not values[0].is_integer():
+                    raise ValueError(f"window size must be a whole number, got {params[0]}")
+                values[0] = int(values[0])
+            stages.append(cls(*values))
+        except (TypeError, ValueError) as e:
+            raise SensorFilterConfigError(
+                f"Bad parameters for filter stage '{token}': {e}. Source: {__name__}"
+            ) from e
+
+    return FilterChain(stages, spec=spec)
@@ -0,0 +1,291 @@
+"""
+Sensor Ring Module
+Path: lib/services/sensor_ring.py
+
+Shared-memory history ring for one level sensor — written by process_c,
+read lock-free by process_b (and anything else that attaches by name).
+
+Why not multiprocessing.Value:
+    A bare Value only holds the latest float. A reader cannot tell a fresh
+    reading from one that has been stale for minutes because the sensor
+    died, and it never sees the samples between two of its own ticks.
+    Every record here carries its own sequence number and timestamp.
+
+Layout (multiprocessing.shared_memory, little endian):
+    header  32 bytes   magic u32 | capacity u32 | write_seq u64 |
+                       lock_seq u64 | reserved u64
+    slot    40 bytes   seq u64 | timestamp f64 | raw_cm f64 |
+                       percent f64 | quality f64
+
+    Record N (1-based) lives in slot (N - 1) % capacity.
+
+Seqlock protocol (single writer, any number of readers):
+    writer: lock_seq += 1 (odd) → write slot → write_seq += 1 → lock_seq += 1
+    reader: s1 = lock_seq (retry while odd) → copy bytes → s2 = lock_seq
+            → accept the copy only if s1 == s2 and every copied slot holds
+              the seq it should, otherwise retry
+
+    The per-slot seq check is a second guard: plain Python has no memory
+    barriers, and on the Pi's weakly ordered ARM cores a reader could see
+    the new lock_seq / write_seq before the slot bytes they cover.
+
+    Readers never take a lock and never block the writer. Records are
+    copied out as raw bytes and decoded with struct — no pickling.
+
+Record fields:
+    seq        — 1-based sequence number, strictly increasing
+    timestamp  — time.time() when the raw sample was taken
+    raw_cm     — raw _measure_once() distance (0.0 = timeout / no echo)
+    percent    — latest filtered fill level (NaN until the first accept)
+    quality    — share of recent raw samples accepted by the filter (0–1)
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import math
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import List, NamedTuple, Optional
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class SensorRingError(Exception):
+    """Base exception for sensor ring errors."""
+    pass
+
+class SensorRingAttachError(SensorRingError):
+    """Raised when a ring cannot be created or attached."""
+    pass
+
+class SensorRingReadError(SensorRingError):
+    """Raised when a consistent snapshot could not be read."""
+    pass
+
+
+# ─────────────────────────── LAYOUT ──────────────────────────────────────────
+
+MAGIC            = 0x43555231            # "CUR1"
+HEADER           = struct.Struct("<IIQQQ")
+SLOT             = struct.Struct("<Qdddd")
+WRITE_SEQ_OFFSET = 8
+LOCK_SEQ_OFFSET  = 16
+U64              = struct.Struct("<Q")
+
+DEFAULT_CAPACITY = 1024                   # ~60 s of history at 16 Hz
+READ_RETRIES     = 1000
+
+
+class SensorRecord(NamedTuple):
+    seq       : int
+    timestamp : float
+    raw_cm    : float
+    percent   : float
+    quality   : float
+
+
+# ─────────────────────────── RING ────────────────────────────────────────────
+
+class SensorRing:
+    """
+    Fixed-capacity record ring in shared memory.
+
+    Example:
+        # main.py — owner
+        ring = SensorRing.create(capacity=1024)
+
+        # process_c — writer
+        ring.write(raw_cm=123.4, percent=61.2, quality=1.0)
+
+        # process_b — reader
+        rec = ring.latest()
+        if rec is None or ring.age() > 10:
+            ...  # no data or sensor stale
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm   = shm
+        self._buf   = shm.buf
+        self._owner = owner
+
+        magic, capacity, _, _, _ = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise SensorRingAttachError(
+                f"Shared memory '{shm.name}' is not a sensor ring. Source: {__name__}"
+            )
+        self.capacity = capacity
+
+    # ─────────────────────────── LIFECYCLE ───────────────────────────────────
+
+    @classmethod
+    def create(cls, capacity: int = DEFAULT_CAPACITY, name: Optional[str] = None) -> "SensorRing":
+        """
+        Allocate and initialize a new ring. The creator owns it and should
+        call unlink() once every process is done.
+
+        Raises:
+            SensorRingAttachError: If the shared memory block cannot be created.
+        """
+        size = HEADER.size + capacity * SLOT.size
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except Exception as e:
+            raise SensorRingAttachError(
+                f"Could not create sensor ring ({size} bytes): {e}. Source: {__name__}"
+            ) from e
+
+        shm.buf[:size] = bytes(size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, capacity, 0, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SensorRing":
+        """
+        Attach to an existing ring by shared memory name.
+
+        Raises:
+            SensorRingAttachError: If no ring with that name exists.
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=False)
+        except Exception as e:
+            raise SensorRingAttachError(
+                f"Could not attach sensor ring '{name}': {e}. Source: {__name__}"
+            ) from e
+        return cls(shm, owner=False)
+
+    def __reduce__(self):
+        # Child processes re-attach by name instead of pickling the buffer
+        return (SensorRing.attach, (self.name,))
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def close(self) -> None:
+        """Detach this process's mapping."""
+        self._buf = None
+        try:
+            self._shm.close()
+        except Exception:
+            pass
+
+    def unlink(self) -> None:
+        """Free the shared memory block. Owner only; safe to call twice."""
+        self.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    # ─────────────────────────── WRITER ──────────────────────────────────────
+
+    def write(
+        self,
+        raw_cm    : float,
+        percent   : float,
+        quality   : float,
+        timestamp : Optional[float] = None,
+    ) -> int:
+        """
+        Append one record. Single writer only.
+
+        Returns:
+            The sequence number of the new record.
+        """
+        buf       = self._buf
+        lock_seq  = U64.unpack_from(buf, LOCK_SEQ_OFFSET)[0]
+        write_seq = U64.unpack_from(buf, WRITE_SEQ_OFFSET)[0]
+        seq       = write_seq + 1
+        slot      = HEADER.size + ((seq - 1) % self.capacity) * SLOT.size
+
+        U64.pack_into(buf, LOCK_SEQ_OFFSET, lock_seq + 1)
+        SLOT.pack_into(
+            buf, slot,
+            seq,
+            time.time() if timestamp is None else timestamp,
+            raw_cm,
+            percent,
+            quality,
+        )
+        U64.pack_into(buf, WRITE_SEQ_OFFSET, seq)
+        U64.pack_into(buf, LOCK_SEQ_OFFSET, lock_seq + 2)
+        return seq
+
+    # ─────────────────────────── READERS ─────────────────────────────────────
+
+    def _snapshot(self, first_seq: int, last_seq: int) -> List[SensorRecord]:
+        """Copy records first_seq..last_seq (inclusive) without tearing."""
+        if last_seq < first_seq:
+            return []
+        start = (first_seq - 1) % self.capacity
+        count = last_seq - first_seq + 1
+        head  = min(count, self.capacity - start)
+
+        a = HEADER.size + start * SLOT.size
+        raw = bytes(self._buf[a:a + head * SLOT.size])
+        if count > head:
+            raw += bytes(self._buf[HEADER.size:HEADER.size + (count - head) * SLOT.size])
+        return [SensorRecord(*fields) for fields in SLOT.iter_unpack(raw)]
+
+    def _read(self, pick) -> List[SensorRecord]:
+        """
+        Run a seqlock-protected read. `pick(write_seq)` returns the inclusive
+        (first_seq, last_seq) range to copy.
+
+        Raises:
+            SensorRingReadError: If the writer kept interfering for
+                                 READ_RETRIES attempts (should never happen
+                                 at sensor rates).
+        """
+        buf = self._buf
+        for _ in range(READ_RETRIES):
+            s1 = U64.unpack_from(buf, LOCK_SEQ_OFFSET)[0]
+            if s1 & 1:
+                continue
+            write_seq         = U64.unpack_from(buf, WRITE_SEQ_OFFSET)[0]
+            first, last       = pick(write_seq)
+            first             = max(first, write_seq - self.capacity + 1, 1)
+            records           = self._snapshot(first, last)
+            if U64.unpack_from(buf, LOCK_SEQ_OFFSET)[0] != s1:
+                continue
+            if all(record.seq == seq for seq, record in enumerate(records, first)):
+                return records
+        raise SensorRingReadError(
+            f"Sensor ring '{self.name}' read did not stabilise. Source: {__name__}"
+        )
+
+    def latest(self) -> Optional[SensorRecord]:
+        """Most recent record, or None if nothing has been written yet."""
+        records = self._read(lambda ws: (ws, ws))
+        return records[0] if records else None
+
+    def since(self, seq: int) -> List[SensorRecord]:
+        """
+        All records with sequence number > seq, oldest first.
+        If the reader fell more than `capacity` behind, the oldest
+        records are gone — compare the first seq with seq + 1 to detect it.
+        """
+        return self._read(lambda ws: (seq + 1, ws))
+
+    def last(self, k: int) -> List[SensorRecord]:
+        """The last k records (fewer if not written yet), oldest first."""
+        return self._read(lambda ws: (ws - k + 1, ws))
+
+    def write_seq(self) -> int:
+        """Sequence number of the newest record (0 = empty)."""
+        return U64.unpack_from(self._buf, WRITE_SEQ_OFFSET)[0]
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since the newest record. math.inf if the ring is empty."""
+        rec = self.latest()
+        if rec is None:
+            return math.inf
+        return (time.time() if now is None else now) - rec.timestamp
+
+    def __repr__(self) -> str:
+        return f"SensorRing(name={self.name}, capacity={self.capacity})"
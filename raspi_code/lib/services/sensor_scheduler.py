@@ -0,0 +1,251 @@
+"""
+Sensor Scheduler Module
+Path: lib/services/sensor_scheduler.py
+
+Configurable ultrasonic sensor registry + crosstalk-aware time-slot scheduler.
+
+Registry:
+    ULTRASONIC_SENSORS in credentials/.env lists every sensor as
+        name:trig:echo[:zone[:full_cm:empty_cm]]
+    separated by commas, e.g.
+        feed:25:22:coop,water:7:8:coop,feed2:5:6:shed,trough2:13:19:shed
+
+    zone       — sensors in the same zone can hear each other's pings
+                 (same tank, same enclosure). Default "default".
+    full_cm    — distance at 100% (default 10)
+    empty_cm   — distance at 0%   (default 300)
+
+    "feed" and "water" are required — process_b drives its LCD, warnings
+    and Firebase levels from those two names.
+
+Slot plan:
+    Time is divided into slots of slot_seconds (default ECHO_TIMEOUT, long
+    enough for the slowest echo to die out). Sensors sharing a zone are put
+    into DIFFERENT slots; sensors in different zones share a slot and fire
+    together (ultrasonic_controller.measure_concurrent).
+
+        slots per frame  = size of the largest zone
+        samples / second = N / (slots × slot_seconds)
+
+    With Z equal zones, aggregate throughput grows with N instead of
+    dropping as 1/N. Sequential left→right reading is the special case of
+    a single zone.
+
+    The poll backend cannot time two echoes at once, so with it every
+    sensor gets its own slot (old behaviour).
+
+Guard gap:
+    A slot is a start time, not a deadline — an echo wait can run up to
+    ECHO_TIMEOUT × 2, past the end of its slot. So whenever the next slot
+    shares a zone with the previous one, it never opens less than
+    guard_seconds (default GUARD_SECONDS, the old 30ms sample spacing) after
+    the previous measurement finished, i.e. after next_slot() is called.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import time
+from collections import defaultdict
+from typing import List, NamedTuple, Sequence
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class SensorSchedulerError(Exception):
+    """Base exception for sensor scheduler errors."""
+    pass
+
+class SensorRegistryError(SensorSchedulerError):
+    """Raised when the ULTRASONIC_SENSORS spec is invalid."""
+    pass
+
+
+# ─────────────────────────── REGISTRY ────────────────────────────────────────
+
+DEFAULT_REGISTRY_SPEC = "feed:25:22:tank,water:7:8:tank"
+REQUIRED_SENSORS      = ("feed", "water")
+DEFAULT_ZONE          = "default"
+DEFAULT_FULL_CM       = 10
+DEFAULT_EMPTY_CM      = 300
+GUARD_SECONDS         = 0.03    # Quiet time between same-zone measurements
+
+
+class SensorSpec(NamedTuple):
+    name     : str
+    trig     : int
+    echo     : int
+    zone     : str   = DEFAULT_ZONE
+    full_cm  : float = DEFAULT_FULL_CM
+    empty_cm : float = DEFAULT_EMPTY_CM
+
+
+def parse_sensor_registry(
+    spec     : str = DEFAULT_REGISTRY_SPEC,
+    required : Sequence[str] = REQUIRED_SENSORS,
+) -> List[SensorSpec]:
+    """
+    Parse a comma separated registry spec.
+
+    Raises:
+        SensorRegistryError: Malformed entry, duplicate name or pin, or a
+                             required sensor name missing.
+    """
+    sensors = []
+    for entry in (spec or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        parts = entry.split(":")
+        if len(parts) not in (3, 4, 6):
+            raise SensorRegistryError(
+                f"Bad sensor entry '{entry}' — expected "
+                f"name:trig:echo[:zone[:full_cm:empty_cm]]. Source: {__name__}"
+            )
+        try:
+            sensor = SensorSpec(
+                name     = parts[0],
+                trig     = int(parts[1]),
+                echo     = int(parts[2]),
+                zone     = parts[3] if len(parts) > 3 and parts[3] else DEFAULT_ZONE,
+                full_cm  = float(parts[4]) if len(parts) > 4 else DEFAULT_FULL_CM,
+                empty_cm = float(parts[5]) if len(parts) > 5 else DEFAULT_EMPTY_CM,
+            )
+        except ValueError as e:
+            raise SensorRegistryError(
+                f"Bad number in sensor entry '{entry}': {e}. Source: {__name__}"
+            ) from e
+
+        if sensor.full_cm >= sensor.empty_cm:
+            raise SensorRegistryError(
+                f"Sensor '{sensor.name}': full_cm must be below empty_cm. Source: {__name__}"
+            )
+        sensors.append(sensor)
+
+    names = [s.name for s in sensors]
+    pins  = [p for s in sensors for p in (s.trig, s.echo)]
+    if len(set(names)) != len(names):
+        raise SensorRegistryError(f"Duplicate sensor names in '{spec}'. Source: {__name__}")
+    if len(set(pins)) != len(pins):
+        raise SensorRegistryError(f"A GPIO pin is used twice in '{spec}'. Source: {__name__}")
+
+    missing = [name for name in required if name not in names]
+    if missing:
+        raise SensorRegistryError(
+            f"Required sensors missing from registry: {', '.join(missing)}. Source: {__name__}"
+        )
+    return sensors
+
+
+# ─────────────────────────── SLOT PLAN ───────────────────────────────────────
+
+def plan_slots(sensors: Sequence[SensorSpec], concurrent: bool = True) -> List[List[SensorSpec]]:
+    """
+    Assign sensors to time slots so no two sensors of one zone share a slot.
+
+    Greedy: zones are placed largest first, each sensor into the least
+    loaded slot that does not already hold its zone. The slot count is the
+    largest zone size, which is the minimum possible.
+    """
+    if not concurrent:
+        return [[sensor] for sensor in sensors]
+
+    zones = defaultdict(list)
+    for sensor in sensors:
+        zones[sensor.zone].append(sensor)
+
+    n_slots = max((len(members) for members in zones.values()), default=0)
+    slots   = [[] for _ in range(n_slots)]
+
+    for zone in sorted(zones, key=lambda z: -len(zones[z])):
+        used = set()
+        for sensor in zones[zone]:
+            free = [i for i in range(n_slots) if i not in used]
+            best = min(free, key=lambda i: len(slots[i]))
+            slots[best].append(sensor)
+            used.add(best)
+    return slots
+
+
+# ─────────────────────────── SCHEDULER ───────────────────────────────────────
+
+class SensorScheduler:
+    """
+    Paces slots on a fixed monotonic grid.
+
+    Example:
+        scheduler = SensorScheduler(sensors, concurrent=distance.supports_concurrent())
+        while running:
+            slot = scheduler.next_slot()          # sleeps until the slot opens
+            raws = distance.measure_concurrent([(s.trig, s.echo) for s in slot])
+    """
+
+    def __init__(
+        self,
+        sensors       : Sequence[SensorSpec],
+        concurrent    : bool  = True,
+        slot_seconds  : float = 0.04,
+        guard_seconds : float = GUARD_SECONDS,
+    ):
+        if not sensors:
+            raise SensorSchedulerError(f"No sensors to schedule. Source: {__name__}")
+        self.sensors       = list(sensors)
+        self.slot_seconds  = slot_seconds
+        self.guard_seconds = guard_seconds
+        self.slots         = plan_slots(self.sensors, concurrent=concurrent)
+        self.overruns      = 0
+        self.guarded       = 0        # Slots delayed by the guard gap
+
+        # _shares_zone[i]: slot i has a zone in common with slot i - 1
+        zones = [{sensor.zone for sensor in slot} for slot in self.slots]
+        self._shares_zone = [bool(zones[i] & zones[i - 1]) for i in range(len(zones))]
+        self._index       = -1
+        self._next_start  = None
+
+    @property
+    def frame_seconds(self) -> float:
+        return len(self.slots) * self.slot_seconds
+
+    @property
+    def samples_per_second(self) -> float:
+        """Planned aggregate raw sample rate across all sensors."""
+        return len(self.sensors) / self.frame_seconds
+
+    def next_slot(self) -> List[SensorSpec]:
+        """
+        Sleep until the next slot opens and return the sensors to fire.
+        Call it right after the previous measurement finished — that moment
+        anchors the guard gap.
+
+        If the caller fell more than one slot behind (slow I/O, overload) the
+        grid is re-anchored to now — sensors are never fired early to catch up,
+        because early firing is exactly what causes crosstalk.
+        """
+        now   = time.monotonic()
+        index = (self._index + 1) % len(self.slots)
+        if self._next_start is None:
+            start = now
+        else:
+            if now - self._next_start > self.slot_seconds:
+                self.overruns += 1
+                start = now
+            else:
+                start = self._next_start
+            if self._shares_zone[index] and start < now + self.guard_seconds:
+                self.guarded += 1
+                start = now + self.guard_seconds
+            time.sleep(max(start - now, 0.0))
+
+        self._index      = index
+        self._next_start = start + self.slot_seconds
+        return self.slots[index]
+
+    def describe(self) -> str:
+        plan = " | ".join(",".join(s.name for s in slot) for slot in self.slots)
+        return (
+            f"{len(self.sensors)} sensors in {len(self.slots)} slots × "
+            f"{self.slot_seconds * 1000:.0f}ms [{plan}] → "
+            f"{self.samples_per_second:.1f} samples/s"
+        )
@@ -0,0 +1,189 @@
+"""
+Sensor Trace Module
+Path: lib/services/sensor_trace.py
+
+Compact binary recorder for raw HC-SR04 samples, so filters can be compared
+offline (test/eval_sensor_filters.py) instead of by watching the tank.
+
+File format (little endian):
+    header  16 bytes   magic b"CUTRACE1" | version u32 | record size u32
+    record  13 bytes   t_ns i64 (time.monotonic_ns) | sensor u8 | cm f32
+
+    One hour of both sensors at ~16 Hz each is ~1.5 MB.
+    Files are append-only; a partially written final record is ignored by
+    load_trace() and trimmed when TraceRecorder reopens the file (a torn
+    header is rewritten), so a power cut never corrupts earlier data. A
+    file of another format is refused rather than appended to.
+
+Sensor ids:
+    SENSOR_FEED  = 0   (left)
+    SENSOR_WATER = 1   (right)
+
+Recording avoids numpy so process_c does not pay for the import; loading
+uses numpy.frombuffer with a structured dtype (no per-record work).
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import os
+import struct
+from typing import Optional
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class SensorTraceError(Exception):
+    """Base exception for sensor trace errors."""
+    pass
+
+class SensorTraceWriteError(SensorTraceError):
+    """Raised when the trace file cannot be opened or written."""
+    pass
+
+class SensorTraceFormatError(SensorTraceError):
+    """Raised when a trace file has a bad header."""
+    pass
+
+
+# ─────────────────────────── FORMAT ──────────────────────────────────────────
+
+MAGIC        = b"CUTRACE1"
+VERSION      = 1
+HEADER       = struct.Struct("<8sII")
+RECORD       = struct.Struct("<qBf")
+
+SENSOR_FEED  = 0
+SENSOR_WATER = 1
+SENSOR_NAMES = {SENSOR_FEED: "feed", SENSOR_WATER: "water"}
+
+FLUSH_BYTES  = 64 * 1024
+
+
+def trace_dtype():
+    """numpy structured dtype matching RECORD. Imported lazily."""
+    import numpy as np
+    return np.dtype([("t_ns", "<i8"), ("sensor", "u1"), ("cm", "<f4")])
+
+
+def _check_header(head: bytes, path: str) -> None:
+    """
+    Raises:
+        SensorTraceFormatError: Missing or mismatched header.
+    """
+    if len(head) < HEADER.size:
+        raise SensorTraceFormatError(f"Trace file too short: {path}. Source: {__name__}")
+    magic, version, rec_size = HEADER.unpack(head)
+    if magic != MAGIC or version != VERSION or rec_size != RECORD.size:
+        raise SensorTraceFormatError(
+            f"Not a Chick-Up sensor trace (magic={magic!r}, version={version}, "
+            f"record={rec_size}): {path}. Source: {__name__}"
+        )
+
+
+# ─────────────────────────── RECORDER ────────────────────────────────────────
+
+class TraceRecorder:
+    """
+    Buffered append-only writer.
+
+    Example:
+        rec = TraceRecorder("logs/sensors.trace")
+        rec.append(SENSOR_FEED, time.monotonic_ns(), 123.4)
+        ...
+        rec.close()
+    """
+
+    def __init__(self, path: str):
+        """
+        Create the file, or append to an existing trace of the same format.
+
+        Raises:
+            SensorTraceFormatError: The existing file is not a trace of this
+                                    magic / version / record size.
+            SensorTraceWriteError:  The file cannot be opened or written.
+        """
+        self.path     = path
+        self.records  = 0
+        self._buffer  = bytearray()
+        try:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            size      = os.path.getsize(path) if os.path.exists(path) else 0
+            if size >= HEADER.size:
+                with open(path, "rb") as fh:
+                    _check_header(fh.read(HEADER.size), path)
+            self._fh  = open(path, "ab")
+            if size < HEADER.size:
+                # New file, or a header torn by a power cut — start over
+                self._fh.truncate(0)
+                self._fh.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            else:
+                # Drop a torn final record so new appends stay aligned
+                torn = (size - HEADER.size) % RECORD.size
+                if torn:
+                    self._fh.truncate(size - torn)
+        except OSError as e:
+            raise SensorTraceWriteError(
+                f"Could not open trace file {path}: {e}. Source: {__name__}"
+            ) from e
+
+    def append(self, sensor: int, t_ns: int, cm: float) -> None:
+        """Queue one raw sample. Flushes to disk every FLUSH_BYTES."""
+        self._buffer += RECORD.pack(t_ns, sensor, cm)
+        self.records += 1
+        if len(self._buffer) >= FLUSH_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Raises:
+            SensorTraceWriteError: If the write fails (disk full, etc.).
+        """
+        if not self._buffer:
+            return
+        try:
+            self._fh.write(self._buffer)
+            self._fh.flush()
+        except OSError as e:
+            raise SensorTraceWriteError(
+                f"Trace write failed for {self.path}: {e}. Source: {__name__}"
+            ) from e
+        finally:
+            self._buffer.clear()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._fh.close()
+
+
+# ─────────────────────────── LOADER ──────────────────────────────────────────
+
+def load_trace(path: str, sensor: Optional[int] = None):
+    """
+    Load a trace file into a numpy structured array.
+
+    Args:
+        path:   Trace file written by TraceRecorder.
+        sensor: Optional sensor id filter.
+
+    Returns:
+        numpy array with fields t_ns, sensor, cm — in recording order.
+
+    Raises:
+        SensorTraceFormatError: Missing or mismatched header.
+    """
+    import numpy as np
+
+    with open(path, "rb") as fh:
+        _check_header(fh.read(HEADER.size), path)
+        payload = fh.read()
+
+    usable = len(payload) - (len(payload) % RECORD.size)
+    data   = np.frombuffer(payload[:usable], dtype=trace_dtype())
+    if sensor is not None:
+        data = data[data["sensor"] == sensor]
+    return data
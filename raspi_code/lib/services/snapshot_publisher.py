@@ -0,0 +1,250 @@
+"""
+Snapshot Publisher Module
+Path: lib/services/snapshot_publisher.py
+
+Small JPEG previews of the camera for the app, without WebRTC.
+
+Why:
+    Checking that the chicks are fine meant a full WebRTC negotiation
+    through liveStream/... — offer, answer, ICE, often a TURN allocation,
+    and an encoder running on the Pi — for what is usually one look. A
+    thumbnail refreshed once a minute (or on request) answers that for a
+    few kilobytes and a few milliseconds of CPU.
+
+Pipeline (SnapshotPublisher.publish, blocking — run it in a worker):
+    1. signature(): a 32 × 24 luma thumbnail of the frame. Fewer than
+       min_cells thumbnail cells differing from the last published one by
+       more than CELL_DIFF luma levels (sensor noise, auto-exposure drift)
+       means the scene has not changed: only checkedAt is updated, nothing
+       is encoded. Counting cells rather than averaging the difference
+       keeps one chick moving in a large frame from being averaged away.
+    2. encode_jpeg(): I420 / BGR → BGR, downscaled to width (INTER_AREA),
+       cv2.imencode JPEG at quality.
+    3. The JPEG is written atomically to path (tmp file + os.replace), and
+       to the RTDB node as base64 — the stand-in for Cloud Storage, which
+       this project does not use. A 320-pixel-wide JPEG is ~10–20 KB.
+
+RTDB node (snapshots/{userUid}/{deviceUid}):
+    image        base64 JPEG
+    contentType  "image/jpeg"
+    width, height, bytes
+    capturedAt   Unix ms the frame was captured
+    publishedAt  Unix ms the image was written
+    checkedAt    Unix ms of the latest check (changed or not)
+    request      written by the app (any new value) for an immediate
+                 snapshot — watched by process_a, never written here
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import base64
+import os
+import time
+from collections import deque
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class SnapshotError(Exception):
+    """Raised when a frame cannot be converted or encoded."""
+    pass
+
+class SnapshotWriteError(SnapshotError):
+    """Raised when the file or RTDB write fails."""
+    pass
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+DEFAULT_INTERVAL  = 60.0    # Seconds between scheduled snapshots
+DEFAULT_WIDTH     = 320     # JPEG width in pixels (height keeps the aspect)
+DEFAULT_QUALITY   = 70      # cv2.IMWRITE_JPEG_QUALITY
+CELL_DIFF         = 10.0    # Luma levels (0–255) a thumbnail cell must move to count
+DEFAULT_MIN_CELLS = 3       # Changed cells (of 32 × 24) that make a new scene
+MIN_REQUEST_GAP   = 2.0     # Seconds between on-demand snapshots
+MAX_FRAME_AGE     = 10.0    # Older ring frames are refreshed before a snapshot
+FRAME_TIMEOUT     = 5.0     # Longest wait for that refresh ("stop" idle mode restarts the camera)
+SIGNATURE_SIZE    = (32, 24)
+
+
+class Snapshot(NamedTuple):
+    jpeg     : bytes
+    width    : int
+    height   : int
+    captured : float
+
+
+class PublishResult(NamedTuple):
+    published : bool         # False = unchanged scene, only checkedAt written
+    bytes     : int
+    encode_ms : float
+
+
+# ─────────────────────────── FRAMES ──────────────────────────────────────────
+
+def _luma(frame: np.ndarray, pixel_format: str) -> np.ndarray:
+    if pixel_format == "yuv420":
+        return frame[:frame.shape[0] * 2 // 3]
+    if pixel_format == "bgr":
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    raise SnapshotError(f"Unsupported pixel format '{pixel_format}'. Source: {__name__}")
+
+
+def signature(frame: np.ndarray, pixel_format: str, ignore_rows: int = 0) -> np.ndarray:
+    """
+    Tiny luma thumbnail used to tell whether the scene changed.
+    ignore_rows skips the top of the frame (e.g. the latency overlay).
+
+    Raises:
+        SnapshotError: Unsupported pixel format.
+    """
+    luma = _luma(frame, pixel_format)[ignore_rows:]
+    return cv2.resize(luma, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def encode_jpeg(
+    frame        : np.ndarray,
+    pixel_format : str,
+    captured     : float,
+    width        : int = DEFAULT_WIDTH,
+    quality      : int = DEFAULT_QUALITY
+) -> Snapshot:
+    """
+    Raises:
+        SnapshotError: Conversion or encoding failed.
+    """
+    try:
+        if pixel_format == "yuv420":
+            bgr = cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420)
+        elif pixel_format == "bgr":
+            bgr = frame
+        else:
+            raise SnapshotError(f"Unsupported pixel format '{pixel_format}'. Source: {__name__}")
+        src_h, src_w = bgr.shape[:2]
+        if width < src_w:
+            height = max(2, round(src_h * width / src_w) // 2 * 2)
+            bgr    = cv2.resize(bgr, (width, height), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    except cv2.error as e:
+        raise SnapshotError(f"Snapshot encode failed: {e}. Source: {__name__}") from e
+    if not ok:
+        raise SnapshotError(f"cv2.imencode returned no JPEG. Source: {__name__}")
+    return Snapshot(jpeg.tobytes(), bgr.shape[1], bgr.shape[0], captured)
+
+
+# ─────────────────────────── PUBLISHER ───────────────────────────────────────
+
+class SnapshotPublisher:
+    """
+    Example:
+        publisher = SnapshotPublisher("logs/snapshot.jpg", db.reference("snapshots/uid/dev"))
+        frame, captured, _ = frame_buffer.peek()
+        result = publisher.publish(frame.copy(), "yuv420", captured)   # in a worker
+        publisher.published, publisher.unchanged
+
+    Not thread-safe — call publish() from one worker at a time.
+    """
+
+    def __init__(
+        self,
+        path        : Optional[str] = None,
+        ref         = None,
+        width       : int = DEFAULT_WIDTH,
+        quality     : int = DEFAULT_QUALITY,
+        min_cells   : int = DEFAULT_MIN_CELLS,
+        ignore_rows : int = 0
+    ):
+        self.path        = path
+        self.ref         = ref
+        self.width       = width
+        self.quality     = quality
+        self.min_cells   = min_cells
+        self.ignore_rows = ignore_rows
+
+        self.published   : int = 0
+        self.unchanged   : int = 0
+        self.last_bytes  : int = 0
+        self.encode_ms   : deque = deque(maxlen=60)
+        self._signature  : Optional[np.ndarray] = None
+
+    def _changed(self, current: np.ndarray) -> bool:
+        """True if the signature differs from the last published one (or there is none)."""
+        if self._signature is None or self._signature.shape != current.shape:
+            return True
+        return int(np.count_nonzero(np.abs(current - self._signature) > CELL_DIFF)) >= self.min_cells
+
+    def publish(self, frame: np.ndarray, pixel_format: str, captured: float) -> PublishResult:
+        """
+        Publish frame unless the scene is unchanged. Blocking (encode, file
+        and RTDB I/O). frame must be a private copy, not a ring view.
+
+        Raises:
+            SnapshotError: The frame could not be encoded.
+            SnapshotWriteError: The file and / or RTDB write failed (the
+                other target is still written).
+        """
+        now_ms  = int(time.time() * 1000)
+        current = signature(frame, pixel_format, self.ignore_rows)
+        if not self._changed(current):
+            self.unchanged += 1
+            self._write_rtdb({"checkedAt": now_ms})
+            return PublishResult(False, 0, 0.0)
+
+        started   = time.perf_counter()
+        snapshot  = encode_jpeg(frame, pixel_format, captured, self.width, self.quality)
+        encode_ms = (time.perf_counter() - started) * 1000
+        self.encode_ms.append(encode_ms)
+
+        errors = []
+        if self.path:
+            try:
+                self._write_file(snapshot.jpeg)
+            except OSError as e:
+                errors.append(f"file {self.path}: {e}")
+        try:
+            self._write_rtdb({
+                "image"       : base64.b64encode(snapshot.jpeg).decode("ascii"),
+                "contentType" : "image/jpeg",
+                "width"       : snapshot.width,
+                "height"      : snapshot.height,
+                "bytes"       : len(snapshot.jpeg),
+                "capturedAt"  : int(captured * 1000),
+                "publishedAt" : now_ms,
+                "checkedAt"   : now_ms,
+            })
+        except SnapshotWriteError as e:
+            errors.append(str(e))
+
+        # The scene counts as published if any target got it
+        targets = (1 if self.path else 0) + (1 if self.ref is not None else 0)
+        if len(errors) < targets or not targets:
+            self._signature = current
+            self.published += 1
+            self.last_bytes = len(snapshot.jpeg)
+        if errors:
+            raise SnapshotWriteError(f"Snapshot write failed: {'; '.join(errors)}. Source: {__name__}")
+        return PublishResult(True, len(snapshot.jpeg), encode_ms)
+
+    def _write_file(self, jpeg: bytes) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(jpeg)
+        os.replace(tmp, self.path)
+
+    def _write_rtdb(self, fields: dict) -> None:
+        if self.ref is None:
+            return
+        try:
+            self.ref.update(fields)
+        except Exception as e:
+            raise SnapshotWriteError(f"RTDB snapshot update failed: {e}. Source: {__name__}") from e
+
+    def __repr__(self) -> str:
+        return f"SnapshotPublisher(path={self.path}, published={self.published}, unchanged={self.unchanged})"
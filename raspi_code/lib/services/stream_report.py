@@ -0,0 +1,245 @@
+"""
+Stream Report Module
+Path: lib/services/stream_report.py
+
+One-line summaries for process_a's periodic stats log.
+
+Why:
+    Every service in the video path already keeps its own counters — the
+    frame ring and capture governor, the peer's viewers and signaling, link
+    telemetry, snapshots, event clips, flock activity and frame latency.
+    Turning them into readable lines is formatting only; keeping it here
+    leaves process_a with the decision of when to log, not how.
+
+Usage:
+    rates = CaptureRates(frame_buffer, governor)
+    rates.frames += 1                                   # per captured frame
+    if rates.due():
+        log(details=f"{TASK_NAME} - {rates.report(target_fps=15)}", log_type="info")
+
+    line = viewers_line(peer.viewer_summary(), peer.max_viewers, cpu, peer.rejected_viewers)
+    if line:
+        log(details=f"{TASK_NAME} - {line}", log_type="info")
+
+    Each *_line() function takes what its service already returns and
+    gives back one line, or None when there is nothing to report.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import time
+from typing import Iterable, Optional
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+REPORT_INTERVAL = 60.0     # Seconds between stats reports
+
+
+# ─────────────────────────── CAPTURE RATES ───────────────────────────────────
+
+class CaptureRates:
+    """
+    Capture / delivery / drop rates, ring bandwidth, CPU and idle share
+    since the previous report.
+
+    Example:
+        rates = CaptureRates(frame_buffer, governor)
+        ...
+        if rates.due():
+            line = rates.report(target_fps=15)     # Starts the next interval
+    """
+
+    def __init__(self, frame_buffer, governor, interval: float = REPORT_INTERVAL):
+        self.frame_buffer = frame_buffer
+        self.governor     = governor
+        self.interval     = interval
+        self.frames       = 0           # Frames captured since start
+        self._started     = time.time()
+        self._last        = self._started
+        self._last_bytes  = 0
+        self._last_cpu    = time.process_time()
+        self._last_idle   = 0.0
+        self._last_counts = (0, 0, 0)
+
+    def due(self, now: Optional[float] = None) -> bool:
+        """True once `interval` seconds have passed since the last report."""
+        return (now or time.time()) - self._last >= self.interval
+
+    def report(self, target_fps: int, now: Optional[float] = None) -> str:
+        """Rates since the last report; starts the next interval."""
+        now      = now or time.time()
+        buffer   = self.frame_buffer
+        interval = now - self._last
+        fps      = self.frames / (now - self._started)
+        mb_s     = (buffer.bytes_written - self._last_bytes) / interval / 1e6
+        cpu      = time.process_time()
+        idle     = self.governor.idle_seconds()
+        counts   = (buffer.seq, buffer.delivered, buffer.dropped)
+        captured, delivered, dropped = (
+            (now_count - last_count) / interval
+            for now_count, last_count in zip(counts, self._last_counts)
+        )
+        line = (
+            f"FPS: {fps:.1f} | Frames: {self.frames} | "
+            f"Captured {captured:.1f}/s, delivered {delivered:.1f}/s, "
+            f"dropped {dropped:.1f}/s (target {target_fps}) | "
+            f"Ring: {mb_s:.1f} MB/s written | "
+            f"CPU: {(cpu - self._last_cpu) / interval * 100:.0f}% | "
+            f"Idle: {(idle - self._last_idle) / interval * 100:.0f}% "
+            f"({self.governor.state}, wakeups={self.governor.wakeups})"
+        )
+        self._last        = now
+        self._last_bytes  = buffer.bytes_written
+        self._last_cpu    = cpu
+        self._last_idle   = idle
+        self._last_counts = counts
+        return line
+
+
+# ─────────────────────────── REPORT LINES ────────────────────────────────────
+
+def loop_lag_line(lag, capture_thread: bool) -> str:
+    """LoopLagMonitor.snapshot() → event loop lag line."""
+    return (
+        f"Event loop lag: mean {lag.mean_ms:.1f}ms | p99 {lag.p99_ms:.1f}ms | "
+        f"max {lag.max_ms:.1f}ms (capture {'thread' if capture_thread else 'inline'})"
+    )
+
+
+def viewers_line(viewers: list, max_viewers: int, cpu_percent: float, rejected: int) -> Optional[str]:
+    """Peer viewer_summary() → viewers, CPU per viewer (the cost of fan-out) and bitrate."""
+    if not viewers:
+        return None
+    total_kbps = sum(viewer["send_kbps"] for viewer in viewers)
+    return (
+        f"Viewers: {len(viewers)}/{max_viewers} | "
+        f"CPU {cpu_percent:.0f}% ({cpu_percent / len(viewers):.0f}% per viewer) | "
+        f"Sent {total_kbps:.0f} kbps | "
+        + ", ".join(
+            (f"{viewer['viewer']} {viewer['state']} {viewer['send_kbps']:.0f}kbps "
+             + " ".join(filter(None, (viewer["codec"], viewer["rung"])))).rstrip()
+            for viewer in viewers
+        )
+        + f" | Rejected: {rejected}"
+    )
+
+
+def links_line(links: list) -> Optional[str]:
+    """StreamTelemetry.summary() → per-viewer path, RTT, jitter, loss and encoder line."""
+    if not links:
+        return None
+    return "Link: " + " | ".join(
+        f"{link['viewer']} {link['path']} ({link['pair']}) "
+        f"rtt {_fmt(link['rtt_ms'], 'ms')} jitter {_fmt(link['jitter_ms'], 'ms')} "
+        f"loss {_fmt(link['loss'] and link['loss'] * 100, '%', 1)} "
+        f"{_fmt(link['send_kbps'], 'kbps')} encode {_fmt(link['encode_ms'], 'ms')} "
+        f"sent {_fmt(link['sent_fps'], 'fps')} ({link['sent']}/{link['encoded']} frames)"
+        for link in links
+    )
+
+
+def snapshots_line(snapshots) -> Optional[str]:
+    """SnapshotPublisher counters → published / unchanged / size / encode time."""
+    if not (snapshots.published or snapshots.unchanged):
+        return None
+    encode_ms = snapshots.encode_ms
+    return (
+        f"Snapshots: {snapshots.published} published, {snapshots.unchanged} unchanged | "
+        f"last {snapshots.last_bytes / 1024:.1f} KB | "
+        f"encode {_fmt(sum(encode_ms) / len(encode_ms) if encode_ms else None, 'ms', 1)}"
+    )
+
+
+def clips_line(recorder) -> Optional[str]:
+    """ClipRecorder → pre-roll ring fill, encode time and clips written."""
+    if recorder is None or not recorder.encode_ms:
+        return None
+    ring, encode_ms = recorder.ring, recorder.encode_ms
+    return (
+        f"Event clips: ring {ring.seconds:.1f}s / {ring.bytes / 1e6:.1f} MB "
+        f"(cap {ring.max_bytes / 1e6:.0f} MB, {ring.trimmed} GOP(s) trimmed) | "
+        f"encode {sum(encode_ms) / len(encode_ms):.1f}ms | "
+        f"{recorder.written} written, {recorder.failed} failed"
+        + (" | recording" if recorder.recording else "")
+    )
+
+
+def activity_line(minute: Optional[dict]) -> Optional[str]:
+    """ActivityMonitor.last_summary → per-zone activity / occupancy line."""
+    if not minute or not minute["samples"]:
+        return None
+    return (
+        "Activity: " + ", ".join(
+            f"{name} {zone['activity']:.1%} (peak {zone['peak']:.1%}, "
+            f"occupancy {zone['occupancy']:.1%})"
+            for name, zone in minute["zones"].items()
+        )
+        + f" | {minute['samples']} samples, {minute['cpuMs']:.1f}ms CPU each, "
+          f"{minute['throttled']} throttled"
+        + (f" | events: {', '.join(minute['events'])}" if minute["events"] else "")
+    )
+
+
+def latency_line(latency: dict) -> Optional[str]:
+    """FrameTracer.snapshot() → p50/p95/p99 per pipeline stage."""
+    if "total" not in latency:
+        return None
+    return "Frame latency p50/p95/p99: " + " | ".join(
+        f"{stage} {stats['p50']:.0f}/{stats['p95']:.0f}/{stats['p99']:.0f}ms"
+        + (f" (n={stats['count']})" if stage == "glass" else "")
+        for stage, stats in latency.items()
+    )
+
+
+def control_line(ack_times: Iterable[float], channels: int) -> Optional[str]:
+    """Command → ack times (ms) → live control line."""
+    ack_times = list(ack_times)
+    if not ack_times:
+        return None
+    return (
+        f"Live control: {len(ack_times)} command(s) | "
+        f"command→ack mean {sum(ack_times) / len(ack_times):.0f}ms, max {max(ack_times):.0f}ms | "
+        f"{channels} channel(s) open"
+    )
+
+
+def signaling_line(signaling: Optional[dict]) -> Optional[str]:
+    """Peer signaling_summary() → offer delivery and offer→answer times."""
+    if not signaling:
+        return None
+    return (
+        f"Signaling ({signaling['mode']}): {signaling['offers']} offer(s) | "
+        f"delivery {_fmt(signaling['delivery_ms_mean'], 'ms')} | "
+        f"offer→answer mean {signaling['answer_ms_mean']:.0f}ms, "
+        f"max {signaling['answer_ms_max']:.0f}ms"
+    )
+
+
+def first_frame_line(first_frames: Optional[dict], ice_mode: str) -> Optional[str]:
+    """Peer first_frame_summary() → offer→first frame per ICE path."""
+    if not first_frames:
+        return None
+    return f"Offer→first frame ({ice_mode} ICE): " + ", ".join(
+        f"{path} {stats['mean_ms']:.0f}ms (max {stats['max_ms']:.0f}ms, n={stats['count']})"
+        for path, stats in first_frames.items()
+    )
+
+
+def reconnects_line(reconnects: Optional[dict]) -> Optional[str]:
+    """Peer reconnect_summary() → warm / cold reconnect times."""
+    if not reconnects:
+        return None
+    return "Reconnects: " + ", ".join(
+        f"{kind} {stats['mean_ms']:.0f}ms (max {stats['max_ms']:.0f}ms, n={stats['count']})"
+        for kind, stats in reconnects.items()
+    )
+
+
+# ─────────────────────────── HELPERS ─────────────────────────────────────────
+
+def _fmt(value: Optional[float], unit: str, digits: int = 0) -> str:
+    """Format an optional measurement ("n/a" when missing)."""
+    return "n/a" if value is None else f"{value:.{digits}f}{unit}"
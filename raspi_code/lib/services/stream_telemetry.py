@@ -0,0 +1,229 @@
+"""
+Stream Telemetry Module
+Path: lib/services/stream_telemetry.py
+
+Per-viewer WebRTC link statistics: a ring buffer of recent samples, an
+optional JSON-lines metrics file, and summaries for logs / RTDB.
+
+Why:
+    The ice_stats host/srflx/relay counters only say which candidates were
+    offered, and process_a's 60-second FPS line only says what was captured.
+    Neither explains a poor stream: whether it is going through TURN, the
+    RTT and jitter the phone reports, whether the encoder keeps up, or how
+    many frames actually leave the Pi.
+
+Sample (StreamStats, one per viewer every ABR_INTERVAL seconds, built by
+webrtc_peer from RTCPeerConnection.getStats() and the sender's encoder):
+    time            — time.time() of the sample
+    viewer          — viewer id
+    path            — "lan", "stun" or "turn" (relayed)
+    pair            — selected candidate pair "local/remote" (e.g. "relay/srflx")
+    rtt_ms          — round trip time from remote-inbound-rtp
+    jitter_ms       — receiver-reported jitter
+    loss            — fraction lost since the previous sample (0–1)
+    send_kbps       — bitrate sent since the previous sample
+    frames_encoded  — frames through the encoder since the previous sample
+    frames_sent     — of those, frames that produced RTP payloads
+    encode_ms       — mean encode time per frame
+    rung            — current ABR rung ("" without ABR)
+
+Metrics file:
+    One JSON object per line, appended; rotated to <path>.1 once it passes
+    max_bytes. Writes are buffered and flushed every FLUSH_LINES lines. If a
+    write fails the file is dropped (StreamTelemetryWriteError is raised
+    once) and the ring buffer keeps working.
+
+Logging contract:
+    This is a service module — it raises exceptions only.
+    All logging is handled by the calling process.
+"""
+
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+
+# ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
+
+class StreamTelemetryError(Exception):
+    """Base exception for stream telemetry errors."""
+    pass
+
+class StreamTelemetryWriteError(StreamTelemetryError):
+    """Raised when the metrics file cannot be opened or written."""
+    pass
+
+
+# ─────────────────────────── DEFAULTS ────────────────────────────────────────
+
+DEFAULT_CAPACITY  = 600               # Samples kept (~10 min of one viewer at 3 s)
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024   # Metrics file size before rotation
+FLUSH_LINES       = 20
+
+
+class StreamStats(NamedTuple):
+    time           : float
+    viewer         : str
+    path           : str
+    pair           : Optional[str]
+    rtt_ms         : Optional[float]
+    jitter_ms      : Optional[float]
+    loss           : Optional[float]
+    send_kbps      : float
+    frames_encoded : int
+    frames_sent    : int
+    encode_ms      : Optional[float]
+    rung           : str
+
+
+def _mean(values: list) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _rounded(value: Optional[float], digits: int = 1) -> Optional[float]:
+    return None if value is None else round(value, digits)
+
+
+# ─────────────────────────── TELEMETRY ───────────────────────────────────────
+
+class StreamTelemetry:
+    """
+    Example:
+        telemetry = StreamTelemetry("logs/webrtc_stats.jsonl")
+        telemetry.record(stats)                 # from the peer's stats loop
+        ...
+        for viewer in telemetry.summary():      # last minute, per viewer
+            print(viewer["viewer"], viewer["path"], viewer["rtt_ms"])
+        telemetry.close()
+    """
+
+    def __init__(
+        self,
+        path      : Optional[str] = None,
+        capacity  : int = DEFAULT_CAPACITY,
+        max_bytes : int = DEFAULT_MAX_BYTES
+    ):
+        self.path      = path
+        self.max_bytes = max_bytes
+        self.samples   : deque = deque(maxlen=capacity)
+        self.records   : int = 0
+        self._fh       = None
+        self._pending  : int = 0
+        if path:
+            self._open()
+
+    def _open(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._fh = open(self.path, "a", encoding="utf-8")
+        except OSError as e:
+            self._fh = None
+            raise StreamTelemetryWriteError(
+                f"Could not open metrics file {self.path}: {e}. Source: {__name__}"
+            ) from e
+
+    def record(self, stats: StreamStats) -> None:
+        """
+        Keep one sample and append it to the metrics file.
+
+        Raises:
+            StreamTelemetryWriteError: The file write failed — the file is
+                dropped, later samples only go to the ring buffer.
+        """
+        self.samples.append(stats)
+        self.records += 1
+        if self._fh is None:
+            return
+        try:
+            self._fh.write(json.dumps(stats._asdict(), separators=(",", ":")) + "\n")
+        except OSError as e:
+            self._drop_file()
+            raise StreamTelemetryWriteError(
+                f"Metrics write failed for {self.path}: {e}. Source: {__name__}"
+            ) from e
+        self._pending += 1
+        if self._pending >= FLUSH_LINES:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Raises:
+            StreamTelemetryWriteError: If the flush or rotation fails (the
+                file is dropped).
+        """
+        if self._fh is None or not self._pending:
+            return
+        try:
+            self._fh.flush()
+            self._pending = 0
+            if self._fh.tell() >= self.max_bytes:
+                self._fh.close()
+                os.replace(self.path, self.path + ".1")
+                self._open()
+        except (OSError, StreamTelemetryWriteError) as e:
+            self._drop_file()
+            raise StreamTelemetryWriteError(
+                f"Metrics flush failed for {self.path}: {e}. Source: {__name__}"
+            ) from e
+
+    def _drop_file(self) -> None:
+        fh, self._fh = self._fh, None
+        if fh is not None:
+            try:
+                fh.close()
+            except OSError:
+                pass
+
+    def recent(self, viewer: Optional[str] = None, seconds: Optional[float] = None) -> List[StreamStats]:
+        """Samples in the ring, optionally for one viewer / the last N seconds."""
+        samples = list(self.samples)
+        if viewer is not None:
+            samples = [s for s in samples if s.viewer == viewer]
+        if seconds is not None:
+            since   = time.time() - seconds
+            samples = [s for s in samples if s.time >= since]
+        return samples
+
+    def summary(self, seconds: float = 60.0) -> List[Dict]:
+        """Per-viewer means over the last `seconds`, newest pair and rung."""
+        by_viewer: Dict[str, List[StreamStats]] = {}
+        for stats in self.recent(seconds=seconds):
+            by_viewer.setdefault(stats.viewer, []).append(stats)
+
+        summaries = []
+        for viewer, samples in by_viewer.items():
+            latest  = samples[-1]
+            elapsed = latest.time - samples[0].time
+            sent    = sum(s.frames_sent for s in samples[1:])
+            summaries.append({
+                "viewer"    : viewer,
+                "path"      : latest.path,
+                "pair"      : latest.pair,
+                "rung"      : latest.rung,
+                "rtt_ms"    : _rounded(_mean([s.rtt_ms    for s in samples])),
+                "jitter_ms" : _rounded(_mean([s.jitter_ms for s in samples])),
+                "loss"      : _rounded(_mean([s.loss      for s in samples]), 4),
+                "send_kbps" : _rounded(_mean([s.send_kbps for s in samples])),
+                "encode_ms" : _rounded(_mean([s.encode_ms for s in samples])),
+                "sent_fps"  : _rounded(sent / elapsed) if elapsed > 0 else None,
+                "encoded"   : sum(s.frames_encoded for s in samples),
+                "sent"      : sum(s.frames_sent    for s in samples),
+                "time"      : int(latest.time * 1000),
+            })
+        return summaries
+
+    def close(self) -> None:
+        """
+        Raises:
+            StreamTelemetryWriteError: If the final flush fails.
+        """
+        try:
+            self.flush()
+        finally:
+            self._drop_file()
+
+    def __repr__(self) -> str:
+        return f"StreamTelemetry(path={self.path}, records={self.records})"
@@ -4,6 +4,79 @@ Description:
     WebRTC peer implementation for Raspberry Pi.
     Streams video to mobile app via Firebase signaling + TURN relay.
 
+Signaling (signaling="listen", the default):
+    Offers and mobile ICE candidates arrive through RTDB listen() streams
+    (lib/services/rtdb_stream) — handled as soon as they are written, and
+    no RTDB traffic while nothing changes. signaling="poll" (or a failed
+    listen()) falls back to the old get() loops: offers every 500 ms,
+    candidates every 200 ms. signaling_summary() reports offer delivery
+    and offer-to-answer latency for comparison.
+
+ICE (ice_mode="trickle", the default):
+    aiortc gathers every local candidate inside setLocalDescription(), so
+    the answer used to wait for the slowest STUN / TURN allocation (up to
+    aioice's 5 s cap). In trickle mode only host candidates are gathered
+    before the answer is written; server-reflexive and relay candidates are
+    gathered in the background and written to iceCandidates/raspi as they
+    arrive, one RTDB update per burst. ice_mode="full" (or an aioice
+    without the internals used here) keeps the old gather-then-answer.
+    first_frame_summary() reports offer-to-first-frame per ICE path
+    (lan / stun / turn).
+
+Reconnects (reconnect_grace, default 30 s):
+    aiortc cannot restart ICE on a live RTCPeerConnection, so a phone that
+    changes network re-offers with the same viewerId. If its old session
+    is still connected, the new one is negotiated alongside it and the old
+    one is closed only once the new one delivers its first frame
+    (make-before-break). If the old session already failed, the camera
+    track and the viewer's ABR rung are kept for the grace period so the
+    new session resumes warm. reconnect_summary() reports both times.
+
+ICE servers (ice_probe_interval, default 300 s):
+    lib/services/ice_prober checks every STUN / TURN URL at start() and
+    periodically after, and new peer connections use its working set —
+    dead servers dropped, fastest STUN and working TURN transport first
+    (aiortc only uses the first of each), addresses pre-resolved.
+
+Telemetry (telemetry, stats_rtdb_interval):
+    Every stats sample (RTT, jitter, loss, bitrate, frames encoded / sent,
+    encode time, selected candidate pair) is handed to a
+    lib/services/stream_telemetry.StreamTelemetry — ring buffer plus
+    optional metrics file. With stats_rtdb_interval > 0 a per-viewer
+    summary is also written to liveStream/{user}/{device}/stats at that
+    rate.
+
+Data channel (on_data_message, send_data):
+    An app that opens an RTCDataChannel labelled "control" (see
+    lib/services/live_control) before its offer gets it attached to its
+    session. Text messages go to on_data_message(viewer_id, text);
+    send_data() writes to one viewer's channel or to all of them, skipping
+    channels whose send buffer is backed up.
+
+Frame latency (tracer):
+    With a lib/services/frame_latency.FrameTracer, CameraVideoTrack stamps
+    every frame it hands out (ring wait, downscale / conversion) by pts,
+    using the capture time the SharedFrameBuffer slot carries, and the
+    encoder wrapper adds queue, encode and capture-to-encoded time per
+    viewer. Percentiles go into the RTDB stats summary when that is on.
+
+Codecs (codec_preferences):
+    A list of mime types, preferred first (lib/services/codec_bench ranks
+    them from an on-device encode benchmark). Each new session's
+    transceiver gets setCodecPreferences() in that order before the offer
+    is applied, so the answer — and the encoder — use the first one the
+    phone also offers. None keeps the phone's order. Settable at any time;
+    applies to the next offer.
+
+RTDB I/O:
+    firebase_admin is synchronous — every get / set / update is an HTTPS
+    round trip. None of them run on the event loop (which also paces
+    CameraVideoTrack.recv()): they go through one "rtdb" worker thread,
+    in order, so state writes never overtake each other. Writes nobody
+    waits on (connection states, trickled candidates, deletes) are queued
+    and their failures logged. Cleanup clears a viewer's nodes — and stop()
+    the whole stream — with one multi-path update.
+
 Logging contract:
     - Public API methods (start, stop, run_webrtc_peer) → raise exceptions.
       The calling process (process_a) catches and logs them.
@@ -14,25 +87,56 @@ Logging contract:
 
 import time
 import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from fractions  import Fraction
-from typing     import Optional, Callable
+from typing     import Optional, Callable, Dict, List
 
 import cv2
 import numpy as np
 from av         import VideoFrame
 from aiortc     import (
     RTCPeerConnection, RTCSessionDescription,
-    VideoStreamTrack, RTCConfiguration, RTCIceServer
+    MediaStreamTrack, VideoStreamTrack, RTCConfiguration, RTCIceServer
 )
-from aiortc.sdp     import candidate_from_sdp
+from aiortc.contrib.media import MediaRelay
+from aiortc.sdp     import candidate_from_sdp, candidate_to_sdp
 from firebase_admin import db
 
+# Private aioice / aiortc pieces used for local trickle ICE (see TRICKLE ICE
+# HELPERS). Without them every session falls back to full gathering.
+try:
+    from aioice.ice import CandidatePair, StunProtocol, relayed_candidate, server_reflexive_candidate
+    from aiortc.rtcicetransport import candidate_from_aioice
+    HAS_TRICKLE = True
+except ImportError:
+    HAS_TRICKLE = False
+
+from lib.services.hardware.camera_controller import AV_FORMATS
+from lib.services.abr_controller import ABRController, LinkSample, Rung
+from lib.services.rtdb_stream import RTDBStream, RTDBStreamError
+from lib.services.ice_prober import IceProber, DEFAULT_INTERVAL as DEFAULT_ICE_PROBE_INTERVAL
+from lib.services.stream_telemetry import StreamStats, StreamTelemetry, StreamTelemetryError
+from lib.services.live_control import CHANNEL_LABEL
+from lib.services.codec_bench import codec_preferences as _codec_capabilities
+from lib.services.frame_latency import FrameTracer
 from lib.services.logger import get_logger
 
 # Internal logger — used ONLY inside async callbacks that cannot raise.
 # Restricted to warning/error to match the system-wide logging policy.
 _log = get_logger("webrtc_peer.py")
 
+ABR_INTERVAL            = 3.0    # Seconds between getStats() samples
+DEFAULT_MAX_VIEWERS     = 3
+SIGNALING_MODES         = ("listen", "poll")
+DEFAULT_SIGNALING       = "listen"
+ICE_MODES               = ("trickle", "full")
+DEFAULT_ICE_MODE        = "trickle"
+TRICKLE_BATCH_WINDOW    = 0.05   # Seconds — candidates landing together share one write
+DEFAULT_RECONNECT_GRACE = 30.0   # Seconds the track and a departed viewer's rung stay warm
+MAX_PACING_LAG          = 0.5    # Seconds behind schedule before recv() re-anchors its clock
+MAX_CHANNEL_BUFFER      = 64 * 1024   # Bytes queued on a data channel before sends are skipped
+
 
 # ─────────────────────────── EXCEPTIONS ──────────────────────────────────────
 
@@ -58,22 +162,54 @@ class CameraVideoTrack(VideoStreamTrack):
     Both webcam and Picamera2 expose capture_array() via the camera_controller
     shim, so no branching on camera type is needed here.
     If frame_buffer is provided it is preferred (decouples capture from WebRTC).
+
+    Frames are wrapped in the buffer's pixel format: "yuv420" becomes a
+    yuv420p VideoFrame the encoder consumes directly, "bgr" goes in as bgr24.
+
+    With a tracer, each frame is stamped (by pts) with its capture, publish,
+    pull and conversion times — see lib/services/frame_latency.
     """
 
     def __init__(
         self,
         capture,
         frame_dimension : dict,
-        frame_buffer    = None
+        frame_buffer    = None,
+        fps             : int = 20,
+        tracer          : Optional[FrameTracer] = None
     ):
         super().__init__()
         self.capture      = capture
         self.width        = frame_dimension.get("width",  640)
         self.height       = frame_dimension.get("height", 480)
         self.frame_buffer = frame_buffer
+        self.out_width    = self.width    # Sent size — lowered by the ABR ladder
+        self.out_height   = self.height
         self._start       = time.time()
         self._timestamp   = 0
-        self.fps          = 20
+        self._blank       = None
+        self.fps          = fps
+        self.pixel_format = getattr(frame_buffer or capture, "pixel_format", "bgr")
+        self.tracer       = tracer
+
+    def set_output(self, width: int, height: int, fps: int) -> None:
+        """Change the sent resolution / frame rate (ABR). Takes effect next frame."""
+        self.out_width  = width
+        self.out_height = height
+        self.fps        = fps
+        self._blank     = None
+
+    def _blank_frame(self) -> np.ndarray:
+        """Black frame sent until the first capture lands. Allocated once per size."""
+        if self._blank is None:
+            width, height = self.out_width, self.out_height
+            if self.pixel_format == "yuv420":
+                # Y = 16 (video black), U = V = 128 (no chroma)
+                self._blank = np.full((height * 3 // 2, width), 128, dtype=np.uint8)
+                self._blank[:height] = 16
+            else:
+                self._blank = np.zeros((height, width, 3), dtype=np.uint8)
+        return self._blank
 
     async def recv(self) -> VideoFrame:
         if self._timestamp != 0:
@@ -81,29 +217,201 @@ class CameraVideoTrack(VideoStreamTrack):
             wait = next_frame_time - time.time()
             if wait > 0:
                 await asyncio.sleep(wait)
+            elif wait < -MAX_PACING_LAG:
+                # Nobody pulled for a while (e.g. between two viewers) —
+                # re-anchor instead of bursting frames to catch up
+                self._start = time.time() - self._timestamp / 90000
 
         self._timestamp += int(90000 / self.fps)
         pts       = self._timestamp
         time_base = Fraction(1, 90000)
 
-        # Pull frame — buffer preferred, fall back to direct capture
+        # Pull frame — buffer preferred, fall back to direct capture.
+        # The buffer hands out a read-only view of its ring slot; it is
+        # consumed right here by from_ndarray(), which copies into the
+        # AVFrame. I420 goes in as yuv420p and BGR as bgr24 — no cvtColor.
+        pulled              = time.time()
+        captured, published = None, None
         if self.frame_buffer is not None:
-            frame = self.frame_buffer.get()
+            if hasattr(self.frame_buffer, "get_stamped"):
+                frame, captured, published = self.frame_buffer.get_stamped()
+            else:
+                frame = self.frame_buffer.get()
         else:
             frame = self.capture.capture_array()
+            captured = pulled
 
         if frame is None:
-            frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
-        else:
-            frame = cv2.resize(frame, (self.width, self.height))
-
-        frame                 = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        video_frame           = VideoFrame.from_ndarray(frame, format="rgb24")
+            frame = self._blank_frame()
+        elif self.pixel_format == "yuv420":
+            if frame.shape != (self.out_height * 3 // 2, self.out_width):
+                frame = _resize_i420(frame, self.out_width, self.out_height)
+        elif frame.shape[:2] != (self.out_height, self.out_width):
+            frame = cv2.resize(frame, (self.out_width, self.out_height), interpolation=cv2.INTER_AREA)
+
+        video_frame           = VideoFrame.from_ndarray(frame, format=AV_FORMATS[self.pixel_format])
         video_frame.pts       = pts
         video_frame.time_base = time_base
+        if self.tracer is not None:
+            self.tracer.stamp(pts, captured, published, pulled, time.time())
         return video_frame
 
 
+def _resize_i420(frame: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Resize a planar I420 frame plane by plane — no colour conversion."""
+    src_h, src_w = frame.shape[0] * 2 // 3, frame.shape[1]
+    out          = np.empty((height * 3 // 2, width), dtype=np.uint8)
+
+    y_size, c_size = src_h * src_w, (src_h // 2) * (src_w // 2)
+    flat           = frame.reshape(-1)
+    planes_in = (
+        frame[:src_h],
+        flat[y_size:y_size + c_size].reshape(src_h // 2, src_w // 2),
+        flat[y_size + c_size:y_size + 2 * c_size].reshape(src_h // 2, src_w // 2),
+    )
+    y_out, c_out = height * width, (height // 2) * (width // 2)
+    out_flat     = out.reshape(-1)
+    planes_out = (
+        out[:height],
+        out_flat[y_out:y_out + c_out].reshape(height // 2, width // 2),
+        out_flat[y_out + c_out:y_out + 2 * c_out].reshape(height // 2, width // 2),
+    )
+    for src, dst in zip(planes_in, planes_out):
+        cv2.resize(src, (dst.shape[1], dst.shape[0]), dst=dst, interpolation=cv2.INTER_AREA)
+    return out
+
+
+class ViewerTrack(MediaStreamTrack):
+    """
+    One viewer's view of the shared camera track, at that viewer's ABR rung.
+
+    The shared CameraVideoTrack runs at the top rung. Each session wraps its
+    MediaRelay proxy in a ViewerTrack that downscales (VideoFrame.reformat)
+    and drops frames down to its own rung, so a viewer on a poor link lowers
+    only its own resolution and frame rate. Frames already at the rung's
+    size pass through untouched; pts is kept, so frame_latency still matches
+    encoder times to capture stamps.
+    """
+
+    kind = "video"
+
+    def __init__(self, source: MediaStreamTrack):
+        super().__init__()
+        self.source     = source
+        self.out_width  : Optional[int] = None    # None = source size
+        self.out_height : Optional[int] = None
+        self.fps        : Optional[int] = None    # None = every source frame
+        self._next_pts  : Optional[int] = None
+
+    def set_output(self, width: int, height: int, fps: int) -> None:
+        """Change this viewer's resolution / frame rate (ABR). Takes effect next frame."""
+        self.out_width  = width
+        self.out_height = height
+        self.fps        = fps
+
+    async def recv(self) -> VideoFrame:
+        while True:
+            frame = await self.source.recv()
+            if not self.fps or frame.pts is None:
+                break
+            # Keep a frame every 90000 / fps ticks of the 90 kHz clock
+            if self._next_pts is not None and frame.pts < self._next_pts:
+                continue
+            step           = 90000 // self.fps
+            due            = frame.pts if self._next_pts is None else self._next_pts
+            self._next_pts = due + step
+            if self._next_pts <= frame.pts:             # Source paused — resync
+                self._next_pts = frame.pts + step
+            break
+
+        if self.out_width and (frame.width, frame.height) != (self.out_width, self.out_height):
+            resized           = frame.reformat(width=self.out_width, height=self.out_height, interpolation="AREA")
+            resized.pts       = frame.pts
+            resized.time_base = frame.time_base
+            frame             = resized
+        return frame
+
+    def stop(self) -> None:
+        super().stop()
+        self.source.stop()
+
+
+# ─────────────────────────── VIEWER SESSION ──────────────────────────────────
+
+class ViewerSession:
+    """
+    One viewer: its RTCPeerConnection, relayed track, signaling refs and
+    link figures. Owned by WebRTCPeer.
+
+    Signaling paths:
+        Offers carrying a "viewerId" get their own nodes under
+        liveStream/{user}/{device}/viewers/{viewerId}/ (answer,
+        iceCandidates/raspi, iceCandidates/mobile, connectionState), so
+        several apps can negotiate at once.
+        Offers without one (older apps) use the original shared nodes —
+        still fine for concurrent viewers, but only one of them can be
+        negotiating at a time.
+    """
+
+    def __init__(self, viewer_id: str, base_ref, path: str, legacy: bool, offer_timestamp: int):
+        self.viewer_id       = viewer_id
+        self.path            = path       # Node path relative to the stream ref ("" = legacy)
+        self.legacy          = legacy
+        self.offer_timestamp = offer_timestamp
+        self.started         = time.time()
+        self.offer_received  = time.monotonic()
+
+        self.pc              : Optional[RTCPeerConnection] = None
+        self.track           = None       # ViewerTrack over a MediaRelay proxy of the shared source
+        self.sender          = None
+        self.abr             : Optional[ABRController] = None
+        self.state           : str   = "new"
+        self.send_kbps       : float = 0.0
+        self.ice_stats       : dict  = {"host": 0, "srflx": 0, "relay": 0}
+        self.closed          : bool  = False
+        self.ice_stream      : Optional[RTDBStream] = None
+        self.gather_tasks    : list  = []     # Background srflx / relay gathering
+        self.first_frame_ms  : Optional[float] = None
+        self.channel         = None       # RTCDataChannel "control", if the app opened one
+        self.codec           : Optional[str] = None   # Negotiated video codec, e.g. "video/VP8"
+
+        # Reconnect bookkeeping (see WebRTCPeer._handle_offer)
+        self.replaces        : Optional["ViewerSession"] = None  # Old session kept until this one flows
+        self.superseded      : bool  = False
+        self.reconnect_from  : Optional[float] = None            # monotonic time the old session failed
+
+        self.answer_ref           = base_ref.child("answer")
+        self.ice_raspi_ref        = base_ref.child("iceCandidates/raspi")
+        self.ice_mobile_ref       = base_ref.child("iceCandidates/mobile")
+        self.connection_state_ref = base_ref.child("connectionState")
+
+    def signaling_paths(self) -> List[str]:
+        """Signaling nodes of this viewer, relative to the stream ref."""
+        paths = ["answer", "iceCandidates/raspi", "iceCandidates/mobile"]
+        if not self.legacy:
+            paths.append("connectionState")
+        return [self.path + node for node in paths]
+
+    @property
+    def reconnect_key(self) -> str:
+        """Legacy offers get a new id each time — all of them count as one viewer."""
+        return "legacy" if self.legacy else self.viewer_id
+
+    def summary(self) -> dict:
+        return {
+            "viewer"    : self.viewer_id,
+            "state"     : self.state,
+            "rung"      : str(self.abr.rung) if self.abr else None,
+            "send_kbps" : round(self.send_kbps, 1),
+            "channel"   : self.channel is not None,
+            "codec"     : self.codec.split("/")[-1] if self.codec else None,
+            "seconds"   : int(time.time() - self.started),
+        }
+
+    def __repr__(self) -> str:
+        return f"ViewerSession({self.viewer_id}, state={self.state})"
+
+
 # ─────────────────────────── WEBRTC PEER ─────────────────────────────────────
 
 class WebRTCPeer:
@@ -113,8 +421,17 @@ class WebRTCPeer:
     Handles:
     - Firebase signaling (offer / answer / ICE candidates)
     - TURN relay for strict NAT / CGNAT mobile networks
-    - Auto-reconnect on new offers
-    - Bitrate limiting
+    - Several concurrent viewers (up to max_viewers), all fed from ONE
+      CameraVideoTrack through aiortc's MediaRelay — capture, frame pull
+      and downscale happen once; aiortc still encodes once per viewer
+      (one encoder per RTCRtpSender)
+    - Bitrate limiting, or adaptive bitrate / resolution / fps when an
+      ABR ladder is given (see lib/services/abr_controller). The shared
+      track runs at the top rung; each viewer's ViewerTrack downscales
+      and drops frames to its own rung, and bitrate is capped per viewer.
+
+    on_connection_state_change receives the AGGREGATE state: "connected"
+    while at least one viewer is connected, "disconnected" once none are.
 
     Public methods raise exceptions.
     Internal async callbacks log via _log() — they cannot raise meaningfully.
@@ -130,7 +447,22 @@ class WebRTCPeer:
         frame_buffer              = None,
         turn_server_url           : str = None,
         turn_username             : str = None,
-        turn_password             : str = None
+        turn_password             : str = None,
+        on_offer                  : Optional[Callable] = None,
+        fps                       : int = 20,
+        abr_ladder                : Optional[List[Rung]] = None,
+        on_abr_change             : Optional[Callable] = None,
+        max_viewers               : int = DEFAULT_MAX_VIEWERS,
+        signaling                 : str = DEFAULT_SIGNALING,
+        ice_mode                  : str = DEFAULT_ICE_MODE,
+        reconnect_grace           : float = DEFAULT_RECONNECT_GRACE,
+        ice_probe_interval        : float = DEFAULT_ICE_PROBE_INTERVAL,
+        on_ice_probe              : Optional[Callable] = None,
+        telemetry                 : Optional[StreamTelemetry] = None,
+        stats_rtdb_interval       : float = 0.0,
+        on_data_message           : Optional[Callable] = None,
+        codec_preferences         : Optional[List[str]] = None,
+        tracer                    : Optional[FrameTracer] = None
     ):
         self.user_uid                   = user_uid
         self.device_uid                 = device_uid
@@ -138,21 +470,44 @@ class WebRTCPeer:
         self.frame_dimension            = frame_dimension
         self.on_connection_state_change = on_connection_state_change
         self.frame_buffer               = frame_buffer
-
-        self.pc           : Optional[RTCPeerConnection] = None
-        self.video_track  : Optional[CameraVideoTrack]  = None
+        self.on_offer                   = on_offer
+        self.fps                        = fps
+        self.abr_ladder                 = abr_ladder
+        self.on_abr_change              = on_abr_change
+        self.max_viewers                = max(1, max_viewers)
+        self.signaling                  = signaling if signaling in SIGNALING_MODES else DEFAULT_SIGNALING
+        self.ice_mode                   = ice_mode  if ice_mode  in ICE_MODES       else DEFAULT_ICE_MODE
+        self.reconnect_grace            = max(0.0, reconnect_grace)
+        self.on_ice_probe               = on_ice_probe
+        self.telemetry                  = telemetry
+        self.stats_rtdb_interval        = stats_rtdb_interval
+        self.on_data_message            = on_data_message
+        self.codec_preferences          = codec_preferences
+        self.tracer                     = tracer
+
+        self.sessions     : Dict[str, ViewerSession]  = {}
+        self.video_track  : Optional[CameraVideoTrack] = None   # Shared source
+        self.relay        : Optional[MediaRelay]       = None
         self.is_running   : bool = False
-        self.candidates_sent      : int  = 0
-        self.last_offer_timestamp : int  = 0
-        self.ice_stats            : dict = {"host": 0, "srflx": 0, "relay": 0}
+        self.last_offer_timestamp : int = 0
+        self.rejected_viewers     : int = 0
+        self._aggregate_state     : str = "disconnected"
+        self._legacy_session      : Optional[ViewerSession] = None
+        self._offer_stream        : Optional[RTDBStream] = None
+        self._offer_latency       = deque(maxlen=100)   # (delivery_ms, answer_ms)
+        self._first_frames        = deque(maxlen=100)   # (ice path, offer → first frame ms)
+        self._reconnects          = deque(maxlen=100)   # ("restart" | "reconnect", ms)
+        self._standby             : set = set()          # Superseded sessions still streaming
+        self._departed            : Dict[str, tuple] = {}  # reconnect_key → (failed at, ABR index)
+        self._source_expiry       : Optional[asyncio.Task] = None
+        self._rtdb_executor       = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rtdb")
 
         # Firebase refs
         self.stream_ref                = db.reference(f"liveStream/{user_uid}/{device_uid}")
         self.offer_ref                 = self.stream_ref.child("offer")
-        self.answer_ref                = self.stream_ref.child("answer")
-        self.ice_candidates_raspi_ref  = self.stream_ref.child("iceCandidates/raspi")
-        self.ice_candidates_mobile_ref = self.stream_ref.child("iceCandidates/mobile")
+        self.viewers_ref               = self.stream_ref.child("viewers")
         self.connection_state_ref      = self.stream_ref.child("connectionState")
+        self.stats_ref                 = self.stream_ref.child("stats")
 
         # ICE / TURN servers
         self.ice_servers = [
@@ -185,79 +540,195 @@ class WebRTCPeer:
                 log_type="warning"
             )
 
+        # Reachability / RTT of the servers above, refreshed in the background
+        self.prober = (
+            IceProber(self.ice_servers, interval=ice_probe_interval)
+            if ice_probe_interval > 0 else None
+        )
+
+    # ─────────────────────────── RTDB I/O ────────────────────────────────────
+
+    async def _rtdb(self, call: Callable, *args):
+        """Run one blocking firebase_admin call on the rtdb thread and await it."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._rtdb_executor, call, *args)
+
+    def _rtdb_post(self, call: Callable, *args, what: Optional[str] = None) -> None:
+        """
+        Queue a write without waiting for it. Internal — a failure is logged
+        as "Failed to write {what}", or ignored when what is None.
+        """
+        def _done(future) -> None:
+            if what and not future.cancelled() and future.exception():
+                _log(details=f"Failed to write {what} to Firebase: {future.exception()}", log_type="warning")
+
+        future = asyncio.get_running_loop().run_in_executor(self._rtdb_executor, call, *args)
+        future.add_done_callback(_done)
+
+    # ─────────────────────────── VIEWERS ─────────────────────────────────────
+
+    def viewer_summary(self) -> List[dict]:
+        """Per-viewer state, ABR rung and send rate — for the process stats log."""
+        return [session.summary() for session in self.sessions.values()]
+
+    def data_channels(self) -> int:
+        """Number of viewers with an open control channel."""
+        return sum(
+            1 for session in self.sessions.values()
+            if session.channel is not None and session.channel.readyState == "open"
+        )
+
+    def send_data(self, text: str, viewer_id: Optional[str] = None) -> int:
+        """
+        Send a text message on the control channel of one viewer, or of
+        every viewer when viewer_id is None. Channels that are not open or
+        have more than MAX_CHANNEL_BUFFER bytes queued are skipped.
+
+        Returns:
+            Number of channels the message was sent on.
+        """
+        sent = 0
+        for session in list(self.sessions.values()):
+            if viewer_id is not None and session.viewer_id != viewer_id:
+                continue
+            channel = session.channel
+            if channel is None or channel.readyState != "open":
+                continue
+            if channel.bufferedAmount > MAX_CHANNEL_BUFFER:
+                continue
+            channel.send(text)
+            sent += 1
+        return sent
+
+    def _live_sessions(self) -> list:
+        """Sessions holding a peer connection, including superseded ones."""
+        return list(self.sessions.values()) + list(self._standby)
+
+    def _subscribe_source(self) -> ViewerTrack:
+        """
+        A viewer's own track over a relayed view of the shared camera track.
+        The source track (and relay) is created for the first viewer, at the
+        top ABR rung, and survives the last one by reconnect_grace seconds.
+        """
+        if self._source_expiry:
+            self._source_expiry.cancel()
+            self._source_expiry = None
+        if self.video_track is None:
+            self.video_track = CameraVideoTrack(
+                capture         = self.capture,
+                frame_dimension = self.frame_dimension,
+                frame_buffer    = self.frame_buffer,
+                fps             = self.fps,
+                tracer          = self.tracer
+            )
+            if self.abr_ladder:
+                top = self.abr_ladder[0]
+                self.video_track.set_output(top.width, top.height, top.fps)
+            self.relay = MediaRelay()
+        return ViewerTrack(self.relay.subscribe(self.video_track, buffered=False))
+
+    @staticmethod
+    def _apply_rung(session: ViewerSession) -> None:
+        """Send this viewer its current ABR rung — other viewers are unaffected."""
+        if session.track is not None and session.abr is not None:
+            rung = session.abr.rung
+            session.track.set_output(rung.width, rung.height, rung.fps)
+
+    async def _expire_source(self) -> None:
+        """Stop the shared track once the grace period passes with no viewer."""
+        await asyncio.sleep(self.reconnect_grace)
+        self._source_expiry = None
+        if not self._live_sessions():
+            self._stop_source()
+
+    def _stop_source(self) -> None:
+        if self._source_expiry:
+            self._source_expiry.cancel()
+            self._source_expiry = None
+        if self.video_track:
+            self.video_track.stop()
+            self.video_track = None
+            self.relay       = None
+
+    def _publish_state(self) -> None:
+        """Write the aggregate connection state and notify process_a on change."""
+        states = {session.state for session in self._live_sessions()}
+        if "connected" in states:
+            aggregate = "connected"
+        elif states & {"new", "connecting"}:
+            aggregate = "connecting"
+        else:
+            aggregate = "disconnected"
+
+        if aggregate == self._aggregate_state:
+            return
+        self._aggregate_state = aggregate
+        self._rtdb_post(self.connection_state_ref.set, aggregate, what="connection state")
+        if self.on_connection_state_change:
+            self.on_connection_state_change(aggregate)
+
     # ─────────────────────────── PEER CONNECTION ─────────────────────────────
 
-    def _create_peer_connection(self) -> RTCPeerConnection:
+    def _create_peer_connection(self, session: ViewerSession) -> RTCPeerConnection:
         """Create a new RTCPeerConnection with ICE/TURN config and event handlers."""
-        config = RTCConfiguration(iceServers=self.ice_servers)
+        ice_servers = self.prober.working_servers() if self.prober else self.ice_servers
+        config      = RTCConfiguration(iceServers=ice_servers)
         pc     = RTCPeerConnection(configuration=config)
-        self.ice_stats = {"host": 0, "srflx": 0, "relay": 0}
 
-        @pc.on("icecandidate")
-        async def on_ice_candidate(candidate):
-            if candidate and self.candidates_sent < 10:
-                try:
-                    cand_str = candidate.candidate
-                    if   "typ host"  in cand_str: self.ice_stats["host"]  += 1
-                    elif "typ srflx" in cand_str: self.ice_stats["srflx"] += 1
-                    elif "typ relay" in cand_str: self.ice_stats["relay"] += 1
-
-                    self.ice_candidates_raspi_ref.push({
-                        "candidate"     : candidate.candidate,
-                        "sdpMid"        : candidate.sdpMid,
-                        "sdpMLineIndex" : candidate.sdpMLineIndex,
-                        "timestamp"     : int(time.time() * 1000)
-                    })
-                    self.candidates_sent += 1
-                except Exception as e:
-                    _log(details=f"ICE candidate send failed: {e}", log_type="error")
+        @pc.on("connectionstatechange")
+        async def on_connection_state():
+            state         = pc.connectionState
+            session.state = state
+            if not session.legacy and not session.superseded:
+                self._rtdb_post(session.connection_state_ref.set, state, what="viewer state")
 
-        @pc.on("icegatheringstatechange")
-        async def on_ice_gathering_state():
-            if pc.iceGatheringState == "complete" and self.ice_stats["relay"] == 0:
+            if state in ["failed", "closed"]:
                 _log(
-                    details=f"ICE gathering complete — no relay candidates. Stats: {self.ice_stats}",
+                    details=f"Viewer {session.viewer_id} {state} | ICE stats: {session.ice_stats}",
                     log_type="warning"
                 )
+                await self._close_session(session, remember=True)
+            self._publish_state()
 
-        @pc.on("connectionstatechange")
-        async def on_connection_state():
-            state = pc.connectionState
-            try:
-                self.connection_state_ref.set(state)
-            except Exception as e:
-                _log(details=f"Failed to write connection state to Firebase: {e}", log_type="warning")
+        @pc.on("datachannel")
+        def on_datachannel(channel):
+            if channel.label != CHANNEL_LABEL:
+                return
+            session.channel = channel
 
-            if self.on_connection_state_change:
-                self.on_connection_state_change(state)
+            @channel.on("message")
+            def on_message(message):
+                if not self.on_data_message or not isinstance(message, str):
+                    return
+                try:
+                    self.on_data_message(session.viewer_id, message)
+                except Exception as e:
+                    _log(details=f"Data channel handler failed ({session.viewer_id}): {e}", log_type="warning")
 
-            if state == "connected":
-                self.candidates_sent = 0
-            elif state in ["failed", "closed"]:
-                _log(
-                    details=f"Connection {state} | ICE stats: {self.ice_stats}",
-                    log_type="warning"
-                )
-                await self._cleanup()
+            @channel.on("close")
+            def on_close():
+                if session.channel is channel:
+                    session.channel = None
 
         @pc.on("iceconnectionstatechange")
         async def on_ice_state():
             if pc.iceConnectionState == "failed":
                 _log(
                     details=(
-                        f"ICE connection failed | stats: {self.ice_stats} | "
-                        f"relay used: {self.ice_stats['relay'] > 0}"
+                        f"ICE connection failed | viewer: {session.viewer_id} | "
+                        f"stats: {session.ice_stats} | "
+                        f"relay used: {session.ice_stats['relay'] > 0}"
                     ),
                     log_type="error"
                 )
 
         return pc
 
-    # ─────────────────────────── START / POLL ────────────────────────────────
+    # ─────────────────────────── START / SIGNALING ───────────────────────────
 
     async def start(self) -> None:
         """
-        Start the peer and begin polling Firebase for offers.
+        Start the peer and begin listening (or polling) Firebase for offers.
 
         Raises:
             WebRTCStartError: If the initial Firebase connection state write fails.
@@ -266,25 +737,76 @@ class WebRTCPeer:
             return
         self.is_running = True
         try:
-            self.connection_state_ref.set("disconnected")
+            await self._rtdb(self.connection_state_ref.set, "disconnected")
         except Exception as e:
             raise WebRTCStartError(
                 f"Failed to write initial connection state to Firebase: {e}. "
                 f"Source: {__name__}"
             ) from e
 
-        asyncio.create_task(self._poll_for_offers())
+        if self.signaling == "listen":
+            try:
+                self._offer_stream = await RTDBStream(self.offer_ref).open()
+            except RTDBStreamError as e:
+                _log(details=f"{e} — falling back to offer polling", log_type="warning")
+                self.signaling = "poll"
+
+        if self._offer_stream:
+            asyncio.create_task(self._listen_for_offers(self._offer_stream))
+        else:
+            asyncio.create_task(self._poll_for_offers())
+
+        if self.prober:
+            asyncio.create_task(self._probe_ice_servers())
+        if self.telemetry and self.stats_rtdb_interval > 0:
+            asyncio.create_task(self._publish_stats())
+
+    async def _probe_ice_servers(self) -> None:
+        """Internal loop — logs internally, does not raise."""
+        def _report(results) -> None:
+            if self.on_ice_probe:
+                self.on_ice_probe(results, self.prober.working_servers())
+        try:
+            await self.prober.run(lambda: self.is_running, on_probe=_report)
+        except Exception as e:
+            _log(details=f"ICE server probe failed: {e}", log_type="error")
+
+    def _take_offer(self, offer_data) -> bool:
+        """True for an offer newer than the last one handled."""
+        if not offer_data or not isinstance(offer_data, dict) or "sdp" not in offer_data:
+            return False
+        timestamp = offer_data.get("timestamp", 0)
+        if timestamp <= self.last_offer_timestamp:
+            return False
+        self.last_offer_timestamp = timestamp
+        return True
+
+    async def _listen_for_offers(self, stream: RTDBStream) -> None:
+        """
+        Internal loop — logs internally, does not raise.
+        Offers are handled concurrently so one viewer's ICE gathering does
+        not hold up the next viewer's answer.
+        """
+        try:
+            async for _, _, _, offer_data in stream:
+                if not self.is_running:
+                    break
+                if self._take_offer(offer_data):
+                    asyncio.create_task(self._handle_offer(dict(offer_data)))
+        except Exception as e:
+            _log(details=f"Offer listener error: {e} — falling back to polling", log_type="error")
+            stream.close()
+            if self.is_running:
+                self.signaling = "poll"
+                asyncio.create_task(self._poll_for_offers())
 
     async def _poll_for_offers(self) -> None:
         """Internal loop — logs internally, does not raise."""
         while self.is_running:
             try:
-                offer_data = self.offer_ref.get()
-                if offer_data and isinstance(offer_data, dict):
-                    timestamp = offer_data.get("timestamp", 0)
-                    if timestamp > self.last_offer_timestamp:
-                        self.last_offer_timestamp = timestamp
-                        await self._handle_offer(offer_data)
+                offer_data = await self._rtdb(self.offer_ref.get)
+                if self._take_offer(offer_data):
+                    await self._handle_offer(offer_data)
                 await asyncio.sleep(0.5)
             except Exception as e:
                 _log(details=f"Offer poll error: {e}", log_type="error")
@@ -292,35 +814,111 @@ class WebRTCPeer:
 
     # ─────────────────────────── OFFER / ANSWER ──────────────────────────────
 
+    def _new_session(self, offer_data: dict) -> ViewerSession:
+        """Build the session (and signaling refs) an offer belongs to."""
+        timestamp = offer_data.get("timestamp", 0)
+        viewer_id = offer_data.get("viewerId")
+        if viewer_id:
+            return ViewerSession(
+                viewer_id       = str(viewer_id),
+                base_ref        = self.viewers_ref.child(str(viewer_id)),
+                path            = f"viewers/{viewer_id}/",
+                legacy          = False,
+                offer_timestamp = timestamp,
+            )
+        return ViewerSession(
+            viewer_id       = f"legacy-{timestamp}",
+            base_ref        = self.stream_ref,
+            path            = "",
+            legacy          = True,
+            offer_timestamp = timestamp,
+        )
+
     async def _handle_offer(self, offer_data: dict) -> None:
         """Internal handler — logs internally, does not raise."""
-        try:
+        # Tell process_a first so the camera warms up while ICE is negotiated
+        if self.on_offer:
             try:
-                self.offer_ref.delete()
-            except Exception:
-                pass
-
-            if self.pc:
-                await self.pc.close()
-                self.pc = None
+                self.on_offer()
+            except Exception as e:
+                _log(details=f"on_offer callback failed: {e}", log_type="warning")
+
+        self._rtdb_post(self.offer_ref.delete)
+
+        session = self._new_session(offer_data)
+
+        # A viewer re-offering replaces its own old session. For older apps
+        # only the still-negotiating legacy session is replaced — connected
+        # legacy viewers keep streaming.
+        previous = self.sessions.get(session.viewer_id)
+        if previous is None and session.legacy and self._legacy_session:
+            if self._legacy_session.state != "connected":
+                previous = self._legacy_session
+
+        # Reconnect fast paths. A connected session being re-offered (network
+        # change on the phone) keeps streaming until the new one flows; a
+        # viewer back within the grace period resumes at its last ABR rung.
+        start_index = 0
+        departed    = self._departed.pop(session.reconnect_key, None)
+        if departed and time.monotonic() - departed[0] <= self.reconnect_grace:
+            session.reconnect_from, start_index = departed
+        if previous is not None and previous.state == "connected" and not previous.legacy:
+            previous.superseded = True
+            session.replaces    = previous
+            self._standby.add(previous)
+            if previous.abr:
+                start_index = previous.abr.index
+
+        # Decide and register before the first await — offers run concurrently
+        if len(self.sessions) - (previous is not None) >= self.max_viewers:
+            self.rejected_viewers += 1
+            _log(
+                details=f"Viewer limit reached ({self.max_viewers}) — rejecting {session.viewer_id}",
+                log_type="warning"
+            )
+            self._rtdb_post(session.answer_ref.set, {
+                "type"      : "reject",
+                "reason"    : "viewer_limit",
+                "timestamp" : int(time.time() * 1000)
+            })
+            return
 
-            self.pc = self._create_peer_connection()
+        self.sessions[session.viewer_id] = session
+        if session.legacy:
+            self._legacy_session = session
+        if previous is not None and session.replaces is None:
+            await self._close_session(previous, delete_signaling=False)
+        self._publish_state()
 
-            self.video_track = CameraVideoTrack(
-                capture         = self.capture,
-                frame_dimension = self.frame_dimension,
-                frame_buffer    = self.frame_buffer
-            )
-            self.pc.addTrack(self.video_track)
+        try:
+            session.pc     = self._create_peer_connection(session)
+            session.track  = self._subscribe_source()
+            session.sender = session.pc.addTrack(session.track)
+            if self.codec_preferences:
+                _prefer_codecs(session.pc, session.sender, self.codec_preferences)
+            if self.abr_ladder:
+                session.abr = ABRController(self.abr_ladder, start_index=start_index)
+                self._apply_rung(session)
 
             offer = RTCSessionDescription(
                 sdp  = offer_data["sdp"],
                 type = offer_data["type"]
             )
-            await self.pc.setRemoteDescription(offer)
+            await session.pc.setRemoteDescription(offer)
+            _watch_first_frame(session.track, lambda: self._record_first_frame(session))
+
+            # Trickle: hold srflx / relay back so setLocalDescription only
+            # gathers host candidates and the answer goes out right away
+            trickle = self.ice_mode == "trickle" and _defer_server_candidates(
+                session.pc,
+                on_batch = lambda batch: self._write_candidates(session, batch),
+                tasks    = session.gather_tasks,
+                on_done  = lambda: self._check_relay(session),
+            )
 
-            answer       = await self.pc.createAnswer()
-            modified_sdp = self._apply_bitrate_limit(answer.sdp)
+            answer       = await session.pc.createAnswer()
+            max_kbps     = self.abr_ladder[0].kbps if self.abr_ladder else 1500
+            modified_sdp = self._apply_bitrate_limit(answer.sdp, max_kbps=max_kbps)
             if modified_sdp != answer.sdp:
                 answer = RTCSessionDescription(sdp=modified_sdp, type=answer.type)
 
@@ -328,30 +926,145 @@ class WebRTCPeer:
             # complete before sending the answer — otherwise socket.send()
             # fires on a half-initialised ICE agent and raises an exception,
             # and host/srflx/relay candidates all stay at 0.
-            await self.pc.setLocalDescription(answer)
-            await self._wait_for_ice_gather(timeout=10.0)
-
-            self.answer_ref.set({
-                "sdp"       : self.pc.localDescription.sdp,
-                "type"      : self.pc.localDescription.type,
+            await session.pc.setLocalDescription(answer)
+            if not trickle:
+                await self._wait_for_ice_gather(session, timeout=10.0)
+
+            session.codec = _negotiated_codec(session.pc, session.sender)
+            answer_sdp = session.pc.localDescription.sdp
+            _count_candidates(session.ice_stats, answer_sdp)
+            if trickle:
+                # More candidates follow through iceCandidates/raspi
+                answer_sdp = answer_sdp.replace("a=end-of-candidates\r\n", "")
+            else:
+                self._check_relay(session)
+
+            await self._rtdb(session.answer_ref.set, {
+                "sdp"       : answer_sdp,
+                "type"      : session.pc.localDescription.type,
                 "timestamp" : int(time.time() * 1000)
             })
+            self._record_offer_latency(session)
 
-            asyncio.create_task(self._poll_for_mobile_ice_candidates())
+            asyncio.create_task(self._receive_mobile_ice_candidates(session))
+            asyncio.create_task(self._stats_loop(session))
 
-            try:
-                self.connection_state_ref.set("connecting")
-            except Exception:
-                pass
+            session.state = "connecting"
+            if not session.legacy:
+                self._rtdb_post(session.connection_state_ref.set, "connecting")
+            self._publish_state()
 
         except Exception as e:
-            _log(details=f"Offer handling failed: {e}", log_type="error")
-            try:
-                self.connection_state_ref.set("failed")
-            except Exception:
-                pass
+            _log(details=f"Offer handling failed ({session.viewer_id}): {e}", log_type="error")
+            if not session.legacy:
+                self._rtdb_post(session.connection_state_ref.set, "failed")
+            session.state = "failed"
+            await self._close_session(session)
+            self._publish_state()
+
+    def _write_candidates(self, session: ViewerSession, batch: list) -> None:
+        """
+        Publish one burst of trickled candidates in a single RTDB update.
+        Internal — logs internally, does not raise.
+        """
+        if session.closed or not batch:
+            return
+        now     = int(time.time() * 1000)
+        payload = {}
+        for index, (candidate, sdp_mid, sdp_mline_index) in enumerate(batch):
+            line = candidate_to_sdp(candidate)
+            _count_candidates(session.ice_stats, line)
+            payload[f"c{now}{index:02d}"] = {
+                "candidate"     : f"candidate:{line}",
+                "sdpMid"        : sdp_mid,
+                "sdpMLineIndex" : sdp_mline_index,
+                "timestamp"     : now,
+            }
+        self._rtdb_post(
+            session.ice_raspi_ref.update, payload, what=f"ICE candidates ({session.viewer_id})"
+        )
+
+    def _check_relay(self, session: ViewerSession) -> None:
+        """Warn once gathering is over without a relay candidate."""
+        if not session.closed and session.ice_stats["relay"] == 0:
+            _log(
+                details=(
+                    f"ICE gathering complete — no relay candidates. "
+                    f"Viewer: {session.viewer_id} | Stats: {session.ice_stats}"
+                ),
+                log_type="warning"
+            )
+
+    def _record_first_frame(self, session: ViewerSession) -> None:
+        now                    = time.monotonic()
+        session.first_frame_ms = (now - session.offer_received) * 1000
+        self._first_frames.append((_ice_path(session.pc), session.first_frame_ms))
+
+        if session.reconnect_from is not None:
+            self._reconnects.append(("reconnect", (now - session.reconnect_from) * 1000))
+        if session.replaces is not None:
+            # Make-before-break: the new connection carries media, drop the old one
+            previous, session.replaces = session.replaces, None
+            self._reconnects.append(("restart", session.first_frame_ms))
+            asyncio.ensure_future(self._close_session(previous, delete_signaling=False))
+
+    def reconnect_summary(self, reset: bool = True) -> Dict[str, dict]:
+        """
+        Reconnect times since the last call — {"restart" | "reconnect":
+        {"count", "mean_ms", "max_ms"}}. "restart": re-offer while connected,
+        offer → first frame on the new connection. "reconnect": old session
+        failed → first frame on the new one.
+        """
+        samples = list(self._reconnects)
+        if reset:
+            self._reconnects.clear()
+        return _summarise(samples)
+
+    def first_frame_summary(self, reset: bool = True) -> Dict[str, dict]:
+        """
+        Offer-to-first-frame per ICE path ("lan", "stun", "turn") since the
+        last call — {path: {"count", "mean_ms", "max_ms"}}. For the process
+        stats log.
+        """
+        samples = list(self._first_frames)
+        if reset:
+            self._first_frames.clear()
+        return _summarise(samples)
 
-    async def _wait_for_ice_gather(self, timeout: float = 10.0) -> None:
+    def _record_offer_latency(self, session: ViewerSession) -> None:
+        """
+        delivery_ms: app offer timestamp → offer seen here (includes RTDB
+                     delivery or poll delay, and any phone/Pi clock skew).
+        answer_ms:   offer seen here → answer written.
+        """
+        delivery_ms = (
+            session.started * 1000 - session.offer_timestamp
+            if session.offer_timestamp else None
+        )
+        answer_ms = (time.monotonic() - session.offer_received) * 1000
+        self._offer_latency.append((delivery_ms, answer_ms))
+
+    def signaling_summary(self, reset: bool = True) -> Optional[dict]:
+        """
+        Offer latency since the last call, or None if no offer was answered.
+        For the process stats log.
+        """
+        samples = list(self._offer_latency)
+        if reset:
+            self._offer_latency.clear()
+        if not samples:
+            return None
+        delivery = [d for d, _ in samples if d is not None and d >= 0]
+        answer   = [a for _, a in samples]
+        return {
+            "mode"             : self.signaling,
+            "offers"           : len(samples),
+            "delivery_ms_mean" : sum(delivery) / len(delivery) if delivery else None,
+            "answer_ms_mean"   : sum(answer) / len(answer),
+            "answer_ms_max"    : max(answer),
+        }
+
+    async def _wait_for_ice_gather(self, session: ViewerSession, timeout: float = 10.0) -> None:
         """
         Block until iceGatheringState == 'complete' or timeout expires.
 
@@ -365,13 +1078,13 @@ class WebRTCPeer:
         under 2 seconds for host candidates.
         """
         deadline = time.time() + timeout
-        while self.pc and self.pc.iceGatheringState != "complete":
+        while session.pc and session.pc.iceGatheringState != "complete":
             if time.time() > deadline:
                 _log(
                     details=(
                         f"ICE gather timed out after {timeout:.0f}s — "
-                        f"state={getattr(self.pc, 'iceGatheringState', 'gone')} "
-                        f"stats={self.ice_stats}"
+                        f"state={getattr(session.pc, 'iceGatheringState', 'gone')} "
+                        f"stats={session.ice_stats}"
                     ),
                     log_type="warning"
                 )
@@ -380,30 +1093,66 @@ class WebRTCPeer:
 
     # ─────────────────────────── ICE CANDIDATES ──────────────────────────────
 
-    async def _poll_for_mobile_ice_candidates(self) -> None:
-        """Internal loop — logs internally, does not raise."""
+    async def _receive_mobile_ice_candidates(self, session: ViewerSession) -> None:
+        """
+        Feed the viewer's ICE candidates into its peer connection — from a
+        listen() stream for the session's lifetime, or by polling.
+        Internal — logs internally, does not raise.
+        """
         processed = set()
+        if self.signaling == "listen":
+            try:
+                session.ice_stream = await RTDBStream(session.ice_mobile_ref).open()
+            except RTDBStreamError as e:
+                _log(details=f"{e} — polling ICE candidates instead", log_type="warning")
+
+        if session.ice_stream is None or session.closed:
+            await self._poll_for_mobile_ice_candidates(session, processed)
+            return
+
+        try:
+            async for _, _, _, candidates_data in session.ice_stream:
+                if session.closed or not self.is_running:
+                    break
+                await self._add_new_candidates(session, candidates_data, processed)
+        except Exception as e:
+            _log(details=f"Mobile ICE candidate listener error: {e}", log_type="error")
+        finally:
+            session.ice_stream.close()
+
+    async def _add_new_candidates(self, session: ViewerSession, candidates_data, processed: set) -> None:
+        """Add every candidate in the node not seen before."""
+        if not candidates_data or not isinstance(candidates_data, dict):
+            return
+        for key, cand_data in candidates_data.items():
+            if key in processed or not isinstance(cand_data, dict):
+                continue
+            processed.add(key)
+            # Shared legacy node — skip candidates of an earlier offer
+            if cand_data.get("timestamp", session.offer_timestamp) < session.offer_timestamp:
+                continue
+            await self._add_ice_candidate(session, cand_data)
+
+    async def _poll_for_mobile_ice_candidates(self, session: ViewerSession, processed: set) -> None:
+        """Internal loop — logs internally, does not raise."""
         while (
-            self.pc and
-            self.pc.connectionState not in ["connected", "closed", "failed"] and
+            not session.closed and
+            session.pc and
+            session.pc.connectionState not in ["connected", "closed", "failed"] and
             self.is_running
         ):
             try:
-                candidates_data = self.ice_candidates_mobile_ref.get()
-                if candidates_data and isinstance(candidates_data, dict):
-                    for key, cand_data in candidates_data.items():
-                        if key not in processed and isinstance(cand_data, dict):
-                            await self._add_ice_candidate(cand_data)
-                            processed.add(key)
+                candidates_data = await self._rtdb(session.ice_mobile_ref.get)
+                await self._add_new_candidates(session, candidates_data, processed)
                 await asyncio.sleep(0.2)
             except Exception as e:
                 _log(details=f"Mobile ICE candidate poll error: {e}", log_type="error")
                 await asyncio.sleep(0.5)
 
-    async def _add_ice_candidate(self, cand_data: dict) -> None:
+    async def _add_ice_candidate(self, session: ViewerSession, cand_data: dict) -> None:
         """Internal — logs internally, does not raise."""
         try:
-            if self.pc and "candidate" in cand_data:
+            if session.pc and "candidate" in cand_data:
                 raw = cand_data["candidate"]
                 if raw.startswith("candidate:"):
                     raw = raw.replace("candidate:", "", 1)
@@ -411,12 +1160,121 @@ class WebRTCPeer:
                 candidate               = candidate_from_sdp(raw)
                 candidate.sdpMid        = cand_data.get("sdpMid")
                 candidate.sdpMLineIndex = cand_data.get("sdpMLineIndex")
-                await self.pc.addIceCandidate(candidate)
+                await session.pc.addIceCandidate(candidate)
         except Exception as e:
             _log(details=f"Add ICE candidate failed: {e}", log_type="error")
 
     # ─────────────────────────── BITRATE ─────────────────────────────────────
 
+    async def _stats_loop(self, session: ViewerSession) -> None:
+        """
+        Link stats (and adaptive bitrate) loop for one viewer.
+        Internal loop — logs internally, does not raise.
+
+        Samples getStats() every ABR_INTERVAL seconds for the viewer's send
+        rate. With an ABR ladder, ABRController picks a rung per viewer:
+        resolution and fps go to this viewer's ViewerTrack only, the
+        bitrate is applied as a cap on this viewer's aiortc encoder target,
+        which receiver REMB feedback may lower further but never raise
+        above it.
+        """
+        timings  = deque(maxlen=200)
+        frames   = {"encoded": 0, "sent": 0}
+        previous = None
+
+        while self.is_running and not session.closed:
+            await asyncio.sleep(ABR_INTERVAL)
+            pc = session.pc
+            if pc is None or pc.connectionState in ("closed", "failed"):
+                return
+            try:
+                encoder = _sender_encoder(session.sender)
+                if encoder is not None:
+                    _instrument_encoder(encoder, timings, frames, on_encoded=self._trace_encoded)
+                    if session.abr:
+                        cap = session.abr.rung.kbps * 1000
+                        if getattr(encoder, "target_bitrate", cap) > cap:
+                            encoder.target_bitrate = cap
+
+                report           = await pc.getStats()
+                sample, previous = _link_sample(report, previous, timings)
+                encoded, sent    = frames["encoded"], frames["sent"]
+                frames["encoded"] = frames["sent"] = 0
+                if sample is None:
+                    continue
+                session.send_kbps = sample.send_kbps
+                self._record_stats(session, report, sample, encoded, sent)
+
+                rung = session.abr.update(sample) if session.abr else None
+                if rung is None:
+                    continue
+
+                self._apply_rung(session)
+                if encoder is not None:
+                    encoder.target_bitrate = rung.kbps * 1000
+                if self.on_abr_change:
+                    self.on_abr_change(session.viewer_id, rung, session.abr.last_reason, sample)
+            except Exception as e:
+                _log(details=f"Stats sample failed ({session.viewer_id}): {e}", log_type="warning")
+
+    def _record_stats(
+        self,
+        session : ViewerSession,
+        report,
+        sample  : LinkSample,
+        encoded : int,
+        sent    : int
+    ) -> None:
+        """Hand one sample to the telemetry. Internal — logs internally, does not raise."""
+        if self.telemetry is None:
+            return
+        try:
+            self.telemetry.record(StreamStats(
+                time           = time.time(),
+                viewer         = session.viewer_id,
+                path           = _ice_path(session.pc),
+                pair           = _candidate_pair(session.pc),
+                rtt_ms         = sample.rtt_ms,
+                jitter_ms      = _jitter_ms(report),
+                loss           = sample.loss,
+                send_kbps      = sample.send_kbps,
+                frames_encoded = encoded,
+                frames_sent    = sent,
+                encode_ms      = sample.encode_ms,
+                rung           = str(session.abr.rung) if session.abr else "",
+            ))
+        except StreamTelemetryError as e:
+            _log(details=f"{e} — metrics file disabled", log_type="warning")
+
+    async def _publish_stats(self) -> None:
+        """
+        Write the per-viewer telemetry summary to RTDB every
+        stats_rtdb_interval seconds. Internal loop — does not raise.
+        """
+        published = False
+        while self.is_running:
+            await asyncio.sleep(self.stats_rtdb_interval)
+            summary = self.telemetry.summary(seconds=self.stats_rtdb_interval)
+            if summary:
+                self._rtdb_post(self.stats_ref.set, {
+                    "viewers"   : summary,
+                    "latency"   : self.tracer.snapshot() if self.tracer else None,
+                    "timestamp" : int(time.time() * 1000)
+                }, what="stream stats")
+                published = True
+            elif published:
+                self._rtdb_post(self.stats_ref.delete)
+                published = False
+
+    def _trace_encoded(self, frame, started: float, finished: float) -> None:
+        """
+        Encoder executor thread — hands the encode times to the tracer.
+        PyAV rebases the (shared) frame's pts to the codec time base during
+        encode, so it is converted back to the track's 90 kHz clock.
+        """
+        if self.tracer is not None and frame.pts is not None and frame.time_base:
+            self.tracer.encoded(round(frame.pts * frame.time_base * 90000), started, finished)
+
     def _apply_bitrate_limit(self, sdp: str, max_kbps: int = 1500) -> str:
         lines         = sdp.split("\r\n")
         modified      = []
@@ -441,36 +1299,93 @@ class WebRTCPeer:
 
     # ─────────────────────────── CLEANUP / STOP ──────────────────────────────
 
+    async def _close_session(
+        self,
+        session          : ViewerSession,
+        delete_signaling : bool = True,
+        remember         : bool = False
+    ) -> None:
+        """
+        Close one viewer. Internal — logs internally, does not raise.
+
+        remember=True (the connection failed or was closed by the viewer)
+        keeps its ABR rung for reconnect_grace seconds. The shared source
+        track outlives the last viewer by the same grace period.
+        """
+        if session.closed:
+            return
+        session.closed = True
+        if session.ice_stream:
+            session.ice_stream.close()
+        for task in session.gather_tasks:
+            task.cancel()
+        try:
+            self._standby.discard(session)
+            if self.sessions.get(session.viewer_id) is session:
+                del self.sessions[session.viewer_id]
+                replaced = session.replaces
+                if replaced is not None and not replaced.closed:
+                    # The new connection never carried media — keep the old one
+                    replaced.superseded = False
+                    self._standby.discard(replaced)
+                    self.sessions[replaced.viewer_id] = replaced
+                    session.replaces = None
+            if remember and not session.superseded and self.reconnect_grace > 0:
+                self._departed[session.reconnect_key] = (
+                    time.monotonic(), session.abr.index if session.abr else 0
+                )
+            if session.pc:
+                await session.pc.close()
+                session.pc = None
+            if session.track:
+                session.track.stop()
+                session.track = None
+
+            # Shared legacy nodes belong to whichever legacy viewer is negotiating
+            owns_nodes = not session.superseded and (not session.legacy or self._legacy_session is session)
+            if session.legacy and self._legacy_session is session:
+                self._legacy_session = None
+            if delete_signaling and owns_nodes:
+                self._rtdb_post(
+                    self.stream_ref.update,
+                    {path: None for path in session.signaling_paths()},
+                    what=f"signaling cleanup ({session.viewer_id})"
+                )
+
+            if not self._live_sessions() and self.video_track:
+                if self.is_running and self.reconnect_grace > 0:
+                    if self._source_expiry is None:
+                        self._source_expiry = asyncio.ensure_future(self._expire_source())
+                else:
+                    self._stop_source()
+        except Exception as e:
+            _log(details=f"Cleanup error ({session.viewer_id}): {e}", log_type="error")
+
     async def _cleanup(self) -> None:
         """
-        Internal cleanup — called from connection state callbacks.
+        Close every viewer and reset the signaling nodes in one update.
         Logs internally, does not raise.
         """
         try:
-            if self.pc:
-                await self.pc.close()
-                self.pc = None
-            if self.video_track:
-                self.video_track.stop()
-                self.video_track = None
-
-            for ref in [
-                self.offer_ref,
-                self.answer_ref,
-                self.ice_candidates_raspi_ref,
-                self.ice_candidates_mobile_ref,
-            ]:
-                try:
-                    ref.delete()
-                except Exception:
-                    pass
+            # "viewers" holds every per-viewer node; only the shared legacy
+            # nodes need listing (an update may not name a node and its child)
+            nodes = {"offer": None, "viewers": None, "stats": None, "connectionState": "disconnected"}
+            if self._legacy_session:
+                nodes.update({path: None for path in self._legacy_session.signaling_paths()})
+
+            for session in self._live_sessions():
+                await self._close_session(session, delete_signaling=False)
+            self._stop_source()
+            self._departed.clear()
 
             try:
-                self.connection_state_ref.set("disconnected")
-            except Exception:
-                pass
+                await self._rtdb(self.stream_ref.update, nodes)
+            except Exception as e:
+                _log(details=f"Failed to reset signaling nodes in Firebase: {e}", log_type="warning")
 
-            self.candidates_sent = 0
+            self._aggregate_state = "disconnected"
+            if self.on_connection_state_change:
+                self.on_connection_state_change("disconnected")
         except Exception as e:
             _log(details=f"Cleanup error: {e}", log_type="error")
 
@@ -482,6 +1397,9 @@ class WebRTCPeer:
             WebRTCStopError: If an unexpected error occurs during stop.
         """
         self.is_running = False
+        if self._offer_stream:
+            self._offer_stream.close()
+            self._offer_stream = None
         try:
             await self._cleanup()
         except Exception as e:
@@ -490,7 +1408,299 @@ class WebRTCPeer:
             ) from e
 
     def __repr__(self) -> str:
-        return f"WebRTCPeer(user={self.user_uid}, device={self.device_uid})"
+        return (
+            f"WebRTCPeer(user={self.user_uid}, device={self.device_uid}, "
+            f"viewers={len(self.sessions)}/{self.max_viewers})"
+        )
+
+
+# ─────────────────────────── ABR HELPERS ─────────────────────────────────────
+
+def _sender_encoder(sender):
+    """aiortc keeps the encoder private and creates it on the first frame."""
+    return getattr(sender, "_RTCRtpSender__encoder", None)
+
+
+def _instrument_encoder(
+    encoder,
+    timings    : deque,
+    frames     : dict,
+    on_encoded : Optional[Callable] = None
+) -> None:
+    """
+    Wrap encoder.encode once to record per-frame encode time (seconds) and
+    count frames encoded / frames that produced RTP payloads (sent).
+    on_encoded(frame, started, finished) gets the wall-clock times.
+    """
+    if getattr(encoder, "_timed", False):
+        return
+    encode = encoder.encode
+
+    def _timed_encode(*args, **kwargs):
+        started = time.perf_counter()
+        wall    = time.time()
+        try:
+            payloads, timestamp = encode(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            timings.append(elapsed)
+        if on_encoded is not None and args:
+            on_encoded(args[0], wall, wall + elapsed)
+        frames["encoded"] += 1
+        if payloads:
+            frames["sent"] += 1
+        return payloads, timestamp
+
+    encoder.encode = _timed_encode
+    encoder._timed = True
+
+
+def _link_sample(report, previous: Optional[dict], timings: deque):
+    """
+    Turn an RTCStatsReport into a LinkSample using the previous counters.
+
+    Returns:
+        (LinkSample or None on the first call, counters for the next call)
+    """
+    now      = time.monotonic()
+    outbound = [s for s in report.values() if s.type == "outbound-rtp"]
+    remote   = [s for s in report.values() if s.type == "remote-inbound-rtp"]
+
+    counters = {
+        "time"    : now,
+        "bytes"   : sum(getattr(s, "bytesSent",   0) or 0 for s in outbound),
+        "packets" : sum(getattr(s, "packetsSent", 0) or 0 for s in outbound),
+        "lost"    : sum(getattr(s, "packetsLost", 0) or 0 for s in remote),
+    }
+    if previous is None:
+        return None, counters
+
+    elapsed = max(now - previous["time"], 1e-3)
+    packets = counters["packets"] - previous["packets"]
+    lost    = counters["lost"]    - previous["lost"]
+
+    rtts    = [s.roundTripTime for s in remote if getattr(s, "roundTripTime", None) is not None]
+    encodes = list(timings)
+    timings.clear()
+
+    sample = LinkSample(
+        rtt_ms    = max(rtts) * 1000 if rtts else None,
+        loss      = (lost / (packets + lost)) if remote and packets + lost > 0 else None,
+        send_kbps = (counters["bytes"] - previous["bytes"]) * 8 / 1000 / elapsed,
+        encode_ms = (sum(encodes) / len(encodes) * 1000) if encodes else None,
+    )
+    return sample, counters
+
+
+# ─────────────────────────── CODEC HELPERS ───────────────────────────────────
+
+def _sender_transceiver(pc, sender):
+    return next((t for t in pc.getTransceivers() if t.sender is sender), None)
+
+
+def _prefer_codecs(pc, sender, mime_types: List[str]) -> None:
+    """
+    Reorder the sender's codec preferences. aiortc builds the answer from
+    the transceiver's preferences (in their order) intersected with the
+    offer, and the sender encodes with the first negotiated codec.
+    """
+    transceiver = _sender_transceiver(pc, sender)
+    if transceiver is not None:
+        transceiver.setCodecPreferences(_codec_capabilities(mime_types))
+
+
+def _negotiated_codec(pc, sender) -> Optional[str]:
+    transceiver = _sender_transceiver(pc, sender)
+    codecs      = getattr(transceiver, "_codecs", None)
+    return codecs[0].mimeType if codecs else None
+
+
+# ─────────────────────────── TRICKLE ICE HELPERS ─────────────────────────────
+# aiortc has no local trickle ICE: RTCIceGatherer.gather() runs aioice's
+# Connection.gather_candidates(), which finishes host, srflx and relay before
+# returning. These helpers wrap the per-component gather on the aioice
+# connection so it returns host candidates at once and finishes the server
+# candidates in the background, pairing them into the running check list.
+
+def _ice_connections(pc) -> list:
+    """(aioice Connection, sdpMid, sdpMLineIndex) per distinct ICE transport."""
+    found, seen = [], set()
+    for index, transceiver in enumerate(pc.getTransceivers()):
+        dtls       = getattr(transceiver.sender, "transport", None)
+        ice        = getattr(dtls, "transport", None)
+        connection = getattr(getattr(ice, "iceGatherer", None), "_connection", None)
+        if connection is not None and id(connection) not in seen:
+            seen.add(id(connection))
+            found.append((connection, transceiver.mid, index))
+    return found
+
+
+def _defer_server_candidates(pc, on_batch: Callable, tasks: list, on_done: Callable) -> bool:
+    """
+    Make the coming setLocalDescription() gather host candidates only.
+
+    Server candidates are passed to on_batch([(RTCIceCandidate, sdpMid,
+    sdpMLineIndex), ...]) in bursts; on_done() runs when gathering is over.
+    Returns False (nothing changed) if this aioice lacks the internals used.
+    """
+    connections = _ice_connections(pc) if HAS_TRICKLE else []
+    required    = ("get_component_candidates", "stun_server", "turn_server",
+                   "_protocols", "_local_candidates", "_remote_candidates",
+                   "_check_list", "_find_pair", "sort_check_list")
+    if not connections or not all(
+        hasattr(connection, name) for connection, _, _ in connections for name in required
+    ):
+        return False
+
+    for connection, sdp_mid, sdp_mline_index in connections:
+        original = connection.get_component_candidates
+
+        async def host_first(component, addresses, timeout=5,
+                             connection=connection, original=original,
+                             sdp_mid=sdp_mid, sdp_mline_index=sdp_mline_index):
+            stun_server, turn_server = connection.stun_server, connection.turn_server
+            connection.stun_server = connection.turn_server = None
+            try:
+                candidates = await original(component=component, addresses=addresses, timeout=timeout)
+            finally:
+                connection.stun_server, connection.turn_server = stun_server, turn_server
+            host_protocols = [
+                protocol for protocol in connection._protocols
+                if protocol.local_candidate.component == component
+            ]
+            tasks.append(asyncio.ensure_future(_gather_server_candidates(
+                connection, component, host_protocols, timeout,
+                lambda batch: on_batch([(c, sdp_mid, sdp_mline_index) for c in batch]),
+                on_done,
+            )))
+            return candidates
+
+        connection.get_component_candidates = host_first
+    return True
+
+
+async def _gather_server_candidates(
+    connection, component: int, host_protocols: list, timeout: float,
+    on_batch: Callable, on_done: Callable
+) -> None:
+    """Background srflx / relay gathering for one component, batched per burst."""
+    pending = set()
+    if connection.stun_server:
+        for protocol in host_protocols:
+            if ":" not in protocol.local_candidate.host:    # IPv4 only, as aioice
+                pending.add(asyncio.ensure_future(
+                    server_reflexive_candidate(protocol, connection.stun_server)
+                ))
+    if connection.turn_server:
+        pending.add(asyncio.ensure_future(relayed_candidate(
+            component        = component,
+            protocol_factory = lambda: StunProtocol(connection),
+            turn_server      = connection.turn_server,
+            turn_username    = connection.turn_username,
+            turn_password    = connection.turn_password,
+            turn_ssl         = connection.turn_ssl,
+            turn_transport   = connection.turn_transport,
+        )))
+
+    deadline = time.monotonic() + timeout
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            # Whatever else lands within the batch window rides the same write
+            await asyncio.sleep(TRICKLE_BATCH_WINDOW)
+            finished = {task for task in pending if task.done()}
+            pending -= finished
+
+            batch = []
+            for task in done | finished:
+                if task.cancelled() or task.exception() is not None:
+                    continue
+                candidate, protocol = task.result()
+                connection._local_candidates.append(candidate)
+                if protocol is not None:
+                    # New relay socket — pair it with the remote candidates
+                    connection._protocols.append(protocol)
+                    for remote in connection._remote_candidates:
+                        if candidate.can_pair_with(remote) and not connection._find_pair(protocol, remote):
+                            connection._check_list.append(CandidatePair(protocol, remote))
+                    connection.sort_check_list()
+                batch.append(candidate_from_aioice(candidate))
+            if batch:
+                on_batch(batch)
+    finally:
+        for task in pending:
+            task.cancel()
+    on_done()
+
+
+def _summarise(samples: list) -> Dict[str, dict]:
+    """[(key, ms), ...] → {key: {"count", "mean_ms", "max_ms"}}."""
+    summary = {}
+    for key in sorted({key for key, _ in samples}):
+        times = [ms for k, ms in samples if k == key]
+        summary[key] = {
+            "count"   : len(times),
+            "mean_ms" : sum(times) / len(times),
+            "max_ms"  : max(times),
+        }
+    return summary
+
+
+def _count_candidates(ice_stats: dict, sdp: str) -> None:
+    """Tally host / srflx / relay candidate lines."""
+    for kind in ice_stats:
+        ice_stats[kind] += sdp.count(f"typ {kind}")
+
+
+def _ice_path(pc) -> str:
+    """ICE path of the nominated candidate pair: "turn", "stun" or "lan"."""
+    for connection, _, _ in (_ice_connections(pc) if pc else []):
+        for pair in getattr(connection, "_nominated", {}).values():
+            types = {pair.local_candidate.type, pair.remote_candidate.type}
+            if "relay" in types:
+                return "turn"
+            if types & {"srflx", "prflx"}:
+                return "stun"
+            return "lan"
+    return "unknown"
+
+
+def _candidate_pair(pc) -> Optional[str]:
+    """Candidate types of the nominated pair, "local/remote" (e.g. "relay/srflx")."""
+    for connection, _, _ in (_ice_connections(pc) if pc else []):
+        for pair in getattr(connection, "_nominated", {}).values():
+            return f"{pair.local_candidate.type}/{pair.remote_candidate.type}"
+    return None
+
+
+def _jitter_ms(report) -> Optional[float]:
+    """Receiver-reported jitter; RTCP reports it in 90 kHz video clock units."""
+    jitters = [
+        s.jitter for s in report.values()
+        if s.type == "remote-inbound-rtp" and getattr(s, "jitter", None) is not None
+    ]
+    return max(jitters) / 90.0 if jitters else None
+
+
+def _watch_first_frame(track, on_first: Callable) -> None:
+    """Call on_first() when the sender pulls its first frame (media flowing)."""
+    recv = track.recv
+
+    async def _recv():
+        frame = await recv()
+        if track.recv is _recv:
+            track.recv = recv
+            on_first()
+        return frame
+
+    track.recv = _recv
 
 
 # ─────────────────────────── PUBLIC HELPER ───────────────────────────────────
@@ -504,7 +1714,22 @@ async def run_webrtc_peer(
     frame_buffer              = None,
     turn_server_url           : str = None,
     turn_username             : str = None,
-    turn_password             : str = None
+    turn_password             : str = None,
+    on_offer                  : Optional[Callable] = None,
+    fps                       : int = 20,
+    abr_ladder                : Optional[List[Rung]] = None,
+    on_abr_change             : Optional[Callable] = None,
+    max_viewers               : int = DEFAULT_MAX_VIEWERS,
+    signaling                 : str = DEFAULT_SIGNALING,
+    ice_mode                  : str = DEFAULT_ICE_MODE,
+    reconnect_grace           : float = DEFAULT_RECONNECT_GRACE,
+    ice_probe_interval        : float = DEFAULT_ICE_PROBE_INTERVAL,
+    on_ice_probe              : Optional[Callable] = None,
+    telemetry                 : Optional[StreamTelemetry] = None,
+    stats_rtdb_interval       : float = 0.0,
+    on_data_message           : Optional[Callable] = None,
+    codec_preferences         : Optional[List[str]] = None,
+    tracer                    : Optional[FrameTracer] = None
 ) -> WebRTCPeer:
     """
     Create and start a WebRTCPeer.
@@ -524,7 +1749,22 @@ async def run_webrtc_peer(
         frame_buffer               = frame_buffer,
         turn_server_url            = turn_server_url,
         turn_username              = turn_username,
-        turn_password              = turn_password
+        turn_password              = turn_password,
+        on_offer                   = on_offer,
+        fps                        = fps,
+        abr_ladder                 = abr_ladder,
+        on_abr_change              = on_abr_change,
+        max_viewers                = max_viewers,
+        signaling                  = signaling,
+        ice_mode                   = ice_mode,
+        reconnect_grace            = reconnect_grace,
+        ice_probe_interval         = ice_probe_interval,
+        on_ice_probe               = on_ice_probe,
+        telemetry                  = telemetry,
+        stats_rtdb_interval        = stats_rtdb_interval,
+        on_data_message            = on_data_message,
+        codec_preferences          = codec_preferences,
+        tracer                     = tracer
     )
     await peer.start()
     return peer
\ No newline at end of file
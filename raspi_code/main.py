@@ -20,24 +20,34 @@ Logout flow (while running):
 
 Process C — Ultrasonic sensors:
     process_c runs the HC-SR04 feed and water level sensors in a dedicated
-    loop with the median filter enabled. It writes the latest readings into
-    two shared multiprocessing.Value('d') objects:
-
-        shared_feed_level  — feed level  (%)
-        shared_water_level — water level (%)
-
-    process_b reads these values on every tick without blocking.
-    The Values are created fresh each session (inside the auth loop) so
-    they are always valid when passed to the child processes.
+    streaming-filter loop. Sensors are listed in the ULTRASONIC_SENSORS
+    registry (lib/services/sensor_scheduler); every raw sample is appended
+    to a shared-memory SensorRing (lib/services/sensor_ring) per sensor:
+
+        sensor_rings["feed"]  — feed  (timestamp, raw cm, level %, quality)
+        sensor_rings["water"] — water (timestamp, raw cm, level %, quality)
+        sensor_rings[...]     — any extra hoppers / troughs
+
+    process_b reads the rings lock-free on every tick and can tell a fresh
+    reading from a stale one by its timestamp. The rings are created fresh
+    each session (inside the auth loop) and unlinked when it ends.
+
+Live-view control (lib/services/live_control):
+    process_a also gets the sensor rings and two Queues shared with
+    process_b — control_commands (feed / water commands from a viewer's
+    "control" data channel) and control_events (acks and motor state back
+    to the viewer) — so live-view commands skip the RTDB round trip.
 """
 
 import os
 import signal
 import sys
-from multiprocessing import Process, Event, Value
-from ctypes import c_double
+from multiprocessing import Process, Event, Queue
 
 from lib.processes import process_a, process_b, process_c
+from lib.services.sensor_ring import SensorRing, SensorRingError
+from lib.services.live_control import COMMAND_QUEUE_SIZE
+from lib.services.sensor_scheduler import parse_sensor_registry, SensorRegistryError
 from lib.services.auth import (
     AuthService,
     FirebaseInitError,
@@ -61,6 +71,15 @@ CAMERA_INDEX     = int(os.getenv("CAMERA_INDEX"))
 IS_WEB_CAM       = os.getenv("IS_WEB_CAM", "").lower() in {"1", "true", "yes"}
 FRAME_WIDTH      = int(os.getenv("FRAME_WIDTH"))
 FRAME_HEIGHT     = int(os.getenv("FRAME_HEIGHT"))
+CAMERA_FPS          = int(os.getenv("CAMERA_FPS", "20"))
+CAMERA_PIXEL_FORMAT = os.getenv("CAMERA_PIXEL_FORMAT", "yuv420").lower()
+CAMERA_CAPTURE_THREAD = os.getenv("CAMERA_CAPTURE_THREAD", "true").lower() in {"1", "true", "yes"}
+CAMERA_IDLE_MODE    = os.getenv("CAMERA_IDLE_MODE", "keepalive").lower()
+CAMERA_IDLE_AFTER_S = float(os.getenv("CAMERA_IDLE_AFTER_S", "30"))
+CAMERA_KEEPALIVE_S  = float(os.getenv("CAMERA_KEEPALIVE_S", "5"))
+CAMERA_BACKEND      = os.getenv("CAMERA_BACKEND", "hardware").lower()
+CAMERA_SOURCE       = os.getenv("CAMERA_SOURCE", "")
+CAMERA_FAULTS       = os.getenv("CAMERA_FAULTS", "")
 TEST_USER_UID    = os.getenv("TEST_USER_UID")
 TEST_USERNAME    = os.getenv("TEST_USERNAME")
 TEST_CREDENTIALS = {
@@ -71,6 +90,41 @@ TEST_CREDENTIALS = {
 TURN_SERVER_URL  = os.getenv("TURN_SERVER_URL")
 TURN_USERNAME    = os.getenv("TURN_USERNAME")
 TURN_PASSWORD    = os.getenv("TURN_PASSWORD")
+WEBRTC_ABR       = os.getenv("WEBRTC_ABR", "true").lower() in {"1", "true", "yes"}
+WEBRTC_LADDER    = os.getenv("WEBRTC_LADDER", "")
+WEBRTC_MAX_VIEWERS = int(os.getenv("WEBRTC_MAX_VIEWERS", "3"))
+WEBRTC_SIGNALING   = os.getenv("WEBRTC_SIGNALING", "listen").lower()
+WEBRTC_ICE_MODE    = os.getenv("WEBRTC_ICE_MODE", "trickle").lower()
+WEBRTC_RECONNECT_GRACE_S = float(os.getenv("WEBRTC_RECONNECT_GRACE_S", "30"))
+WEBRTC_ICE_PROBE_S = float(os.getenv("WEBRTC_ICE_PROBE_S", "300"))
+WEBRTC_STATS_PATH  = os.getenv("WEBRTC_STATS_PATH") or None
+WEBRTC_STATS_RTDB_S = float(os.getenv("WEBRTC_STATS_RTDB_S", "0"))
+LIVE_CONTROL_HZ    = float(os.getenv("LIVE_CONTROL_HZ", "10"))
+WEBRTC_CODEC       = os.getenv("WEBRTC_CODEC", "auto").lower()
+WEBRTC_CODEC_CACHE = os.getenv("WEBRTC_CODEC_CACHE", "logs/codec_bench.json")
+WEBRTC_LATENCY_OVERLAY = os.getenv("WEBRTC_LATENCY_OVERLAY", "false").lower() in {"1", "true", "yes"}
+SNAPSHOT_ENABLED    = os.getenv("SNAPSHOT_ENABLED", "true").lower() in {"1", "true", "yes"}
+SNAPSHOT_INTERVAL_S = float(os.getenv("SNAPSHOT_INTERVAL_S", "60"))
+SNAPSHOT_PATH       = os.getenv("SNAPSHOT_PATH", "logs/snapshot.jpg")
+SNAPSHOT_WIDTH      = int(os.getenv("SNAPSHOT_WIDTH", "320"))
+CLIP_ENABLED       = os.getenv("CLIP_ENABLED", "false").lower() in {"1", "true", "yes"}
+CLIP_PRE_S         = float(os.getenv("CLIP_PRE_S", "10"))
+CLIP_POST_S        = float(os.getenv("CLIP_POST_S", "20"))
+CLIP_RING_MB       = float(os.getenv("CLIP_RING_MB", "8"))
+CLIP_FPS           = int(os.getenv("CLIP_FPS", "10"))
+CLIP_WIDTH         = int(os.getenv("CLIP_WIDTH", "640"))
+CLIP_DIR           = os.getenv("CLIP_DIR", "clips")
+ACTIVITY_ENABLED   = os.getenv("ACTIVITY_ENABLED", "false").lower() in {"1", "true", "yes"}
+ACTIVITY_FPS       = float(os.getenv("ACTIVITY_FPS", "1"))
+ACTIVITY_ZONES     = os.getenv("ACTIVITY_ZONES", "")
+ACTIVITY_CPU_PCT   = float(os.getenv("ACTIVITY_CPU_PCT", "2"))
+ACTIVITY_PATH      = os.getenv("ACTIVITY_PATH", "logs/activity.jsonl")
+ACTIVITY_CLIP_THRESHOLD = float(os.getenv("ACTIVITY_CLIP_THRESHOLD", "0"))
+ULTRASONIC_BACKEND = os.getenv("ULTRASONIC_BACKEND", "rpigpio").lower()
+SENSOR_FILTER_CHAIN = os.getenv("SENSOR_FILTER_CHAIN", "median:5")
+SENSOR_TRACE_PATH   = os.getenv("SENSOR_TRACE_PATH") or None
+ULTRASONIC_SENSORS  = os.getenv("ULTRASONIC_SENSORS", "feed:25:22:tank,water:7:8:tank")
+ULTRASONIC_SLOT_MS  = float(os.getenv("ULTRASONIC_SLOT_MS", "40"))
 
 
 def _stop_processes(*tasks: Process) -> None:
@@ -84,11 +138,27 @@ def _stop_processes(*tasks: Process) -> None:
                 task.join()
 
 
+def _unlink_rings(rings: dict) -> None:
+    """Free the shared-memory sensor rings of a finished session."""
+    for ring in rings.values():
+        try:
+            ring.unlink()
+        except Exception:
+            pass
+
+
 def main() -> None:
     """
     System entry point — outer loop handles logout and re-authentication.
     """
 
+    # ── Sensor registry ───────────────────────────────────────────────────
+    try:
+        sensors = parse_sensor_registry(ULTRASONIC_SENSORS)
+    except SensorRegistryError as e:
+        log(details=f"Invalid ULTRASONIC_SENSORS: {e}", log_type="error")
+        return
+
     # ── Init hardware once ────────────────────────────────────────────────
     try:
         lcd    = LCD_I2C(address=0x27, size=LCDSize.LCD_16x2)
@@ -104,7 +174,9 @@ def main() -> None:
     # are in an undefined state and the keypad reads ghost presses.
     #
     # This handler ensures lcd.clear() and keypad.cleanup() always run on
-    # both `systemctl stop` (SIGTERM) and Ctrl-C (SIGINT).
+    # both `systemctl stop` (SIGTERM) and Ctrl-C (SIGINT). The session's
+    # processes and sensor rings are released by the finally block of the
+    # wait loop (Step 5), which sys.exit() unwinds through.
     def _handle_exit(sig, frame):
         log(details=f"Signal {sig} received — cleaning up and exiting", log_type="info")
         try:
@@ -174,26 +246,82 @@ def main() -> None:
         live_status.clear()
         logout_requested.clear()
 
-        # ── Shared sensor values — written by process_c, read by process_b ─
-        # Value('d') is a double-precision float backed by shared memory.
-        # Initialized to 0.0; process_c overwrites on its first read cycle.
-        shared_feed_level  = Value(c_double, 0.0)
-        shared_water_level = Value(c_double, 0.0)
+        # ── Shared sensor rings — written by process_c, read by process_b ─
+        # Empty until process_c's first sample; readers treat an empty ring
+        # as "no data yet" rather than 0%.
+        sensor_rings = {}
+        try:
+            for sensor in sensors:
+                sensor_rings[sensor.name] = SensorRing.create()
+        except SensorRingError as e:
+            log(details=f"Sensor ring allocation failed: {e}", log_type="error")
+            _unlink_rings(sensor_rings)
+            break
+
+        # ── Live-view data channel — process_a relays, process_b acts ─────
+        control_commands = Queue(maxsize=COMMAND_QUEUE_SIZE)   # app commands → process_b
+        control_events   = Queue(maxsize=64)                   # acks / motor state → process_a
 
         # ── Step 3: Start processes ───────────────────────────────────────
         task_A = Process(
             target=process_a.process_A,
             kwargs={"process_A_args": {
-                "TASK_NAME"       : "Process A",
-                "live_status"     : live_status,
-                "status_checker"  : status_checker,
-                "FRAME_DIMENSION" : {"width": FRAME_WIDTH, "height": FRAME_HEIGHT},
-                "IS_WEB_CAM"      : IS_WEB_CAM,
-                "CAMERA_INDEX"    : CAMERA_INDEX,
-                "USER_CREDENTIAL" : user_credentials,
-                "TURN_SERVER_URL" : TURN_SERVER_URL,
-                "TURN_USERNAME"   : TURN_USERNAME,
-                "TURN_PASSWORD"   : TURN_PASSWORD,
+                "TASK_NAME"                : "Process A",
+                "live_status"              : live_status,
+                "status_checker"           : status_checker,
+                "FRAME_DIMENSION"          : {"width": FRAME_WIDTH, "height": FRAME_HEIGHT},
+                "IS_WEB_CAM"               : IS_WEB_CAM,
+                "CAMERA_INDEX"             : CAMERA_INDEX,
+                "USER_CREDENTIAL"          : user_credentials,
+                "TURN_SERVER_URL"          : TURN_SERVER_URL,
+                "TURN_USERNAME"            : TURN_USERNAME,
+                "TURN_PASSWORD"            : TURN_PASSWORD,
+                # Camera capture
+                "CAMERA_FPS"               : CAMERA_FPS,
+                "CAMERA_PIXEL_FORMAT"      : CAMERA_PIXEL_FORMAT,
+                "CAMERA_CAPTURE_THREAD"    : CAMERA_CAPTURE_THREAD,
+                "CAMERA_IDLE_MODE"         : CAMERA_IDLE_MODE,
+                "CAMERA_IDLE_AFTER_S"      : CAMERA_IDLE_AFTER_S,
+                "CAMERA_KEEPALIVE_S"       : CAMERA_KEEPALIVE_S,
+                "CAMERA_BACKEND"           : CAMERA_BACKEND,
+                "CAMERA_SOURCE"            : CAMERA_SOURCE,
+                "CAMERA_FAULTS"            : CAMERA_FAULTS,
+                # WebRTC streaming
+                "WEBRTC_ABR"               : WEBRTC_ABR,
+                "WEBRTC_LADDER"            : WEBRTC_LADDER,
+                "WEBRTC_MAX_VIEWERS"       : WEBRTC_MAX_VIEWERS,
+                "WEBRTC_SIGNALING"         : WEBRTC_SIGNALING,
+                "WEBRTC_ICE_MODE"          : WEBRTC_ICE_MODE,
+                "WEBRTC_RECONNECT_GRACE_S" : WEBRTC_RECONNECT_GRACE_S,
+                "WEBRTC_ICE_PROBE_S"       : WEBRTC_ICE_PROBE_S,
+                "WEBRTC_STATS_PATH"        : WEBRTC_STATS_PATH,
+                "WEBRTC_STATS_RTDB_S"      : WEBRTC_STATS_RTDB_S,
+                "LIVE_CONTROL_HZ"          : LIVE_CONTROL_HZ,
+                "WEBRTC_CODEC"             : WEBRTC_CODEC,
+                "WEBRTC_CODEC_CACHE"       : WEBRTC_CODEC_CACHE,
+                "WEBRTC_LATENCY_OVERLAY"   : WEBRTC_LATENCY_OVERLAY,
+                # Snapshots, event clips, flock activity
+                "SNAPSHOT_ENABLED"         : SNAPSHOT_ENABLED,
+                "SNAPSHOT_INTERVAL_S"      : SNAPSHOT_INTERVAL_S,
+                "SNAPSHOT_PATH"            : SNAPSHOT_PATH,
+                "SNAPSHOT_WIDTH"           : SNAPSHOT_WIDTH,
+                "CLIP_ENABLED"             : CLIP_ENABLED,
+                "CLIP_PRE_S"               : CLIP_PRE_S,
+                "CLIP_POST_S"              : CLIP_POST_S,
+                "CLIP_RING_MB"             : CLIP_RING_MB,
+                "CLIP_FPS"                 : CLIP_FPS,
+                "CLIP_WIDTH"               : CLIP_WIDTH,
+                "CLIP_DIR"                 : CLIP_DIR,
+                "ACTIVITY_ENABLED"         : ACTIVITY_ENABLED,
+                "ACTIVITY_FPS"             : ACTIVITY_FPS,
+                "ACTIVITY_ZONES"           : ACTIVITY_ZONES,
+                "ACTIVITY_CPU_PCT"         : ACTIVITY_CPU_PCT,
+                "ACTIVITY_PATH"            : ACTIVITY_PATH,
+                "ACTIVITY_CLIP_THRESHOLD"  : ACTIVITY_CLIP_THRESHOLD,
+                # Shared memory / queues — live-view levels and commands
+                "sensor_rings"             : sensor_rings,
+                "control_commands"         : control_commands,
+                "control_events"           : control_events,
             }}
         )
 
@@ -207,19 +335,25 @@ def main() -> None:
                 "USER_CREDENTIAL"    : user_credentials,
                 "LCD_I2C_ADDR"       : 0x27,
                 # Shared memory — process_b reads, process_c writes
-                "shared_feed_level"  : shared_feed_level,
-                "shared_water_level" : shared_water_level,
+                "sensor_rings"       : sensor_rings,
+                # Live-view data channel commands, relayed by process_a
+                "control_commands"   : control_commands,
+                "control_events"     : control_events,
             }}
         )
 
         task_C = Process(
             target=process_c.process_C,
             kwargs={"process_C_args": {
-                "TASK_NAME"          : "Process C",
-                "status_checker"     : status_checker,
+                "TASK_NAME"           : "Process C",
+                "status_checker"      : status_checker,
                 # Shared memory — process_c writes, process_b reads
-                "shared_feed_level"  : shared_feed_level,
-                "shared_water_level" : shared_water_level,
+                "sensor_rings"        : sensor_rings,
+                "SENSORS"             : sensors,
+                "ULTRASONIC_BACKEND"  : ULTRASONIC_BACKEND,
+                "ULTRASONIC_SLOT_MS"  : ULTRASONIC_SLOT_MS,
+                "SENSOR_FILTER_CHAIN" : SENSOR_FILTER_CHAIN,
+                "SENSOR_TRACE_PATH"   : SENSOR_TRACE_PATH,
             }}
         )
 
@@ -243,11 +377,14 @@ def main() -> None:
             # KeyboardInterrupt is now handled by the SIGINT signal handler
             # above, but keep this as a fallback for edge cases.
             log(details="KeyboardInterrupt — stopping", log_type="warning")
-            _stop_processes(task_A, task_B, task_C)
             break
 
         # ── Step 5: Stop processes cleanly ───────────────────────────────
-        _stop_processes(task_A, task_B, task_C)
+        # Also runs on SIGTERM / SIGINT: sys.exit() in _handle_exit raises
+        # SystemExit through here, so the /dev/shm rings are always freed.
+        finally:
+            _stop_processes(task_A, task_B, task_C)
+            _unlink_rings(sensor_rings)
 
         # ── Step 6: Handle logout vs normal exit ─────────────────────────
         if logout_requested.is_set():
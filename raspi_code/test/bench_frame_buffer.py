@@ -0,0 +1,122 @@
+"""
+Path: test/bench_frame_buffer.py
+Description:
+    Standalone benchmark for the process_a frame path — old copy-on-update /
+    copy-on-get buffer vs the preallocated SharedFrameBuffer ring.
+
+    No camera needed. A synthetic 1280×720 BGR "capture" frame is resized to
+    FRAME_DIMENSION and pushed through each buffer the same way process_a
+    does, while a consumer reads it at the WebRTC rate (every PRODUCE_PER_GET
+    captures, like recv() at 20 fps against a ~100 Hz capture loop).
+
+    For each buffer it reports:
+        - frames/s through the buffer
+        - full-frame allocations per second
+        - bytes copied per second (full-frame writes + reads)
+        - peak traced memory (tracemalloc)
+
+    Run from raspi_code/ root:
+        python test/bench_frame_buffer.py
+"""
+
+import sys
+import os
+import time
+import threading
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import cv2
+import numpy as np
+
+from lib.processes.process_a import SharedFrameBuffer
+
+# ─────────────────────────── CONFIG ──────────────────────────────────────────
+
+FRAME_DIMENSION = {"width": 640, "height": 480}
+CAPTURE_SHAPE   = (720, 1280, 3)
+FRAMES          = 2000
+PRODUCE_PER_GET = 5
+
+# ─────────────────────────── OLD BUFFER ──────────────────────────────────────
+
+class LegacyFrameBuffer:
+    """The pre-ring SharedFrameBuffer: copies on update() and on get()."""
+
+    def __init__(self):
+        self._frame = None
+        self._lock  = threading.Lock()
+
+    def update(self, frame) -> None:
+        with self._lock:
+            self._frame = frame.copy() if frame is not None else None
+
+    def get(self):
+        with self._lock:
+            return self._frame.copy() if self._frame is not None else None
+
+# ─────────────────────────── RUNNERS ─────────────────────────────────────────
+# Each runner returns (frame allocations, bytes copied) for FRAMES captures.
+
+def _run_legacy(raw: np.ndarray, size: tuple) -> tuple:
+    buffer = LegacyFrameBuffer()
+    allocs = copied = 0
+    for i in range(FRAMES):
+        frame = cv2.resize(raw, size)          # allocates
+        buffer.update(frame)                   # allocates + copies
+        allocs += 2
+        copied += frame.nbytes * 2
+        if i % PRODUCE_PER_GET == 0:
+            out = buffer.get()                 # allocates + copies again
+            allocs += 1
+            copied += out.nbytes
+    return allocs, copied
+
+
+def _run_ring(raw: np.ndarray, size: tuple) -> tuple:
+    buffer = SharedFrameBuffer(shape=(size[1], size[0], 3))
+    copied = 0
+    for i in range(FRAMES):
+        slot = buffer.next_slot()
+        cv2.resize(raw, size, dst=slot)        # writes in place
+        buffer.publish()
+        copied += slot.nbytes
+        if i % PRODUCE_PER_GET == 0:
+            buffer.get()                       # read-only view, no copy
+    return buffer.allocations, copied
+
+
+def _measure(name: str, runner, raw: np.ndarray, size: tuple) -> None:
+    tracemalloc.start()
+    started        = time.perf_counter()
+    allocs, copied = runner(raw, size)
+    elapsed        = time.perf_counter() - started
+    _, peak        = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"  {name:<8} {FRAMES / elapsed:7.0f} frames/s | "
+        f"{allocs / elapsed:7.0f} allocs/s | "
+        f"{copied / elapsed / 1e6:7.1f} MB/s copied | "
+        f"{copied / FRAMES / 1e6:5.2f} MB/frame | "
+        f"peak {peak / 1e6:5.1f} MB"
+    )
+
+# ─────────────────────────── MAIN ────────────────────────────────────────────
+
+def main() -> None:
+    size = (FRAME_DIMENSION["width"], FRAME_DIMENSION["height"])
+    raw  = np.random.randint(0, 256, CAPTURE_SHAPE, dtype=np.uint8)
+
+    print(
+        f"\n{FRAMES} captures {CAPTURE_SHAPE[1]}×{CAPTURE_SHAPE[0]} → {size[0]}×{size[1]}, "
+        f"one get() per {PRODUCE_PER_GET} captures\n"
+    )
+    _measure("legacy", _run_legacy, raw, size)
+    _measure("ring",   _run_ring,   raw, size)
+    print()
+
+
+if __name__ == "__main__":
+    main()
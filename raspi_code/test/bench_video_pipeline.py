@@ -0,0 +1,132 @@
+"""
+Path: test/bench_video_pipeline.py
+Description:
+    Standalone benchmark for the process_a video path on any Linux box —
+    simulated camera → SharedFrameBuffer ring → yuv420p VideoFrame → aiortc
+    encoder, the same steps process_a and CameraVideoTrack run per frame.
+
+    No camera needed: the capture comes from camera_controller's synthetic
+    or file backend, optionally with injected faults, so the pipeline's
+    reaction to stalls and empty frames can be measured too.
+
+    Reports:
+        - frames encoded per second, and captured vs target fps
+        - mean / p95 / max ms per stage (capture, write, encode)
+        - stalls, empty frames and errors injected by CAMERA_FAULTS
+
+    Run from raspi_code/ root:
+        python test/bench_video_pipeline.py
+        python test/bench_video_pipeline.py --backend file --source clip.mp4 --codec h264
+        python test/bench_video_pipeline.py --faults stall:0.02:0.5,fail:0.01 --fps 20
+"""
+
+import sys
+import os
+import time
+import argparse
+from fractions import Fraction
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from av import VideoFrame
+from aiortc.codecs import CODECS, get_encoder
+
+from lib.processes.process_a import SharedFrameBuffer
+from lib.services.hardware import camera_controller as camera
+from lib.services.hardware.camera_controller import CameraError
+
+# ─────────────────────────── CONFIG ──────────────────────────────────────────
+
+FRAME_DIMENSION = {"width": 1280, "height": 720}
+FRAMES          = 300
+FPS             = 1000      # Far above any encoder — measures throughput
+KBPS            = 2000
+MIME_TYPES      = {"vp8": "video/VP8", "h264": "video/H264"}
+
+# ─────────────────────────── HELPERS ─────────────────────────────────────────
+
+def _stats(samples: list) -> str:
+    if not samples:
+        return "      no samples"
+    ordered = sorted(samples)
+    mean    = sum(ordered) / len(ordered) * 1000
+    p95     = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000
+    return f"mean {mean:6.2f} ms | p95 {p95:6.2f} ms | max {ordered[-1] * 1000:7.2f} ms"
+
+
+def _encoder(codec: str):
+    mime   = MIME_TYPES[codec]
+    params = next(params for params in CODECS["video"] if params.mimeType == mime)
+    encoder = get_encoder(params)
+    encoder.target_bitrate = KBPS * 1000
+    return encoder
+
+# ─────────────────────────── MAIN ────────────────────────────────────────────
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="synthetic", choices=("synthetic", "file"))
+    parser.add_argument("--source",  default="")
+    parser.add_argument("--faults",  default="")
+    parser.add_argument("--codec",   default="vp8", choices=sorted(MIME_TYPES))
+    parser.add_argument("--fps",     default=FPS, type=int)
+    parser.add_argument("--frames",  default=FRAMES, type=int)
+    parser.add_argument("--size",    default=f"{FRAME_DIMENSION['width']}x{FRAME_DIMENSION['height']}")
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    dimension     = {"width": width, "height": height}
+    capture = camera.config_camera(
+        IS_WEB_CAM      = False,
+        CAMERA_INDEX    = 0,
+        FRAME_DIMENSION = dimension,
+        PIXEL_FORMAT    = "yuv420",
+        FPS             = args.fps,
+        BACKEND         = args.backend,
+        SOURCE          = args.source,
+        FAULTS          = args.faults,
+    )
+    buffer  = SharedFrameBuffer(shape=camera.frame_shape(dimension, "yuv420"), pixel_format="yuv420")
+    encoder = _encoder(args.codec)
+
+    print(f"\n{capture!r}\n{args.frames} frames → {args.codec} @ {KBPS} kbps\n")
+
+    timings = {"capture": [], "write": [], "encode": []}
+    errors  = 0
+    started = time.perf_counter()
+    encoded = 0
+    while encoded < args.frames:
+        t0 = time.perf_counter()
+        try:
+            raw = capture.capture_array()
+        except CameraError:
+            errors += 1
+            continue
+        t1 = time.perf_counter()
+        timings["capture"].append(t1 - t0)
+        if raw is None:
+            continue
+
+        buffer.update(raw)
+        t2 = time.perf_counter()
+        timings["write"].append(t2 - t1)
+
+        frame           = VideoFrame.from_ndarray(buffer.get(), format="yuv420p")
+        frame.pts       = encoded * 3000
+        frame.time_base = Fraction(1, 90000)
+        encoder.encode(frame)
+        timings["encode"].append(time.perf_counter() - t2)
+        encoded += 1
+    elapsed = time.perf_counter() - started
+    camera.clean_up_camera(capture, False)
+
+    for stage, samples in timings.items():
+        print(f"  {stage:<8} {_stats(samples)}")
+    print(
+        f"\n  {encoded / elapsed:6.1f} frames/s encoded (target {args.fps}) | "
+        f"stalls {capture.stalls} | empty {capture.failures} | errors {errors}\n"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Path: test/eval_sensor_filters.py
+Description:
+    Offline filter evaluation over recorded (or synthetic) echo traces.
+
+    Every candidate filter is re-implemented with vectorized NumPy so a
+    multi-million sample trace runs in seconds on a laptop. The streaming
+    FilterChain from lib/services/sensor_filter is also timed on a slice of
+    the same data — that number is the real per-sample cost on the Pi.
+
+    Candidates:
+        burst-median:N   — legacy _median_distance(): median of N raw samples,
+                           one output per burst
+        burst-iqr:N      — test/test_sensor_iqr.py: IQR-clean average of N raw
+                           samples, one output per burst
+        <chain spec>     — any SENSOR_FILTER_CHAIN, e.g. "iqr:25,median:5"
+
+    Report per sensor and candidate:
+        out/s     — published values per second of trace time
+        noise     — RMS deviation (cm) of the published value from a slow
+                    201-sample reference median of the raw trace
+        spikes    — published values more than SPIKE_CM off the reference
+        lag90     — ms for the output to cover 90% of a STEP_CM step
+                    injected half-way through the trace
+        vec ns/s  — vectorized harness cost per sample
+        live ns/s — streaming FilterChain cost per sample (chains only)
+
+    Usage (from raspi_code/ root):
+        python test/eval_sensor_filters.py logs/sensors.trace
+        python test/eval_sensor_filters.py --synthetic 2000000
+        python test/eval_sensor_filters.py --synthetic 500000 \\
+            --candidates "median:5;iqr:25,ewma:0.2"
+
+    Record a trace on the device with SENSOR_TRACE_PATH in credentials/.env
+    or with test/record_sensor_trace.py.
+"""
+
+import sys
+import os
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from lib.services import sensor_filter, sensor_trace
+from lib.services.sensor_filter import (
+    SlidingMedian, IQRReject, EWMA, Kalman1D,
+    VALID_MIN_CM, VALID_MAX_CM,
+)
+
+# ─────────────────────────── CONFIG ──────────────────────────────────────────
+
+DEFAULT_CANDIDATES = [
+    "burst-median:5",
+    "burst-iqr:50",
+    "median:5",
+    "iqr:25,median:5",
+    "median:5,ewma:0.3",
+    "iqr:25,kalman",
+    "iqr:25,median:5,ewma:0.3",
+]
+
+REFERENCE_WINDOW = 201
+STEP_CM          = 20.0
+SPIKE_CM         = 5.0
+LIVE_SAMPLES     = 20000
+BLOCK            = 200000   # rows per block for windowed sorts (memory cap)
+
+# ─────────────────────────── VECTOR PRIMITIVES ───────────────────────────────
+
+def _windows(x: np.ndarray, n: int, include_self: bool = True) -> np.ndarray:
+    """Trailing windows of length n (NaN padded at the start)."""
+    pad    = np.full(n - 1 if include_self else n, np.nan)
+    padded = np.concatenate([pad, x])
+    view   = sliding_window_view(padded, n)
+    return view if include_self else view[:-1]
+
+
+def _linear_recurrence(x: np.ndarray, a: np.ndarray) -> np.ndarray:
+    """
+    Solve y[i] = (1 - a[i]) * y[i-1] + a[i] * x[i] with y[-1] = 0.
+
+    Hillis–Steele prefix scan over affine maps — log2(n) vector passes,
+    exact for a[i] = 1 (which resets the state, as the first sample does).
+    """
+    A = 1.0 - a
+    B = a * x
+    shift = 1
+    while shift < len(x):
+        B[shift:] = A[shift:] * B[:-shift] + B[shift:]
+        A[shift:] = A[shift:] * A[:-shift]
+        shift *= 2
+    return B
+
+
+def vec_median(x: np.ndarray, window: int) -> np.ndarray:
+    out = np.empty_like(x)
+    win = _windows(x, window)
+    for i in range(0, len(x), BLOCK):
+        out[i:i + BLOCK] = np.nanmedian(win[i:i + BLOCK], axis=1)
+    return out
+
+
+def vec_iqr(x: np.ndarray, window: int, k: float) -> np.ndarray:
+    """NaN where the streaming IQRReject stage would reject the sample."""
+    out  = x.copy()
+    prev = _windows(x, window, include_self=False)
+    q1i, q3i = window // 4, (3 * window) // 4
+
+    # Full windows — vectorized in blocks
+    for i in range(window, len(x), BLOCK):
+        block  = np.sort(prev[i:i + BLOCK], axis=1)
+        q1, q3 = block[:, q1i], block[:, q3i]
+        iqr    = q3 - q1
+        vals   = x[i:i + BLOCK]
+        reject = (vals < q1 - k * iqr) | (vals > q3 + k * iqr)
+        out[i:i + BLOCK][reject] = np.nan
+
+    # Warm-up (fewer than `window` previous samples) — tiny, done directly
+    for i in range(4, min(window, len(x))):
+        ordered = np.sort(x[:i])
+        q1, q3  = ordered[i // 4], ordered[(3 * i) // 4]
+        iqr     = q3 - q1
+        if not (q1 - k * iqr) <= x[i] <= (q3 + k * iqr):
+            out[i] = np.nan
+    return out
+
+
+def vec_ewma(x: np.ndarray, alpha: float) -> np.ndarray:
+    a    = np.full_like(x, alpha)
+    a[0] = 1.0
+    return _linear_recurrence(x, a)
+
+
+def vec_kalman(x: np.ndarray, q: float, r: float) -> np.ndarray:
+    # Gain sequence does not depend on the data — precompute until it settles
+    gains = [1.0]
+    p     = r
+    while len(gains) < len(x):
+        p    += q
+        gain  = p / (p + r)
+        p    *= (1 - gain)
+        if abs(gain - gains[-1]) < 1e-12:
+            break
+        gains.append(gain)
+    a = np.full_like(x, gains[-1])
+    a[:len(gains)] = gains[:len(x)]
+    return _linear_recurrence(x, a)
+
+
+def vec_stage(stage, x: np.ndarray) -> np.ndarray:
+    """Vectorized twin of a streaming sensor_filter stage."""
+    if isinstance(stage, SlidingMedian):
+        return vec_median(x, stage._ring.maxlen)
+    if isinstance(stage, IQRReject):
+        return vec_iqr(x, stage._ring.maxlen, stage._k)
+    if isinstance(stage, EWMA):
+        return vec_ewma(x, stage._alpha)
+    if isinstance(stage, Kalman1D):
+        return vec_kalman(x, stage._q, stage._r)
+    raise ValueError(f"No vectorized twin for stage {stage!r}")
+
+
+# ─────────────────────────── CANDIDATES ──────────────────────────────────────
+
+def run_chain(spec: str, cm: np.ndarray) -> np.ndarray:
+    """
+    Vectorized FilterChain. Returns an array aligned with `cm` — the
+    published value at that sample, NaN where nothing was published.
+    """
+    chain = sensor_filter.build_filter_chain(spec)
+    x     = cm.astype(np.float64)
+    x[(x < VALID_MIN_CM) | (x > VALID_MAX_CM)] = np.nan
+
+    for stage in chain.stages:
+        keep    = ~np.isnan(x)
+        out     = np.full_like(x, np.nan)
+        out[keep] = vec_stage(stage, x[keep])
+        x       = out
+    return np.round(x, 2)
+
+
+def run_burst(kind: str, n: int, cm: np.ndarray) -> np.ndarray:
+    """Legacy one-value-per-burst filters. Output lands on the burst's last sample."""
+    usable = len(cm) - len(cm) % n
+    blocks = cm[:usable].astype(np.float64).reshape(-1, n)
+    blocks[(blocks < VALID_MIN_CM) | (blocks > VALID_MAX_CM)] = np.nan
+
+    if kind == "burst-median":
+        # Old code sorts the valid samples and takes samples[len // 2]
+        ordered = np.sort(blocks, axis=1)
+        count   = np.sum(~np.isnan(blocks), axis=1)
+        idx     = np.minimum(count // 2, n - 1)
+        values  = ordered[np.arange(len(ordered)), idx]
+        values[count == 0] = np.nan
+    else:
+        ordered = np.sort(blocks, axis=1)
+        count   = np.sum(~np.isnan(blocks), axis=1)
+        rows    = np.arange(len(ordered))
+        q1      = ordered[rows, count // 4]
+        q3      = ordered[rows, np.minimum((3 * count) // 4, n - 1)]
+        iqr     = q3 - q1
+        lo, hi  = (q1 - 1.5 * iqr)[:, None], (q3 + 1.5 * iqr)[:, None]
+        clean   = np.where((blocks >= lo) & (blocks <= hi), blocks, np.nan)
+        with np.errstate(invalid="ignore"):
+            values = np.nanmean(clean, axis=1)
+        small = (count > 0) & (count < 4)
+        with np.errstate(invalid="ignore"):
+            values[small] = np.nanmean(blocks[small], axis=1)
+
+    out = np.full(len(cm), np.nan)
+    out[n - 1:usable:n] = np.round(values, 2)
+    return out
+
+
+def run_candidate(spec: str, cm: np.ndarray) -> np.ndarray:
+    if spec.startswith("burst-"):
+        kind, _, n = spec.partition(":")
+        return run_burst(kind, int(n or 5), cm)
+    return run_chain(spec, cm)
+
+
+# ─────────────────────────── METRICS ─────────────────────────────────────────
+
+def _hold(values: np.ndarray) -> np.ndarray:
+    """Forward-fill NaN — the value process_b would see at each sample."""
+    idx = np.where(~np.isnan(values), np.arange(len(values)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    held = values[idx]
+    held[:np.argmax(~np.isnan(values))] = np.nan
+    return held
+
+
+def _reference(cm: np.ndarray) -> np.ndarray:
+    x = cm.astype(np.float64)
+    x[(x < VALID_MIN_CM) | (x > VALID_MAX_CM)] = np.nan
+    win = _windows(x, REFERENCE_WINDOW)
+    ref = np.empty_like(x)
+    for i in range(0, len(x), BLOCK):
+        with np.errstate(all="ignore"):
+            ref[i:i + BLOCK] = np.nanmedian(win[i:i + BLOCK], axis=1)
+    # Centre the reference so it does not lag
+    shift = REFERENCE_WINDOW // 2
+    ref[:-shift] = ref[shift:]
+    return ref
+
+
+def step_lag_ms(spec: str, t_ns: np.ndarray, cm: np.ndarray) -> float:
+    """Inject a +STEP_CM step half-way and time the 90% crossing."""
+    mid     = len(cm) // 2
+    stepped = cm.astype(np.float64).copy()
+    valid   = (stepped >= VALID_MIN_CM) & (stepped <= VALID_MAX_CM - STEP_CM)
+    stepped[mid:][valid[mid:]] += STEP_CM
+
+    held   = _hold(run_candidate(spec, stepped))
+    before = np.nanmedian(held[max(0, mid - 500):mid])
+    after  = held[mid:]
+    hit    = np.nonzero(after >= before + 0.9 * STEP_CM)[0]
+    if np.isnan(before) or len(hit) == 0:
+        return float("nan")
+    return (t_ns[mid + hit[0]] - t_ns[mid]) / 1e6
+
+
+def live_ns_per_sample(spec: str, cm: np.ndarray) -> float:
+    if spec.startswith("burst-"):
+        return float("nan")
+    chain   = sensor_filter.build_filter_chain(spec)
+    samples = cm[:LIVE_SAMPLES].tolist()
+    start   = time.perf_counter_ns()
+    for raw in samples:
+        chain.update(raw)
+    return (time.perf_counter_ns() - start) / max(len(samples), 1)
+
+
+def evaluate(spec: str, t_ns: np.ndarray, cm: np.ndarray, ref: np.ndarray) -> dict:
+    start   = time.perf_counter_ns()
+    out     = run_candidate(spec, cm)
+    vec_ns  = (time.perf_counter_ns() - start) / len(cm)
+
+    published = ~np.isnan(out)
+    duration  = (t_ns[-1] - t_ns[0]) / 1e9 if len(t_ns) > 1 else 0.0
+    held      = _hold(out)
+    err       = (held - ref)[~np.isnan(held) & ~np.isnan(ref)]
+
+    return {
+        "spec"     : spec,
+        "rate"     : published.sum() / duration if duration > 0 else float("nan"),
+        "noise"    : float(np.sqrt(np.mean(err ** 2))) if len(err) else float("nan"),
+        "spikes"   : int(np.sum(np.abs(err) > SPIKE_CM)),
+        "lag90"    : step_lag_ms(spec, t_ns, cm),
+        "vec_ns"   : vec_ns,
+        "live_ns"  : live_ns_per_sample(spec, cm),
+    }
+
+
+# ─────────────────────────── DATA ────────────────────────────────────────────
+
+def synthetic_trace(n: int, seed: int = 7) -> np.ndarray:
+    """
+    Slowly draining tank + gaussian noise + HC-SR04 style faults:
+    3% timeouts (0.0), 1% max-range echoes, 1% surface-scatter outliers.
+    Both sensors interleaved at the process_c cadence (~60ms per sensor).
+    """
+    rng    = np.random.default_rng(seed)
+    data   = np.zeros(n, dtype=sensor_trace.trace_dtype())
+    t      = np.arange(n, dtype=np.int64) * 30_000_000
+    sensor = (np.arange(n) % 2).astype(np.uint8)
+    level  = np.where(sensor == 0, 80.0, 150.0) + t / 1e9 * 0.002
+    cm     = level + rng.normal(0, 0.8, n)
+
+    fault       = rng.random(n)
+    cm[fault < 0.03] = 0.0
+    cm[(fault >= 0.03) & (fault < 0.04)] = VALID_MAX_CM + 50
+    scatter     = (fault >= 0.04) & (fault < 0.05)
+    cm[scatter] += rng.normal(0, 40, scatter.sum())
+
+    data["t_ns"], data["sensor"], data["cm"] = t, sensor, cm
+    return data
+
+
+# ─────────────────────────── MAIN ────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline HC-SR04 filter evaluation")
+    parser.add_argument("trace", nargs="?", help="Trace file from TraceRecorder")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N synthetic samples")
+    parser.add_argument("--candidates", default=";".join(DEFAULT_CANDIDATES),
+                        help="Semicolon separated candidate specs")
+    opts = parser.parse_args()
+
+    if opts.trace:
+        data = sensor_trace.load_trace(opts.trace)
+        source = opts.trace
+    else:
+        data = synthetic_trace(opts.synthetic or 1_000_000)
+        source = f"synthetic ({len(data)} samples)"
+
+    candidates = [c.strip() for c in opts.candidates.split(";") if c.strip()]
+
+    print("=" * 96)
+    print(f"  Sensor filter evaluation — {source}")
+    print(f"  noise/spikes vs {REFERENCE_WINDOW}-sample reference median | "
+          f"lag90 for a {STEP_CM:.0f} cm step")
+    print("=" * 96)
+
+    for sensor_id in np.unique(data["sensor"]):
+        name = sensor_trace.SENSOR_NAMES.get(int(sensor_id), f"sensor {sensor_id}")
+        rows = data[data["sensor"] == sensor_id]
+        if len(rows) < REFERENCE_WINDOW * 2:
+            continue
+        t_ns = rows["t_ns"].astype(np.int64)
+        cm   = rows["cm"].astype(np.float64)
+        ref  = _reference(cm)
+
+        print(f"\n  {name.upper()} — {len(rows)} samples")
+        print(f"  {'candidate':<28} {'out/s':>7} {'noise cm':>8} {'spikes':>7} "
+              f"{'lag90':>9} {'vec ns/s':>9} {'live ns/s':>10}")
+        print("  " + "-" * 83)
+        for spec in candidates:
+            r = evaluate(spec, t_ns, cm, ref)
+            print(
+                f"  {r['spec']:<28} {r['rate']:>7.2f} {r['noise']:>8.2f} "
+                f"{r['spikes']:>7} {r['lag90']:>7.0f}ms {r['vec_ns']:>9.1f} "
+                f"{r['live_ns']:>10.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
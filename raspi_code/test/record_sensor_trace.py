@@ -0,0 +1,72 @@
+"""
+Path: test/record_sensor_trace.py
+Description:
+    Record raw _measure_once() samples from both HC-SR04 sensors into a
+    compact binary trace (lib/services/sensor_trace) for offline filter
+    evaluation with test/eval_sensor_filters.py.
+
+    Uses the same cadence as process_c: left, SAMPLE_DELAY, right,
+    SAMPLE_DELAY. Stop process_c (or the whole service) first — both
+    cannot drive the trigger pins at once.
+
+    Run from raspi_code/ root:
+        sudo python test/record_sensor_trace.py logs/sensors.trace [seconds]
+
+    Stop early with Ctrl+C — everything recorded so far is kept.
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import RPi.GPIO as GPIO
+from lib.services.hardware import ultrasonic_controller as distance
+from lib.services import sensor_trace
+
+# ─────────────────────────── CONFIG ──────────────────────────────────────────
+
+DEFAULT_SECONDS = 600
+BACKEND         = os.getenv("ULTRASONIC_BACKEND", distance.DEFAULT_BACKEND)
+
+# ─────────────────────────── MAIN ────────────────────────────────────────────
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+
+    path     = sys.argv[1]
+    seconds  = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SECONDS
+
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setwarnings(False)
+    distance.setup_ultrasonics(backend=BACKEND)
+
+    recorder = sensor_trace.TraceRecorder(path)
+    deadline = time.monotonic() + seconds
+    print(f"Recording to {path} for {seconds:.0f}s (backend={BACKEND}) — Ctrl+C to stop")
+
+    try:
+        while time.monotonic() < deadline:
+            recorder.append(sensor_trace.SENSOR_FEED,  time.monotonic_ns(), distance.read_left_raw())
+            time.sleep(distance.SAMPLE_DELAY)
+            recorder.append(sensor_trace.SENSOR_WATER, time.monotonic_ns(), distance.read_right_raw())
+            time.sleep(distance.SAMPLE_DELAY)
+
+            if recorder.records % 500 == 0:
+                print(f"  {recorder.records} samples")
+
+    except KeyboardInterrupt:
+        print("\n\nRecording stopped by user.")
+
+    finally:
+        recorder.close()
+        distance.cleanup_ultrasonics()
+        GPIO.cleanup()
+        print(f"Saved {recorder.records} samples to {path}")
+
+
+if __name__ == "__main__":
+    main()
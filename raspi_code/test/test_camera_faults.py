@@ -0,0 +1,113 @@
+"""
+Path: test/test_camera_faults.py
+Description:
+    Regression checks for process_a's capture loop under camera faults
+    (no camera needed — the synthetic backend injects them).
+
+    Covers the read-failure policy: scattered empty frames and CameraErrors
+    are retried and capture keeps publishing frames; a camera that fails
+    every read stops capture after MAX_CAPTURE_FAILURES attempts, and a
+    good frame resets the count.
+
+    Run from raspi_code/ root:
+        python test/test_camera_faults.py
+"""
+
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lib.processes import process_a
+from lib.processes.process_a import SharedFrameBuffer, MAX_CAPTURE_FAILURES, CAPTURE_RETRY_WAIT
+from lib.services.capture_governor import CaptureGovernor
+from lib.services.frame_latency import FrameTracer
+from lib.services.hardware import camera_controller as camera
+
+# ─────────────────────────── CONFIG ──────────────────────────────────────────
+
+FRAME_DIMENSION = {"width": 160, "height": 120}
+FPS             = 1000      # Keep the simulated camera from pacing the test
+STEPS           = 300
+
+# ─────────────────────────── HELPERS ─────────────────────────────────────────
+
+def _capture_loop(faults: str):
+    capture = camera.config_camera(
+        IS_WEB_CAM      = False,
+        CAMERA_INDEX    = 0,
+        FRAME_DIMENSION = FRAME_DIMENSION,
+        PIXEL_FORMAT    = "yuv420",
+        FPS             = FPS,
+        BACKEND         = "synthetic",
+        FAULTS          = faults,
+    )
+    status_checker = threading.Event()
+    status_checker.set()
+    loop = process_a._CaptureLoop(
+        task_name      = "test_camera_faults",
+        capture        = capture,
+        is_web_cam     = False,
+        camera_index   = 0,
+        frame_buffer   = SharedFrameBuffer(shape=camera.frame_shape(FRAME_DIMENSION, "yuv420"), pixel_format="yuv420"),
+        governor       = CaptureGovernor(mode="off"),
+        tracer         = FrameTracer(),
+        live_status    = threading.Event(),
+        status_checker = status_checker,
+        wake_event     = threading.Event(),
+        stop_event     = threading.Event(),
+        fps            = FPS,
+    )
+    return capture, loop
+
+# ─────────────────────────── TESTS ───────────────────────────────────────────
+
+def test_scattered_faults_are_retried() -> None:
+    capture, loop = _capture_loop("fail:0.2,error:0.2")
+    waits = [loop.step() for _ in range(STEPS)]
+    try:
+        assert None not in waits, "capture stopped on a scattered fault"
+        assert capture.failures and capture.errors, "no faults were injected"
+        assert loop.failures == capture.failures + capture.errors
+        assert waits.count(CAPTURE_RETRY_WAIT) == loop.failures
+        assert loop.frame_buffer.seq == STEPS - loop.failures
+    finally:
+        camera.clean_up_camera(capture, False)
+
+
+def test_persistent_failure_stops_capture() -> None:
+    for faults in ("fail:1", "error:1"):
+        capture, loop = _capture_loop(faults)
+        try:
+            waits = [loop.step() for _ in range(MAX_CAPTURE_FAILURES)]
+            assert waits[:-1] == [CAPTURE_RETRY_WAIT] * (MAX_CAPTURE_FAILURES - 1), faults
+            assert waits[-1] is None, f"{faults}: capture did not stop"
+        finally:
+            camera.clean_up_camera(capture, False)
+
+
+def test_good_frame_resets_count() -> None:
+    capture, loop = _capture_loop("fail:1")
+    try:
+        for _ in range(MAX_CAPTURE_FAILURES - 1):
+            loop.step()
+        capture.faults["fail"] = 0.0                # Camera recovers
+        assert loop.step() == 0.0
+        assert loop.failed_in_row == 0
+        capture.faults["fail"] = 1.0
+        assert loop.step() == CAPTURE_RETRY_WAIT    # Counting starts over
+    finally:
+        camera.clean_up_camera(capture, False)
+
+# ─────────────────────────── MAIN ────────────────────────────────────────────
+
+def main() -> None:
+    test_scattered_faults_are_retried()
+    test_persistent_failure_stops_capture()
+    test_good_frame_resets_count()
+    print("OK — camera faults are retried, a run of failures stops capture")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Path: test/test_sensor_backends.py
+Description:
+    Standalone comparison of the ultrasonic measurement backends.
+
+    For every available backend (poll, rpigpio, gpiod) this script:
+        STEP 1 — Calls setup_ultrasonics(backend=...)
+        STEP 2 — Takes MEASUREMENTS raw _measure_once() readings per sensor
+        STEP 3 — Reports accuracy (mean, stdev, valid count) and CPU cost
+                 (process CPU seconds per wall second while measuring)
+
+    Point both sensors at a fixed flat target for a fair comparison.
+    The poll backend should show ~100% CPU; edge backends should be near 0%.
+
+    Run from raspi_code/ root:
+        sudo python test/test_sensor_backends.py
+"""
+
+import sys
+import os
+import time
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import RPi.GPIO as GPIO
+from lib.services.hardware import ultrasonic_controller as distance
+from lib.services.hardware.ultrasonic_controller import (
+    LEFT_TRIG, LEFT_ECHO,
+    RIGHT_TRIG, RIGHT_ECHO,
+    VALID_MIN_CM, VALID_MAX_CM,
+    SAMPLE_DELAY,
+)
+
+# ─────────────────────────── CONFIG ──────────────────────────────────────────
+
+MEASUREMENTS = 200
+
+# ─────────────────────────── HELPERS ─────────────────────────────────────────
+
+def _run_backend(backend: str) -> None:
+    try:
+        distance.setup_ultrasonics(backend=backend)
+    except distance.UltrasonicSetupError as e:
+        print(f"  {backend:<8} | skipped: {e}")
+        return
+
+    for label, trig, echo in (
+        ("FEED ", LEFT_TRIG,  LEFT_ECHO),
+        ("WATER", RIGHT_TRIG, RIGHT_ECHO),
+    ):
+        readings   = []
+        busy_wall  = 0.0
+        busy_cpu   = 0.0
+
+        for _ in range(MEASUREMENTS):
+            wall0 = time.perf_counter()
+            cpu0  = time.process_time()
+            reading = distance._measure_once(trig, echo)
+            busy_cpu  += time.process_time() - cpu0
+            busy_wall += time.perf_counter() - wall0
+
+            if VALID_MIN_CM <= reading <= VALID_MAX_CM:
+                readings.append(reading)
+            time.sleep(SAMPLE_DELAY)
+
+        if len(readings) >= 2:
+            mean  = statistics.mean(readings)
+            stdev = statistics.stdev(readings)
+        else:
+            mean = stdev = 0.0
+
+        cpu_pct = (busy_cpu / busy_wall * 100) if busy_wall > 0 else 0.0
+        print(
+            f"  {backend:<8} | {label} | valid: {len(readings):>3}/{MEASUREMENTS} | "
+            f"mean: {mean:>7.2f} cm | stdev: {stdev:>5.2f} cm | "
+            f"cpu while measuring: {cpu_pct:>5.1f}%"
+        )
+
+    distance.cleanup_ultrasonics()
+
+
+# ─────────────────────────── MAIN ────────────────────────────────────────────
+
+def main():
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setwarnings(False)
+
+    print("=" * 96)
+    print("  Ultrasonic backend comparison — accuracy and CPU")
+    print(f"  {MEASUREMENTS} raw readings per sensor per backend")
+    print("=" * 96)
+
+    try:
+        for backend in distance.BACKENDS:
+            _run_backend(backend)
+    except KeyboardInterrupt:
+        print("\n\nTest stopped by user.")
+    finally:
+        distance.cleanup_ultrasonics()
+        GPIO.cleanup()
+        print("GPIO cleaned up.")
+
+
+if __name__ == "__main__":
+    main()
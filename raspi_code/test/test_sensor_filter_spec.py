@@ -0,0 +1,56 @@
+"""
+Path: test/test_sensor_filter_spec.py
+Description:
+    Regression checks for SENSOR_FILTER_CHAIN parsing (no hardware needed).
+
+    Bad specs must raise SensorFilterConfigError at start-up instead of
+    building a filter that silently misbehaves — e.g. "kalman:nan" used to
+    be accepted and then output NaN forever.
+
+    Run from raspi_code/ root:
+        python test/test_sensor_filter_spec.py
+"""
+
+import sys
+import os
+import math
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lib.services.sensor_filter import build_filter_chain, SensorFilterConfigError
+
+# ─────────────────────────── CONFIG ──────────────────────────────────────────
+
+GOOD_SPECS = ("", "median:5", "iqr:25:1.5,median:5,ewma:0.3", "kalman:0.05:4", "median:5.0")
+BAD_SPECS  = (
+    "kalman:nan", "kalman:0.05:nan", "kalman:inf", "kalman:0.05:-inf", "kalman:0",
+    "iqr:25:nan", "iqr:25:inf", "median:5.5", "median:nan", "ewma:nan", "bogus:1",
+)
+
+# ─────────────────────────── TESTS ───────────────────────────────────────────
+
+def test_good_specs_build() -> None:
+    for spec in GOOD_SPECS:
+        chain = build_filter_chain(spec)
+        outputs = [chain.update(value) for value in (50.0, 51.0, 49.5, 50.5, 50.0)]
+        assert all(out is None or math.isfinite(out) for out in outputs), (spec, outputs)
+
+
+def test_bad_specs_rejected() -> None:
+    for spec in BAD_SPECS:
+        try:
+            build_filter_chain(spec)
+        except SensorFilterConfigError:
+            continue
+        raise AssertionError(f"'{spec}' was accepted")
+
+# ─────────────────────────── MAIN ────────────────────────────────────────────
+
+def main() -> None:
+    test_good_specs_build()
+    test_bad_specs_rejected()
+    print(f"OK — {len(GOOD_SPECS)} good and {len(BAD_SPECS)} bad filter specs")
+
+
+if __name__ == "__main__":
+    main()
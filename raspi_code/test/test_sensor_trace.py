@@ -0,0 +1,90 @@
+"""
+Path: test/test_sensor_trace.py
+Description:
+    Regression checks for the sensor trace file format (no hardware needed).
+
+    Covers reopening a trace after a power cut: a torn header (file shorter
+    than the 16-byte header) is rewritten, a torn final record is trimmed,
+    and a file of another format is refused instead of appended to.
+
+    Run from raspi_code/ root:
+        python test/test_sensor_trace.py
+"""
+
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from lib.services import sensor_trace
+from lib.services.sensor_trace import (
+    TraceRecorder, load_trace, SensorTraceFormatError,
+    HEADER, RECORD, MAGIC, SENSOR_FEED, SENSOR_WATER,
+)
+
+# ─────────────────────────── HELPERS ─────────────────────────────────────────
+
+def _record(path: str, samples: list) -> None:
+    recorder = TraceRecorder(path)
+    for t_ns, sensor, cm in samples:
+        recorder.append(sensor, t_ns, cm)
+    recorder.close()
+
+# ─────────────────────────── TESTS ───────────────────────────────────────────
+
+def test_truncated_header_is_rewritten() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sensors.trace")
+        with open(path, "wb") as fh:
+            fh.write(MAGIC[:5])                     # power cut mid-header
+
+        _record(path, [(1, SENSOR_FEED, 10.0), (2, SENSOR_WATER, 20.0)])
+
+        data = load_trace(path)
+        assert len(data) == 2, data
+        assert os.path.getsize(path) == HEADER.size + 2 * RECORD.size
+
+
+def test_torn_record_is_trimmed() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sensors.trace")
+        _record(path, [(1, SENSOR_FEED, 10.0)])
+        with open(path, "ab") as fh:
+            fh.write(b"\x01\x02\x03")               # half a record
+
+        _record(path, [(2, SENSOR_FEED, 11.0)])
+
+        data = load_trace(path)
+        assert list(data["t_ns"]) == [1, 2], data
+        assert list(data["cm"]) == [10.0, 11.0], data
+
+
+def test_foreign_file_is_refused() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sensors.trace")
+        for head in (
+            b"NOTATRACE" + bytes(HEADER.size),
+            HEADER.pack(MAGIC, sensor_trace.VERSION + 1, RECORD.size),
+            HEADER.pack(MAGIC, sensor_trace.VERSION, RECORD.size + 1),
+        ):
+            with open(path, "wb") as fh:
+                fh.write(head)
+            try:
+                TraceRecorder(path)
+            except SensorTraceFormatError:
+                assert open(path, "rb").read() == head   # left untouched
+                continue
+            raise AssertionError(f"header {head!r} was accepted")
+
+# ─────────────────────────── MAIN ────────────────────────────────────────────
+
+def main() -> None:
+    test_truncated_header_is_rewritten()
+    test_torn_record_is_trimmed()
+    test_foreign_file_is_refused()
+    print("OK — torn header, torn record and foreign file handled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Path: test/test_viewer_rungs.py
+Description:
+    Regression check for per-viewer ABR rungs (no camera or network needed).
+
+    Two viewers share one CameraVideoTrack through MediaRelay, the way
+    WebRTCPeer wires its sessions. One sits at the top rung, the other is
+    moved down to the bottom rung: the second must get smaller, sparser
+    frames while the first keeps full size and frame rate — a poor link
+    only downgrades its own viewer.
+
+    Run from raspi_code/ root:
+        python test/test_viewer_rungs.py
+"""
+
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from aiortc.contrib.media import MediaRelay
+
+from lib.processes.process_a import SharedFrameBuffer
+from lib.services.abr_controller import ABRController, default_ladder
+from lib.services.hardware import camera_controller as camera
+from lib.services.webrtc_peer import CameraVideoTrack, ViewerTrack, WebRTCPeer
+
+# ─────────────────────────── CONFIG ──────────────────────────────────────────
+
+FRAME_DIMENSION = {"width": 640, "height": 480}
+FPS             = 20
+SECONDS         = 2.0
+
+# ─────────────────────────── HELPERS ─────────────────────────────────────────
+
+def _frame_buffer() -> SharedFrameBuffer:
+    shape  = camera.frame_shape(FRAME_DIMENSION, "yuv420")
+    buffer = SharedFrameBuffer(shape=shape, pixel_format="yuv420")
+    buffer.update(np.full(shape, 128, dtype=np.uint8))
+    return buffer
+
+
+def _session(relay: MediaRelay, source: CameraVideoTrack, ladder: list, index: int) -> SimpleNamespace:
+    session = SimpleNamespace(
+        track = ViewerTrack(relay.subscribe(source, buffered=False)),
+        abr   = ABRController(ladder, start_index=index),
+    )
+    WebRTCPeer._apply_rung(session)
+    return session
+
+
+async def _pull(track: ViewerTrack, seconds: float) -> list:
+    """(width, height) of every frame the viewer's sender would encode."""
+    sizes    = []
+    deadline = asyncio.get_running_loop().time() + seconds
+    while asyncio.get_running_loop().time() < deadline:
+        frame = await track.recv()
+        sizes.append((frame.width, frame.height))
+    return sizes
+
+# ─────────────────────────── TESTS ───────────────────────────────────────────
+
+async def test_sessions_keep_their_own_rung() -> None:
+    ladder = default_ladder(FRAME_DIMENSION["width"], FRAME_DIMENSION["height"], FPS)
+    source = CameraVideoTrack(None, FRAME_DIMENSION, frame_buffer=_frame_buffer(), fps=FPS)
+    top    = ladder[0]
+    source.set_output(top.width, top.height, top.fps)
+    relay  = MediaRelay()
+
+    lan, mobile = _session(relay, source, ladder, 0), _session(relay, source, ladder, 0)
+    mobile.abr.index = len(ladder) - 1          # Poor link: ABR steps to the bottom rung
+    WebRTCPeer._apply_rung(mobile)
+    bottom = mobile.abr.rung
+
+    try:
+        lan_sizes, mobile_sizes = await asyncio.gather(
+            _pull(lan.track, SECONDS), _pull(mobile.track, SECONDS)
+        )
+    finally:
+        lan.track.stop()
+        mobile.track.stop()
+        source.stop()
+
+    assert set(lan_sizes) == {(top.width, top.height)}, f"LAN viewer downgraded: {set(lan_sizes)}"
+    assert set(mobile_sizes) == {(bottom.width, bottom.height)}, set(mobile_sizes)
+    assert (source.out_width, source.out_height) == (top.width, top.height)
+
+    lan_fps, mobile_fps = len(lan_sizes) / SECONDS, len(mobile_sizes) / SECONDS
+    assert lan_fps >= top.fps * 0.8, f"LAN viewer at {lan_fps:.1f} fps"
+    assert abs(mobile_fps - bottom.fps) <= bottom.fps * 0.25, f"mobile viewer at {mobile_fps:.1f} fps"
+    print(f"  lan {top.width}x{top.height} @ {lan_fps:.1f} fps | "
+          f"mobile {bottom.width}x{bottom.height} @ {mobile_fps:.1f} fps")
+
+# ─────────────────────────── MAIN ────────────────────────────────────────────
+
+def main() -> None:
+    asyncio.run(test_sessions_keep_their_own_rung())
+    print("OK — each viewer streams at its own ABR rung")
+
+
+if __name__ == "__main__":
+    main()